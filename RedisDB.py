@@ -1,14 +1,220 @@
 #!/usr/bin/env python3
 """Redis 資料庫處理器 - 用於儲存測試數據"""
 
+import re
 import redis as redis_client
-from typing import Optional, Dict, List
+from redis.client import NEVER_DECODE
+from typing import Optional, Dict, List, Union, Iterable, Tuple, Callable
 from datetime import datetime
+from threading import Thread, Lock
+import struct
+import time
+import uuid
+
+import numpy as np
+
+import metric_codec
+
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 監控樣本以固定寬度的二進位紀錄儲存，每分鐘一個 chunk（APPEND 追加）：
+# chunk 內毫秒偏移 (uint16)、cpu_usage (float32)、ram_used (uint32)、ram_usage (float32)
+# ram_total 幾乎不變，只存在 monitor:pair{index}:meta 中
+MONITOR_CHUNK_SECONDS = 60
+MONITOR_RECORD = struct.Struct('<HfIf')
+MONITOR_DTYPE = np.dtype([
+    ('offset_ms', '<u2'),
+    ('cpu_usage', '<f4'),
+    ('ram_used', '<u4'),
+    ('ram_usage', '<f4'),
+])
+
+# 超過保留期限的原始樣本降採樣為 1 分鐘 / 1 小時的 min/avg/max 彙總，
+# 存在 monitor:pair{index}:rollup:{解析度} sorted set 中（score 為區間起點，
+# 成員為一筆固定寬度的二進位紀錄）
+ROLLUP_RESOLUTIONS = {'1m': 60, '1h': 3600}
+ROLLUP_FIELDS = ('cpu_usage', 'ram_used', 'ram_usage')
+ROLLUP_DTYPE = np.dtype(
+    [('timestamp', '<f8'), ('count', '<u4')]
+    + [(f"{name}_{stat}", '<f4') for name in ROLLUP_FIELDS for stat in ('min', 'avg', 'max')]
+)
+
+# 各 pair 的 dperf 行程取樣存在 monitor:pair{index}:{role}:process sorted set 中
+# （score 為取樣時間，成員為一筆固定寬度的二進位紀錄）：
+# CPU 使用率 (% of 單一核心)、累計 CPU 時間 (秒)、RSS 與 hugepage 用量 (MB)、行程數
+PROCESS_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('cpu_usage', '<f4'),
+    ('cpu_time', '<f8'),
+    ('rss_mb', '<f4'),
+    ('hugetlb_mb', '<f4'),
+    ('pids', '<u2'),
+])
+PROCESS_FIELDS = PROCESS_DTYPE.names[1:]
+
+# 監控數據與測試輸出 key 中的 pair 索引（保留策略以 SCAN 找出所有曾寫入數據的 pair）
+PAIR_KEY_PATTERN = re.compile(r'^(?:monitor|test):pair(\d+):')
+
+
+def _normalize_timestamp(timestamp: Union[str, float, int]) -> Tuple[str, float]:
+    """將時間戳轉為 (字串, epoch 秒數)
+
+    傳入 epoch float 時不需要 strptime 解析，只有舊的字串格式才會解析一次；
+    字串可帶小數秒（如 SystemMonitor 的毫秒時間戳 '2026-01-01 00:00:00.250'）。
+    """
+    if isinstance(timestamp, (int, float)):
+        return datetime.fromtimestamp(timestamp).strftime(TIMESTAMP_FORMAT), float(timestamp)
+    fmt = TIMESTAMP_FORMAT + '.%f' if '.' in timestamp else TIMESTAMP_FORMAT
+    return timestamp, datetime.strptime(timestamp, fmt).timestamp()
+
+
+def _score_bound(value: Union[str, float, None], default: str):
+    """將查詢範圍的時間（字串或 epoch）轉為 sorted set score，None 時返回 default"""
+    if value is None:
+        return default
+    return _normalize_timestamp(value)[1]
+
+
+def new_run_id() -> str:
+    """產生測試執行 ID（開始時間 + 隨機碼），同一秒開始的多次執行也不會重複"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def _output_prefix(pair_index: int, role: str, timestamp: Optional[str] = None,
+                   run_id: Optional[str] = None) -> str:
+    """測試輸出的 key 前綴：有 run_id 時以 run_id 區分，否則沿用舊的時間戳格式"""
+    return f"test:pair{pair_index}:{role}:{run_id or timestamp}"
+
+
+def _process_records(pair_index: int, role: str, arrays: Dict[str, np.ndarray]) -> List[Dict]:
+    """將行程取樣陣列轉為 SystemMonitor.get_process_data() 的字典格式"""
+    return [
+        {
+            "pair_index": pair_index,
+            "role": role,
+            "timestamp": datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT),
+            "epoch": float(ts),
+            "cpu_usage": round(float(cpu), 2),
+            "cpu_time": round(float(cpu_time), 2),
+            "rss_mb": round(float(rss), 2),
+            "hugetlb_mb": round(float(hugetlb), 2),
+            "pids": int(pids),
+        }
+        for ts, cpu, cpu_time, rss, hugetlb, pids in zip(*(arrays[name] for name in PROCESS_DTYPE.names))
+    ]
+
+
+def _decode_chunk(chunk_start: float, raw: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """解碼一個監控 chunk，返回 (epoch 時間戳, MONITOR_DTYPE 紀錄)，忽略結尾不完整的紀錄"""
+    usable = len(raw) - len(raw) % MONITOR_DTYPE.itemsize
+    rec = np.frombuffer(raw[:usable], dtype=MONITOR_DTYPE)
+    return chunk_start + rec['offset_ms'] / 1000.0, rec
+
+
+def _samples_to_rollup(ts: np.ndarray, rec: np.ndarray) -> np.ndarray:
+    """將原始樣本轉為 count=1 的 ROLLUP_DTYPE 紀錄，方便與既有彙總合併"""
+    out = np.zeros(len(ts), dtype=ROLLUP_DTYPE)
+    out['timestamp'] = ts
+    out['count'] = 1
+    for name in ROLLUP_FIELDS:
+        for stat in ('min', 'avg', 'max'):
+            out[f"{name}_{stat}"] = rec[name]
+    return out
+
+
+def rollup_records(records: np.ndarray, resolution: int) -> np.ndarray:
+    """將 ROLLUP_DTYPE 紀錄依 resolution 秒分桶合併（min 取最小、max 取最大、avg 依 count 加權）
+
+    Args:
+        records: ROLLUP_DTYPE 紀錄（原始樣本可先以 count=1 表示）
+        resolution: 分桶秒數
+
+    Returns:
+        np.ndarray: 依時間排序、每個分桶一筆的 ROLLUP_DTYPE 紀錄
+    """
+    buckets = (records['timestamp'] // resolution) * resolution
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    counts = records['count'].astype(np.float64)
+    total = np.bincount(inverse, weights=counts, minlength=len(starts))
+
+    out = np.zeros(len(starts), dtype=ROLLUP_DTYPE)
+    out['timestamp'] = starts
+    out['count'] = total
+    for name in ROLLUP_FIELDS:
+        low = np.full(len(starts), np.inf)
+        np.minimum.at(low, inverse, records[f"{name}_min"])
+        high = np.full(len(starts), -np.inf)
+        np.maximum.at(high, inverse, records[f"{name}_max"])
+        weighted = np.bincount(inverse, weights=records[f"{name}_avg"] * counts, minlength=len(starts))
+        out[f"{name}_min"] = low
+        out[f"{name}_avg"] = weighted / total
+        out[f"{name}_max"] = high
+    return out
+
+
+class InstrumentedConnectionPool(redis_client.BlockingConnectionPool):
+    """記錄取得連線等待時間的 BlockingConnectionPool
+
+    連線數達到 max_connections 時，取得連線會阻塞至多 timeout 秒；
+    等待時間與使用中連線數可透過 stats() 觀察連線池是否成為瓶頸。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = Lock()
+        self.acquire_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        waited = time.perf_counter() - start
+        with self._stats_lock:
+            self.acquire_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return connection
+
+    def release(self, connection):
+        with self._stats_lock:
+            self.in_use = max(0, self.in_use - 1)
+        super().release(connection)
+
+    def stats(self) -> Dict:
+        """返回連線池統計
+
+        Returns:
+            dict: max_connections、created、in_use、peak_in_use、acquire_count、
+                  wait_avg_ms、wait_max_ms
+        """
+        with self._stats_lock:
+            return {
+                "max_connections": self.max_connections,
+                "created": len(getattr(self, "_connections", [])),
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "acquire_count": self.acquire_count,
+                "wait_avg_ms": round(self.wait_total / self.acquire_count * 1000, 3) if self.acquire_count else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
 
 
 class RedisHandler:
     """Redis 資料庫處理器"""
 
+    # 共用 handler，以 (host, port, db) 為 key
+    _shared: Dict[Tuple[str, int, int], "RedisHandler"] = {}
+    _shared_lock = Lock()
+
+    # 範圍查詢時每個 pipeline 最多包含的指令數，避免單次回應過大
+    READ_BATCH_SIZE = 500
+
     def __init__(
         self,
         host: str = "localhost",
@@ -16,6 +222,7 @@ class RedisHandler:
         db: int = 0,
         password: Optional[str] = None,
         decode_responses: bool = True,
+        connection_pool: Optional[redis_client.ConnectionPool] = None,
     ):
         """
         初始化 Redis 連接
@@ -26,20 +233,34 @@ class RedisHandler:
             db: Redis 數據庫編號
             password: Redis 密碼（如果需要）
             decode_responses: 是否自動解碼響應為字符串
+            connection_pool: 使用指定的連線池（可選，由 shared() 提供）
         """
         self.host = host
         self.port = port
         self.db = db
         self.password = password
+        self.decode_responses = decode_responses
+        self.connection_pool = connection_pool
+        self._shared_key = None
+        self._refs = 0
+        # 各 pair 最近寫入的 ram_total，只有改變時才更新 meta
+        self._ram_totals: Dict[int, int] = {}
+        # 監控取樣執行緒、寫入佇列與清除數據可能同時讀寫 _ram_totals
+        self._ram_totals_lock = Lock()
+        # 已寫入 Redis 的 metric schema id
+        self._saved_schemas = set()
 
         try:
-            self.client = redis_client.Redis(
-                host=host,
-                port=port,
-                db=db,
-                password=password,
-                decode_responses=decode_responses,
-            )
+            if connection_pool is not None:
+                self.client = redis_client.Redis(connection_pool=connection_pool)
+            else:
+                self.client = redis_client.Redis(
+                    host=host,
+                    port=port,
+                    db=db,
+                    password=password,
+                    decode_responses=decode_responses,
+                )
             # 測試連接
             self.client.ping()
             print(f"成功連接到 Redis: {host}:{port}")
@@ -47,20 +268,131 @@ class RedisHandler:
             print(f"警告: 無法連接到 Redis ({host}:{port}): {e}")
             self.client = None
 
+    @classmethod
+    def shared(
+        cls,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        max_connections: int = 64,
+        pool_timeout: float = 5.0,
+    ) -> "RedisHandler":
+        """
+        取得行程內共用的 RedisHandler（以 host/port/db 為 key）
+
+        同一組 host/port/db 只建立一個連線池並只 ping 一次，所有 dperf pair 與
+        SystemMonitor 共用；每次呼叫需對應一次 close()，最後一個 close() 才真正斷線。
+        連接失敗的 handler 同樣會被共用，避免每個 pair 各自等待連線逾時。
+
+        Args:
+            host: Redis 主機地址
+            port: Redis 端口
+            db: Redis 數據庫編號
+            password: Redis 密碼（如果需要）
+            max_connections: 連線池最大連線數
+            pool_timeout: 連線池滿時等待可用連線的秒數
+
+        Returns:
+            RedisHandler: 共用的 handler（連接失敗時 is_connected() 為 False）
+        """
+        key = (host, port, db)
+        with cls._shared_lock:
+            handler = cls._shared.get(key)
+            if handler is None:
+                pool = InstrumentedConnectionPool(
+                    host=host,
+                    port=port,
+                    db=db,
+                    password=password,
+                    decode_responses=True,
+                    max_connections=max_connections,
+                    timeout=pool_timeout,
+                )
+                handler = cls(host=host, port=port, db=db, password=password, connection_pool=pool)
+                handler._shared_key = key
+                cls._shared[key] = handler
+            handler._refs += 1
+            return handler
+
+    def pool_stats(self) -> Dict:
+        """返回連線池統計（連線池大小與等待時間），非共用連線池時返回空 dict"""
+        if isinstance(self.connection_pool, InstrumentedConnectionPool):
+            return self.connection_pool.stats()
+        return {}
+
     def is_connected(self) -> bool:
         """檢查是否成功連接到 Redis"""
         return self.client is not None
 
+    def reconnect(self) -> bool:
+        """重新建立連接並 ping（建立 handler 時 Redis 尚未啟動，或之後恢復時使用）
+
+        共用連線池時先中斷池中所有連線，之後取用時重新建立。
+
+        Returns:
+            bool: 連接成功時返回 True，失敗時 is_connected() 為 False
+        """
+        try:
+            if self.connection_pool is not None:
+                self.connection_pool.disconnect()
+                client = redis_client.Redis(connection_pool=self.connection_pool)
+            else:
+                client = redis_client.Redis(
+                    host=self.host,
+                    port=self.port,
+                    db=self.db,
+                    password=self.password,
+                    decode_responses=self.decode_responses,
+                )
+            client.ping()
+        except Exception as e:
+            print(f"警告: 無法重新連接到 Redis ({self.host}:{self.port}): {e}")
+            self.client = None
+            return False
+        self.client = client
+        print(f"已重新連接到 Redis: {self.host}:{self.port}")
+        return True
+
+    def _queue_monitor_sample(
+        self, pipe, pair_index: int, timestamp: Union[str, float], cpu_usage: float,
+        ram_used: int, ram_total: int, ram_usage: float
+    ) -> None:
+        """將一筆監控數據的 APPEND 與 chunk 索引加入 pipeline"""
+        if isinstance(timestamp, (int, float)):
+            ts = float(timestamp)
+        else:
+            ts = _normalize_timestamp(timestamp)[1]
+
+        # Key: monitor:pair{index}:chunk:{分鐘起點 epoch}
+        chunk_start = int(ts // MONITOR_CHUNK_SECONDS) * MONITOR_CHUNK_SECONDS
+        offset_ms = min(int(round((ts - chunk_start) * 1000)), MONITOR_CHUNK_SECONDS * 1000 - 1)
+        chunk_key = f"monitor:pair{pair_index}:chunk:{chunk_start}"
+
+        pipe.append(chunk_key, MONITOR_RECORD.pack(offset_ms, cpu_usage, int(ram_used), ram_usage))
+        # chunk 索引，Score 為 chunk 起點的 Unix 時間戳
+        pipe.zadd(f"monitor:pair{pair_index}:chunks", {chunk_key: chunk_start})
+
+        with self._ram_totals_lock:
+            if self._ram_totals.get(pair_index) != ram_total:
+                pipe.hset(f"monitor:pair{pair_index}:meta", "ram_total", ram_total)
+                self._ram_totals[pair_index] = ram_total
+
+    def _forget_ram_total(self, pair_index: int) -> None:
+        """清除 pair 最近寫入的 ram_total，下一筆樣本會重新寫入 meta"""
+        with self._ram_totals_lock:
+            self._ram_totals.pop(pair_index, None)
+
     def save_monitor_data(
-        self, pair_index: int, timestamp: str, cpu_usage: float,
+        self, pair_index: int, timestamp: Union[str, float], cpu_usage: float,
         ram_used: int, ram_total: int, ram_usage: float
     ) -> bool:
         """
-        儲存監控數據到 Redis
+        儲存監控數據到 Redis（追加到每分鐘的二進位 chunk，以單次 pipeline 送出）
 
         Args:
             pair_index: pair 索引
-            timestamp: 時間戳
+            timestamp: 時間戳，epoch 秒數 (float) 或 '%Y-%m-%d %H:%M:%S' 字串
             cpu_usage: CPU 使用率
             ram_used: 已使用 RAM (MB)
             ram_total: 總 RAM (MB)
@@ -73,46 +405,70 @@ class RedisHandler:
             return False
 
         try:
-            # 使用 Hash 結構儲存監控數據
-            # Key: monitor:pair{index}:{timestamp}
-            key = f"monitor:pair{pair_index}:{timestamp}"
+            pipe = self.client.pipeline()
+            self._queue_monitor_sample(
+                pipe, pair_index, timestamp, cpu_usage, ram_used, ram_total, ram_usage
+            )
+            pipe.execute()
+            return True
+        except Exception as e:
+            self._forget_ram_total(pair_index)
+            print(f"儲存監控數據失敗: {e}")
+            return False
 
-            data = {
-                "pair_index": pair_index,
-                "timestamp": timestamp,
-                "cpu_usage": cpu_usage,
-                "ram_used": ram_used,
-                "ram_total": ram_total,
-                "ram_usage": ram_usage,
-            }
+    def save_monitor_batch(self, pair_index: int, samples: Iterable[Dict]) -> int:
+        """
+        以單次 pipeline 批次儲存多筆監控數據
 
-            self.client.hset(key, mapping=data)
+        Args:
+            pair_index: pair 索引
+            samples: 監控數據字典，每筆包含 timestamp、cpu_usage、ram_used、ram_total、ram_usage
+                     (與 SystemMonitor.monitor_data 的格式相同)
 
-            # 將 key 加入到 sorted set 以便按時間排序查詢
-            # Score 使用時間戳轉換為 Unix 時間戳
-            ts = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp()
-            self.client.zadd(f"monitor:pair{pair_index}:timeline", {key: ts})
+        Returns:
+            成功寫入的筆數，失敗返回 0
+        """
+        if not self.is_connected():
+            return 0
 
-            return True
+        try:
+            pipe = self.client.pipeline()
+            count = 0
+            for sample in samples:
+                self._queue_monitor_sample(
+                    pipe, pair_index, sample["timestamp"], sample["cpu_usage"],
+                    sample["ram_used"], sample["ram_total"], sample["ram_usage"]
+                )
+                count += 1
+            if count:
+                pipe.execute()
+            return count
         except Exception as e:
-            print(f"儲存監控數據失敗: {e}")
-            return False
+            self._forget_ram_total(pair_index)
+            print(f"批次儲存監控數據失敗: {e}")
+            return 0
 
     def save_test_output(
-        self, pair_index: int, role: str, output: Dict, timestamp: Optional[str] = None
+        self, pair_index: int, role: str, output: Dict, timestamp: Union[str, float, None] = None,
+        steady: Optional[Dict] = None, fingerprint: Optional[str] = None, run_id: Optional[str] = None
     ) -> bool:
         """
         儲存測試輸出數據（server 或 client）
 
-        資料結構：
-        - test:pair{index}:{role}:{timestamp}:info - 儲存 metadata (pair_index, role, timestamp)
-        - test:pair{index}:{role}:{timestamp}:metrics - 儲存所有效能指標 (duration, ackDup, etc.)
+        資料結構（{id} 為 run_id，未指定 run_id 時為時間戳）：
+        - test:pair{index}:{role}:{id}:info - 儲存 metadata (pair_index, role, timestamp, run_id)
+        - test:pair{index}:{role}:{id}:packed - hash，metrics 欄位為所有效能指標 (duration, ackDup, etc.)，
+          steady 欄位為去除暖機/收尾後的穩態統計 (pktRx.mean, etc.)，皆為 metric_codec 的二進位編碼
+        - metric_schema:{schema_id} - 編碼使用的欄位名稱與型別（每個 schema 只寫入一次）
 
         Args:
             pair_index: pair 索引
             role: 角色 ('server' 或 'client')
             output: 測試輸出數據字典
-            timestamp: 時間戳（可選，預設使用當前時間）
+            timestamp: 時間戳，epoch 秒數或字串（可選，預設使用當前時間）
+            steady: 攤平後的穩態統計字典（可選）
+            fingerprint: pair 配置指紋（可選），用於查詢同配置的歷史結果作為 baseline
+            run_id: 測試執行 ID（可選），同一秒開始的多次執行不會互相覆蓋
 
         Returns:
             成功返回 True，否則返回 False
@@ -121,11 +477,15 @@ class RedisHandler:
             return False
 
         if timestamp is None:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp = datetime.now().timestamp()
 
         try:
+            timestamp, ts = _normalize_timestamp(timestamp)
+            # 所有寫入以單次 pipeline (MULTI/EXEC) 送出
+            pipe = self.client.pipeline()
+
             # Key 前綴
-            key_prefix = f"test:pair{pair_index}:{role}:{timestamp}"
+            key_prefix = _output_prefix(pair_index, role, timestamp, run_id)
 
             # 1. 儲存 metadata
             info_key = f"{key_prefix}:info"
@@ -134,68 +494,646 @@ class RedisHandler:
                 "role": role,
                 "timestamp": timestamp,
             }
-            self.client.hset(info_key, mapping=metadata)
-
-            # 2. 儲存 metrics
-            metrics_key = f"{key_prefix}:metrics"
-            # 將所有 output 數據作為 metrics 儲存
-            metrics_data = {k: str(v) for k, v in output.items()}
-            self.client.hset(metrics_key, mapping=metrics_data)
+            if fingerprint:
+                metadata["fingerprint"] = fingerprint
+            if run_id:
+                metadata["run_id"] = run_id
+            pipe.hset(info_key, mapping=metadata)
+
+            # 2. 以二進位編碼儲存 metrics 與穩態統計（如果有），保留數值型別
+            metrics_blob, metrics_schema = metric_codec.encode(output)
+            packed = {"metrics": metrics_blob}
+            schemas = [metrics_schema]
+            if steady:
+                steady_blob, steady_schema = metric_codec.encode(steady)
+                packed["steady"] = steady_blob
+                schemas.append(steady_schema)
+            pipe.hset(f"{key_prefix}:packed", mapping=packed)
+            new_schemas = self._queue_schemas(pipe, schemas)
 
             # 3. 將 key 前綴加入到 sorted set 以便按時間排序查詢
-            ts = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp()
-            self.client.zadd(f"test:pair{pair_index}:{role}:timeline", {key_prefix: ts})
+            pipe.zadd(f"test:pair{pair_index}:{role}:timeline", {key_prefix: ts})
+
+            # 4. 依配置指紋建立索引，供 regression 比對使用
+            if fingerprint:
+                pipe.zadd(f"baseline:{fingerprint}:{role}:timeline", {key_prefix: ts})
 
+            pipe.execute()
+            self._saved_schemas.update(new_schemas)
             return True
         except Exception as e:
             print(f"儲存測試輸出失敗: {e}")
             return False
 
+    def _hgetall_many(self, keys: List[str]) -> List[Dict]:
+        """以分批 pipeline 讀取多個 hash，順序與 keys 相同"""
+        result = []
+        for i in range(0, len(keys), self.READ_BATCH_SIZE):
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys[i:i + self.READ_BATCH_SIZE]:
+                pipe.hgetall(key)
+            result.extend(pipe.execute())
+        return result
+
+    def _queue_schemas(self, pipe, schemas: List[metric_codec.MetricSchema]) -> List[int]:
+        """將尚未寫入的 schema 定義加入 pipeline，返回新加入的 schema id"""
+        new_ids = []
+        for schema in schemas:
+            if schema.schema_id not in self._saved_schemas and schema.schema_id not in new_ids:
+                pipe.set(f"metric_schema:{schema.schema_id}", schema.to_json())
+                new_ids.append(schema.schema_id)
+        return new_ids
+
+    def _load_schema(self, schema_id: int) -> metric_codec.MetricSchema:
+        """取得 schema，未登錄時從 metric_schema:{id} 讀取"""
+        schema = metric_codec.get_schema(schema_id)
+        if schema is None:
+            definition = self.client.get(f"metric_schema:{schema_id}")
+            if definition is None:
+                raise ValueError(f"找不到 metric schema {schema_id}")
+            if isinstance(definition, bytes):
+                definition = definition.decode('utf-8')
+            schema = metric_codec.register_schema(metric_codec.MetricSchema.from_json(definition))
+        return schema
+
+    def _decode_metrics(self, blob: Optional[bytes]) -> Dict:
+        """解碼 packed hash 中的單一欄位，沒有內容時返回空字典"""
+        if not blob:
+            return {}
+        return metric_codec.decode(blob, self._load_schema(metric_codec.schema_id_of(blob)))
+
+    def _read_test_outputs(self, key_prefixes: List[str], include_metrics: bool = True) -> List[Dict]:
+        """以分批 pipeline 讀取多次測試的 info / metrics / steady，略過不存在的項目
+
+        metrics / steady 優先讀取二進位編碼的 :packed，舊格式（字串 hash）的結果再補讀一次。
+        """
+        result = []
+        for i in range(0, len(key_prefixes), self.READ_BATCH_SIZE):
+            batch = key_prefixes[i:i + self.READ_BATCH_SIZE]
+            pipe = self.client.pipeline(transaction=False)
+            for prefix in batch:
+                pipe.hgetall(f"{prefix}:info")
+                if include_metrics:
+                    pipe.execute_command(
+                        "HMGET", f"{prefix}:packed", "metrics", "steady", **{NEVER_DECODE: []}
+                    )
+            replies = pipe.execute()
+
+            step = 2 if include_metrics else 1
+            legacy = []
+            for j, prefix in enumerate(batch):
+                info = replies[j * step]
+                if not info:
+                    continue
+                data = {"info": info}
+                if include_metrics:
+                    metrics_blob, steady_blob = replies[j * step + 1]
+                    if metrics_blob is None:
+                        legacy.append((prefix, data))
+                    else:
+                        data["metrics"] = self._decode_metrics(metrics_blob)
+                        data["steady"] = self._decode_metrics(steady_blob)
+                result.append(data)
+
+            if legacy:
+                hashes = self._hgetall_many(
+                    [f"{prefix}:{section}" for prefix, _ in legacy for section in ("metrics", "steady")]
+                )
+                for k, (_, data) in enumerate(legacy):
+                    data["metrics"] = hashes[2 * k] or {}
+                    data["steady"] = hashes[2 * k + 1] or {}
+        return result
+
+    def get_metric_arrays(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, section: str = "metrics"
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取多次測試的數值指標
+
+        相同 schema 的結果以 np.frombuffer 一次解碼；若期間內欄位不同，缺少的值為 NaN。
+        字串欄位與舊格式（字串 hash）的結果不包含在內。
+
+        Args:
+            pair_index: pair 索引
+            role: 角色 ('server' 或 'client')
+            start_time: 起始時間（含），字串或 epoch 秒數（可選）
+            end_time: 結束時間（含），字串或 epoch 秒數（可選）
+            section: 'metrics' 或 'steady'
+
+        Returns:
+            {'timestamp': np.ndarray, 指標名稱: np.ndarray, ...}，依時間排序
+        """
+        result = {"timestamp": np.empty(0, dtype=np.float64)}
+        if not self.is_connected():
+            return result
+
+        try:
+            min_score = "-inf" if start_time is None else _normalize_timestamp(start_time)[1]
+            max_score = "+inf" if end_time is None else _normalize_timestamp(end_time)[1]
+            entries = self.client.zrangebyscore(
+                f"test:pair{pair_index}:{role}:timeline", min_score, max_score, withscores=True
+            )
+
+            blobs, timestamps = [], []
+            for i in range(0, len(entries), self.READ_BATCH_SIZE):
+                batch = entries[i:i + self.READ_BATCH_SIZE]
+                pipe = self.client.pipeline(transaction=False)
+                for prefix, _ in batch:
+                    pipe.execute_command("HGET", f"{prefix}:packed", section, **{NEVER_DECODE: []})
+                for (_, ts), blob in zip(batch, pipe.execute()):
+                    if blob:
+                        blobs.append(blob)
+                        timestamps.append(ts)
+
+            result["timestamp"] = np.array(timestamps, dtype=np.float64)
+            result.update(metric_codec.decode_arrays(blobs, self._load_schema))
+            return result
+        except Exception as e:
+            print(f"獲取指標陣列失敗: {e}")
+            return result
+
+    def get_monitor_arrays(
+        self, pair_index: int, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, limit: Optional[int] = None,
+        after: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取監控數據
+
+        chunk 以分批 pipeline 一次讀回並以 np.frombuffer 解碼，同一時間戳重複寫入的樣本只保留一筆。
+
+        Args:
+            pair_index: pair 索引
+            start_time: 起始時間（含），字串或 epoch 秒數（可選）
+            end_time: 結束時間（含），字串或 epoch 秒數（可選）
+            limit: 最多返回的筆數（可選，預設全部）
+            after: 只返回時間戳大於此值的樣本（分頁游標，可選）
+
+        Returns:
+            {'timestamp', 'cpu_usage', 'ram_used', 'ram_total', 'ram_usage'} -> np.ndarray，
+            依時間排序；timestamp 為 epoch 秒數
+        """
+        empty = {
+            "timestamp": np.empty(0, dtype=np.float64),
+            "cpu_usage": np.empty(0, dtype=np.float32),
+            "ram_used": np.empty(0, dtype=np.uint32),
+            "ram_total": np.empty(0, dtype=np.int64),
+            "ram_usage": np.empty(0, dtype=np.float32),
+        }
+        if not self.is_connected():
+            return empty
+
+        try:
+            lower = _score_bound(start_time, None)
+            upper = _score_bound(end_time, None)
+
+            # chunk 的 score 為起點，需從包含起始時間的 chunk 開始讀
+            bounds = [b for b in (lower, after) if b is not None]
+            min_score = (max(bounds) // MONITOR_CHUNK_SECONDS) * MONITOR_CHUNK_SECONDS if bounds else '-inf'
+            chunks = self.client.zrangebyscore(
+                f"monitor:pair{pair_index}:chunks", min_score,
+                '+inf' if upper is None else upper, withscores=True
+            )
+
+            times, records = [], []
+            count = 0
+            for i in range(0, len(chunks), self.READ_BATCH_SIZE):
+                batch = chunks[i:i + self.READ_BATCH_SIZE]
+                pipe = self.client.pipeline(transaction=False)
+                for chunk_key, _ in batch:
+                    pipe.execute_command("GET", chunk_key, **{NEVER_DECODE: []})
+
+                for (_, chunk_start), raw in zip(batch, pipe.execute()):
+                    if not raw:
+                        continue
+                    ts, rec = _decode_chunk(chunk_start, raw)
+
+                    keep = np.ones(len(rec), dtype=bool)
+                    if lower is not None:
+                        keep &= ts >= lower
+                    if after is not None:
+                        keep &= ts > after
+                    if upper is not None:
+                        keep &= ts <= upper
+                    times.append(ts[keep])
+                    records.append(rec[keep])
+                    count += int(keep.sum())
+
+                # chunk 依時間排序，已足夠時不必再讀後面的 chunk
+                if limit is not None and count >= limit:
+                    break
+
+            if not times:
+                return empty
+
+            ts = np.concatenate(times)
+            rec = np.concatenate(records)
+            # np.unique 同時排序並去除重送造成的重複時間戳
+            ts, index = np.unique(ts, return_index=True)
+            rec = rec[index]
+            if limit is not None:
+                ts, rec = ts[:limit], rec[:limit]
+
+            ram_total = self.client.hget(f"monitor:pair{pair_index}:meta", "ram_total")
+            return {
+                "timestamp": ts,
+                "cpu_usage": rec['cpu_usage'],
+                "ram_used": rec['ram_used'],
+                "ram_total": np.full(len(ts), int(ram_total or 0), dtype=np.int64),
+                "ram_usage": rec['ram_usage'],
+            }
+        except Exception as e:
+            print(f"獲取監控數據失敗: {e}")
+            return empty
+
     def get_monitor_data(
-        self, pair_index: int, start_time: Optional[str] = None, end_time: Optional[str] = None
+        self, pair_index: int, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, limit: Optional[int] = None,
+        after: Optional[float] = None
     ) -> List[Dict]:
         """
         獲取監控數據
 
         Args:
             pair_index: pair 索引
-            start_time: 起始時間（可選）
-            end_time: 結束時間（可選）
+            start_time: 起始時間，字串或 epoch 秒數（可選）
+            end_time: 結束時間，字串或 epoch 秒數（可選）
+            limit: 最多返回的筆數（可選，預設全部）
+            after: 只返回時間戳大於此值的樣本（分頁游標，可選）
+
+        Returns:
+            監控數據列表，格式與 SystemMonitor.get_data() 相同
+        """
+        arrays = self.get_monitor_arrays(pair_index, start_time, end_time, limit=limit, after=after)
+        return [
+            {
+                "pair_index": pair_index,
+                "timestamp": datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT),
+                "cpu_usage": round(float(cpu), 2),
+                "ram_used": int(used),
+                "ram_total": int(total),
+                "ram_usage": round(float(usage), 2),
+            }
+            for ts, cpu, used, total, usage in zip(
+                arrays["timestamp"], arrays["cpu_usage"], arrays["ram_used"],
+                arrays["ram_total"], arrays["ram_usage"]
+            )
+        ]
+
+    def get_monitor_page(
+        self, pair_index: int, cursor: Optional[float] = None, limit: int = 1000,
+        start_time: Union[str, float, None] = None, end_time: Union[str, float, None] = None
+    ) -> Tuple[Dict[str, np.ndarray], Optional[float]]:
+        """
+        分頁獲取監控數據
+
+        Args:
+            pair_index: pair 索引
+            cursor: 分頁游標（上一頁最後一筆的 epoch 時間戳），第一頁為 None
+            limit: 每頁筆數
+            start_time: 起始時間，字串或 epoch 秒數（可選）
+            end_time: 結束時間，字串或 epoch 秒數（可選）
 
         Returns:
-            監控數據列表
+            (get_monitor_arrays 格式的陣列, 下一頁游標)，已無更多數據時游標為 None
+        """
+        arrays = self.get_monitor_arrays(pair_index, start_time, end_time, limit=limit, after=cursor)
+        timestamps = arrays["timestamp"]
+        next_cursor = float(timestamps[-1]) if len(timestamps) == limit else None
+        return arrays, next_cursor
+
+    @staticmethod
+    def _process_key(pair_index: int, role: str) -> str:
+        """dperf 行程取樣的 sorted set key"""
+        return f"monitor:pair{pair_index}:{role}:process"
+
+    def save_process_batch(self, pair_index: int, role: str, samples: Iterable[Dict]) -> int:
+        """
+        以單次 ZADD 批次儲存一個 pair / 角色的 dperf 行程取樣
+
+        Args:
+            pair_index: pair 索引
+            role: 角色 ('server' 或 'client')
+            samples: 每筆包含 timestamp（epoch 秒數或字串）、cpu_usage、cpu_time、rss_mb、hugetlb_mb 與 pids
+
+        Returns:
+            成功處理的筆數，失敗返回 0
         """
         if not self.is_connected():
-            return []
+            return 0
+
+        try:
+            records = np.array([
+                (_normalize_timestamp(s["timestamp"])[1], *(s[name] for name in PROCESS_FIELDS))
+                for s in samples
+            ], dtype=PROCESS_DTYPE)
+            if not len(records):
+                return 0
+            self.client.zadd(
+                self._process_key(pair_index, role),
+                {record.tobytes(): float(record['timestamp']) for record in records}
+            )
+            return len(records)
+        except Exception as e:
+            print(f"批次儲存行程監控數據失敗: {e}")
+            return 0
+
+    def get_process_arrays(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取一個 pair / 角色的 dperf 行程取樣
+
+        Args:
+            pair_index: pair 索引
+            role: 角色 ('server' 或 'client')
+            start_time: 起始時間（含），字串或 epoch 秒數（可選）
+            end_time: 結束時間（含），字串或 epoch 秒數（可選）
 
+        Returns:
+            {'timestamp', 'cpu_usage', 'cpu_time', 'rss_mb', 'hugetlb_mb', 'pids': np.ndarray}，依時間排序
+        """
+        records = np.empty(0, dtype=PROCESS_DTYPE)
+        if self.is_connected():
+            try:
+                members = self.client.execute_command(
+                    "ZRANGEBYSCORE", self._process_key(pair_index, role),
+                    _score_bound(start_time, "-inf"), _score_bound(end_time, "+inf"), **{NEVER_DECODE: []}
+                )
+                if members:
+                    records = np.frombuffer(b"".join(members), dtype=PROCESS_DTYPE)
+            except Exception as e:
+                print(f"獲取行程監控數據失敗: {e}")
+        return {name: records[name] for name in PROCESS_DTYPE.names}
+
+    def get_process_data(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> List[Dict]:
+        """
+        獲取一個 pair / 角色的 dperf 行程取樣
+
+        Returns:
+            行程監控數據列表，格式與 SystemMonitor.get_process_data() 相同
+        """
+        return _process_records(pair_index, role, self.get_process_arrays(pair_index, role, start_time, end_time))
+
+    def expire_process_data(self, pair_index: int, days: float, now: Optional[float] = None) -> int:
+        """
+        刪除超過保留天數的 dperf 行程取樣
+
+        Args:
+            pair_index: pair 索引
+            days: 保留天數
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+
+        Returns:
+            刪除的取樣筆數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
         try:
-            # 從 sorted set 獲取時間範圍內的 keys
-            min_score = '-inf'
-            max_score = '+inf'
+            pipe = self.client.pipeline(transaction=False)
+            for role in ("server", "client"):
+                pipe.zremrangebyscore(self._process_key(pair_index, role), '-inf', cutoff)
+            return sum(pipe.execute())
+        except Exception as e:
+            print(f"刪除過期行程監控數據失敗: {e}")
+            return 0
 
-            if start_time:
-                min_score = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S').timestamp()
-            if end_time:
-                max_score = datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S').timestamp()
+    def migrate_legacy_monitor_data(self, pair_index: int, batch_size: int = 500) -> int:
+        """
+        將舊格式（每筆一個 hash + timeline）的監控數據轉存為二進位 chunk 並刪除舊 keys
 
-            keys = self.client.zrangebyscore(
-                f"monitor:pair{pair_index}:timeline", min_score, max_score
+        Args:
+            pair_index: pair 索引
+            batch_size: 每批轉存的筆數
+
+        Returns:
+            轉存的筆數
+        """
+        if not self.is_connected():
+            return 0
+
+        timeline = f"monitor:pair{pair_index}:timeline"
+        migrated = 0
+        try:
+            while True:
+                keys = self.client.zrange(timeline, 0, batch_size - 1)
+                if not keys:
+                    break
+                samples = [
+                    {
+                        "timestamp": data["timestamp"],
+                        "cpu_usage": float(data.get("cpu_usage", 0)),
+                        "ram_used": int(float(data.get("ram_used", 0))),
+                        "ram_total": int(float(data.get("ram_total", 0))),
+                        "ram_usage": float(data.get("ram_usage", 0)),
+                    }
+                    for data in self._hgetall_many(keys) if data.get("timestamp")
+                ]
+                if samples and self.save_monitor_batch(pair_index, samples) != len(samples):
+                    break
+                migrated += len(samples)
+                self._unlink_batch(keys, {timeline: keys})
+            print(f"已轉存 pair {pair_index} 的 {migrated} 筆舊格式監控數據")
+        except Exception as e:
+            print(f"轉存舊格式監控數據失敗: {e}")
+        return migrated
+
+    @staticmethod
+    def _rollup_key(pair_index: int, label: str) -> str:
+        """降採樣彙總的 sorted set key"""
+        return f"monitor:pair{pair_index}:rollup:{label}"
+
+    def _read_rollups(self, key: str, min_score, max_score, limit: Optional[int] = None) -> np.ndarray:
+        """讀取 score 範圍內的彙總紀錄（二進位成員不經字串解碼）"""
+        args = ["ZRANGEBYSCORE", key, min_score, max_score]
+        if limit is not None:
+            args += ["LIMIT", 0, limit]
+        members = self.client.execute_command(*args, **{NEVER_DECODE: []})
+        if not members:
+            return np.empty(0, dtype=ROLLUP_DTYPE)
+        return np.frombuffer(b"".join(members), dtype=ROLLUP_DTYPE)
+
+    def _queue_rollup_merge(self, pipe, pair_index: int, label: str, records: np.ndarray) -> None:
+        """將新的彙總紀錄與同區間既有的紀錄合併，並把替換動作加入 pipeline"""
+        key = self._rollup_key(pair_index, label)
+        lower, upper = float(records['timestamp'][0]), float(records['timestamp'][-1])
+        existing = self._read_rollups(key, lower, upper)
+        if len(existing):
+            records = rollup_records(np.concatenate([existing, records]), ROLLUP_RESOLUTIONS[label])
+        pipe.zremrangebyscore(key, lower, upper)
+        pipe.zadd(key, {record.tobytes(): float(record['timestamp']) for record in records})
+
+    def _compact_raw(self, pair_index: int, cutoff: float, label: str, batch_size: int) -> int:
+        """將完全早於 cutoff 的原始 chunk 降採樣為 label 解析度的彙總並刪除
+
+        Returns:
+            降採樣的原始樣本筆數
+        """
+        index_key = f"monitor:pair{pair_index}:chunks"
+        compacted = 0
+        while True:
+            chunks = self.client.zrangebyscore(
+                index_key, '-inf', cutoff - MONITOR_CHUNK_SECONDS, start=0, num=batch_size, withscores=True
             )
+            if not chunks:
+                break
+
+            pipe = self.client.pipeline(transaction=False)
+            for chunk_key, _ in chunks:
+                pipe.execute_command("GET", chunk_key, **{NEVER_DECODE: []})
+            parts = []
+            for (_, chunk_start), raw in zip(chunks, pipe.execute()):
+                if raw:
+                    ts, rec = _decode_chunk(chunk_start, raw)
+                    ts, index = np.unique(ts, return_index=True)
+                    parts.append(_samples_to_rollup(ts, rec[index]))
+
+            # 寫入彙總與刪除原始 chunk 以同一個 MULTI/EXEC 生效，中斷時不會遺失或重複計算
+            chunk_keys = [chunk_key for chunk_key, _ in chunks]
+            pipe = self.client.pipeline()
+            if parts:
+                records = np.concatenate(parts)
+                self._queue_rollup_merge(pipe, pair_index, label, rollup_records(records, ROLLUP_RESOLUTIONS[label]))
+                compacted += len(records)
+            pipe.unlink(*chunk_keys)
+            pipe.zrem(index_key, *chunk_keys)
+            pipe.execute()
+        return compacted
+
+    def _compact_rollups(self, pair_index: int, source: str, target: str, cutoff: float, batch_size: int) -> int:
+        """將完全早於 cutoff 的 source 彙總合併為 target 解析度並刪除
 
-            # 獲取每個 key 的數據
-            result = []
-            for key in keys:
-                data = self.client.hgetall(key)
-                result.append(data)
+        Returns:
+            合併的 source 彙總筆數
+        """
+        source_key = self._rollup_key(pair_index, source)
+        compacted = 0
+        while True:
+            records = self._read_rollups(
+                source_key, '-inf', cutoff - ROLLUP_RESOLUTIONS[source], limit=batch_size
+            )
+            if not len(records):
+                break
+            pipe = self.client.pipeline()
+            self._queue_rollup_merge(pipe, pair_index, target, rollup_records(records, ROLLUP_RESOLUTIONS[target]))
+            pipe.zremrangebyscore(source_key, float(records['timestamp'][0]), float(records['timestamp'][-1]))
+            pipe.execute()
+            compacted += len(records)
+        return compacted
+
+    def compact_monitor_data(
+        self, pair_index: int, raw_days: float, minute_days: Optional[float] = 30,
+        hour_days: Optional[float] = None, now: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        依保留政策降採樣並清除舊的監控數據
+
+        - 超過 raw_days 的原始樣本彙總為 1 分鐘 (minute_days 為 0/None 時直接彙總為 1 小時)
+        - 超過 minute_days 的 1 分鐘彙總再合併為 1 小時
+        - 超過 hour_days 的 1 小時彙總刪除 (None 表示永久保留)
+
+        Args:
+            pair_index: pair 索引
+            raw_days: 原始樣本保留天數
+            minute_days: 1 分鐘彙總保留天數
+            hour_days: 1 小時彙總保留天數
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+            batch_size: 每批處理的 chunk / 彙總筆數
 
+        Returns:
+            {'raw_samples', 'minute_rollups', 'hour_rollups_expired'} 各階段處理的筆數
+        """
+        result = {'raw_samples': 0, 'minute_rollups': 0, 'hour_rollups_expired': 0}
+        if not self.is_connected():
             return result
+
+        now = time.time() if now is None else now
+        batch_size = batch_size or self.READ_BATCH_SIZE
+        try:
+            result['raw_samples'] = self._compact_raw(
+                pair_index, now - raw_days * 86400, '1m' if minute_days else '1h', batch_size
+            )
+            if minute_days:
+                result['minute_rollups'] = self._compact_rollups(
+                    pair_index, '1m', '1h', now - minute_days * 86400, batch_size
+                )
+            if hour_days is not None:
+                result['hour_rollups_expired'] = self.client.zremrangebyscore(
+                    self._rollup_key(pair_index, '1h'), '-inf', now - hour_days * 86400 - ROLLUP_RESOLUTIONS['1h']
+                )
         except Exception as e:
-            print(f"獲取監控數據失敗: {e}")
-            return []
+            print(f"壓縮監控數據失敗: {e}")
+        return result
+
+    def get_monitor_rollups(
+        self, pair_index: int, resolution: str = '1m', start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取降採樣後的監控彙總
+
+        Args:
+            pair_index: pair 索引
+            resolution: '1m' 或 '1h'
+            start_time: 起始時間（含），字串或 epoch 秒數（可選）
+            end_time: 結束時間（含），字串或 epoch 秒數（可選）
+
+        Returns:
+            {'timestamp', 'count', 'cpu_usage_min', 'cpu_usage_avg', 'cpu_usage_max', ...} -> np.ndarray，
+            timestamp 為每個區間起點的 epoch 秒數
+        """
+        records = np.empty(0, dtype=ROLLUP_DTYPE)
+        if self.is_connected():
+            try:
+                records = self._read_rollups(
+                    self._rollup_key(pair_index, resolution),
+                    _score_bound(start_time, '-inf'), _score_bound(end_time, '+inf')
+                )
+            except Exception as e:
+                print(f"獲取監控彙總失敗: {e}")
+        return {name: records[name] for name in ROLLUP_DTYPE.names}
+
+    def expire_test_outputs(
+        self, pair_index: int, days: float, now: Optional[float] = None, batch_size: int = 500
+    ) -> int:
+        """
+        刪除超過保留天數的測試輸出（同時從配置指紋索引移除）
+
+        Args:
+            pair_index: pair 索引
+            days: 保留天數
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+            batch_size: 每批刪除的數量
+
+        Returns:
+            刪除的 key 數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        deleted = 0
+        try:
+            for role in ("server", "client"):
+                deleted = self._clear_timeline(
+                    f"test:pair{pair_index}:{role}:timeline", (":info", ":packed", ":metrics", ":steady"),
+                    batch_size, None, deleted, baseline_role=role, max_score=cutoff
+                )
+        except Exception as e:
+            print(f"刪除過期測試輸出失敗: {e}")
+        return deleted
 
     def get_test_output(
         self, pair_index: int, role: str, timestamp: Optional[str] = None,
-        include_metrics: bool = True
+        include_metrics: bool = True, run_id: Optional[str] = None
     ) -> Optional[Dict]:
         """
         獲取測試輸出數據
@@ -205,16 +1143,17 @@ class RedisHandler:
             role: 角色 ('server' 或 'client')
             timestamp: 時間戳（可選，若不提供則返回最新的）
             include_metrics: 是否包含 metrics 數據（預設 True）
+            run_id: 測試執行 ID（可選，指定時返回該次執行的輸出）
 
         Returns:
-            測試輸出數據字典，包含 'info' 和 'metrics' (如果 include_metrics=True)
+            測試輸出數據字典，包含 'info'、'metrics' 和 'steady' (如果 include_metrics=True)
             如果不存在則返回 None
         """
         if not self.is_connected():
             return None
 
         try:
-            if timestamp is None:
+            if timestamp is None and run_id is None:
                 # 獲取最新的數據
                 key_prefixes = self.client.zrevrange(
                     f"test:pair{pair_index}:{role}:timeline", 0, 0
@@ -223,34 +1162,476 @@ class RedisHandler:
                     return None
                 key_prefix = key_prefixes[0]
             else:
-                key_prefix = f"test:pair{pair_index}:{role}:{timestamp}"
+                key_prefix = _output_prefix(pair_index, role, timestamp, run_id)
 
-            # 讀取 metadata
-            info_key = f"{key_prefix}:info"
-            info_data = self.client.hgetall(info_key)
+            # info / metrics / steady 以單次 pipeline 讀取
+            outputs = self._read_test_outputs([key_prefix], include_metrics)
+            return outputs[0] if outputs else None
+        except Exception as e:
+            print(f"獲取測試輸出失敗: {e}")
+            return None
 
-            if not info_data:
-                return None
+    def start_run(
+        self, run_id: str, fingerprint: str, pair_indexes: Iterable[int],
+        start_time: Union[str, float, None] = None
+    ) -> bool:
+        """
+        建立測試執行索引
 
-            result = {"info": info_data}
+        資料結構：
+        - run:{run_id} - hash (run_id, fingerprint, pairs, start, date, status)
+        - runs:timeline - 所有執行，Score 為開始時間
+        - runs:config:{fingerprint} - 相同配置的執行，Score 為開始時間
+        - runs:date:{YYYY-MM-DD} - 同一天開始的執行，Score 為開始時間
 
-            # 讀取 metrics (如果需要)
-            if include_metrics:
-                metrics_key = f"{key_prefix}:metrics"
-                metrics_data = self.client.hgetall(metrics_key)
-                result["metrics"] = metrics_data if metrics_data else {}
+        Args:
+            run_id: 測試執行 ID（new_run_id() 產生）
+            fingerprint: 整份配置的指紋 (Config.fingerprint())
+            pair_indexes: 此次執行測試的 pair 索引
+            start_time: 開始時間，epoch 秒數或字串（可選，預設使用當前時間）
 
-            return result
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        try:
+            start_time, start = _normalize_timestamp(
+                datetime.now().timestamp() if start_time is None else start_time
+            )
+            date = start_time[:10]
+            pipe = self.client.pipeline()
+            pipe.hset(f"run:{run_id}", mapping={
+                "run_id": run_id,
+                "fingerprint": fingerprint,
+                "pairs": ",".join(str(i) for i in pair_indexes),
+                "start": start,
+                "start_time": start_time,
+                "date": date,
+                "status": "running",
+            })
+            pipe.zadd("runs:timeline", {run_id: start})
+            pipe.zadd(f"runs:config:{fingerprint}", {run_id: start})
+            pipe.zadd(f"runs:date:{date}", {run_id: start})
+            pipe.execute()
+            return True
         except Exception as e:
-            print(f"獲取測試輸出失敗: {e}")
+            print(f"建立測試執行索引失敗: {e}")
+            return False
+
+    def finish_run(
+        self, run_id: str, status: str = "completed", end_time: Union[str, float, None] = None
+    ) -> bool:
+        """
+        記錄測試執行結束
+
+        Args:
+            run_id: 測試執行 ID
+            status: 結束狀態 ('completed' 或 'failed')
+            end_time: 結束時間，epoch 秒數或字串（可選，預設使用當前時間）
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        try:
+            end_time, end = _normalize_timestamp(
+                datetime.now().timestamp() if end_time is None else end_time
+            )
+            self.client.hset(f"run:{run_id}", mapping={"end": end, "end_time": end_time, "status": status})
+            return True
+        except Exception as e:
+            print(f"更新測試執行索引失敗: {e}")
+            return False
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """
+        獲取測試執行索引
+
+        Returns:
+            run:{run_id} 的內容，如果不存在則返回 None
+        """
+        if not self.is_connected():
             return None
 
-    def clear_pair_data(self, pair_index: int) -> bool:
+        try:
+            return self.client.hgetall(f"run:{run_id}") or None
+        except Exception as e:
+            print(f"獲取測試執行索引失敗: {e}")
+            return None
+
+    def get_runs(
+        self, fingerprint: Optional[str] = None, date: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        依配置指紋或日期查詢測試執行（由新到舊），直接讀取對應的索引，不掃描 timeline
+
+        Args:
+            fingerprint: 整份配置的指紋（可選）
+            date: 開始日期 'YYYY-MM-DD'（可選）
+            limit: 最多返回的筆數（可選，預設全部）
+
+        Returns:
+            run:{run_id} 內容的列表
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            if fingerprint and date:
+                # 同時指定時在配置索引中依當天的時間範圍查詢
+                day_start = datetime.strptime(date, "%Y-%m-%d").timestamp()
+                run_ids = self.client.zrevrangebyscore(
+                    f"runs:config:{fingerprint}", f"({day_start + 86400}", day_start,
+                    start=0, num=-1 if limit is None else limit
+                )
+            else:
+                if fingerprint:
+                    index_key = f"runs:config:{fingerprint}"
+                elif date:
+                    index_key = f"runs:date:{date}"
+                else:
+                    index_key = "runs:timeline"
+                run_ids = self.client.zrevrange(index_key, 0, -1 if limit is None else limit - 1)
+            return [run for run in self._hgetall_many([f"run:{run_id}" for run_id in run_ids]) if run]
+        except Exception as e:
+            print(f"查詢測試執行失敗: {e}")
+            return []
+
+    def get_runs_page(
+        self, cursor: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        依開始時間由舊到新分頁讀取 runs:timeline
+
+        Args:
+            cursor: 分頁游標（上一頁返回的位置），第一頁為 None
+            limit: 每頁筆數
+
+        Returns:
+            (run:{run_id} 內容的列表, 下一頁游標)，已無更多執行時游標為 None
+        """
+        if not self.is_connected():
+            return [], None
+
+        try:
+            offset = cursor or 0
+            run_ids = self.client.zrange("runs:timeline", offset, offset + limit - 1)
+            runs = [run for run in self._hgetall_many([f"run:{run_id}" for run_id in run_ids]) if run]
+            return runs, offset + len(run_ids) if len(run_ids) == limit else None
+        except Exception as e:
+            print(f"查詢測試執行失敗: {e}")
+            return [], None
+
+    def get_run_outputs(self, run_id: str, include_metrics: bool = True) -> Dict[int, Dict[str, Dict]]:
+        """
+        獲取一次測試執行中所有 pair 的測試輸出
+
+        Returns:
+            {pair_index: {'server': 輸出, 'client': 輸出}}，缺少的輸出不列出
+        """
+        run = self.get_run(run_id)
+        if not run:
+            return {}
+
+        try:
+            pair_indexes = [int(i) for i in run.get("pairs", "").split(",") if i]
+            prefixes = [
+                _output_prefix(pair_index, role, run_id=run_id)
+                for pair_index in pair_indexes for role in ("server", "client")
+            ]
+            result: Dict[int, Dict[str, Dict]] = {}
+            for output in self._read_test_outputs(prefixes, include_metrics):
+                info = output["info"]
+                result.setdefault(int(info["pair_index"]), {})[info["role"]] = output
+            return result
+        except Exception as e:
+            print(f"獲取測試執行輸出失敗: {e}")
+            return {}
+
+    def save_apv_samples(self, run_id: str, samples: Iterable[Dict]) -> int:
+        """
+        以單次 pipeline 批次儲存 APV 監控樣本
+
+        資料結構：
+        - apv:{run_id}:samples - sorted set，Score 為取樣時間，成員為 metric_codec 編碼的
+          {'epoch': 取樣時間, 指標名稱: 數值, ...}（包含取樣時間，數值相同的兩筆樣本不會合併）
+
+        Args:
+            run_id: 測試執行 ID（與流量產生器的測試輸出相同）
+            samples: 每筆包含 timestamp（epoch 秒數或字串）與 metrics（{指標名稱: 數值}）
+
+        Returns:
+            成功處理的筆數，失敗返回 0
+        """
+        if not self.is_connected():
+            return 0
+
+        try:
+            pipe = self.client.pipeline()
+            members, schemas = {}, []
+            for sample in samples:
+                ts = _normalize_timestamp(sample["timestamp"])[1]
+                blob, schema = metric_codec.encode({"epoch": ts, **sample["metrics"]})
+                members[blob] = ts
+                schemas.append(schema)
+            if not members:
+                return 0
+            pipe.zadd(f"apv:{run_id}:samples", members)
+            new_schemas = self._queue_schemas(pipe, schemas)
+            pipe.execute()
+            self._saved_schemas.update(new_schemas)
+            return len(members)
+        except Exception as e:
+            print(f"儲存 APV 監控數據失敗: {e}")
+            return 0
+
+    def expire_apv_samples(self, days: float, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        刪除所有執行中超過保留天數的 APV 監控樣本（以 SCAN 找出 apv:*:samples，樣本刪光時 key 隨之消失）
+
+        Args:
+            days: 保留天數
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+            batch_size: SCAN 每次取得與每批 pipeline 處理的 key 數
+
+        Returns:
+            刪除的樣本筆數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        deleted = 0
+        try:
+            keys = []
+            for key in self.client.scan_iter(match="apv:*:samples", count=batch_size):
+                keys.append(key)
+                if len(keys) >= batch_size:
+                    deleted += self._zremrange_keys(keys, cutoff)
+                    keys = []
+            if keys:
+                deleted += self._zremrange_keys(keys, cutoff)
+        except Exception as e:
+            print(f"刪除過期 APV 監控數據失敗: {e}")
+        return deleted
+
+    def _zremrange_keys(self, keys: List[str], cutoff: float) -> int:
+        """以單次 pipeline 從多個 sorted set 刪除 score 不大於 cutoff 的成員，返回刪除的成員數"""
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+        return sum(pipe.execute())
+
+    def expire_runs(self, days: float, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        刪除開始時間超過保留天數的執行索引（run:{id} 及其在 runs:timeline、runs:config:*、runs:date:* 中的成員）
+
+        Args:
+            days: 保留天數
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+            batch_size: 每批 pipeline 處理的執行數
+
+        Returns:
+            刪除的執行數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        deleted = 0
+        try:
+            while True:
+                run_ids = self.client.zrangebyscore("runs:timeline", '-inf', cutoff, start=0, num=batch_size)
+                if not run_ids:
+                    break
+                pipe = self.client.pipeline(transaction=False)
+                for run_id in run_ids:
+                    pipe.hmget(f"run:{run_id}", "fingerprint", "date")
+                infos = pipe.execute()
+
+                pipe = self.client.pipeline()
+                for run_id, (fingerprint, date) in zip(run_ids, infos):
+                    if fingerprint:
+                        pipe.zrem(f"runs:config:{fingerprint}", run_id)
+                    if date:
+                        pipe.zrem(f"runs:date:{date}", run_id)
+                pipe.unlink(*[f"run:{run_id}" for run_id in run_ids])
+                pipe.zrem("runs:timeline", *run_ids)
+                pipe.execute()
+                deleted += len(run_ids)
+        except Exception as e:
+            print(f"刪除過期執行索引失敗: {e}")
+        return deleted
+
+    def stored_pairs(self, batch_size: int = 500) -> List[int]:
+        """
+        以 SCAN 找出儲存後端中有監控數據或測試輸出的 pair 索引（包含已不在目前配置中的 pair）
+
+        Args:
+            batch_size: SCAN 每次取得的 key 數
+
+        Returns:
+            排序後的 pair 索引列表
+        """
+        if not self.is_connected():
+            return []
+
+        pairs = set()
+        try:
+            for pattern in ("monitor:pair*", "test:pair*"):
+                for key in self.client.scan_iter(match=pattern, count=batch_size):
+                    if isinstance(key, bytes):
+                        key = key.decode()
+                    match = PAIR_KEY_PATTERN.match(key)
+                    if match:
+                        pairs.add(int(match.group(1)))
+        except Exception as e:
+            print(f"掃描 pair 索引失敗: {e}")
+        return sorted(pairs)
+
+    def _read_apv_blobs(
+        self, run_id: str, start_time: Union[str, float, None], end_time: Union[str, float, None]
+    ) -> List[bytes]:
+        """讀取時間範圍內的 APV 樣本（二進位成員不經字串解碼），依時間排序"""
+        return self.client.execute_command(
+            "ZRANGEBYSCORE", f"apv:{run_id}:samples",
+            _score_bound(start_time, "-inf"), _score_bound(end_time, "+inf"), **{NEVER_DECODE: []}
+        ) or []
+
+    def get_apv_samples(
+        self, run_id: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> List[Dict]:
+        """
+        獲取一次測試執行的 APV 監控樣本
+
+        Args:
+            run_id: 測試執行 ID
+            start_time: 起始時間（含），字串或 epoch 秒數（可選）
+            end_time: 結束時間（含），字串或 epoch 秒數（可選）
+
+        Returns:
+            [{'timestamp': epoch 秒數, 'metrics': {指標名稱: 數值}}]，依時間排序
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            samples = []
+            for blob in self._read_apv_blobs(run_id, start_time, end_time):
+                metrics = self._decode_metrics(blob)
+                samples.append({"timestamp": metrics.pop("epoch"), "metrics": metrics})
+            return samples
+        except Exception as e:
+            print(f"獲取 APV 監控數據失敗: {e}")
+            return []
+
+    def get_apv_arrays(
+        self, run_id: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取一次測試執行的 APV 監控樣本（指標欄位不同的樣本缺值為 NaN）
+
+        Returns:
+            {'timestamp': np.ndarray, 指標名稱: np.ndarray, ...}，依時間排序
+        """
+        result = {"timestamp": np.empty(0, dtype=np.float64)}
+        if not self.is_connected():
+            return result
+
+        try:
+            arrays = metric_codec.decode_arrays(self._read_apv_blobs(run_id, start_time, end_time), self._load_schema)
+            if "epoch" in arrays:
+                result["timestamp"] = arrays.pop("epoch").astype(np.float64)
+            result.update(arrays)
+            return result
+        except Exception as e:
+            print(f"獲取 APV 監控陣列失敗: {e}")
+            return result
+
+    def _unlink_batch(self, keys: List[str], zrem: Optional[Dict[str, List[str]]] = None) -> int:
+        """以單次 pipeline 執行 UNLINK（非阻塞刪除）並從索引 sorted set 移除成員
+
+        Returns:
+            實際刪除的 key 數量
+        """
+        pipe = self.client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        for zset_key, members in (zrem or {}).items():
+            if members:
+                pipe.zrem(zset_key, *members)
+        results = pipe.execute()
+        return results[0] if keys else 0
+
+    def _clear_timeline(
+        self, timeline_key: str, suffixes: Tuple[str, ...], batch_size: int,
+        progress: Optional[Callable[[int], None]], deleted: int, baseline_role: Optional[str] = None,
+        max_score: Optional[float] = None
+    ) -> int:
+        """依 timeline sorted set 分批刪除其成員對應的 keys，最後刪除 timeline 本身
+
+        Args:
+            timeline_key: timeline sorted set 的 key
+            suffixes: 成員對應的 key 後綴；空 tuple 表示成員本身就是 key
+            batch_size: 每批處理的成員數
+            progress: 進度回呼，參數為目前累計刪除的 key 數
+            deleted: 目前累計刪除的 key 數
+            baseline_role: 若指定，同時從 baseline:{fingerprint}:{role}:timeline 移除成員
+            max_score: 若指定，只刪除 score 不大於此值的成員，並保留 timeline 本身
+
+        Returns:
+            累計刪除的 key 數
+        """
+        while True:
+            if max_score is None:
+                members = self.client.zrange(timeline_key, 0, batch_size - 1)
+            else:
+                members = self.client.zrangebyscore(timeline_key, '-inf', max_score, start=0, num=batch_size)
+            if not members:
+                break
+
+            keys = [f"{m}{suffix}" for m in members for suffix in suffixes] if suffixes else list(members)
+            zrem = {timeline_key: members}
+
+            # 從配置指紋索引移除，避免 regression 比對讀到已刪除的結果
+            if baseline_role:
+                pipe = self.client.pipeline(transaction=False)
+                for member in members:
+                    pipe.hget(f"{member}:info", "fingerprint")
+                for member, fingerprint in zip(members, pipe.execute()):
+                    if fingerprint:
+                        zrem.setdefault(f"baseline:{fingerprint}:{baseline_role}:timeline", []).append(member)
+
+            deleted += self._unlink_batch(keys, zrem)
+            if progress:
+                progress(deleted)
+
+        if max_score is None:
+            deleted += self.client.unlink(timeline_key)
+        return deleted
+
+    def clear_pair_data(
+        self, pair_index: int, batch_size: int = 500, sweep: bool = True,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> bool:
         """
         清除指定 pair 的所有數據
 
+        依 timeline sorted set 分批以 UNLINK 刪除，不使用會阻塞整個 Redis 的 KEYS；
+        sweep=True 時再以 SCAN 清除不在 timeline 中的殘留 keys。
+
         Args:
             pair_index: pair 索引
+            batch_size: 每批刪除的數量
+            sweep: 是否以 SCAN 清除殘留 keys
+            progress: 進度回呼，參數為目前累計刪除的 key 數（可選）
 
         Returns:
             成功返回 True，否則返回 False
@@ -259,26 +1640,72 @@ class RedisHandler:
             return False
 
         try:
-            # 獲取所有相關的 keys
-            patterns = [
-                f"monitor:pair{pair_index}:*",
-                f"test:pair{pair_index}:*",
-            ]
-
-            for pattern in patterns:
-                keys = self.client.keys(pattern)
-                if keys:
-                    self.client.delete(*keys)
+            deleted = self._clear_timeline(
+                f"monitor:pair{pair_index}:chunks", (), batch_size, progress, 0
+            )
+            # 舊格式的監控數據（每筆一個 hash）
+            deleted = self._clear_timeline(
+                f"monitor:pair{pair_index}:timeline", (), batch_size, progress, deleted
+            )
+            deleted += self.client.unlink(
+                f"monitor:pair{pair_index}:meta",
+                *(self._rollup_key(pair_index, label) for label in ROLLUP_RESOLUTIONS),
+                *(self._process_key(pair_index, role) for role in ("server", "client"))
+            )
+            self._forget_ram_total(pair_index)
+            for role in ("server", "client"):
+                deleted = self._clear_timeline(
+                    f"test:pair{pair_index}:{role}:timeline", (":info", ":packed", ":metrics", ":steady"),
+                    batch_size, progress, deleted, baseline_role=role
+                )
 
-            print(f"已清除 pair {pair_index} 的所有數據")
+            if sweep:
+                for pattern in (f"monitor:pair{pair_index}:*", f"test:pair{pair_index}:*"):
+                    batch = []
+                    for key in self.client.scan_iter(match=pattern, count=batch_size):
+                        batch.append(key)
+                        if len(batch) >= batch_size:
+                            deleted += self._unlink_batch(batch)
+                            batch = []
+                            if progress:
+                                progress(deleted)
+                    if batch:
+                        deleted += self._unlink_batch(batch)
+                        if progress:
+                            progress(deleted)
+
+            print(f"已清除 pair {pair_index} 的所有數據 ({deleted} keys)")
             return True
         except Exception as e:
             print(f"清除數據失敗: {e}")
             return False
 
+    def clear_pair_data_async(
+        self, pair_index: int, batch_size: int = 500, sweep: bool = True,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Thread:
+        """
+        在背景執行緒中清除指定 pair 的所有數據
+
+        Args:
+            與 clear_pair_data 相同
+
+        Returns:
+            已啟動的執行緒，可呼叫 join() 等待完成
+        """
+        thread = Thread(
+            target=self.clear_pair_data,
+            args=(pair_index, batch_size, sweep, progress),
+            name=f"redis-clear-pair{pair_index}",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
     def get_all_test_outputs(
-        self, pair_index: int, role: str, start_time: Optional[str] = None,
-        end_time: Optional[str] = None, include_metrics: bool = True
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, include_metrics: bool = True,
+        limit: Optional[int] = None, offset: int = 0
     ) -> List[Dict]:
         """
         獲取指定時間範圍內的所有測試輸出數據
@@ -286,58 +1713,67 @@ class RedisHandler:
         Args:
             pair_index: pair 索引
             role: 角色 ('server' 或 'client')
-            start_time: 起始時間（可選）
-            end_time: 結束時間（可選）
+            start_time: 起始時間，字串或 epoch 秒數（可選）
+            end_time: 結束時間，字串或 epoch 秒數（可選）
             include_metrics: 是否包含 metrics 數據（預設 True）
+            limit: 最多返回的筆數（可選，預設全部）
+            offset: 從範圍內第幾筆開始
 
         Returns:
-            測試輸出數據列表，每個元素包含 'info' 和 'metrics' (如果 include_metrics=True)
+            測試輸出數據列表，每個元素包含 'info'、'metrics' 和 'steady' (如果 include_metrics=True)
         """
         if not self.is_connected():
             return []
 
         try:
-            # 從 sorted set 獲取時間範圍內的 key prefixes
-            min_score = '-inf'
-            max_score = '+inf'
-
-            if start_time:
-                min_score = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S').timestamp()
-            if end_time:
-                max_score = datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S').timestamp()
+            min_score = _score_bound(start_time, '-inf')
+            max_score = _score_bound(end_time, '+inf')
 
-            key_prefixes = self.client.zrangebyscore(
-                f"test:pair{pair_index}:{role}:timeline", min_score, max_score
-            )
-
-            # 獲取每個 key prefix 的數據
-            result = []
-            for key_prefix in key_prefixes:
-                # 讀取 metadata
-                info_key = f"{key_prefix}:info"
-                info_data = self.client.hgetall(info_key)
+            # 從 sorted set 獲取時間範圍內的 key prefixes
+            if limit is None and offset == 0:
+                key_prefixes = self.client.zrangebyscore(
+                    f"test:pair{pair_index}:{role}:timeline", min_score, max_score
+                )
+            else:
+                key_prefixes = self.client.zrangebyscore(
+                    f"test:pair{pair_index}:{role}:timeline", min_score, max_score,
+                    start=offset, num=-1 if limit is None else limit
+                )
 
-                if not info_data:
-                    continue
+            return self._read_test_outputs(key_prefixes, include_metrics)
+        except Exception as e:
+            print(f"獲取測試輸出數據失敗: {e}")
+            return []
 
-                data = {"info": info_data}
+    def get_fingerprint_outputs(
+        self, fingerprint: str, role: str, limit: int = 10
+    ) -> List[Dict]:
+        """
+        獲取相同配置指紋的最近測試輸出（由新到舊）
 
-                # 讀取 metrics (如果需要)
-                if include_metrics:
-                    metrics_key = f"{key_prefix}:metrics"
-                    metrics_data = self.client.hgetall(metrics_key)
-                    data["metrics"] = metrics_data if metrics_data else {}
+        Args:
+            fingerprint: pair 配置指紋
+            role: 角色 ('server' 或 'client')
+            limit: 最多返回的筆數
 
-                result.append(data)
+        Returns:
+            測試輸出數據列表，每個元素包含 'info'、'metrics' 和 'steady'
+        """
+        if not self.is_connected():
+            return []
 
-            return result
+        try:
+            key_prefixes = self.client.zrevrange(
+                f"baseline:{fingerprint}:{role}:timeline", 0, limit - 1
+            )
+            return self._read_test_outputs(key_prefixes)
         except Exception as e:
-            print(f"獲取測試輸出數據失敗: {e}")
+            print(f"獲取 baseline 數據失敗: {e}")
             return []
 
     def get_specific_metrics(
         self, pair_index: int, role: str, metric_names: List[str],
-        timestamp: Optional[str] = None
+        timestamp: Optional[str] = None, run_id: Optional[str] = None
     ) -> Optional[Dict]:
         """
         獲取特定的 metrics 數據
@@ -347,16 +1783,17 @@ class RedisHandler:
             role: 角色 ('server' 或 'client')
             metric_names: 要查詢的 metric 名稱列表 (例如 ['duration', 'ackDup', 'synRt'])
             timestamp: 時間戳（可選，若不提供則返回最新的）
+            run_id: 測試執行 ID（可選）
 
         Returns:
             包含指定 metrics 的字典，如果不存在則返回 None
-            格式: {'duration': '值', 'ackDup': '值', ...}
+            格式: {'duration': 值, 'ackDup': 值, ...}，不存在的 metric 為 None
         """
         if not self.is_connected():
             return None
 
         try:
-            if timestamp is None:
+            if timestamp is None and run_id is None:
                 # 獲取最新的數據
                 key_prefixes = self.client.zrevrange(
                     f"test:pair{pair_index}:{role}:timeline", 0, 0
@@ -365,17 +1802,20 @@ class RedisHandler:
                     return None
                 key_prefix = key_prefixes[0]
             else:
-                key_prefix = f"test:pair{pair_index}:{role}:{timestamp}"
+                key_prefix = _output_prefix(pair_index, role, timestamp, run_id)
 
-            # 讀取指定的 metrics
-            metrics_key = f"{key_prefix}:metrics"
-            result = {}
+            blob = self.client.execute_command(
+                "HGET", f"{key_prefix}:packed", "metrics", **{NEVER_DECODE: []}
+            )
+            if blob is not None:
+                metrics = self._decode_metrics(blob)
+                return {name: metrics.get(name) for name in metric_names}
 
-            for metric_name in metric_names:
-                value = self.client.hget(metrics_key, metric_name)
-                result[metric_name] = value if value is not None else None
+            # 舊格式（字串 hash）以單次 HMGET 讀取指定的 metrics
+            metrics_key = f"{key_prefix}:metrics"
+            values = self.client.hmget(metrics_key, metric_names) if metric_names else []
 
-            return result
+            return dict(zip(metric_names, values))
         except Exception as e:
             print(f"獲取特定 metrics 失敗: {e}")
             return None
@@ -401,9 +1841,13 @@ class RedisHandler:
                 'client_output_count': 0,
             }
 
-            # 獲取監控數據數量
-            monitor_keys = self.client.zcard(f"monitor:pair{pair_index}:timeline")
-            summary['monitor_count'] = monitor_keys if monitor_keys else 0
+            # 獲取監控數據數量（chunk 長度 / 紀錄寬度）
+            chunk_keys = self.client.zrange(f"monitor:pair{pair_index}:chunks", 0, -1)
+            pipe = self.client.pipeline(transaction=False)
+            for chunk_key in chunk_keys:
+                pipe.strlen(chunk_key)
+            sizes = pipe.execute() if chunk_keys else []
+            summary['monitor_count'] = sum(sizes) // MONITOR_DTYPE.itemsize
 
             # 獲取 server 輸出數量
             server_keys = self.client.zcard(f"test:pair{pair_index}:server:timeline")
@@ -419,7 +1863,18 @@ class RedisHandler:
             return {}
 
     def close(self) -> None:
-        """關閉 Redis 連接"""
+        """關閉 Redis 連接（共用 handler 在最後一個使用者 close 時才斷線）"""
+        if self._shared_key is not None:
+            with self._shared_lock:
+                self._refs -= 1
+                if self._refs > 0:
+                    return
+                if self._shared.get(self._shared_key) is self:
+                    del self._shared[self._shared_key]
+            if self.connection_pool is not None:
+                print(f"Redis 連線池統計: {self.pool_stats()}")
+                self.connection_pool.disconnect()
+
         if self.client:
             self.client.close()
             print("Redis 連接已關閉")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+APV 監控 - 測試期間在獨立的 SSH session 中定期讀取 APV CLI 統計
+（系統 CPU / 記憶體、slb virtual / slb real 計數），與流量產生器的監控數據
+使用相同的時間戳格式與 run_id 保存，可直接比對瓶頸在產生器或 APV。
+
+統計指令的輸出以「名稱: 數值」或「名稱    數值」逐行解析為
+{區段[.SLB 物件].名稱: 數值}，例如 'slb_virtual.tcp_slb_vs.current_connections'；
+各 APV 版本的指令不同時可在 config.yaml 的 apv_monitor.commands 覆寫。
+"""
+
+import os
+import re
+import time
+from collections import deque
+from threading import Event, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from config import Config, TrafficGeneratorPair
+from metrics_exporter import MetricsRegistry
+from monitor_sink import open_monitor_sink
+from output_handler import OutputHandler
+from sqlite_storage import open_storage_handler
+from ssh_executor import SSHExecutor
+from system_monitor import TickScheduler, format_sample_time
+from write_behind import WriteBehindQueue
+
+
+# 區段名稱 -> APV CLI 統計指令
+DEFAULT_APV_COMMANDS = {
+    'system': 'show statistics system',
+    'slb_virtual': 'show statistics slb virtual',
+    'slb_real': 'show statistics slb real',
+}
+
+_NUMBER = r'[-+]?\d[\d,]*(?:\.\d+)?'
+# 「名稱: 數值」或「名稱 = 數值」，同一行可有多組
+_LABELED_VALUE = re.compile(r'([A-Za-z][A-Za-z0-9 _/()-]*?)\s*[:=]\s*(' + _NUMBER + r')\s*%?(?=\s|,|$)')
+# 「名稱    數值」（名稱與數值之間至少兩個空白，數值在行尾）
+_TRAILING_VALUE = re.compile(r'^\s*([A-Za-z][A-Za-z0-9 _/()-]*?)\s{2,}(' + _NUMBER + r')\s*%?\s*$')
+
+
+def slb_object_names(pairs: Iterable[TrafficGeneratorPair]) -> List[str]:
+    """依 APVSetup 的命名規則列出各 pair 的 SLB virtual / real 物件名稱
+
+    Returns:
+        ['{協定}_slb_vs', '{協定}_rs_{pair 索引}', ...]（不重複，依 pair 順序）
+    """
+    names: List[str] = []
+    for i, pair in enumerate(pairs):
+        protocol = pair.protocol.lower()
+        for name in (f"{protocol}_slb_vs", f"{protocol}_rs_{i}"):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _metric_name(label: str) -> str:
+    """將統計名稱轉為小寫底線格式（如 'Current Connections' -> 'current_connections'）"""
+    return re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')
+
+
+def _number(text: str) -> Union[int, float]:
+    text = text.replace(',', '')
+    return float(text) if '.' in text else int(text)
+
+
+def parse_apv_stats(output: str, section: str, object_names: Iterable[str] = ()) -> Dict[str, Union[int, float]]:
+    """解析 APV CLI 統計指令的輸出
+
+    出現 SLB 物件名稱的行開始該物件的區塊，之後的數值歸屬於該物件，直到出現下一個物件名稱。
+
+    Args:
+        output: 指令輸出（可包含提示符、指令回顯與 ANSI 控制字元）
+        section: 區段名稱，作為指標名稱的前綴
+        object_names: 要辨識的 SLB 物件名稱（slb_object_names() 的結果）
+
+    Returns:
+        {'區段[.物件].名稱': 數值}，同一名稱重複出現時保留第一個
+    """
+    # 長的名稱優先比對，避免 tcp_rs_1 被 tcp_rs_10 的行誤判
+    names = sorted(object_names, key=len, reverse=True)
+    metrics: Dict[str, Union[int, float]] = {}
+    entity = None
+    for line in OutputHandler.clean_ansi(output).splitlines():
+        for name in names:
+            if re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', line):
+                entity = name
+                line = line.replace(name, ' ')
+                break
+
+        matches = _LABELED_VALUE.findall(line) or _TRAILING_VALUE.findall(line)
+        prefix = f"{section}.{entity}" if entity else section
+        for label, value in matches:
+            key = _metric_name(label)
+            if key:
+                metrics.setdefault(f"{prefix}.{key}", _number(value))
+    return metrics
+
+
+class APVMonitor:
+    """APV 監控類別，在獨立的 SSH session 中定期讀取 APV 統計"""
+
+    def __init__(self, config: Config, log_path: str = "./logs", redis_host: str = "localhost",
+                 redis_port: int = 6379, redis_db: int = 0, enable_redis: bool = True,
+                 max_samples: int = 65536, metrics: Optional[MetricsRegistry] = None,
+                 clock: Optional[Callable[[], float]] = None):
+        """初始化 APV 監控器
+
+        Args:
+            config: 配置物件（使用 APV 管理介面設定與 test.apv_monitor）
+            log_path: 日誌輸出路徑
+            redis_host: Redis 主機位址
+            redis_port: Redis 埠號
+            redis_db: Redis 資料庫編號
+            enable_redis: 是否啟用儲存後端
+            max_samples: 記憶體中保存的樣本數上限，超過時捨棄最舊的樣本
+            metrics: OpenMetrics 端點的 MetricsRegistry，每筆取樣時更新（可選）
+            clock: 返回取樣時間（epoch 秒數）的函式，預設為 time.time；傳入 SystemMonitor.remote_time
+                時 APV 樣本與流量產生器的監控數據使用同一個時鐘
+
+        Raises:
+            ValueError: 取樣間隔小於 0.1 秒
+        """
+        monitor_config = config.test.apv_monitor
+        # TickScheduler 會檢查間隔，在建立連線前先確認
+        TickScheduler(monitor_config.interval)
+        self.interval = monitor_config.interval
+        self.flush_interval = monitor_config.flush_interval
+        self.commands = dict(monitor_config.commands or DEFAULT_APV_COMMANDS)
+        self.enable_password = config.test.apv_enable_password
+        self.object_names = slb_object_names(config.test.traffic_generator.pairs)
+        self.metrics = metrics
+        self.clock = clock or time.time
+
+        self.run_id = None
+        self.monitoring = False
+        self.missed_ticks = 0
+        self.samples = deque(maxlen=max_samples)
+        self.monitor_thread = None
+        self._stop_event = Event()
+
+        if log_path is None or log_path == "":
+            log_path = "./logs"
+        os.makedirs(log_path, exist_ok=True)
+        self.log_path = log_path
+
+        # 獨立的 session，不與 APVSetup 的設定 session 交錯
+        self.executor = SSHExecutor(
+            config.test.apv_management_ip,
+            config.test.apv_management_port,
+            config.test.apv_username,
+            config.test.apv_password,
+            log_path=f"{log_path}/apv_monitor.log",
+        )
+
+        self.redis_handler = None
+        self.writer = None
+        if enable_redis:
+            try:
+                self.redis_handler = open_storage_handler(
+                    config.test.storage.backend, redis_host=redis_host, redis_port=redis_port,
+                    redis_db=redis_db, sqlite_path=config.test.storage.sqlite_path
+                )
+                if not self.redis_handler.is_connected():
+                    # 保留 handler 交給寫入佇列，後端恢復後由佇列重新連接並補寫
+                    print("[APVMonitor] 儲存後端連接失敗，數據先暫存到本地，恢復後自動補寫")
+            except Exception as e:
+                print(f"[APVMonitor] 儲存後端初始化失敗: {e}，將僅使用本地儲存")
+                self.redis_handler = None
+            self.writer = WriteBehindQueue(
+                self.redis_handler,
+                spill_path=f"{log_path}/redis_spill_apv.jsonl",
+                name="APVMonitor-Writer",
+                metrics=metrics,
+            ).start()
+
+    def connect(self):
+        """連接到 APV 並進入 enable 模式"""
+        self.executor.connect(persistent_session=True)
+        self.executor.execute_command('enable')
+        self.executor.execute_command(f'{self.enable_password}')
+
+    def disconnect(self):
+        """斷開與 APV 的連接"""
+        self.executor.close()
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+        if self.redis_handler:
+            self.redis_handler.close()
+            self.redis_handler = None
+
+    def start(self, run_id: Optional[str] = None, output_file: Optional[str] = None):
+        """開始監控（在新執行緒中執行）
+
+        Args:
+            run_id: 測試執行 ID，與流量產生器的數據相同；為 None 時只保存在本地
+            output_file: JSONL 輸出檔案路徑，若為 None 則使用 {log_path}/apv_monitor.jsonl
+        """
+        if self.monitoring:
+            print("[APVMonitor] 監控已在執行中")
+            return
+
+        self.run_id = run_id
+        self.monitoring = True
+        self._stop_event.clear()
+        self.monitor_thread = Thread(target=self._monitor_loop, args=(output_file,), name="APVMonitor")
+        self.monitor_thread.start()
+
+    def stop(self):
+        """停止監控"""
+        self.monitoring = False
+        self._stop_event.set()
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            # 正在執行的統計指令最多等待 session 的逾時時間
+            self.monitor_thread.join(timeout=15)
+            if self.monitor_thread.is_alive():
+                print("[APVMonitor] 警告: 監控線程未能正常結束")
+
+    def _sample(self) -> Dict[str, Union[int, float]]:
+        """依序執行各區段的統計指令並解析
+
+        Returns:
+            {指標名稱: 數值}
+        """
+        metrics: Dict[str, Union[int, float]] = {}
+        for section, command in self.commands.items():
+            start = time.perf_counter()
+            result = self.executor.execute_command(command)
+            if self.metrics:
+                self.metrics.observe('array_script_ssh_command_latency_seconds',
+                                     time.perf_counter() - start, source='apv_monitor')
+            metrics.update(parse_apv_stats(result[0] if result else "", section, self.object_names))
+        return metrics
+
+    def _record(self, now: float, monotonic: float, metrics: Dict[str, Union[int, float]], sink) -> None:
+        """記錄一筆取樣：加入記憶體、寫入 JSONL 並排入儲存後端寫入佇列"""
+        sample = {
+            'timestamp': format_sample_time(now),
+            'epoch': now,
+            'monotonic': monotonic,
+            'run_id': self.run_id,
+            'metrics': metrics,
+        }
+        self.samples.append(sample)
+        sink.write(sample)
+        if self.metrics:
+            self.metrics.set_many('array_script_apv_stat', metrics, key='metric')
+        if self.writer and self.run_id:
+            self.writer.put_apv(self.run_id, {'timestamp': now, 'metrics': metrics})
+
+    def _monitor_loop(self, output_file: Optional[str] = None):
+        """監控迴圈，每 interval 秒讀取一次 APV 統計"""
+        self.samples.clear()
+        self.missed_ticks = 0
+        if output_file is None:
+            output_file = f"{self.log_path}/apv_monitor.jsonl"
+
+        print(f"[APVMonitor] 開始監控 APV (間隔 {self.interval:g} 秒，Run: {self.run_id})...")
+        sink = open_monitor_sink('jsonl', output_file, flush_interval=self.flush_interval)
+        scheduler = TickScheduler(self.interval, self._stop_event)
+        try:
+            while self.monitoring:
+                # 與 SystemMonitor 相同，以指令送出前的時間作為取樣時間
+                now, monotonic = self.clock(), time.monotonic()
+                try:
+                    metrics = self._sample()
+                    if metrics:
+                        self._record(now, monotonic, metrics, sink)
+                    else:
+                        print("[APVMonitor] 統計指令沒有可解析的數值")
+                except Exception as e:
+                    print(f"[APVMonitor] 監控錯誤: {e}")
+                if not scheduler.wait():
+                    break
+        finally:
+            self.missed_ticks = scheduler.missed
+            sink.close()
+
+        if self.missed_ticks:
+            print(f"[APVMonitor] 統計指令耗時超過間隔，共略過 {self.missed_ticks} 次取樣")
+        print(f"[APVMonitor] 監控已停止，共 {len(self.samples)} 筆，數據已保存到 {output_file}")
+
+    def get_data(self) -> List[Dict]:
+        """獲取監控數據
+
+        Returns:
+            list: 每筆包含 timestamp（毫秒精度字串）、epoch、monotonic、run_id 與 metrics（{指標名稱: 數值}）
+        """
+        return list(self.samples)
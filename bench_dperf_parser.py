@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+比較 dperf.parseOutput 與 dperf_stats 批次解析器的效能。
+
+可使用合成 log（預設）或指定實際的歷史 log 檔。
+"""
+
+import argparse
+import random
+import time
+
+from dperfSetup import dperf
+from dperf_stats import parse_interval_stats, parse_stat_blocks, parse_total_logs, parse_log_files
+
+
+METRIC_ROWS = [
+    ["pktRx", "pktTx", "bitsRx", "bitsTx", "dropTx"],
+    ["arpRx", "arpTx", "icmpRx", "icmpTx", "otherRx", "badRx"],
+    ["synRx", "synTx", "finRx", "finTx", "rstRx", "rstTx"],
+    ["synRt", "finRt", "ackRt", "pushRt", "tcpDrop"],
+    ["skOpen", "skClose", "skCon", "skErr"],
+    ["httpGet", "http2XX", "httpErr"],
+    ["ierrors", "oerrors", "imissed"],
+]
+
+
+def _stat_block(rng: random.Random) -> str:
+    """產生一個與 dperf 格式相同的統計區塊"""
+    lines = []
+    for row in METRIC_ROWS:
+        lines.append("".join(f"{name:<8}{rng.randint(0, 3_000_000_000):<19,}" for name in row).rstrip())
+    return "\n".join(lines)
+
+
+def generate_log(seconds: int, seed: int = 0) -> str:
+    """產生一份合成的 dperf 輸出"""
+    rng = random.Random(seed)
+    parts = []
+    for sec in range(1, seconds + 1):
+        parts.append(f"seconds {sec:<19}cpuUsage {rng.randint(0, 100)}")
+        parts.append(_stat_block(rng))
+        parts.append("")
+    parts.append("dperf Test Finished")
+    parts.append("Total Numbers:")
+    parts.append(_stat_block(rng))
+    return "\n".join(parts)
+
+
+def _timeit(func, repeat: int) -> float:
+    """執行 repeat 次並返回最短耗時（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="比較 dperf 統計解析器的效能。")
+    parser.add_argument("--logs", type=int, default=1000, help="合成 log 數量 (預設: 1000)")
+    parser.add_argument("--seconds", type=int, default=60, help="每份合成 log 的秒數 (預設: 60)")
+    parser.add_argument("--repeat", type=int, default=3, help="每項測量重複次數，取最短 (預設: 3)")
+    parser.add_argument(
+        "--paths",
+        nargs="*",
+        default=None,
+        metavar="LOG",
+        help="改用實際 log 檔測量 Total Numbers 批次解析",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.paths:
+        elapsed = _timeit(lambda: parse_log_files(args.paths), args.repeat)
+        print(f"批次解析 {len(args.paths)} 個 log 檔: {elapsed:.3f}s")
+        return
+
+    logs = [generate_log(args.seconds, seed=i) for i in range(args.logs)]
+    print(f"合成 {args.logs} 份 log，每份 {args.seconds} 秒")
+
+    legacy_total = _timeit(lambda: [dperf.parseOutput(None, (log,)) for log in logs], args.repeat)
+    batch_total = _timeit(lambda: parse_total_logs(logs), args.repeat)
+    print(f"Total Numbers  parseOutput: {legacy_total:.3f}s  parse_total_logs: {batch_total:.3f}s  "
+          f"({legacy_total / batch_total:.1f}x)")
+
+    legacy_interval = _timeit(lambda: [parse_interval_stats(log) for log in logs], args.repeat)
+    batch_interval = _timeit(lambda: [parse_stat_blocks(log) for log in logs], args.repeat)
+    print(f"每秒統計區塊   parse_interval_stats: {legacy_interval:.3f}s  parse_stat_blocks: {batch_interval:.3f}s  "
+          f"({legacy_interval / batch_interval:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+批次匯出 - 依執行索引分批讀取所有測試執行、各 pair 的測試輸出與監控數據，
+串流寫入分段 CSV 或 Parquet / Arrow IPC（需安裝 pyarrow，即 array-script[parquet]），供分析 notebook 直接讀取。
+
+輸出依開始日期與配置指紋分區：
+    {output_dir}/date=YYYY-MM-DD/config={fingerprint}/{runs,test_outputs,monitor,process}-NNNN.{parquet,arrow,csv}
+
+執行依開始時間由舊到新讀取，一次只保留一批執行索引與一頁監控數據在記憶體中；
+日期前進後即關閉較早日期的檔案，單一檔案超過 rows_per_file 筆時換下一個檔案。
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from RedisDB import _normalize_timestamp
+from sqlite_storage import open_storage_handler
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 為選用套件，未安裝時只能輸出 CSV
+    pa = None
+
+
+# 各表的欄位與型別（f8 / f4 / i8 為 NumPy 型別代碼，str 為字串）
+TABLES: Dict[str, List[Tuple[str, str]]] = {
+    'runs': [
+        ('run_id', 'str'), ('fingerprint', 'str'), ('date', 'str'), ('pairs', 'str'),
+        ('start', 'f8'), ('end', 'f8'), ('status', 'str'),
+    ],
+    # 指標以長表格保存，不同配置、不同版本的欄位都能放進同一個 schema
+    'test_outputs': [
+        ('run_id', 'str'), ('pair_index', 'i8'), ('role', 'str'), ('timestamp', 'f8'),
+        ('section', 'str'), ('metric', 'str'), ('value', 'f8'), ('text', 'str'),
+    ],
+    'monitor': [
+        ('run_id', 'str'), ('pair_index', 'i8'), ('timestamp', 'f8'), ('cpu_usage', 'f4'),
+        ('ram_used', 'i8'), ('ram_total', 'i8'), ('ram_usage', 'f4'),
+    ],
+    # 各 pair / 角色的 dperf 行程取樣
+    'process': [
+        ('run_id', 'str'), ('pair_index', 'i8'), ('role', 'str'), ('timestamp', 'f8'), ('cpu_usage', 'f4'),
+        ('cpu_time', 'f8'), ('rss_mb', 'f4'), ('hugetlb_mb', 'f4'), ('pids', 'i8'),
+    ],
+}
+
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow', 'csv': 'csv'}
+
+# SystemMonitor 記錄整台主機 CPU/RAM 時使用的 pair 索引
+HOST_MONITOR_PAIR = 0
+
+
+def _arrow_schema(table: str):
+    """依 TABLES 建立 pyarrow schema"""
+    types = {'str': pa.string(), 'f8': pa.float64(), 'f4': pa.float32(), 'i8': pa.int64()}
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+
+
+def _metric_value(value) -> Tuple[Optional[float], Optional[str]]:
+    """將指標拆為 (數值, 文字)，舊格式的字串數值也轉為數值"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), None
+    try:
+        number = float(str(value).replace(",", ""))
+        if math.isfinite(number):
+            return number, None
+    except (TypeError, ValueError):
+        pass
+    return None, str(value)
+
+
+class _TableWriter:
+    """單一分區、單一表的串流寫入器，超過 rows_per_file 筆時換下一個檔案"""
+
+    def __init__(self, directory: str, table: str, fmt: str, batch_rows: int, rows_per_file: int):
+        self.directory = directory
+        self.table = table
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self.rows_per_file = rows_per_file
+        self.columns = [name for name, _ in TABLES[table]]
+        self._schema = _arrow_schema(table) if fmt != 'csv' else None
+        self._file_index = 0
+        self._file_rows = 0
+        self._handle = None
+        self._writer = None
+        self._batches: List = []
+        self._buffered = 0
+
+    def _open(self) -> None:
+        """開啟下一個輸出檔案"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.table}-{self._file_index:04d}.{FORMATS[self.fmt]}")
+        if self.fmt == 'csv':
+            self._handle = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow(self.columns)
+        elif self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._handle = pa.OSFile(path, 'wb')
+            self._writer = pa_ipc.new_file(self._handle, self._schema)
+        self._file_index += 1
+        self._file_rows = 0
+
+    def _close_file(self) -> None:
+        """關閉目前的輸出檔案"""
+        if self._writer is not None and self.fmt != 'csv':
+            self._writer.close()
+        if self._handle is not None:
+            self._handle.close()
+        self._handle = None
+        self._writer = None
+
+    def append(self, data: Dict[str, Iterable]) -> int:
+        """
+        加入一批資料列
+
+        Args:
+            data: {欄位名稱: 值序列}，各欄位長度相同，缺少的值為 None
+
+        Returns:
+            加入的筆數
+        """
+        values = [data[name] for name in self.columns]
+        rows = len(values[0])
+        if rows == 0:
+            return 0
+
+        if self.fmt == 'csv':
+            start = 0
+            while start < rows:
+                if self._writer is None:
+                    self._open()
+                end = min(rows, start + self.rows_per_file - self._file_rows)
+                self._writer.writerows(
+                    zip(*(column[start:end] for column in values))
+                )
+                self._file_rows += end - start
+                start = end
+                if self._file_rows >= self.rows_per_file:
+                    self._close_file()
+            return rows
+
+        self._batches.append(pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(values, self._schema)],
+            schema=self._schema,
+        ))
+        self._buffered += rows
+        if self._buffered >= self.batch_rows:
+            self.flush()
+        return rows
+
+    def flush(self) -> None:
+        """將緩衝的資料寫入檔案（Parquet 為一個 row group）"""
+        if not self._batches:
+            return
+        table = pa.Table.from_batches(self._batches, schema=self._schema)
+        self._batches = []
+        self._buffered = 0
+
+        offset = 0
+        while offset < table.num_rows:
+            if self._writer is None:
+                self._open()
+            length = min(table.num_rows - offset, self.rows_per_file - self._file_rows)
+            self._writer.write_table(table.slice(offset, length))
+            self._file_rows += length
+            offset += length
+            if self._file_rows >= self.rows_per_file:
+                self._close_file()
+
+    def close(self) -> None:
+        """寫入剩餘的資料並關閉檔案"""
+        self.flush()
+        self._close_file()
+
+
+class BulkExporter:
+    """依執行索引串流匯出所有測試執行、測試輸出與監控數據"""
+
+    def __init__(
+        self, storage_handler, output_dir: str, fmt: str = 'csv', run_batch_size: int = 100,
+        page_size: int = 10000, batch_rows: int = 65536, rows_per_file: int = 1000000
+    ):
+        """初始化匯出工作
+
+        Args:
+            storage_handler: 已連接的 RedisHandler 或 SQLiteHandler
+            output_dir: 輸出目錄
+            fmt: 'parquet'、'arrow'（Arrow IPC）或 'csv'
+            run_batch_size: 每次讀取的執行索引筆數
+            page_size: 每次讀取的監控數據筆數
+            batch_rows: Parquet / Arrow 累積多少筆寫入一次
+            rows_per_file: 單一檔案的最大筆數，超過時換下一個檔案
+
+        Raises:
+            ValueError: 不支援的格式，或未安裝 pyarrow 時指定 Parquet / Arrow
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"不支援的匯出格式: {fmt}")
+        if fmt != 'csv' and pa is None:
+            raise ValueError(f"{fmt} 格式需要安裝 pyarrow，或改用 csv")
+        self.storage_handler = storage_handler
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.run_batch_size = run_batch_size
+        self.page_size = page_size
+        self.batch_rows = batch_rows
+        self.rows_per_file = rows_per_file
+        self._writers: Dict[Tuple[str, str, str], _TableWriter] = {}
+
+    def _writer(self, date: str, fingerprint: str, table: str) -> _TableWriter:
+        """取得分區的寫入器，日期前進時關閉較早日期的分區"""
+        key = (date, fingerprint, table)
+        if key not in self._writers:
+            for old in [k for k in self._writers if k[0] < date]:
+                self._writers.pop(old).close()
+            directory = os.path.join(self.output_dir, f"date={date}", f"config={fingerprint}")
+            self._writers[key] = _TableWriter(directory, table, self.fmt, self.batch_rows, self.rows_per_file)
+        return self._writers[key]
+
+    def _export_outputs(self, run: Dict, writer: _TableWriter) -> int:
+        """匯出一次執行中所有 pair 的測試輸出"""
+        rows = []
+        for pair_index, roles in sorted(self.storage_handler.get_run_outputs(run["run_id"]).items()):
+            for role, output in roles.items():
+                timestamp = _normalize_timestamp(output["info"]["timestamp"])[1]
+                for section in ("metrics", "steady"):
+                    for metric, raw in (output.get(section) or {}).items():
+                        value, text = _metric_value(raw)
+                        rows.append((run["run_id"], pair_index, role, timestamp, section, metric, value, text))
+        names = [name for name, _ in TABLES['test_outputs']]
+        columns = dict(zip(names, zip(*rows))) if rows else {name: [] for name in names}
+        return writer.append(columns)
+
+    def _export_monitor(self, run: Dict, writer: _TableWriter) -> int:
+        """分頁匯出執行期間的主機監控數據
+
+        SystemMonitor 只以 pair 0 記錄整台主機的 CPU/RAM，每次執行匯出一次，與測試了哪些 pair 無關。
+        """
+        count = 0
+        cursor = None
+        while True:
+            arrays, cursor = self.storage_handler.get_monitor_page(
+                HOST_MONITOR_PAIR, cursor=cursor, limit=self.page_size,
+                start_time=float(run["start"]), end_time=float(run["end"])
+            )
+            rows = len(arrays["timestamp"])
+            if rows:
+                count += writer.append({
+                    "run_id": [run["run_id"]] * rows,
+                    "pair_index": np.full(rows, HOST_MONITOR_PAIR, dtype=np.int64),
+                    "timestamp": arrays["timestamp"],
+                    "cpu_usage": arrays["cpu_usage"],
+                    "ram_used": arrays["ram_used"].astype(np.int64),
+                    "ram_total": arrays["ram_total"],
+                    "ram_usage": arrays["ram_usage"],
+                })
+            if cursor is None:
+                break
+        return count
+
+    def _export_process(self, run: Dict, pair_indexes: List[int], writer: _TableWriter) -> int:
+        """匯出執行期間各 pair / 角色的 dperf 行程取樣"""
+        count = 0
+        for pair_index in pair_indexes:
+            for role in ("server", "client"):
+                arrays = self.storage_handler.get_process_arrays(
+                    pair_index, role, start_time=float(run["start"]), end_time=float(run["end"])
+                )
+                rows = len(arrays["timestamp"])
+                if rows:
+                    count += writer.append({
+                        "run_id": [run["run_id"]] * rows,
+                        "pair_index": np.full(rows, pair_index, dtype=np.int64),
+                        "role": [role] * rows,
+                        "timestamp": arrays["timestamp"],
+                        "cpu_usage": arrays["cpu_usage"],
+                        "cpu_time": arrays["cpu_time"],
+                        "rss_mb": arrays["rss_mb"],
+                        "hugetlb_mb": arrays["hugetlb_mb"],
+                        "pids": arrays["pids"].astype(np.int64),
+                    })
+        return count
+
+    def export(self, fingerprint: Optional[str] = None, date: Optional[str] = None) -> Dict[str, int]:
+        """
+        匯出所有執行（可依配置指紋或日期篩選）
+
+        監控數據與 dperf 行程取樣依執行的開始與結束時間擷取，尚未結束的執行只匯出執行索引與測試輸出。
+
+        Args:
+            fingerprint: 只匯出此配置指紋的執行（可選）
+            date: 只匯出此日期 'YYYY-MM-DD' 開始的執行（可選）
+
+        Returns:
+            {'runs', 'test_outputs', 'monitor', 'process'} 各表匯出的筆數
+        """
+        counts = {table: 0 for table in TABLES}
+        cursor = None
+        try:
+            while True:
+                runs, cursor = self.storage_handler.get_runs_page(cursor, self.run_batch_size)
+                for run in runs:
+                    if (fingerprint and run.get("fingerprint") != fingerprint) or (date and run.get("date") != date):
+                        continue
+                    run_date, run_config = run.get("date", "unknown"), run.get("fingerprint", "unknown")
+                    pair_indexes = [int(i) for i in run.get("pairs", "").split(",") if i]
+
+                    counts['runs'] += self._writer(run_date, run_config, 'runs').append({
+                        "run_id": [run["run_id"]],
+                        "fingerprint": [run_config],
+                        "date": [run_date],
+                        "pairs": [run.get("pairs", "")],
+                        "start": [float(run["start"])],
+                        "end": [float(run["end"]) if "end" in run else None],
+                        "status": [run.get("status")],
+                    })
+                    counts['test_outputs'] += self._export_outputs(
+                        run, self._writer(run_date, run_config, 'test_outputs')
+                    )
+                    if "end" in run:
+                        counts['monitor'] += self._export_monitor(
+                            run, self._writer(run_date, run_config, 'monitor')
+                        )
+                        counts['process'] += self._export_process(
+                            run, pair_indexes, self._writer(run_date, run_config, 'process')
+                        )
+                print(f"[Export] 已匯出 {counts['runs']} 次執行")
+                if cursor is None:
+                    break
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = {}
+        return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="將所有測試執行、測試輸出與監控數據匯出為 Parquet / Arrow / CSV。")
+    parser.add_argument('-c', '--config', type=str, default='config.yaml', help='配置檔案路徑')
+    parser.add_argument('-o', '--output', type=str, default='./results/export', help='輸出目錄')
+    parser.add_argument('-f', '--format', type=str, default='csv', choices=sorted(FORMATS),
+                        help='輸出格式（parquet / arrow 需要 pyarrow，可安裝 array-script[parquet]）')
+    parser.add_argument('--fingerprint', type=str, default=None, help='只匯出此配置指紋的執行')
+    parser.add_argument('--date', type=str, default=None, help='只匯出此日期 (YYYY-MM-DD) 開始的執行')
+    parser.add_argument('--redis-host', type=str, default='localhost', help='Redis 主機位址')
+    parser.add_argument('--redis-port', type=int, default=6379, help='Redis 埠號')
+    parser.add_argument('--redis-db', type=int, default=0, help='Redis 資料庫編號')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    storage = Config(args.config).test.storage
+
+    storage_handler = open_storage_handler(
+        storage.backend, redis_host=args.redis_host, redis_port=args.redis_port, redis_db=args.redis_db,
+        sqlite_path=storage.sqlite_path
+    )
+    if not storage_handler.is_connected():
+        print(f"無法連接到儲存後端 ({storage.backend})，無法匯出")
+        sys.exit(2)
+
+    try:
+        exporter = BulkExporter(storage_handler, args.output, fmt=args.format)
+        counts = exporter.export(fingerprint=args.fingerprint, date=args.date)
+        print(f"[Export] 完成: {counts} -> {args.output}")
+    except ValueError as e:
+        print(f"[Export] {e}")
+        sys.exit(2)
+    finally:
+        storage_handler.close()
+
+
+if __name__ == "__main__":
+    main()
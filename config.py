@@ -1,5 +1,7 @@
 from dataclasses import dataclass, field
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
 import yaml
 
 @dataclass
@@ -59,6 +61,26 @@ class TrafficGeneratorPair:
     protocol: str = "tcp"
 
 
+@dataclass
+class ResourcePlannerConfig:
+    """NUMA 資源規劃配置"""
+    enable: bool = False
+    cores_per_role: int = 1
+    reserved_cores: List[int] = field(default_factory=lambda: [0])
+
+
+@dataclass
+class MonitorConfig:
+    """流量產生器主機的系統監控配置"""
+    mode: str = "stream"
+    interval: float = 1.0
+    saturation_threshold: float = 90.0
+    buffer_capacity: int = 65536
+    sink: str = "csv"
+    flush_interval: float = 5.0
+    flush_bytes: int = 65536
+
+
 @dataclass
 class TrafficGenerator:
     """流量產生器配置"""
@@ -70,9 +92,50 @@ class TrafficGenerator:
     dperf_path: str = ""
     hugepage_frames: int = 2
     hugepage_size: str = "1G"
+    warmup_seconds: int = 0
+    cooldown_seconds: int = 0
+    resource_planner: ResourcePlannerConfig = field(default_factory=ResourcePlannerConfig)
+    monitor: MonitorConfig = field(default_factory=MonitorConfig)
     pairs: List[TrafficGeneratorPair] = field(default_factory=list)
 
 
+@dataclass
+class APVMonitorConfig:
+    """APV 統計監控配置"""
+    enable: bool = False
+    interval: float = 5.0
+    flush_interval: float = 5.0
+    # 區段名稱 -> APV CLI 統計指令，空白時使用 apv_monitor.DEFAULT_APV_COMMANDS
+    commands: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class MetricsExporterConfig:
+    """OpenMetrics HTTP 端點配置"""
+    enable: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9464
+
+
+@dataclass
+class RetentionConfig:
+    """監控數據保留與降採樣配置"""
+    enable: bool = False
+    raw_days: float = 7
+    minute_days: float = 30
+    hour_days: Optional[float] = 365
+    test_output_days: Optional[float] = None
+    interval_seconds: int = 3600
+
+
+@dataclass
+class StorageConfig:
+    """測試數據儲存後端配置"""
+    backend: str = "redis"
+    sqlite_path: str = "./results/array_script.db"
+    retention: RetentionConfig = field(default_factory=RetentionConfig)
+
+
 @dataclass
 class TestConfig:
     """測試配置"""
@@ -81,7 +144,10 @@ class TestConfig:
     apv_username: str = ""
     apv_password: str = ""
     apv_enable_password: str = ""
+    apv_monitor: APVMonitorConfig = field(default_factory=APVMonitorConfig)
+    metrics_exporter: MetricsExporterConfig = field(default_factory=MetricsExporterConfig)
     traffic_generator: TrafficGenerator = field(default_factory=TrafficGenerator)
+    storage: StorageConfig = field(default_factory=StorageConfig)
 
 
 class Config:
@@ -164,6 +230,26 @@ class Config:
             )
             pairs_list.append(pair)
 
+        # 解析 resource_planner
+        planner_data = tg_data.get('resource_planner', {}) or {}
+        resource_planner = ResourcePlannerConfig(
+            enable=planner_data.get('enable', False),
+            cores_per_role=planner_data.get('cores_per_role', 1),
+            reserved_cores=planner_data.get('reserved_cores', [0])
+        )
+
+        # 解析 monitor
+        monitor_data = tg_data.get('monitor', {}) or {}
+        monitor = MonitorConfig(
+            mode=monitor_data.get('mode', 'stream'),
+            interval=float(monitor_data.get('interval', 1.0)),
+            saturation_threshold=float(monitor_data.get('saturation_threshold', 90.0)),
+            buffer_capacity=int(monitor_data.get('buffer_capacity', 65536)),
+            sink=monitor_data.get('sink', 'csv'),
+            flush_interval=float(monitor_data.get('flush_interval', 5.0)),
+            flush_bytes=int(monitor_data.get('flush_bytes', 65536))
+        )
+
         # 建立 TrafficGenerator 物件
         traffic_generator = TrafficGenerator(
             management_ip=tg_data.get('management_ip', ''),
@@ -174,9 +260,47 @@ class Config:
             dperf_path=tg_data.get('dperf_path', ''),
             hugepage_frames=tg_data.get('hugepage_frames', 2),
             hugepage_size=tg_data.get('hugepage_size', '1G'),
+            warmup_seconds=tg_data.get('warmup_seconds', 0),
+            cooldown_seconds=tg_data.get('cooldown_seconds', 0),
+            resource_planner=resource_planner,
+            monitor=monitor,
             pairs=pairs_list
         )
 
+        # 解析 apv_monitor
+        apv_monitor_data = test_data.get('apv_monitor', {}) or {}
+        apv_monitor = APVMonitorConfig(
+            enable=apv_monitor_data.get('enable', False),
+            interval=float(apv_monitor_data.get('interval', 5.0)),
+            flush_interval=float(apv_monitor_data.get('flush_interval', 5.0)),
+            commands=dict(apv_monitor_data.get('commands', {}) or {})
+        )
+
+        # 解析 metrics_exporter
+        exporter_data = test_data.get('metrics_exporter', {}) or {}
+        metrics_exporter = MetricsExporterConfig(
+            enable=exporter_data.get('enable', False),
+            host=exporter_data.get('host', '127.0.0.1'),
+            port=int(exporter_data.get('port', 9464))
+        )
+
+        # 解析 storage
+        storage_data = test_data.get('storage', {}) or {}
+        retention_data = storage_data.get('retention', {}) or {}
+        retention = RetentionConfig(
+            enable=retention_data.get('enable', False),
+            raw_days=retention_data.get('raw_days', 7),
+            minute_days=retention_data.get('minute_days', 30),
+            hour_days=retention_data.get('hour_days', 365),
+            test_output_days=retention_data.get('test_output_days'),
+            interval_seconds=retention_data.get('interval_seconds', 3600)
+        )
+        storage = StorageConfig(
+            backend=storage_data.get('backend', 'redis'),
+            sqlite_path=storage_data.get('sqlite_path', './results/array_script.db'),
+            retention=retention
+        )
+
         # 直接更新當前物件的 test 屬性
         self.test = TestConfig(
             apv_management_ip=test_data.get('apv_management_ip', ''),
@@ -184,7 +308,10 @@ class Config:
             apv_username=test_data.get('apv_username', ''),
             apv_password=test_data.get('apv_password', ''),
             apv_enable_password=test_data.get('apv_enable_password', ''),
-            traffic_generator=traffic_generator
+            apv_monitor=apv_monitor,
+            metrics_exporter=metrics_exporter,
+            traffic_generator=traffic_generator,
+            storage=storage
         )
         return self
 
@@ -242,6 +369,17 @@ class Config:
                 'apv_username': self.test.apv_username,
                 'apv_password': self.test.apv_password,
                 'apv_enable_password': self.test.apv_enable_password,
+                'apv_monitor': {
+                    'enable': self.test.apv_monitor.enable,
+                    'interval': self.test.apv_monitor.interval,
+                    'flush_interval': self.test.apv_monitor.flush_interval,
+                    'commands': dict(self.test.apv_monitor.commands),
+                },
+                'metrics_exporter': {
+                    'enable': self.test.metrics_exporter.enable,
+                    'host': self.test.metrics_exporter.host,
+                    'port': self.test.metrics_exporter.port,
+                },
                 'traffic_generator': {
                     'management_ip': self.test.traffic_generator.management_ip,
                     'management_port': self.test.traffic_generator.management_port,
@@ -251,7 +389,65 @@ class Config:
                     'dperf_path': self.test.traffic_generator.dperf_path,
                     'hugepage_frames': self.test.traffic_generator.hugepage_frames,
                     'hugepage_size': self.test.traffic_generator.hugepage_size,
+                    'warmup_seconds': self.test.traffic_generator.warmup_seconds,
+                    'cooldown_seconds': self.test.traffic_generator.cooldown_seconds,
+                    'resource_planner': {
+                        'enable': self.test.traffic_generator.resource_planner.enable,
+                        'cores_per_role': self.test.traffic_generator.resource_planner.cores_per_role,
+                        'reserved_cores': self.test.traffic_generator.resource_planner.reserved_cores,
+                    },
+                    'monitor': {
+                        'mode': self.test.traffic_generator.monitor.mode,
+                        'interval': self.test.traffic_generator.monitor.interval,
+                        'saturation_threshold': self.test.traffic_generator.monitor.saturation_threshold,
+                        'buffer_capacity': self.test.traffic_generator.monitor.buffer_capacity,
+                        'sink': self.test.traffic_generator.monitor.sink,
+                        'flush_interval': self.test.traffic_generator.monitor.flush_interval,
+                        'flush_bytes': self.test.traffic_generator.monitor.flush_bytes,
+                    },
                     'pairs': pairs_list
+                },
+                'storage': {
+                    'backend': self.test.storage.backend,
+                    'sqlite_path': self.test.storage.sqlite_path,
+                    'retention': {
+                        'enable': self.test.storage.retention.enable,
+                        'raw_days': self.test.storage.retention.raw_days,
+                        'minute_days': self.test.storage.retention.minute_days,
+                        'hour_days': self.test.storage.retention.hour_days,
+                        'test_output_days': self.test.storage.retention.test_output_days,
+                        'interval_seconds': self.test.storage.retention.interval_seconds,
+                    },
                 }
             }
-        }
\ No newline at end of file
+        }
+
+    def pair_fingerprint(self, pair_index: int) -> str:
+        """計算指定 pair 的配置指紋
+
+        只包含會影響效能的設定（pair 參數與 hugepages），不含帳號密碼與管理 IP，
+        相同指紋的測試結果可以互相比較。
+
+        Args:
+            pair_index: pair 索引
+
+        Returns:
+            str: 12 字元的十六進位指紋
+        """
+        tg = self.to_dict()['test']['traffic_generator']
+        payload = {
+            'pair': tg['pairs'][pair_index],
+            'hugepage_frames': tg['hugepage_frames'],
+            'hugepage_size': tg['hugepage_size'],
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()[:12]
+
+    def fingerprint(self) -> str:
+        """計算整份配置的指紋（所有 pair 的配置指紋依序組合），用於查詢相同配置的測試執行
+
+        Returns:
+            str: 12 字元的十六進位指紋
+        """
+        pair_fingerprints = [self.pair_fingerprint(i) for i in range(len(self.test.traffic_generator.pairs))]
+        return hashlib.sha1(",".join(pair_fingerprints).encode('utf-8')).hexdigest()[:12]
@@ -2,7 +2,13 @@ from ssh_executor import SSHExecutor
 from config import Config
 from threading import Thread
 from concurrent.futures import ThreadPoolExecutor
-from RedisDB import RedisHandler
+from sqlite_storage import open_storage_handler
+from write_behind import WriteBehindQueue
+from dperf_stats import (
+    IntervalStatsParser, parse_interval_stats, steady_window_stats, flatten_steady_stats,
+    nic_error_events, summarize_nic_events,
+)
+from metrics_exporter import MetricsRegistry, PAIR_PHASES
 import re
 import os
 import csv
@@ -12,7 +18,7 @@ from datetime import datetime
 class dperf:
     def __init__(self, config: Config, pair_index: int = 0, log_path: str = None, output_path: str = None,
                  redis_host: str = "localhost", redis_port: int = 6379, redis_db: int = 0,
-                 enable_redis: bool = True):
+                 enable_redis: bool = True, metrics: MetricsRegistry = None):
         self.config = config
         self.pair_index = pair_index
         self.pair = config.test.traffic_generator.pairs[pair_index]
@@ -46,21 +52,47 @@ class dperf:
         )
         self.serverOutput = None
         self.clientOutput = None
+        # 去除暖機/收尾後的穩態統計（攤平格式）
+        self.serverSteady = None
+        self.clientSteady = None
+        # dperf 每秒統計中 DPDK port 錯誤計數（ierrors/oerrors/imissed）大於 0 的區間
+        self.serverNicEvents = None
+        self.clientNicEvents = None
+        # 由 ResourcePlanner 規劃的 cpu/socket_mem，若為 None 則使用 config.yaml 中的設定
+        self.allocation = None
+        # 測試執行 ID，由 TrafficGenerator 在每次執行前設定；測試輸出以此區分不同次執行
+        self.run_id = None
+        # OpenMetrics 端點的 MetricsRegistry（可選），dperf 執行期間即時更新每秒統計與階段
+        self.metrics = metrics
 
         # 初始化 Redis Handler
         self.enable_redis = enable_redis
         self.redis_handler = None
         if self.enable_redis:
             try:
-                self.redis_handler = RedisHandler(host=redis_host, port=redis_port, db=redis_db)
+                storage = config.test.storage
+                self.redis_handler = open_storage_handler(
+                    storage.backend, redis_host=redis_host, redis_port=redis_port, redis_db=redis_db,
+                    sqlite_path=storage.sqlite_path
+                )
                 if self.redis_handler.is_connected():
-                    print(f"[Pair {self.pair_index}] Redis 已啟用並成功連接")
+                    print(f"[Pair {self.pair_index}] 儲存後端 ({storage.backend}) 已啟用並成功連接")
                 else:
-                    print(f"[Pair {self.pair_index}] Redis 連接失敗，將僅使用本地儲存")
-                    self.redis_handler = None
+                    # 保留 handler 交給寫入佇列，後端恢復後由佇列重新連接並補寫
+                    print(f"[Pair {self.pair_index}] Redis 連接失敗，數據先暫存到本地，恢復後自動補寫")
             except Exception as e:
                 print(f"[Pair {self.pair_index}] Redis 初始化失敗: {e}，將僅使用本地儲存")
                 self.redis_handler = None
+
+        # 測試輸出由背景佇列寫入 Redis，Redis 無法使用時暫存到本地
+        self.writer = None
+        if self.enable_redis:
+            self.writer = WriteBehindQueue(
+                self.redis_handler,
+                spill_path=f"{log_path}/redis_spill_pair{pair_index}.jsonl",
+                name=f"Pair{pair_index}-Writer",
+                metrics=metrics,
+            ).start()
     def __del__(self):
         """Destructor to automatically disconnect from the server"""
         try:
@@ -80,18 +112,25 @@ class dperf:
         self.server_executor.close()
         self.client_executor.close()
 
-        # 關閉 Redis 連接
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+
+        # 釋放共用的 Redis 連接（設為 None 避免 __del__ 再次釋放）
         if self.redis_handler:
             self.redis_handler.close()
+            self.redis_handler = None
     
     def generateServerConfig(self):
         """產生 dperf server 配置檔案"""
         server_cfg = self.pair.server
+        cpu = self.allocation.server_cpu if self.allocation else server_cfg.server_cpu_core
+        socket_mem = self.allocation.server_socket_mem if self.allocation else server_cfg.socket_mem
 
         config_lines = [
             "mode            server",
             f"tx_burst        {server_cfg.tx_burst}",
-            f"cpu             {server_cfg.server_cpu_core}",
+            f"cpu             {cpu}",
         ]
 
         if server_cfg.rss:
@@ -99,7 +138,7 @@ class dperf:
 
         config_lines.extend(
             [
-                f"socket_mem      {server_cfg.socket_mem}",
+                f"socket_mem      {socket_mem}",
                 f"protocol        {self.pair.protocol}",
                 f"duration        {server_cfg.server_duration}",
                 f"payload_size    {self.pair.payload_size}",
@@ -125,12 +164,14 @@ class dperf:
     def generateClientConfig(self):
         """產生 dperf client 配置檔案"""
         client_cfg = self.pair.client
+        cpu = self.allocation.client_cpu if self.allocation else client_cfg.client_cpu_core
+        socket_mem = self.allocation.client_socket_mem if self.allocation else client_cfg.socket_mem
 
         config_lines = [
             "mode            client",
             f"tx_burst        {client_cfg.tx_burst}",
             f"launch_num      {client_cfg.launch_num}",
-            f"cpu             {client_cfg.client_cpu_core}",
+            f"cpu             {cpu}",
         ]
 
         if client_cfg.rss:
@@ -138,7 +179,7 @@ class dperf:
 
         config_lines.extend(
             [
-                f"socket_mem      {client_cfg.socket_mem}",
+                f"socket_mem      {socket_mem}",
                 f"protocol        {self.pair.protocol}",
                 f"payload_size    {self.pair.payload_size}",
                 f"duration        {client_cfg.client_duration}",
@@ -186,20 +227,24 @@ class dperf:
         print(f"[Pair {self.pair_index}] Server 輸出: {self.serverOutput}")
         print(f"[Pair {self.pair_index}] Client 輸出: {self.clientOutput}")
 
-        # 獲取監控數據（如果有提供 monitor）
-        monitor_data = monitor.get_data() if monitor else []
+        # 獲取此 pair 的 dperf 行程監控數據（如果有提供 monitor）
+        monitor_data = monitor.get_process_data(self.pair_index) if monitor else []
         self.outputResults(monitor_data=monitor_data)
 
         return {
             'server': self.serverOutput,
-            'client': self.clientOutput
+            'client': self.clientOutput,
+            'nic_events': {
+                'server': self.serverNicEvents or [],
+                'client': self.clientNicEvents or [],
+            },
         }
         
     def outputResults(self, monitor_data=None):
         """輸出測試結果到指定路徑的檔案
 
         Args:
-            monitor_data: 監控數據列表，由外部 SystemMonitor 提供
+            monitor_data: 此 pair 本次執行的 dperf 行程監控數據列表，由外部 SystemMonitor.get_process_data() 提供
         """
         if self.outputPath is None or self.outputPath == "":
             self.outputPath = f"./results/dperf_pair{self.pair_index}_results.csv"
@@ -212,29 +257,33 @@ class dperf:
         # 嘗試從 Redis 讀取數據
         server_data = self.serverOutput
         client_data = self.clientOutput
+        server_steady = self.serverSteady
+        client_steady = self.clientSteady
         if monitor_data is None:
             monitor_data = []
 
 
         if self.enable_redis and self.redis_handler and self.redis_handler.is_connected():
             try:
+                # 等待佇列中的測試輸出寫入 Redis，避免讀到上一次的結果
+                if self.writer and not self.writer.flush():
+                    print(f"[Pair {self.pair_index}] 警告: Redis 寫入佇列未在時限內清空")
+
                 # 從 Redis 獲取 server 數據
                 redis_server = self.get_redis_test_output('server')
                 if redis_server and 'metrics' in redis_server:
                     server_data = redis_server['metrics']
+                    server_steady = redis_server.get('steady') or server_steady
                     print(f"[Pair {self.pair_index}] 已從 Redis 載入 Server 輸出數據")
                 
                 # 從 Redis 獲取 client 數據
                 redis_client = self.get_redis_test_output('client')
                 if redis_client and 'metrics' in redis_client:
                     client_data = redis_client['metrics']
+                    client_steady = redis_client.get('steady') or client_steady
                     print(f"[Pair {self.pair_index}] 已從 Redis 載入 Client 輸出數據")
-                
-                # 從 Redis 獲取 monitor 數據
-                redis_monitor = self.get_redis_monitor_data()
-                if redis_monitor:
-                    monitor_data = redis_monitor
-                    print(f"[Pair {self.pair_index}] 已從 Redis 載入 Monitor 數據")
+                # 行程監控數據使用 SystemMonitor 記憶體中本次監控的完整序列，不從 Redis 讀取：
+                # 取樣由 SystemMonitor 自己的寫入佇列寫入，此時可能尚未寫完
             except Exception as e:
                 print(f"[Pair {self.pair_index}] 從 Redis 讀取數據失敗: {e}，使用本地數據")
             
@@ -262,6 +311,28 @@ class dperf:
                 server_value = server_data.get(key, 'N/A') if server_data else 'N/A'
                 client_value = client_data.get(key, 'N/A') if client_data else 'N/A'
                 writer.writerow([key, server_value, client_value])
+
+            # 寫入穩態區間統計（已去除暖機/收尾）
+            steady_keys = set()
+            if server_steady:
+                steady_keys.update(server_steady.keys())
+            if client_steady:
+                steady_keys.update(client_steady.keys())
+            if steady_keys:
+                writer.writerow(['steady_window'])
+                for key in sorted(steady_keys):
+                    server_value = server_steady.get(key, 'N/A') if server_steady else 'N/A'
+                    client_value = client_steady.get(key, 'N/A') if client_steady else 'N/A'
+                    writer.writerow([key, server_value, client_value])
+
+            # 寫入 DPDK port 錯誤計數（ierrors/oerrors/imissed）的秒數與總數
+            server_nic = summarize_nic_events(self.serverNicEvents or [])
+            client_nic = summarize_nic_events(self.clientNicEvents or [])
+            nic_keys = set(server_nic) | set(client_nic)
+            if nic_keys:
+                writer.writerow(['nic_errors'])
+                for key in sorted(nic_keys):
+                    writer.writerow([key, server_nic.get(key, 0), client_nic.get(key, 0)])
             
         # 寫入監控數據到 CSV
         monitor_output_dir = os.path.dirname(self.outputPath)
@@ -272,18 +343,21 @@ class dperf:
         with open(monitor_csv_path, 'w', newline='') as f:
             writer = csv.writer(f)
 
-            # 寫入標題行
-            writer.writerow(['Timestamp', 'CPU_Usage_Percent', 'RAM_Used_MB', 'RAM_Total_MB', 'RAM_Usage_Percent'])
+            # 寫入標題行（CPU 使用率以單一核心為 100%）
+            writer.writerow(['Timestamp', 'Role', 'PIDs', 'CPU_Usage_Percent', 'CPU_Time_Seconds',
+                             'RSS_MB', 'Hugetlb_MB'])
 
             # monitor_data 是一個 list，每個元素是一個 dict
             if isinstance(monitor_data, list):
                 for data_point in monitor_data:
                     writer.writerow([
                         data_point.get('timestamp', ''),
+                        data_point.get('role', ''),
+                        data_point.get('pids', ''),
                         data_point.get('cpu_usage', ''),
-                        data_point.get('ram_used', ''),
-                        data_point.get('ram_total', ''),
-                        data_point.get('ram_usage', '')
+                        data_point.get('cpu_time', ''),
+                        data_point.get('rss_mb', ''),
+                        data_point.get('hugetlb_mb', '')
                     ])
             elif isinstance(monitor_data, dict):
                 # 如果是 dict（舊版本相容）
@@ -308,31 +382,38 @@ class dperf:
             server_cmd = f"sudo ./build/dperf -c config/server_pair{self.pair_index}.conf"
             print(f"[Pair {self.pair_index}] Server: 執行命令 -> {server_cmd}")
             # log = self.server_executor.execute_command(server_cmd)
-            log = self.server_executor.execute_script('shell/server.sh')
+            self._set_phase('server', 'starting')
+            log = self.server_executor.execute_script('shell/server.sh', on_line=self._live_stats('server'))
 
             print(f"[Pair {self.pair_index}] Server: 解析輸出...")
             output = self.parseOutput(log)
             self.serverOutput = output
+            samples = parse_interval_stats(log[0])
+            self.serverSteady = self.parseSteadyStats(log, samples)
+            self.serverNicEvents = self.parseNicEvents('server', log, samples)
 
-            # 寫入 Redis（如果啟用且有輸出數據）
-            if output and self.redis_handler and self.redis_handler.is_connected():
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                success = self.redis_handler.save_test_output(
+            # 排入 Redis 寫入佇列（如果啟用且有輸出數據）
+            if output and self.writer:
+                self.writer.put_test_output(
                     pair_index=self.pair_index,
                     role='server',
                     output=output,
-                    timestamp=timestamp
+                    timestamp=datetime.now().timestamp(),
+                    steady=self.serverSteady,
+                    fingerprint=self.config.pair_fingerprint(self.pair_index),
+                    run_id=self.run_id
                 )
-                if success:
-                    print(f"[Pair {self.pair_index}] Server: 輸出數據已寫入 Redis")
-                else:
-                    print(f"[Pair {self.pair_index}] Server: 警告 - 輸出數據寫入 Redis 失敗")
+                print(f"[Pair {self.pair_index}] Server: 輸出數據已排入 Redis 寫入佇列")
 
             print(f"[Pair {self.pair_index}] Server: 測試完成，斷開連接")
             self.server_executor.close()
+            self._set_phase('server', 'finished')
         except Exception as e:
             print(f"[Pair {self.pair_index}] Server 執行失敗: {e}")
+            self._set_phase('server', 'failed')
             self.serverOutput = None
+            self.serverSteady = None
+            self.serverNicEvents = None
 
     def clientStart(self):
         """啟動 dperf client 並收集流量數據"""
@@ -348,35 +429,72 @@ class dperf:
             client_cmd = f"sudo ./build/dperf -c config/client_pair{self.pair_index}.conf"
             print(f"[Pair {self.pair_index}] Client: 執行命令 -> {client_cmd}")
             # log = self.client_executor.execute_command(client_cmd)
-            log = self.client_executor.execute_script('shell/client.sh')
+            self._set_phase('client', 'starting')
+            log = self.client_executor.execute_script('shell/client.sh', on_line=self._live_stats('client'))
 
 
             print(f"[Pair {self.pair_index}] Client: 解析輸出...")
             output = self.parseOutput(log)
             self.clientOutput = output
+            samples = parse_interval_stats(log[0])
+            self.clientSteady = self.parseSteadyStats(log, samples)
+            self.clientNicEvents = self.parseNicEvents('client', log, samples)
 
-            # 寫入 Redis（如果啟用且有輸出數據）
-            if output and self.redis_handler and self.redis_handler.is_connected():
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                success = self.redis_handler.save_test_output(
+            # 排入 Redis 寫入佇列（如果啟用且有輸出數據）
+            if output and self.writer:
+                self.writer.put_test_output(
                     pair_index=self.pair_index,
                     role='client',
                     output=output,
-                    timestamp=timestamp
+                    timestamp=datetime.now().timestamp(),
+                    steady=self.clientSteady,
+                    fingerprint=self.config.pair_fingerprint(self.pair_index),
+                    run_id=self.run_id
                 )
-                if success:
-                    print(f"[Pair {self.pair_index}] Client: 輸出數據已寫入 Redis")
-                else:
-                    print(f"[Pair {self.pair_index}] Client: 警告 - 輸出數據寫入 Redis 失敗")
+                print(f"[Pair {self.pair_index}] Client: 輸出數據已排入 Redis 寫入佇列")
 
             print(f"[Pair {self.pair_index}] Client: 測試完成，斷開連接")
             self.client_executor.close()
+            self._set_phase('client', 'finished')
         except Exception as e:
             print(f"[Pair {self.pair_index}] Client 執行失敗: {e}")
+            self._set_phase('client', 'failed')
             self.clientOutput = None
+            self.clientSteady = None
+            self.clientNicEvents = None
 
     
 
+    def _set_phase(self, role, phase):
+        """更新 OpenMetrics 端點上此 pair / 角色的階段"""
+        if self.metrics:
+            self.metrics.set_state('array_script_pair_phase', phase, PAIR_PHASES, pair=self.pair_index, role=role)
+
+    def _live_stats(self, role):
+        """建立逐行解析 dperf 每秒統計並更新 OpenMetrics 指標的 callback，未啟用端點時返回 None
+
+        與 parseSteadyStats 相同，開頭 warmup_seconds 秒標記為 warmup，之後為 steady。
+        """
+        if not self.metrics:
+            return None
+        parser = IntervalStatsParser()
+        warmup_seconds = self.config.test.traffic_generator.warmup_seconds
+        first_seconds = []
+
+        def on_line(line):
+            sample = parser.feed(line)
+            if not sample:
+                return
+            seconds = sample.get('seconds', 0)
+            if not first_seconds:
+                first_seconds.append(seconds)
+            values = {key: value for key, value in sample.items() if key != 'seconds'}
+            self.metrics.set('array_script_dperf_seconds', seconds, pair=self.pair_index, role=role)
+            self.metrics.set_many('array_script_dperf_stat', values, key='metric', pair=self.pair_index, role=role)
+            self._set_phase(role, 'warmup' if seconds - first_seconds[0] < warmup_seconds else 'steady')
+
+        return on_line
+
     def parseOutput(self, log):
         log = log[0]
 
@@ -427,6 +545,49 @@ class dperf:
             print("未找到 'dperf Test Finished' 字串")
             return None
 
+    def parseSteadyStats(self, log, samples=None):
+        """由每秒統計區塊計算穩態區間的 mean/p50/p99/min/max/stddev
+
+        Args:
+            log: execute_script 回傳的 (output, error, exit_status)
+            samples: 已解析的每秒統計（可選），省略時由 log 解析
+
+        Returns:
+            dict: 攤平後的穩態統計，例如 {'pktRx.mean': ...}；無每秒數據時返回 None
+        """
+        if samples is None:
+            samples = parse_interval_stats(log[0])
+        stats = steady_window_stats(
+            samples,
+            warmup_seconds=self.config.test.traffic_generator.warmup_seconds,
+            cooldown_seconds=self.config.test.traffic_generator.cooldown_seconds,
+        )
+        if not stats:
+            return None
+        return flatten_steady_stats(stats)
+
+    def parseNicEvents(self, role, log, samples=None):
+        """找出 dperf 每秒統計中 DPDK port 錯誤計數（ierrors/oerrors/imissed）大於 0 的區間
+
+        DPDK 綁定的 port 不在 kernel 中，無法由 ethtool 讀取，因此使用 dperf 每秒輸出的 port 計數；
+        imissed 增加表示 RX queue 已滿（queue 飽和）。
+
+        Args:
+            role: 'server' 或 'client'，用於訊息
+            log: execute_script 回傳的 (output, error, exit_status)
+            samples: 已解析的每秒統計（可選），省略時由 log 解析
+
+        Returns:
+            list: nic_error_events 的結果
+        """
+        if samples is None:
+            samples = parse_interval_stats(log[0])
+        events = nic_error_events(samples)
+        for event in events:
+            print(f"[Pair {self.pair_index}] 警告: {role} {event['counter']} 在第 "
+                  f"{event['first_second']}-{event['last_second']} 秒增加 {event['total']}")
+        return events
+
     def bindNICs(self):
         """綁定 NIC 到 DPDK 驅動程式"""
         try:
@@ -540,10 +701,26 @@ class dperf:
         else:
             return None
 
+    def get_redis_monitor_data(self, start_time=None, end_time=None):
+        """從 Redis 獲取此 pair 的 dperf 行程監控數據（server 與 client，依時間排序）
+
+        取樣時間為受監控主機的時鐘，控制端的時間需加上 SystemMonitor.clock_offset 再作為範圍。
+
+        Args:
+            start_time: 起始時間（可選）
+            end_time: 結束時間（可選）
+        """
+        if not (self.redis_handler and self.redis_handler.is_connected()):
+            return []
+        records = []
+        for role in ('server', 'client'):
+            records.extend(self.redis_handler.get_process_data(self.pair_index, role, start_time, end_time))
+        return sorted(records, key=lambda record: record['epoch'])
+
     def get_redis_test_output(self, role):
-        """從 Redis 獲取測試輸出數據（server 或 client）"""
+        """從 Redis 獲取本次執行的測試輸出數據（server 或 client），未設定 run_id 時返回最新的"""
         if self.redis_handler and self.redis_handler.is_connected():
-            return self.redis_handler.get_test_output(self.pair_index, role)
+            return self.redis_handler.get_test_output(self.pair_index, role, run_id=self.run_id)
         else:
             return None
 
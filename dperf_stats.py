@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""dperf 統計數據處理 - 解析每秒統計區塊並計算穩態區間指標"""
+
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+# 每秒統計區塊以 "seconds N" 開頭
+_SECONDS_LINE = re.compile(r'^\s*seconds\s+(\d+)', re.MULTILINE)
+
+STEADY_STAT_NAMES = ('mean', 'p50', 'p99', 'min', 'max', 'stddev')
+
+# dperf 每秒統計中的 DPDK port 錯誤計數：ierrors 為收到的錯誤封包、oerrors 為送出失敗、
+# imissed 為 RX queue 已滿而被 NIC 丟棄的封包（queue 飽和）
+NIC_ERROR_COUNTERS = ('ierrors', 'oerrors', 'imissed')
+
+# key 後接數值，例如 "pktRx   3001058"（千分位逗號已由 _clean() 移除）；一次比對整份 log 中所有
+# key-value，"seconds" 也是其中一個 key
+_KEY_VALUE = re.compile(r'([A-Za-z][\w-]*:?)[ \t]+(-?\d+(?:\.\d+)?)(?![\w.])')
+# 第一個每秒統計區塊的開頭
+_FIRST_SECONDS = re.compile(r'^[ \t]*seconds[ \t]+\d', re.MULTILINE)
+
+
+def _clean(text: str) -> str:
+    """移除 ANSI 控制字元與千分位逗號（dperf 統計區塊中的逗號只出現在千分位，整段移除比逐值 replace 快得多）"""
+    return _ANSI_ESCAPE.sub('', text).replace(',', '')
+
+
+def _stat_pairs(log: str) -> List[Tuple[str, str]]:
+    """以編譯好的正規表示式一次取出所有每秒統計區塊的 (key, 數值字串)
+
+    只掃描第一個 "seconds" 區塊到 "dperf Test Finished" / "Total Numbers" 之間，啟動訊息不進入比對。
+    """
+    end = log.find("Total Numbers")
+    if end != -1:
+        log = log[:end]
+    log = _clean(log)
+
+    first_block = _FIRST_SECONDS.search(log)
+    if first_block is None:
+        return []
+    finished = log.find("dperf Test Finished", first_block.start())
+    return _KEY_VALUE.findall(log[first_block.start():finished if finished != -1 else len(log)])
+
+
+def _to_number(value: str):
+    """將已去除千分位逗號的數字字串轉為 int 或 float"""
+    return float(value) if "." in value else int(value)
+
+
+def parse_interval_stats(log: str) -> List[Dict]:
+    """解析 dperf 執行期間每秒輸出的統計區塊
+
+    與 parse_stat_blocks 共用同一次正規表示式掃描，測試結束後的即時結果也走這條路徑。
+
+    Args:
+        log: dperf 的完整輸出
+
+    Returns:
+        每秒一筆的統計 dict 列表，依時間排序，包含 'seconds' 欄位
+    """
+    samples = []
+    sample = None
+    for key, value in _stat_pairs(log):
+        if key == 'seconds':
+            sample = {}
+            samples.append(sample)
+        if sample is not None and key not in sample:
+            sample[key] = _to_number(value)
+    return samples
+
+
+class IntervalStatsParser:
+    """逐行解析 dperf 每秒統計區塊（dperf 執行期間即時使用，結果與 parse_interval_stats 相同）
+
+    收到下一個 "seconds N" 行或 "Total Numbers" 時前一個區塊才完整，由 feed() 返回。
+    """
+
+    def __init__(self):
+        self._sample: Optional[Dict] = None
+        self.finished = False
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """解析一行輸出
+
+        Returns:
+            完整的每秒統計 dict（含 'seconds'），此行未結束任何區塊時返回 None
+        """
+        if self.finished:
+            return None
+        line = _clean(line)
+        if "Total Numbers" in line:
+            self.finished = True
+            return self.flush()
+
+        completed = None
+        if _SECONDS_LINE.match(line):
+            completed = self.flush()
+            self._sample = {}
+        if self._sample is not None:
+            for key, value in _KEY_VALUE.findall(line):
+                if key not in self._sample:
+                    self._sample[key] = _to_number(value)
+        return completed
+
+    def flush(self) -> Optional[Dict]:
+        """返回尚未完成的區塊（輸出結束時呼叫）"""
+        sample, self._sample = self._sample, None
+        return sample
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """以線性內插計算百分位數 (與 numpy 預設方法一致)"""
+    if len(sorted_values) == 1:
+        return float(sorted_values[0])
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = math.floor(pos)
+    upper = math.ceil(pos)
+    if lower == upper:
+        return float(sorted_values[lower])
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def trim_samples(samples: List[Dict], warmup_seconds: int = 0, cooldown_seconds: int = 0) -> List[Dict]:
+    """移除暖機 (warm-up) 與收尾 (cool-down) 期間的樣本
+
+    Args:
+        samples: parse_interval_stats 的輸出
+        warmup_seconds: 開頭要捨棄的秒數
+        cooldown_seconds: 結尾要捨棄的秒數
+
+    Returns:
+        穩態區間內的樣本列表
+    """
+    if not samples:
+        return []
+
+    seconds = [s.get('seconds', i + 1) for i, s in enumerate(samples)]
+    first = seconds[0]
+    last = seconds[-1]
+
+    return [
+        sample for sample, sec in zip(samples, seconds)
+        if sec - first >= warmup_seconds and last - sec >= cooldown_seconds
+    ]
+
+
+def steady_window_stats(
+    samples: List[Dict], warmup_seconds: int = 0, cooldown_seconds: int = 0,
+    metrics: Optional[List[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    """計算穩態區間內每個指標的統計值
+
+    Args:
+        samples: parse_interval_stats 的輸出
+        warmup_seconds: 開頭要捨棄的秒數
+        cooldown_seconds: 結尾要捨棄的秒數
+        metrics: 要計算的指標名稱，若為 None 則計算所有數值指標
+
+    Returns:
+        {metric: {'mean', 'p50', 'p99', 'min', 'max', 'stddev', 'samples'}}
+    """
+    window = trim_samples(samples, warmup_seconds, cooldown_seconds)
+    if not window:
+        return {}
+
+    if metrics is None:
+        metrics = []
+        for sample in window:
+            for key in sample:
+                if key != 'seconds' and key not in metrics:
+                    metrics.append(key)
+
+    result = {}
+    for metric in metrics:
+        values = sorted(s[metric] for s in window if isinstance(s.get(metric), (int, float)))
+        if not values:
+            continue
+
+        n = len(values)
+        mean = sum(values) / n
+        variance = sum((v - mean) ** 2 for v in values) / n
+
+        result[metric] = {
+            'mean': round(mean, 3),
+            'p50': round(_percentile(values, 50), 3),
+            'p99': round(_percentile(values, 99), 3),
+            'min': values[0],
+            'max': values[-1],
+            'stddev': round(math.sqrt(variance), 3),
+            'samples': n,
+        }
+
+    return result
+
+
+def nic_error_events(samples: List[Dict], counters: Iterable[str] = NIC_ERROR_COUNTERS) -> List[Dict]:
+    """找出 DPDK port 錯誤計數大於 0 的連續區間
+
+    Args:
+        samples: parse_interval_stats 的輸出
+        counters: 要檢查的計數名稱，dperf 沒有輸出的計數略過
+
+    Returns:
+        [{'counter', 'first_second', 'last_second', 'seconds', 'total', 'max'}]，依計數名稱與時間排序
+    """
+    events = []
+    for counter in counters:
+        current = None
+        for i, sample in enumerate(samples):
+            value = sample.get(counter)
+            if not isinstance(value, (int, float)) or value <= 0:
+                current = None
+                continue
+            second = sample.get('seconds', i + 1)
+            if current is None:
+                current = {'counter': counter, 'first_second': second, 'last_second': second,
+                           'seconds': 0, 'total': 0, 'max': 0}
+                events.append(current)
+            current['last_second'] = second
+            current['seconds'] += 1
+            current['total'] += value
+            current['max'] = max(current['max'], value)
+    return events
+
+
+def summarize_nic_events(events: List[Dict]) -> Dict[str, float]:
+    """將 nic_error_events 的結果彙整為 {'imissed.error_seconds': 值, 'imissed.total': 值, ...}"""
+    summary: Dict[str, float] = {}
+    for event in events:
+        counter = event['counter']
+        summary[f"{counter}.error_seconds"] = summary.get(f"{counter}.error_seconds", 0) + event['seconds']
+        summary[f"{counter}.total"] = summary.get(f"{counter}.total", 0) + event['total']
+        summary.setdefault(f"{counter}.first_second", event['first_second'])
+    return summary
+
+
+def flatten_steady_stats(stats: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """將穩態統計攤平成 {'pktRx.mean': 值, ...}，方便寫入 CSV 與 Redis"""
+    flat = {}
+    for metric, values in stats.items():
+        for stat_name, value in values.items():
+            flat[f"{metric}.{stat_name}"] = value
+    return flat
+
+
+def _to_float_array(values: List[str]) -> np.ndarray:
+    """將已去除千分位逗號的數字字串批次轉為 float64 陣列"""
+    if not values:
+        return np.empty(0, dtype=np.float64)
+    return np.array(values, dtype=np.float64)
+
+
+def _scatter(keys: List[str], rows: np.ndarray, values: np.ndarray, n_rows: int) -> Dict[str, np.ndarray]:
+    """依 (row, key) 將數值散佈到每個 metric 一條的陣列，缺值為 NaN；同一 row 重複的 key 保留第一個"""
+    if not keys:
+        return {}
+
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.int64, count=len(keys))
+
+    # 同一格只保留第一次出現的值
+    _, first = np.unique(codes * n_rows + rows, return_index=True)
+    table = np.full((len(index), n_rows), np.nan)
+    table[codes[first], rows[first]] = values[first]
+
+    return {name: table[code] for name, code in index.items()}
+
+
+def parse_stat_blocks(log: str) -> Dict[str, np.ndarray]:
+    """以編譯好的正規表示式一次解析所有每秒統計區塊
+
+    與 parse_interval_stats 相同的數據，但以 {metric: ndarray} 形式返回，
+    每個陣列的第 i 個元素對應第 i 個 "seconds" 區塊，缺值為 NaN。
+
+    Args:
+        log: dperf 的完整輸出
+
+    Returns:
+        {metric: np.ndarray}
+    """
+    pairs = _stat_pairs(log)
+    if not pairs:
+        return {}
+    keys, values = map(list, zip(*pairs))
+    if 'seconds' not in keys:
+        return {}
+
+    # 第一個 seconds 之前的內容捨棄
+    first = keys.index('seconds')
+    keys = keys[first:]
+    values = _to_float_array(values[first:])
+
+    # 常見情況：每個區塊的 key 順序相同，可直接 reshape 成 (區塊數, key 數)
+    width = keys.index('seconds', 1) if keys.count('seconds') > 1 else len(keys)
+    n_rows, remainder = divmod(len(keys), width)
+    schema = keys[:width]
+    if remainder == 0 and len(set(schema)) == width and keys == schema * n_rows:
+        table = values.reshape(n_rows, width)
+        return {name: table[:, i] for i, name in enumerate(schema)}
+
+    rows = np.cumsum(np.fromiter((k == 'seconds' for k in keys), dtype=bool, count=len(keys))) - 1
+    return _scatter(keys, rows, values, int(rows[-1]) + 1)
+
+
+def parse_total_logs(logs: Iterable[str]) -> Dict[str, np.ndarray]:
+    """批次解析多份 dperf log 的 "Total Numbers" 區塊
+
+    "Total Numbers" 在 log 結尾，由後往前尋找，不掃描每秒統計；所有 log 的區塊串接後
+    只以正規表示式掃描一次，再一次散佈成每個 metric 一條陣列，適合離線重新處理大量歷史 log。
+
+    Args:
+        logs: dperf 輸出字串的可迭代物件
+
+    Returns:
+        {metric: np.ndarray}，第 i 個元素對應第 i 份 log，未完成或缺值為 NaN
+    """
+    blocks = []
+    rows = []
+    n_logs = 0
+
+    for row, log in enumerate(logs):
+        n_logs = row + 1
+        index = log.rfind("Total Numbers")
+        if index == -1 or log.rfind("dperf Test Finished", 0, index) == -1:
+            continue
+        blocks.append(_clean(log[index + len("Total Numbers"):]))
+        rows.append(row)
+
+    if not blocks:
+        return {}
+
+    # 各 log 的區塊串接後一次掃描，再以每個 key 的位置與區塊起點還原所屬的 log
+    text = "\n".join(blocks)
+    starts = np.cumsum([0] + [len(block) + 1 for block in blocks[:-1]])
+    matches = list(_KEY_VALUE.finditer(text))
+    if not matches:
+        return {}
+
+    keys = [m.group(1) for m in matches]
+    values = _to_float_array([m.group(2) for m in matches])
+    positions = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    row_index = np.asarray(rows, dtype=np.int64)[np.searchsorted(starts, positions, side='right') - 1]
+    return _scatter(keys, row_index, values, n_logs)
+
+
+def parse_log_files(paths: Iterable[str]) -> Dict[str, np.ndarray]:
+    """讀取多個 log 檔並批次解析 "Total Numbers" 區塊
+
+    Args:
+        paths: log 檔路徑
+
+    Returns:
+        {metric: np.ndarray}，順序與 paths 相同
+    """
+    def _read(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+    return parse_total_logs(_read(path) for path in paths)
@@ -1,10 +1,14 @@
 import argparse
+import sys
 import paramiko
 from ssh_executor import SSHExecutor
 from dperfSetup import dperf
 from config import Config
 from APVSetup import APVSetup
 from trafficGenerator import TrafficGenerator
+from sqlite_storage import open_storage_handler
+from regression import check_regression
+from retention import RetentionCompactor
 
 def parse_arguments():
     """解析命令列參數"""
@@ -67,6 +71,12 @@ def parse_arguments():
         default='./logs',
         help='指定日誌檔案資料夾 (預設: ./log)'
     )
+
+    parser.add_argument(
+        '--check-regression',
+        action='store_true',
+        help='測試結束後與相同配置的歷史結果比較，偵測到回歸時以 exit code 1、無法連接儲存後端時以 2 結束'
+    )
     return parser.parse_args()
 
 def argOverrideConfig(args, config):
@@ -124,6 +134,26 @@ def main():
         for pair_name, pair_result in results.items():
             if pair_name == 'monitor_data':
                 print(f"\n監控數據筆數: {len(pair_result)}")
+            elif pair_name == 'apv_data':
+                print(f"\nAPV 統計筆數: {len(pair_result)}")
+                if pair_result:
+                    for name, value in sorted(pair_result[-1]['metrics'].items()):
+                        print(f"  {name}: {value}")
+            elif pair_name == 'core_report':
+                saturated = [entry for entry in pair_result if entry['saturated']]
+                print(f"\nWorker 核心: {len(pair_result)} 個，飽和: {len(saturated)} 個")
+                for entry in saturated:
+                    print(f"  Pair {entry['pair_index']} {entry['role']} 核心 {entry['core']}: "
+                          f"最高 {entry['max_usage']}%，飽和 {entry['saturated_samples']}/{entry['samples']} 次取樣")
+            elif pair_name == 'depletion_events':
+                print(f"\n耗盡事件: {len(pair_result)} 個")
+                for event in pair_result:
+                    if event['type'] == 'hugepage_depleted':
+                        print(f"  NUMA 節點 {event['node']} {event['page_size_kb']}kB hugepages 耗盡: "
+                              f"{event['start']} ~ {event['end'] or '測試結束'}")
+                    else:
+                        print(f"  Pair {event['pair_index']} {event['role']} {event['counter']}: "
+                              f"第 {event['first_second']}-{event['last_second']} 秒，共 {event['total']}")
             else:
                 print(f"\n{pair_name}:")
                 print(f"  Server: {pair_result.get('server')}")
@@ -135,6 +165,24 @@ def main():
         apv.clearEnv()
         apv.disconnect()
 
+    # 依保留政策降採樣舊的監控數據
+    storage = config.test.storage
+    if storage.retention.enable:
+        storage_handler = open_storage_handler(storage.backend, sqlite_path=storage.sqlite_path)
+        try:
+            RetentionCompactor(storage_handler, storage.retention).run_once()
+        finally:
+            storage_handler.close()
+
+    if args.check_regression:
+        redis_handler = open_storage_handler(storage.backend, sqlite_path=storage.sqlite_path)
+        try:
+            exit_code = check_regression(config, redis_handler)
+        finally:
+            redis_handler.close()
+        if exit_code:
+            sys.exit(exit_code)
+
 
 if __name__ == "__main__":
     main()
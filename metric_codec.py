@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+測試指標的二進位編碼 - 以 schema id + 固定寬度 struct 儲存 metrics / steady，
+讀取時直接還原為 int / float，或一次把多筆結果解碼成 NumPy 陣列。
+
+編碼格式：
+- header: magic b'MC'、版本 (uint8)、schema id (uint32)
+- 數值欄位：依 schema 順序的 int64 / float64（固定寬度，可用 np.frombuffer 批次解碼）
+- 字串欄位：依 schema 順序，每個為 uint16 長度 + UTF-8 內容
+
+schema（欄位名稱與型別）由內容決定 schema id，同一組欄位的每次測試共用同一個 schema，
+schema 定義只需由儲存後端保存一次。
+"""
+
+import json
+import struct
+import zlib
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+MAGIC = b'MC'
+VERSION = 1
+HEADER = struct.Struct('<2sBI')
+_STRING_LENGTH = struct.Struct('<H')
+# 字串長度以 uint16 儲存，超過時截斷
+_MAX_STRING_BYTES = 0xFFFF
+
+# 欄位型別：i = int64、f = float64、s = 字串
+_NUMERIC_FORMATS = {'i': 'q', 'f': 'd'}
+_NUMERIC_DTYPES = {'i': '<i8', 'f': '<f8'}
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+@dataclass(frozen=True)
+class MetricSchema:
+    """一組指標的欄位名稱與型別"""
+    names: Tuple[str, ...]
+    kinds: Tuple[str, ...]
+    schema_id: int = field(init=False, compare=False)
+    numeric: Tuple[int, ...] = field(init=False, compare=False, repr=False)
+    strings: Tuple[int, ...] = field(init=False, compare=False, repr=False)
+    record: struct.Struct = field(init=False, compare=False, repr=False)
+    dtype: np.dtype = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        numeric = tuple(i for i, kind in enumerate(self.kinds) if kind in _NUMERIC_FORMATS)
+        strings = tuple(i for i, kind in enumerate(self.kinds) if kind == 's')
+        object.__setattr__(self, 'schema_id', zlib.crc32(self.to_json().encode('utf-8')))
+        object.__setattr__(self, 'numeric', numeric)
+        object.__setattr__(self, 'strings', strings)
+        object.__setattr__(self, 'record', struct.Struct(
+            '<' + ''.join(_NUMERIC_FORMATS[self.kinds[i]] for i in numeric)
+        ))
+        object.__setattr__(self, 'dtype', np.dtype(
+            [(self.names[i], _NUMERIC_DTYPES[self.kinds[i]]) for i in numeric]
+        ))
+
+    def to_json(self) -> str:
+        """schema 定義的 JSON 字串（由儲存後端保存）"""
+        return json.dumps([list(self.names), list(self.kinds)], separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text: str) -> "MetricSchema":
+        """由 to_json() 的內容還原 schema"""
+        names, kinds = json.loads(text)
+        return cls(tuple(names), tuple(kinds))
+
+
+# 已知的 schema（schema id 由內容決定，可在所有 handler 間共用）
+_schemas: Dict[int, MetricSchema] = {}
+_schemas_lock = Lock()
+
+
+def register_schema(schema: MetricSchema) -> MetricSchema:
+    """登錄 schema，返回已登錄的實例"""
+    with _schemas_lock:
+        return _schemas.setdefault(schema.schema_id, schema)
+
+
+def get_schema(schema_id: int) -> Optional[MetricSchema]:
+    """依 schema id 取得已登錄的 schema，未登錄時返回 None"""
+    return _schemas.get(schema_id)
+
+
+def _kind(value: Any) -> str:
+    """判斷單一數值的欄位型別"""
+    if isinstance(value, (bool, np.bool_)):
+        return 'i'
+    if isinstance(value, (int, np.integer)):
+        return 'i' if _INT64_MIN <= int(value) <= _INT64_MAX else 's'
+    if isinstance(value, (float, np.floating)):
+        return 'f'
+    return 's'
+
+
+def schema_for(values: Dict[str, Any]) -> MetricSchema:
+    """依數值的型別建立（並登錄）schema"""
+    names = tuple(values)
+    return register_schema(MetricSchema(names, tuple(_kind(values[name]) for name in names)))
+
+
+def encode(values: Dict[str, Any]) -> Tuple[bytes, MetricSchema]:
+    """將指標字典編碼為二進位
+
+    Args:
+        values: {指標名稱: 數值}，int / float 以數值儲存，其他型別以字串儲存
+
+    Returns:
+        (編碼後的 bytes, 使用的 schema)
+    """
+    schema = schema_for(values)
+    items = list(values.values())
+    parts = [
+        HEADER.pack(MAGIC, VERSION, schema.schema_id),
+        schema.record.pack(*(
+            int(items[i]) if schema.kinds[i] == 'i' else float(items[i]) for i in schema.numeric
+        )),
+    ]
+    for i in schema.strings:
+        text = str(items[i]).encode('utf-8')
+        if len(text) > _MAX_STRING_BYTES:
+            # 在字元邊界截斷，避免切開多位元組的 UTF-8 字元導致解碼失敗
+            text = text[:_MAX_STRING_BYTES].decode('utf-8', errors='ignore').encode('utf-8')
+        parts.append(_STRING_LENGTH.pack(len(text)))
+        parts.append(text)
+    return b''.join(parts), schema
+
+
+def schema_id_of(blob: bytes) -> int:
+    """讀取編碼內容的 schema id
+
+    Raises:
+        ValueError: 不是本模組的編碼格式
+    """
+    magic, version, schema_id = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("不支援的指標編碼格式")
+    return schema_id
+
+
+def decode(blob: bytes, schema: MetricSchema) -> Dict[str, Any]:
+    """將二進位內容還原為 {指標名稱: int / float / str}"""
+    offset = HEADER.size
+    numbers = schema.record.unpack_from(blob, offset)
+    offset += schema.record.size
+
+    result: List[Any] = [None] * len(schema.names)
+    for i, value in zip(schema.numeric, numbers):
+        result[i] = value
+    for i in schema.strings:
+        (length,) = _STRING_LENGTH.unpack_from(blob, offset)
+        offset += _STRING_LENGTH.size
+        result[i] = blob[offset:offset + length].decode('utf-8')
+        offset += length
+    return dict(zip(schema.names, result))
+
+
+def decode_numeric(blobs: Iterable[bytes], schema: MetricSchema) -> np.ndarray:
+    """將多筆相同 schema 的編碼內容一次解碼為結構化陣列（只含數值欄位）"""
+    start, end = HEADER.size, HEADER.size + schema.record.size
+    return np.frombuffer(b''.join(blob[start:end] for blob in blobs), dtype=schema.dtype)
+
+
+def decode_arrays(
+    blobs: List[bytes], load_schema: Callable[[int], MetricSchema]
+) -> Dict[str, np.ndarray]:
+    """將多筆編碼內容解碼為 {指標名稱: np.ndarray}（只含數值欄位）
+
+    相同 schema 的內容以 decode_numeric 一次解碼；若 schema 不只一種，
+    各欄位轉為 float64，缺少該欄位的列為 NaN。
+
+    Args:
+        blobs: 編碼內容列表
+        load_schema: 依 schema id 取得 schema 的函式
+
+    Returns:
+        {指標名稱: np.ndarray}，順序與 blobs 相同
+    """
+    groups: Dict[int, List[int]] = {}
+    for row, blob in enumerate(blobs):
+        groups.setdefault(schema_id_of(blob), []).append(row)
+
+    columns: Dict[str, np.ndarray] = {}
+    for schema_id, rows in groups.items():
+        values = decode_numeric([blobs[row] for row in rows], load_schema(schema_id))
+        for name in values.dtype.names:
+            if len(groups) == 1:
+                columns[name] = values[name]
+                continue
+            if name not in columns:
+                columns[name] = np.full(len(blobs), np.nan)
+            columns[name][rows] = values[name]
+    return columns
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics 匯出 - 在控制端行程內提供 HTTP 端點，讓 Prometheus / Grafana 即時繪製測試狀態。
+
+各元件（SystemMonitor、APVMonitor、dperf、WriteBehindQueue）在取得新數據時更新 MetricsRegistry，
+每次更新只重新格式化該筆 series 的文字；scrape 時只串接已格式化的文字，不重新計算任何指標。
+
+提供的指標：
+- 測試階段（stateset）：array_script_run_phase、array_script_pair_phase
+- 主機監控：CPU / RAM、每核心 CPU、各 NUMA 節點的 hugepages、各 pair dperf 行程的 CPU / RSS / hugepage
+- dperf 每秒統計：array_script_dperf_stat{pair, role, metric}
+- APV 統計：array_script_apv_stat{metric}
+- 延遲（summary）：SSH 取樣指令、儲存後端批次寫入
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+RUN_PHASES = ('idle', 'setup', 'running', 'stopping')
+PAIR_PHASES = ('idle', 'starting', 'warmup', 'steady', 'finished', 'failed')
+
+# 指標名稱 -> (類型, 說明)
+METRICS = {
+    'array_script_run_phase': ('stateset', 'Current phase of the traffic generator run'),
+    'array_script_pair_phase': ('stateset', 'Current phase of each dperf pair and role'),
+    'array_script_host_cpu_usage_percent': ('gauge', 'Traffic generator host CPU usage'),
+    'array_script_host_ram_used_megabytes': ('gauge', 'Traffic generator host memory in use'),
+    'array_script_host_ram_usage_percent': ('gauge', 'Traffic generator host memory usage'),
+    'array_script_core_cpu_usage_percent': ('gauge', 'Per-core CPU usage on the traffic generator host'),
+    'array_script_hugepages_total': ('gauge', 'Configured hugepages per NUMA node and page size'),
+    'array_script_hugepages_free': ('gauge', 'Free hugepages per NUMA node and page size'),
+    'array_script_dperf_process_cpu_usage_percent': ('gauge', 'dperf process CPU usage (100 = one core)'),
+    'array_script_dperf_process_cpu_time_seconds': ('gauge', 'Cumulative CPU time of the dperf processes'),
+    'array_script_dperf_process_rss_megabytes': ('gauge', 'Resident memory of the dperf processes'),
+    'array_script_dperf_process_hugetlb_megabytes': ('gauge', 'Hugepage memory of the dperf processes'),
+    'array_script_dperf_seconds': ('gauge', 'Last per-second block reported by dperf'),
+    'array_script_dperf_stat': ('gauge', 'Latest dperf per-second statistic'),
+    'array_script_apv_stat': ('gauge', 'Latest APV CLI statistic'),
+    'array_script_ssh_command_latency_seconds': ('summary', 'Round-trip time of monitoring SSH commands'),
+    'array_script_storage_write_latency_seconds': ('summary', 'Duration of storage backend batch writes'),
+}
+
+
+def _escape(value) -> str:
+    """跳脫標籤值中的反斜線、雙引號與換行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value: Union[int, float]) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class MetricsRegistry:
+    """以增量方式更新並保存已格式化的 OpenMetrics series（執行緒安全）"""
+
+    def __init__(self, metrics: Optional[Dict[str, Tuple[str, str]]] = None):
+        """
+        Args:
+            metrics: {指標名稱: (類型, 說明)}，預設為 METRICS
+        """
+        self.metrics = dict(METRICS if metrics is None else metrics)
+        self._lock = Lock()
+        # 指標名稱 -> {標籤: 已格式化的 series 文字}，依第一次更新的順序輸出
+        self._series: Dict[str, Dict[Tuple, str]] = {name: {} for name in self.metrics}
+        # summary 的累計 (count, sum)
+        self._summaries: Dict[Tuple[str, Tuple], Tuple[int, float]] = {}
+
+    def _check(self, name: str, metric_type: str) -> None:
+        if self.metrics.get(name, (None,))[0] != metric_type:
+            raise ValueError(f"未定義的 {metric_type} 指標: {name}")
+
+    def set(self, name: str, value: Union[int, float], **labels) -> None:
+        """設定 gauge 的值"""
+        self._check(name, 'gauge')
+        line = f"{name}{_labels(labels)} {_number(value)}\n"
+        with self._lock:
+            self._series[name][tuple(labels.items())] = line
+
+    def set_many(self, name: str, values: Dict[str, Union[int, float]], key: str, **labels) -> None:
+        """一次設定多個 gauge（values 的鍵作為 key 標籤的值），只取得一次鎖"""
+        self._check(name, 'gauge')
+        lines = {}
+        for label, value in values.items():
+            series_labels = dict(labels, **{key: label})
+            lines[tuple(series_labels.items())] = f"{name}{_labels(series_labels)} {_number(value)}\n"
+        with self._lock:
+            self._series[name].update(lines)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """在 summary 中記錄一次觀測值（累計 count 與 sum）"""
+        self._check(name, 'summary')
+        key = tuple(labels.items())
+        with self._lock:
+            count, total = self._summaries.get((name, key), (0, 0.0))
+            count, total = count + 1, total + value
+            self._summaries[(name, key)] = (count, total)
+            label_text = _labels(labels)
+            self._series[name][key] = f"{name}_count{label_text} {count}\n{name}_sum{label_text} {total!r}\n"
+
+    def set_state(self, name: str, state: str, states: Iterable[str], **labels) -> None:
+        """設定 stateset 目前的狀態（其餘狀態為 0）
+
+        Raises:
+            ValueError: state 不在 states 中
+        """
+        self._check(name, 'stateset')
+        states = tuple(states)
+        if state not in states:
+            raise ValueError(f"未定義的狀態: {state}")
+        text = ''.join(
+            f"{name}{_labels(dict(labels, **{name: s}))} {int(s == state)}\n" for s in states
+        )
+        with self._lock:
+            self._series[name][tuple(labels.items())] = text
+
+    def render(self) -> bytes:
+        """輸出 OpenMetrics 文字格式（只串接已格式化的 series）"""
+        with self._lock:
+            parts = []
+            for name, series in self._series.items():
+                if not series:
+                    continue
+                metric_type, help_text = self.metrics[name]
+                parts.append(f"# TYPE {name} {metric_type}\n# HELP {name} {help_text}\n")
+                parts.extend(series.values())
+        parts.append("# EOF\n")
+        return ''.join(parts).encode('utf-8')
+
+
+class MetricsExporter:
+    """在背景執行緒提供 GET /metrics 的 HTTP 伺服器"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        """
+        Args:
+            registry: 要輸出的 MetricsRegistry
+            host: 監聽位址
+            port: 監聽埠號（0 表示由系統分配，實際埠號見 port 屬性）
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> "MetricsExporter":
+        """開始監聽"""
+        if self._server:
+            return self
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render()
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scrape 不寫入主控台
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = Thread(target=self._server.serve_forever, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        print(f"[MetricsExporter] OpenMetrics 端點: http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self) -> None:
+        """停止監聽"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+有上限的監控數據緩衝區 - 以固定容量的 NumPy 陣列（struct-of-arrays）保存 SystemMonitor 的取樣。
+
+每一列是一個區間的彙總：count 為涵蓋的原始樣本數，cpu_usage / ram_used / ram_usage
+保存 min/avg/max（與 RedisDB.ROLLUP_DTYPE 相同的合併規則，avg 依 count 加權）。
+原始樣本的 count 為 1；緩衝區滿時把較舊的一半相鄰兩列合併為一列，
+最近的數據保持原始解析度，越舊的數據解析度越粗，記憶體用量固定。
+"""
+
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# 保存 min/avg/max 的欄位
+AGGREGATE_FIELDS = ('cpu_usage', 'ram_used', 'ram_usage')
+AGGREGATE_STATS = ('min', 'avg', 'max')
+
+# 欄位名稱 -> dtype
+COLUMNS = {
+    'timestamp': np.float64,   # 區間第一筆樣本的 epoch 秒數
+    'monotonic': np.float64,   # 區間第一筆樣本的 time.monotonic()
+    'count': np.uint32,
+    'ram_total': np.uint32,    # 區間最後一筆樣本的 RAM 總量 (MB)
+    **{f"{name}_{stat}": np.float32 for name in AGGREGATE_FIELDS for stat in AGGREGATE_STATS},
+}
+
+
+class MonitorBuffer:
+    """固定容量的監控數據緩衝區（執行緒安全）"""
+
+    def __init__(self, capacity: int = 65536):
+        """初始化緩衝區
+
+        Args:
+            capacity: 最多保存的列數（至少 4）
+
+        Raises:
+            ValueError: 容量小於 4
+        """
+        if capacity < 4:
+            raise ValueError(f"緩衝區容量至少為 4: {capacity}")
+        self.capacity = capacity
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        # 每核心使用率的平均值（列 x 核心編號），沒有數據為 NaN；核心數在第一次取樣時決定
+        self._cores = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self._size = 0
+        # 累計寫入的原始樣本數與降採樣次數
+        self.samples = 0
+        self.compactions = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        """清除所有數據（保留已配置的陣列）"""
+        with self._lock:
+            self._size = 0
+            self.samples = 0
+            self.compactions = 0
+            self._cores[:] = np.nan
+
+    def append(self, timestamp: float, monotonic: float, cpu_usage: float, ram_used: int, ram_total: int,
+               ram_usage: float, core_usage: Optional[Dict[int, float]] = None) -> None:
+        """加入一筆原始樣本，緩衝區已滿時先將較舊的一半降採樣
+
+        Args:
+            timestamp: 取樣時間（epoch 秒數）
+            monotonic: 取樣時的 time.monotonic()
+            cpu_usage: CPU 使用率 (%)
+            ram_used: RAM 已使用量 (MB)
+            ram_total: RAM 總量 (MB)
+            ram_usage: RAM 使用率 (%)
+            core_usage: {核心編號: 使用率 %}
+        """
+        with self._lock:
+            if self._size == self.capacity:
+                self._compact()
+            row = self._size
+            columns = self._columns
+            columns['timestamp'][row] = timestamp
+            columns['monotonic'][row] = monotonic
+            columns['count'][row] = 1
+            columns['ram_total'][row] = ram_total
+            for name, value in (('cpu_usage', cpu_usage), ('ram_used', ram_used), ('ram_usage', ram_usage)):
+                for stat in AGGREGATE_STATS:
+                    columns[f"{name}_{stat}"][row] = value
+            if core_usage:
+                self._ensure_cores(max(core_usage) + 1)
+                self._cores[row] = np.nan
+                self._cores[row, list(core_usage)] = list(core_usage.values())
+            elif self._cores.shape[1]:
+                self._cores[row] = np.nan
+            self._size += 1
+            self.samples += 1
+
+    def _ensure_cores(self, count: int) -> None:
+        """擴充每核心陣列的欄數"""
+        if count <= self._cores.shape[1]:
+            return
+        cores = np.full((self.capacity, count), np.nan, dtype=np.float32)
+        cores[:, :self._cores.shape[1]] = self._cores
+        self._cores = cores
+
+    def _compact(self) -> None:
+        """將較舊的一半相鄰兩列合併為一列（min 取最小、max 取最大、avg 依 count 加權）"""
+        half = (self._size // 2) & ~1
+        first, second = slice(0, half, 2), slice(1, half, 2)
+        merged = half // 2
+        columns = self._columns
+
+        count_a = columns['count'][first].astype(np.float64)
+        count_b = columns['count'][second].astype(np.float64)
+        total = count_a + count_b
+        for name in AGGREGATE_FIELDS:
+            low, avg, high = (columns[f"{name}_{stat}"] for stat in AGGREGATE_STATS)
+            low[:merged] = np.minimum(low[first], low[second])
+            high[:merged] = np.maximum(high[first], high[second])
+            avg[:merged] = (avg[first] * count_a + avg[second] * count_b) / total
+        if self._cores.shape[1]:
+            cores_a, cores_b = self._cores[first], self._cores[second]
+            weight_a = np.where(np.isnan(cores_a), 0.0, count_a[:, None])
+            weight_b = np.where(np.isnan(cores_b), 0.0, count_b[:, None])
+            weight = weight_a + weight_b
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cores = (np.nan_to_num(cores_a) * weight_a + np.nan_to_num(cores_b) * weight_b) / weight
+            self._cores[:merged] = np.where(weight > 0, cores, np.nan)
+        columns['timestamp'][:merged] = columns['timestamp'][first]
+        columns['monotonic'][:merged] = columns['monotonic'][first]
+        columns['ram_total'][:merged] = columns['ram_total'][second]
+        columns['count'][:merged] = total
+
+        # 較新的一半往前移，保持原始解析度
+        remaining = self._size - half
+        for values in columns.values():
+            values[merged:merged + remaining] = values[half:self._size]
+        self._cores[merged:merged + remaining] = self._cores[half:self._size]
+        self._size = merged + remaining
+        self.compactions += 1
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """以 NumPy 視圖取得目前的數據（不複製）
+
+        視圖為唯讀，指向緩衝區內部陣列，之後的寫入與降採樣會改變其內容；
+        需要保存當下的數據時請自行 copy()。
+
+        Returns:
+            {欄位名稱: np.ndarray}，欄位見 COLUMNS；另有 'core_usage'（列 x 核心編號，沒有數據為 NaN）
+        """
+        with self._lock:
+            views = {name: values[:self._size] for name, values in self._columns.items()}
+            views['core_usage'] = self._cores[:self._size]
+        for view in views.values():
+            view.flags.writeable = False
+        return views
+
+    def to_records(self) -> List[Dict]:
+        """複製為字典列表（每列一筆），供需要逐筆處理的呼叫端使用
+
+        Returns:
+            List[Dict]: 每筆包含 timestamp (epoch)、monotonic、count、cpu_usage / ram_used / ram_usage
+                （區間平均）、其 _min / _max、ram_total 與 core_usage（{核心編號: 使用率}）
+        """
+        with self._lock:
+            columns = {name: values[:self._size].tolist() for name, values in self._columns.items()}
+            cores = self._cores[:self._size]
+            core_rows = [
+                {int(core): round(float(row[core]), 2) for core in np.flatnonzero(~np.isnan(row))}
+                for row in cores
+            ]
+
+        records = []
+        for row in range(len(core_rows)):
+            record = {
+                'timestamp': columns['timestamp'][row],
+                'monotonic': columns['monotonic'][row],
+                'count': columns['count'][row],
+            }
+            for name in AGGREGATE_FIELDS:
+                for stat, key in (('avg', name), ('min', f"{name}_min"), ('max', f"{name}_max")):
+                    value = columns[f"{name}_{stat}"][row]
+                    record[key] = int(round(value)) if name == 'ram_used' else round(value, 2)
+            record['ram_total'] = columns['ram_total'][row]
+            record['core_usage'] = core_rows[row]
+            records.append(record)
+        return records
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+監控數據輸出 (sink) - SystemMonitor 在整個監控期間保持同一個有緩衝的檔案 handle，
+依大小或時間政策 flush，停止時 fsync，取樣頻率提高時不會因每筆開檔/關檔而增加檔案系統負擔。
+
+支援的格式：
+- csv：監控 CSV、每核心 *_cores.csv、各 pair dperf 行程的 *_processes.csv 與各 NUMA 節點的 *_hugepages.csv
+- jsonl：每筆取樣一行 JSON（含 core_usage、process_usage 與 hugepages）
+- binary：二進位紀錄（固定寬度欄位 + 每核心使用率），以 read_binary_samples() 讀回；
+  dperf 行程數據不在此格式中，可由儲存後端的 get_process_data() 取得，hugepages 亦不包含
+"""
+
+import csv
+import json
+import os
+import struct
+import time
+from typing import Dict, IO, List, Optional, Tuple
+
+import numpy as np
+
+
+SINK_FORMATS = ('csv', 'jsonl', 'binary')
+SINK_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'binary': '.bin'}
+
+# 二進位格式：檔頭 magic + 版本，之後每筆為
+# epoch (float64)、monotonic (float64)、cpu_usage (float32)、ram_used (uint32)、ram_total (uint32)、
+# ram_usage (float32)、核心數 (uint16)，接著 核心數 x (核心編號 uint16、使用率 float32)
+BINARY_MAGIC = b'MS'
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct('<2sB')
+_BINARY_RECORD = struct.Struct('<ddfIIfH')
+_BINARY_CORE = struct.Struct('<Hf')
+BINARY_DTYPE = np.dtype([
+    ('timestamp', '<f8'), ('monotonic', '<f8'), ('cpu_usage', '<f4'), ('ram_used', '<u4'),
+    ('ram_total', '<u4'), ('ram_usage', '<f4'),
+])
+
+
+class MonitorSink:
+    """監控數據輸出的基底類別：保持開啟的檔案 handle，依政策 flush，close() 時 fsync"""
+
+    def __init__(self, path: str, flush_bytes: int = 65536, flush_interval: float = 5.0,
+                 worker_cores: Optional[Dict[int, Tuple[int, str]]] = None):
+        """
+        Args:
+            path: 輸出檔案路徑
+            flush_bytes: 檔案緩衝區大小，累積超過此大小時寫出
+            flush_interval: 距離上次 flush 超過此秒數時寫出（0 表示每筆都寫出）
+            worker_cores: {核心編號: (pair 索引, 角色)}，用於標記每核心數據
+        """
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.worker_cores = worker_cores or {}
+        self._files: List[IO] = []
+        self._last_flush = time.monotonic()
+
+    def _open(self, path: str, binary: bool = False) -> IO:
+        """以 flush_bytes 大小的緩衝區開啟檔案（覆寫），close() 時一併關閉"""
+        if binary:
+            f = open(path, 'wb', buffering=self.flush_bytes)
+        else:
+            f = open(path, 'w', newline='', buffering=self.flush_bytes)
+        self._files.append(f)
+        return f
+
+    def write(self, record: Dict) -> None:
+        """寫入一筆取樣，距離上次 flush 超過 flush_interval 時寫出
+
+        Args:
+            record: 包含 timestamp（字串）、epoch、monotonic、cpu_usage、ram_used、ram_total、
+                ram_usage、core_usage（{核心編號: 使用率}）、process_usage
+                （{(pair 索引, 角色): 行程資源}，可省略）與 hugepages（{(節點, 頁大小 kB): {'total', 'free'}}，可省略）
+        """
+        self._write(record)
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+            self._last_flush = now
+
+    def _write(self, record: Dict) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """將緩衝區寫出到作業系統"""
+        for f in self._files:
+            f.flush()
+
+    def close(self) -> None:
+        """寫出緩衝區、fsync 並關閉檔案"""
+        for f in self._files:
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+        self._files = []
+
+
+class CsvSink(MonitorSink):
+    """監控 CSV、每核心 *_cores.csv、dperf 行程 *_processes.csv 與 hugepages *_hugepages.csv"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._writer = csv.writer(self._open(path))
+        self._writer.writerow(['Timestamp', 'CPU_Usage_Percent', 'RAM_Used_MB', 'RAM_Total_MB',
+                               'RAM_Usage_Percent', 'Epoch', 'Monotonic'])
+        self.cores_path = f"{os.path.splitext(path)[0]}_cores.csv"
+        self._cores_writer = csv.writer(self._open(self.cores_path))
+        self._cores_writer.writerow(['Timestamp', 'Core', 'Pair', 'Role', 'CPU_Usage_Percent'])
+        self.processes_path = f"{os.path.splitext(path)[0]}_processes.csv"
+        self._processes_writer = csv.writer(self._open(self.processes_path))
+        self._processes_writer.writerow(['Timestamp', 'Pair', 'Role', 'PIDs', 'CPU_Usage_Percent',
+                                         'CPU_Time_Seconds', 'RSS_MB', 'Hugetlb_MB'])
+        self.hugepages_path = f"{os.path.splitext(path)[0]}_hugepages.csv"
+        self._hugepages_writer = csv.writer(self._open(self.hugepages_path))
+        self._hugepages_writer.writerow(['Timestamp', 'Node', 'Page_Size_kB', 'Total', 'Free', 'Used'])
+
+    def _write(self, record: Dict) -> None:
+        timestamp = record['timestamp']
+        self._writer.writerow([
+            timestamp,
+            round(record['cpu_usage'], 2),
+            record['ram_used'],
+            record['ram_total'],
+            round(record['ram_usage'], 2),
+            f"{record['epoch']:.6f}",
+            f"{record['monotonic']:.6f}",
+        ])
+        # 每個核心一列，dperf worker 核心標記所屬 pair 與角色
+        core_usage = record['core_usage']
+        for core in sorted(core_usage):
+            pair_index, role = self.worker_cores.get(core, ("", ""))
+            self._cores_writer.writerow([timestamp, core, pair_index, role, round(core_usage[core], 2)])
+        # 每個 pair / 角色的 dperf 行程一列
+        process_usage = record.get('process_usage') or {}
+        for (pair_index, role), usage in sorted(process_usage.items()):
+            self._processes_writer.writerow([
+                timestamp, pair_index, role, usage['pids'], round(usage['cpu_usage'], 2),
+                round(usage['cpu_time'], 2), round(usage['rss_mb'], 2), round(usage['hugetlb_mb'], 2),
+            ])
+        # 每個 NUMA 節點 / 頁大小一列
+        hugepages = record.get('hugepages') or {}
+        for (node, page_kb), pages in sorted(hugepages.items()):
+            self._hugepages_writer.writerow([
+                timestamp, node, page_kb, pages['total'], pages['free'], pages['total'] - pages['free'],
+            ])
+
+
+class JsonlSink(MonitorSink):
+    """每筆取樣一行 JSON（也用於 APVMonitor 的樣本，沒有 core_usage 時原樣輸出）"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = self._open(path)
+
+    def _write(self, record: Dict) -> None:
+        line = dict(record)
+        if 'core_usage' in record:
+            line['core_usage'] = {str(core): round(usage, 2) for core, usage in record['core_usage'].items()}
+        if 'process_usage' in record:
+            # JSON 的鍵只能是字串，以 "pair 索引:角色" 表示
+            line['process_usage'] = {
+                f"{pair_index}:{role}": {name: round(value, 2) for name, value in usage.items()}
+                for (pair_index, role), usage in record['process_usage'].items()
+            }
+        if 'hugepages' in record:
+            line['hugepages'] = {f"{node}:{page_kb}": pages for (node, page_kb), pages in record['hugepages'].items()}
+        self._file.write(json.dumps(line, separators=(',', ':')) + "\n")
+
+
+class BinarySink(MonitorSink):
+    """二進位紀錄（格式見模組說明）"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = self._open(path, binary=True)
+        self._file.write(_BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION))
+
+    def _write(self, record: Dict) -> None:
+        core_usage = record['core_usage']
+        self._file.write(_BINARY_RECORD.pack(
+            record['epoch'], record['monotonic'], record['cpu_usage'], record['ram_used'],
+            record['ram_total'], record['ram_usage'], len(core_usage),
+        ))
+        self._file.write(b''.join(_BINARY_CORE.pack(core, usage) for core, usage in sorted(core_usage.items())))
+
+
+def read_binary_samples(path: str) -> Tuple[np.ndarray, List[Dict[int, float]]]:
+    """讀取 BinarySink 輸出的檔案
+
+    Returns:
+        (BINARY_DTYPE 結構化陣列, 每筆的 {核心編號: 使用率})
+
+    Raises:
+        ValueError: 不是 BinarySink 的檔案格式
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version = _BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"不支援的監控數據檔案格式: {path}")
+
+    rows, cores = [], []
+    offset = _BINARY_HEADER.size
+    while offset + _BINARY_RECORD.size <= len(data):
+        *values, core_count = _BINARY_RECORD.unpack_from(data, offset)
+        offset += _BINARY_RECORD.size
+        usage = {}
+        for _ in range(core_count):
+            core, value = _BINARY_CORE.unpack_from(data, offset)
+            usage[core] = value
+            offset += _BINARY_CORE.size
+        rows.append(tuple(values))
+        cores.append(usage)
+    return np.array(rows, dtype=BINARY_DTYPE), cores
+
+
+_SINKS = {'csv': CsvSink, 'jsonl': JsonlSink, 'binary': BinarySink}
+
+
+def open_monitor_sink(fmt: str, path: str, flush_bytes: int = 65536, flush_interval: float = 5.0,
+                      worker_cores: Optional[Dict[int, Tuple[int, str]]] = None) -> MonitorSink:
+    """依格式建立監控數據輸出
+
+    Args:
+        fmt: 'csv'、'jsonl' 或 'binary'
+        path: 輸出檔案路徑
+        flush_bytes: 檔案緩衝區大小
+        flush_interval: 定期 flush 的秒數
+        worker_cores: {核心編號: (pair 索引, 角色)}
+
+    Returns:
+        MonitorSink
+
+    Raises:
+        ValueError: 不支援的格式
+    """
+    if fmt not in _SINKS:
+        raise ValueError(f"不支援的監控輸出格式: {fmt}")
+    return _SINKS[fmt](path, flush_bytes=flush_bytes, flush_interval=flush_interval, worker_cores=worker_cores)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+效能回歸偵測 - 將最新測試結果與相同配置指紋的歷史結果比較。
+
+回傳非零的 exit code 代表偵測到回歸，可用於 CI gating。
+"""
+
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import Config
+from RedisDB import RedisHandler
+from sqlite_storage import open_storage_handler
+
+
+# 數值越高越好的指標（吞吐量類）
+HIGHER_IS_BETTER = {
+    'pktRx', 'pktTx', 'bitsRx', 'bitsTx',
+    'skOpen', 'skClose', 'skCon',
+    'httpGet', 'http2XX',
+}
+
+# 數值越低越好的指標（錯誤與重傳類）
+LOWER_IS_BETTER = {
+    'dropTx', 'badRx', 'rstRx', 'rstTx',
+    'synRt', 'finRt', 'ackRt', 'pushRt', 'tcpDrop',
+    'skErr', 'httpErr',
+    'ierrors', 'oerrors', 'imissed',
+}
+
+
+@dataclass
+class MetricDelta:
+    """單一指標與 baseline 的比較結果"""
+    metric: str
+    current: float
+    baseline_mean: float
+    baseline_stddev: float
+    baseline_runs: int
+    threshold: float
+    regression: bool
+
+    @property
+    def delta(self) -> float:
+        """與 baseline 平均值的差"""
+        return self.current - self.baseline_mean
+
+    @property
+    def delta_percent(self) -> Optional[float]:
+        """與 baseline 平均值的相對差 (%)"""
+        if self.baseline_mean == 0:
+            return None
+        return self.delta / abs(self.baseline_mean) * 100
+
+
+def _direction(metric: str) -> int:
+    """返回 +1 (越高越好)、-1 (越低越好) 或 0 (不比較)
+
+    穩態統計 (例如 'pktRx.mean') 只比較 mean 與 p50，方向取決於原始指標名稱。
+    """
+    name, _, stat = metric.partition('.')
+    if stat and stat not in ('mean', 'p50'):
+        return 0
+    name = name.rstrip(':')
+    if name in HIGHER_IS_BETTER:
+        return 1
+    if name in LOWER_IS_BETTER:
+        return -1
+    return 0
+
+
+def _to_float(value) -> Optional[float]:
+    """將 Redis 中的字串數值轉為 float，無法轉換時返回 None"""
+    try:
+        value = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class RegressionDetector:
+    """以相同配置指紋的歷史結果為 baseline，偵測效能回歸"""
+
+    def __init__(self, redis_handler: RedisHandler, baseline_runs: int = 5, min_runs: int = 1,
+                 sigma: float = 3.0, min_relative: float = 0.05):
+        """初始化回歸偵測器
+
+        Args:
+            redis_handler: 已連接的 RedisHandler
+            baseline_runs: 用於 baseline 的最近歷史筆數
+            min_runs: baseline 至少需要的歷史筆數，不足時不判定回歸
+            sigma: 雜訊門檻，超過 baseline 標準差的倍數才視為回歸
+            min_relative: 最小相對門檻 (0.05 = 5%)，避免歷史雜訊為 0 時過度敏感
+        """
+        self.redis_handler = redis_handler
+        self.baseline_runs = baseline_runs
+        self.min_runs = min_runs
+        self.sigma = sigma
+        self.min_relative = min_relative
+
+    @staticmethod
+    def _run_values(run: Dict) -> Dict[str, float]:
+        """合併一次測試的 metrics 與 steady 並轉為數值"""
+        values = {}
+        for section in ('metrics', 'steady'):
+            for key, value in (run.get(section) or {}).items():
+                number = _to_float(value)
+                if number is not None:
+                    values[key] = number
+        return values
+
+    def compare(self, current: Dict[str, float], baseline: List[Dict]) -> List[MetricDelta]:
+        """比較目前結果與 baseline 歷史結果
+
+        Args:
+            current: 目前測試的數值 {metric: value}
+            baseline: 歷史測試輸出（get_fingerprint_outputs 的格式）
+
+        Returns:
+            List[MetricDelta]: 每個可比較指標的結果
+        """
+        history = [self._run_values(run) for run in baseline]
+        deltas = []
+
+        for metric in sorted(current):
+            direction = _direction(metric)
+            if direction == 0:
+                continue
+
+            values = [h[metric] for h in history if metric in h]
+            if not values or len(values) < self.min_runs:
+                continue
+
+            mean = sum(values) / len(values)
+            stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+            threshold = max(self.sigma * stddev, self.min_relative * abs(mean))
+
+            # 只有往「變差」方向超過門檻才算回歸
+            worse_by = (mean - current[metric]) if direction > 0 else (current[metric] - mean)
+            deltas.append(MetricDelta(
+                metric=metric,
+                current=current[metric],
+                baseline_mean=mean,
+                baseline_stddev=stddev,
+                baseline_runs=len(values),
+                threshold=threshold,
+                regression=worse_by > threshold,
+            ))
+
+        return deltas
+
+    def check_latest(self, fingerprint: str, role: str) -> List[MetricDelta]:
+        """將指定配置指紋最新的一次結果與其之前的結果比較
+
+        Args:
+            fingerprint: pair 配置指紋
+            role: 角色 ('server' 或 'client')
+
+        Returns:
+            List[MetricDelta]: 比較結果，沒有歷史資料時為空列表
+        """
+        runs = self.redis_handler.get_fingerprint_outputs(fingerprint, role, limit=self.baseline_runs + 1)
+        if len(runs) < 2:
+            return []
+
+        latest, baseline = runs[0], runs[1:]
+        return self.compare(self._run_values(latest), baseline)
+
+
+def print_report(label: str, deltas: List[MetricDelta]) -> None:
+    """列印比較報告"""
+    print(f"\n[{label}]")
+    if not deltas:
+        print("  沒有可比較的 baseline 數據")
+        return
+    for d in deltas:
+        pct = f"{d.delta_percent:+.2f}%" if d.delta_percent is not None else "N/A"
+        flag = "REGRESSION" if d.regression else "ok"
+        print(f"  {flag:<10} {d.metric:<20} current={d.current:.3f} "
+              f"baseline={d.baseline_mean:.3f}±{d.baseline_stddev:.3f} (n={d.baseline_runs}) "
+              f"delta={pct} threshold={d.threshold:.3f}")
+
+
+def check_config(config: Config, redis_handler: RedisHandler, baseline_runs: int = 5,
+                 sigma: float = 3.0, min_relative: float = 0.05) -> bool:
+    """檢查配置中所有 pair 的最新結果是否有回歸
+
+    沒有 baseline 可比較的 pair / 角色不判定回歸，但會在最後列出。
+
+    Returns:
+        bool: 有任何回歸時返回 True
+    """
+    detector = RegressionDetector(
+        redis_handler, baseline_runs=baseline_runs, sigma=sigma, min_relative=min_relative
+    )
+    found = False
+    missing = []
+    for i in range(len(config.test.traffic_generator.pairs)):
+        fingerprint = config.pair_fingerprint(i)
+        for role in ('server', 'client'):
+            deltas = detector.check_latest(fingerprint, role)
+            print_report(f"Pair {i} {role} ({fingerprint})", deltas)
+            if not deltas:
+                missing.append(f"Pair {i} {role}")
+            if any(d.regression for d in deltas):
+                found = True
+    if missing:
+        print(f"\n警告: 以下項目沒有相同配置的 baseline，未進行回歸比對: {', '.join(missing)}")
+    return found
+
+
+def check_regression(config: Config, redis_handler: RedisHandler, baseline_runs: int = 5,
+                     sigma: float = 3.0, min_relative: float = 0.05) -> int:
+    """檢查儲存後端連線後執行 check_config()，並列印結論
+
+    Returns:
+        int: exit code，0 為未偵測到回歸、1 為偵測到回歸、2 為無法連接儲存後端
+    """
+    if not redis_handler.is_connected():
+        print("無法連接到儲存後端，無法進行回歸比對")
+        return 2
+
+    if check_config(config, redis_handler, baseline_runs=baseline_runs, sigma=sigma, min_relative=min_relative):
+        print("\n偵測到效能回歸")
+        return 1
+    print("\n未偵測到效能回歸")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="比較最新測試結果與相同配置的歷史 baseline，偵測效能回歸。")
+    parser.add_argument('-c', '--config', type=str, default='config.yaml', help='配置檔案路徑')
+    parser.add_argument('--redis-host', type=str, default='localhost', help='Redis 主機位址')
+    parser.add_argument('--redis-port', type=int, default=6379, help='Redis 埠號')
+    parser.add_argument('--redis-db', type=int, default=0, help='Redis 資料庫編號')
+    parser.add_argument('--baseline-runs', type=int, default=5, help='用於 baseline 的最近歷史筆數 (預設: 5)')
+    parser.add_argument('--sigma', type=float, default=3.0, help='雜訊門檻的標準差倍數 (預設: 3.0)')
+    parser.add_argument('--min-relative', type=float, default=0.05, help='最小相對門檻 (預設: 0.05)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = Config(args.config)
+
+    storage = config.test.storage
+    redis_handler = open_storage_handler(
+        storage.backend, redis_host=args.redis_host, redis_port=args.redis_port, redis_db=args.redis_db,
+        sqlite_path=storage.sqlite_path
+    )
+    try:
+        exit_code = check_regression(
+            config, redis_handler,
+            baseline_runs=args.baseline_runs, sigma=args.sigma, min_relative=args.min_relative
+        )
+    finally:
+        redis_handler.close()
+
+    if exit_code:
+        sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""NUMA 資源規劃器 - 為每組 pair 分配不重疊且 NUMA 本地的 CPU 核心與 socket 記憶體"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from output_handler import OutputHandler
+
+
+# 一次讀取 CPU、NIC NUMA 節點與各節點 hugepages 的遠端命令
+TOPOLOGY_COMMAND = (
+    "lscpu -p=CPU,NODE,SOCKET; "
+    "grep -H . /sys/bus/pci/devices/*/numa_node; "
+    "grep -H . /sys/devices/system/node/node*/hugepages/hugepages-*/free_hugepages"
+)
+
+_CPU_LINE = re.compile(r'^(\d+),(\d*),(\d*)$')
+_PCI_NODE_LINE = re.compile(r'^/sys/bus/pci/devices/([0-9a-fA-F:.]+)/numa_node:(-?\d+)$')
+_HUGEPAGE_LINE = re.compile(
+    r'^/sys/devices/system/node/node(\d+)/hugepages/hugepages-(\d+)kB/free_hugepages:(\d+)$'
+)
+
+
+def socket_mem_mb(value) -> int:
+    """取得 socket_mem 設定的總記憶體 (MB)
+
+    接受單一數值（1024）或 DPDK 的 per-node 格式（"1024,0"，各節點相加）。
+
+    Raises:
+        ValueError: 格式錯誤
+    """
+    try:
+        return sum(int(part) for part in str(value).split(',') if part.strip())
+    except ValueError:
+        raise ValueError(f"socket_mem 格式錯誤: {value!r}，應為 MB 數值或以逗號分隔的各節點 MB 數") from None
+
+
+def hugepage_kb(size: str) -> int:
+    """將 hugepage_size 設定（"1G" 或 "2M"）轉換為 sysfs 目錄名稱中的 kB 數
+
+    Raises:
+        ValueError: 格式錯誤
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*([KMG])\s*', str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"hugepage_size 格式錯誤: {size!r}，應為 1G 或 2M 等格式")
+    return int(match.group(1)) * {'K': 1, 'M': 1024, 'G': 1024 * 1024}[match.group(2).upper()]
+
+
+@dataclass
+class NumaTopology:
+    """遠端主機的 NUMA 拓樸"""
+    cpus_by_node: Dict[int, List[int]] = field(default_factory=dict)
+    nic_nodes: Dict[str, int] = field(default_factory=dict)
+    # node -> 可用 hugepage 記憶體 (MB)，指定頁大小時只計算該大小的 hugepages
+    free_hugepage_mb: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def nodes(self) -> List[int]:
+        """所有 NUMA 節點編號（已排序）"""
+        return sorted(set(self.cpus_by_node) | set(self.free_hugepage_mb))
+
+    def nic_node(self, pci: str) -> int:
+        """取得 NIC 所在的 NUMA 節點，未知或 -1 時視為節點 0"""
+        node = self.nic_nodes.get(pci.lower(), -1)
+        return node if node >= 0 else 0
+
+
+@dataclass
+class PairAllocation:
+    """單組 pair 的資源分配結果，直接對應 dperf 配置中的 cpu 與 socket_mem"""
+    pair_index: int
+    client_node: int
+    server_node: int
+    client_cpus: List[int] = field(default_factory=list)
+    server_cpus: List[int] = field(default_factory=list)
+    client_socket_mem: str = ""
+    server_socket_mem: str = ""
+
+    @property
+    def client_cpu(self) -> str:
+        """dperf 配置格式的 client cpu 欄位"""
+        return " ".join(str(c) for c in self.client_cpus)
+
+    @property
+    def server_cpu(self) -> str:
+        """dperf 配置格式的 server cpu 欄位"""
+        return " ".join(str(c) for c in self.server_cpus)
+
+
+class ResourcePlanner:
+    """依據遠端 NUMA 拓樸為多組 pair 規劃 CPU 核心與 socket 記憶體"""
+
+    def __init__(self, executor=None, cores_per_role: int = 1, reserved_cores: Optional[List[int]] = None,
+                 hugepage_size: Optional[str] = None):
+        """初始化資源規劃器
+
+        Args:
+            executor: 已連接的 SSHExecutor，用於讀取遠端拓樸
+            cores_per_role: 每個角色 (server/client) 分配的核心數量
+            reserved_cores: 保留不分配的核心 (例如系統常駐的核心 0)
+            hugepage_size: dperf 使用的 hugepage 大小（"1G" 或 "2M"），只計算此大小的可用頁；
+                None 時計算所有大小
+        """
+        self.executor = executor
+        self.cores_per_role = cores_per_role
+        self.reserved_cores = set(reserved_cores if reserved_cores is not None else [0])
+        self.page_kb = hugepage_kb(hugepage_size) if hugepage_size else None
+        self.topology: Optional[NumaTopology] = None
+
+    def read_topology(self) -> NumaTopology:
+        """從遠端主機讀取一次 NUMA 拓樸並快取
+
+        Returns:
+            NumaTopology: 解析後的拓樸
+        """
+        if self.topology is not None:
+            return self.topology
+        if self.executor is None:
+            raise Exception("尚未提供 SSH executor，無法讀取遠端拓樸")
+
+        result = self.executor.execute_command(TOPOLOGY_COMMAND)
+        output = OutputHandler.clean_ansi(result[0]) if result else ""
+        self.topology = self.parse_topology(output, self.page_kb)
+        return self.topology
+
+    @staticmethod
+    def parse_topology(output: str, page_kb: Optional[int] = None) -> NumaTopology:
+        """解析拓樸命令的輸出
+
+        Args:
+            output: lscpu -p 與 sysfs grep 的合併輸出
+            page_kb: 只計算此頁大小 (kB) 的可用 hugepages，None 時計算所有大小
+
+        Returns:
+            NumaTopology: 解析後的拓樸
+        """
+        topology = NumaTopology()
+
+        for line in output.split('\n'):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            match = _CPU_LINE.match(line)
+            if match:
+                cpu = int(match.group(1))
+                node = int(match.group(2)) if match.group(2) else 0
+                topology.cpus_by_node.setdefault(node, []).append(cpu)
+                continue
+
+            match = _PCI_NODE_LINE.match(line)
+            if match:
+                topology.nic_nodes[match.group(1).lower()] = int(match.group(2))
+                continue
+
+            match = _HUGEPAGE_LINE.match(line)
+            if match:
+                node = int(match.group(1))
+                size_kb = int(match.group(2))
+                if page_kb is not None and size_kb != page_kb:
+                    continue
+                free_pages = int(match.group(3))
+                topology.free_hugepage_mb[node] = (
+                    topology.free_hugepage_mb.get(node, 0) + free_pages * size_kb // 1024
+                )
+
+        for cpus in topology.cpus_by_node.values():
+            cpus.sort()
+
+        return topology
+
+    def plan(self, pairs) -> List[PairAllocation]:
+        """為所有 pair 分配不重疊且 NUMA 本地的核心與 socket 記憶體
+
+        Args:
+            pairs: TrafficGeneratorPair 列表
+
+        Returns:
+            List[PairAllocation]: 與 pairs 順序相同的分配結果
+
+        Raises:
+            ValueError: CPU 核心耗盡、socket_mem 格式錯誤，或任一 NUMA 節點可用 hugepages 不足
+        """
+        topology = self.read_topology()
+        nodes = topology.nodes or [0]
+
+        free_cpus = {
+            node: [c for c in topology.cpus_by_node.get(node, []) if c not in self.reserved_cores]
+            for node in nodes
+        }
+        mem_used = {node: 0 for node in nodes}
+
+        allocations = []
+        for i, pair in enumerate(pairs):
+            client_node = topology.nic_node(pair.client.client_nic_pci)
+            server_node = topology.nic_node(pair.server.server_nic_pci)
+
+            client_cpus = self._take_cpus(free_cpus, client_node, f"Pair {i} client")
+            server_cpus = self._take_cpus(free_cpus, server_node, f"Pair {i} server")
+
+            # socket_mem 可能已是 per-node 格式（例如前一次規劃產生的 "1024,0"），以總量配置到 NIC 所在節點
+            client_mem = socket_mem_mb(pair.client.socket_mem)
+            server_mem = socket_mem_mb(pair.server.socket_mem)
+            mem_used[client_node] = mem_used.get(client_node, 0) + client_mem
+            mem_used[server_node] = mem_used.get(server_node, 0) + server_mem
+
+            allocations.append(PairAllocation(
+                pair_index=i,
+                client_node=client_node,
+                server_node=server_node,
+                client_cpus=client_cpus,
+                server_cpus=server_cpus,
+                client_socket_mem=self._socket_mem(nodes, client_node, client_mem),
+                server_socket_mem=self._socket_mem(nodes, server_node, server_mem),
+            ))
+
+        # 檢查各節點 hugepages 是否足夠，不足時 dperf 會在 DPDK 初始化時失敗，在此提前停止
+        shortages = [
+            f"NUMA node {node} 需要 {used} MB，只有 {topology.free_hugepage_mb[node]} MB 可用"
+            for node, used in sorted(mem_used.items())
+            if node in topology.free_hugepage_mb and used > topology.free_hugepage_mb[node]
+        ]
+        if shortages:
+            raise ValueError(f"hugepages 不足: {'；'.join(shortages)}")
+
+        return allocations
+
+    def _take_cpus(self, free_cpus: Dict[int, List[int]], node: int, label: str) -> List[int]:
+        """從指定節點取出核心，不足時才跨節點借用"""
+        taken = []
+        local = free_cpus.get(node, [])
+        while local and len(taken) < self.cores_per_role:
+            taken.append(local.pop(0))
+
+        if len(taken) < self.cores_per_role:
+            for other in sorted(free_cpus):
+                remote = free_cpus[other]
+                while remote and len(taken) < self.cores_per_role:
+                    taken.append(remote.pop(0))
+            if taken:
+                print(f"[ResourcePlanner] 警告: {label} 在 NUMA node {node} 上核心不足，已跨節點分配 {taken}")
+
+        if len(taken) < self.cores_per_role:
+            raise ValueError(f"{label} 無法分配 {self.cores_per_role} 個 CPU 核心，可用核心已耗盡")
+
+        return taken
+
+    @staticmethod
+    def _socket_mem(nodes: List[int], node: int, mem_mb: int) -> str:
+        """產生 dperf socket_mem 字串，僅在 NIC 所在節點配置記憶體"""
+        return ",".join(str(mem_mb if n == node else 0) for n in range(max(nodes) + 1))
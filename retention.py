@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+監控數據保留與壓縮 - 依 config.yaml 的 storage.retention 定期降採樣舊的監控數據。
+
+原始樣本保留 raw_days 天後彙總為 1 分鐘 min/avg/max，超過 minute_days 天再合併為
+1 小時，超過 hour_days 天的彙總與超過 test_output_days 天的測試輸出、dperf 行程取樣、APV 樣本與執行索引則刪除。
+要處理的 pair 每次由儲存後端掃描得出，已從配置移除的 pair 也會被清理。
+可由 main.py 在測試結束後執行一次，或以本模組常駐在背景定期執行。
+"""
+
+import argparse
+import sys
+import time
+from threading import Event, Thread
+from typing import Dict, Iterable, List, Optional
+
+from config import Config, RetentionConfig
+from sqlite_storage import open_storage_handler
+
+
+class RetentionCompactor:
+    """背景壓縮工作，定期對各 pair 套用保留政策"""
+
+    def __init__(
+        self, storage_handler, policy: RetentionConfig, pair_indexes: Optional[Iterable[int]] = None
+    ):
+        """初始化壓縮工作
+
+        Args:
+            storage_handler: 已連接的 RedisHandler 或 SQLiteHandler
+            policy: 保留政策
+            pair_indexes: 要壓縮的 pair 索引（None 表示每次執行時由儲存後端掃描）
+        """
+        self.storage_handler = storage_handler
+        self.policy = policy
+        self.pair_indexes = None if pair_indexes is None else list(pair_indexes)
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+
+    def run_once(self, now: Optional[float] = None) -> Dict[int, Dict[str, int]]:
+        """對所有 pair 執行一次壓縮
+
+        Args:
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+
+        Returns:
+            Dict[int, Dict[str, int]]: 每個 pair 各階段處理的筆數
+        """
+        now = time.time() if now is None else now
+        results = {}
+        for pair_index in self._pairs():
+            result = self.storage_handler.compact_monitor_data(
+                pair_index,
+                raw_days=self.policy.raw_days,
+                minute_days=self.policy.minute_days,
+                hour_days=self.policy.hour_days,
+                now=now,
+            )
+            result['test_outputs_expired'] = 0
+            result['process_samples_expired'] = 0
+            if self.policy.test_output_days is not None:
+                result['test_outputs_expired'] = self.storage_handler.expire_test_outputs(
+                    pair_index, self.policy.test_output_days, now=now
+                )
+                # dperf 行程取樣只在測試執行期間產生，與測試輸出保留相同天數
+                result['process_samples_expired'] = self.storage_handler.expire_process_data(
+                    pair_index, self.policy.test_output_days, now=now
+                )
+            print(f"[Retention] Pair {pair_index}: {result}")
+            results[pair_index] = result
+        self.expire_runs(now)
+        return results
+
+    def _pairs(self) -> List[int]:
+        """返回本次要處理的 pair 索引"""
+        if self.pair_indexes is not None:
+            return self.pair_indexes
+        return self.storage_handler.stored_pairs()
+
+    def expire_runs(self, now: Optional[float] = None) -> Dict[str, int]:
+        """刪除不屬於單一 pair 的過期執行數據（APV 樣本與執行索引），與測試輸出保留相同天數
+        （test_output_days 為 None 時不刪除）
+
+        Args:
+            now: 計算保留期限的基準時間（epoch 秒數，預設為目前時間）
+
+        Returns:
+            Dict[str, int]: {'apv_samples_expired', 'runs_expired'} 刪除的筆數
+        """
+        result = {'apv_samples_expired': 0, 'runs_expired': 0}
+        if self.policy.test_output_days is None:
+            return result
+        now = time.time() if now is None else now
+        result['apv_samples_expired'] = self.storage_handler.expire_apv_samples(
+            self.policy.test_output_days, now=now
+        )
+        result['runs_expired'] = self.storage_handler.expire_runs(self.policy.test_output_days, now=now)
+        print(f"[Retention] Runs: {result}")
+        return result
+
+    def start(self) -> "RetentionCompactor":
+        """啟動背景執行緒，每 interval_seconds 秒執行一次"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = Thread(target=self._run, name="RetentionCompactor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止背景執行緒（進行中的壓縮會先完成）"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        """背景壓縮迴圈"""
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[Retention] 壓縮失敗: {e}")
+            self._stop_event.wait(self.policy.interval_seconds)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="依保留政策降採樣並清除舊的監控數據與測試輸出。")
+    parser.add_argument('-c', '--config', type=str, default='config.yaml', help='配置檔案路徑')
+    parser.add_argument('--redis-host', type=str, default='localhost', help='Redis 主機位址')
+    parser.add_argument('--redis-port', type=int, default=6379, help='Redis 埠號')
+    parser.add_argument('--redis-db', type=int, default=0, help='Redis 資料庫編號')
+    parser.add_argument('--once', action='store_true', help='只執行一次，不常駐')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = Config(args.config)
+    storage = config.test.storage
+
+    storage_handler = open_storage_handler(
+        storage.backend, redis_host=args.redis_host, redis_port=args.redis_port, redis_db=args.redis_db,
+        sqlite_path=storage.sqlite_path
+    )
+    if not storage_handler.is_connected():
+        print(f"無法連接到儲存後端 ({storage.backend})，無法執行壓縮")
+        sys.exit(2)
+
+    compactor = RetentionCompactor(storage_handler, storage.retention)
+    try:
+        if args.once:
+            compactor.run_once()
+        else:
+            compactor.start()
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        compactor.stop()
+    finally:
+        storage_handler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1170 @@
+#!/usr/bin/env python3
+"""SQLite 儲存後端 - 與 RedisHandler 相同的介面，供沒有 Redis 的機器保存歷史數據"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+import metric_codec
+from RedisDB import (
+    RedisHandler, PROCESS_DTYPE, PROCESS_FIELDS, ROLLUP_DTYPE, ROLLUP_FIELDS, ROLLUP_RESOLUTIONS, _normalize_timestamp
+)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS monitor_samples (
+    pair_index INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    cpu_usage REAL NOT NULL,
+    ram_used INTEGER NOT NULL,
+    ram_total INTEGER NOT NULL,
+    ram_usage REAL NOT NULL,
+    PRIMARY KEY (pair_index, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS process_samples (
+    pair_index INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    ts REAL NOT NULL,
+    cpu_usage REAL NOT NULL,
+    cpu_time REAL NOT NULL,
+    rss_mb REAL NOT NULL,
+    hugetlb_mb REAL NOT NULL,
+    pids INTEGER NOT NULL,
+    PRIMARY KEY (pair_index, role, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS monitor_rollups (
+    pair_index INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    count INTEGER NOT NULL,
+    cpu_usage_min REAL NOT NULL,
+    cpu_usage_avg REAL NOT NULL,
+    cpu_usage_max REAL NOT NULL,
+    ram_used_min REAL NOT NULL,
+    ram_used_avg REAL NOT NULL,
+    ram_used_max REAL NOT NULL,
+    ram_usage_min REAL NOT NULL,
+    ram_usage_avg REAL NOT NULL,
+    ram_usage_max REAL NOT NULL,
+    PRIMARY KEY (pair_index, resolution, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS test_outputs (
+    id INTEGER PRIMARY KEY,
+    pair_index INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    ts REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    run_id TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT,
+    metrics BLOB NOT NULL,
+    steady BLOB NOT NULL,
+    UNIQUE (pair_index, role, run_id, timestamp)
+);
+
+CREATE TABLE IF NOT EXISTS apv_samples (
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    metrics BLOB NOT NULL,
+    PRIMARY KEY (run_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS metric_schemas (
+    schema_id INTEGER PRIMARY KEY,
+    definition TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    pairs TEXT NOT NULL,
+    start REAL NOT NULL,
+    start_time TEXT NOT NULL,
+    date TEXT NOT NULL,
+    "end" REAL,
+    end_time TEXT,
+    status TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_test_outputs_pair_role_ts ON test_outputs (pair_index, role, ts);
+CREATE INDEX IF NOT EXISTS idx_test_outputs_fingerprint ON test_outputs (fingerprint, role, ts);
+CREATE INDEX IF NOT EXISTS idx_test_outputs_run ON test_outputs (run_id, pair_index, role);
+CREATE INDEX IF NOT EXISTS idx_runs_fingerprint ON runs (fingerprint, start);
+CREATE INDEX IF NOT EXISTS idx_runs_date ON runs (date, start);
+CREATE INDEX IF NOT EXISTS idx_runs_start ON runs (start);
+"""
+
+_ROLLUP_COLUMNS = ["count"] + [f"{name}_{stat}" for name in ROLLUP_FIELDS for stat in ("min", "avg", "max")]
+
+# 與既有彙總合併：min 取最小、max 取最大、avg 依 count 加權（SET 右側皆為更新前的值）
+_ROLLUP_UPSERT = "ON CONFLICT (pair_index, resolution, ts) DO UPDATE SET count = count + excluded.count, " + ", ".join(
+    f"{name}_min = MIN({name}_min, excluded.{name}_min), "
+    f"{name}_avg = ({name}_avg * count + excluded.{name}_avg * excluded.count) / (count + excluded.count), "
+    f"{name}_max = MAX({name}_max, excluded.{name}_max)"
+    for name in ROLLUP_FIELDS
+)
+
+
+def _rollup_insert_sql(resolution: int, source_rollups: bool) -> str:
+    """產生將原始樣本或較細的彙總依 resolution 分桶寫入 monitor_rollups 的 SQL"""
+    if source_rollups:
+        stats = ", ".join(
+            f"MIN({name}_min), SUM({name}_avg * count) / SUM(count), MAX({name}_max)" for name in ROLLUP_FIELDS
+        )
+        select = (f"SELECT pair_index, {resolution}, CAST(ts / {resolution} AS INTEGER) * {resolution} AS bucket, "
+                  f"SUM(count), {stats} FROM monitor_rollups "
+                  "WHERE pair_index = ? AND resolution = ? AND ts <= ? GROUP BY bucket")
+    else:
+        stats = ", ".join(f"MIN({name}), AVG({name}), MAX({name})" for name in ROLLUP_FIELDS)
+        select = (f"SELECT pair_index, {resolution}, CAST(ts / {resolution} AS INTEGER) * {resolution} AS bucket, "
+                  f"COUNT(*), {stats} FROM monitor_samples "
+                  "WHERE pair_index = ? AND ts < ? GROUP BY bucket")
+    return (f"INSERT INTO monitor_rollups (pair_index, resolution, ts, {', '.join(_ROLLUP_COLUMNS)}) "
+            f"{select} {_ROLLUP_UPSERT}")
+
+
+class SQLiteHandler:
+    """SQLite 儲存後端，方法與返回格式與 RedisHandler 相同
+
+    使用 WAL 模式，讀取不會被寫入阻塞；所有存取以同一把鎖序列化，可在多執行緒間共用。
+    """
+
+    _shared: Dict[str, "SQLiteHandler"] = {}
+    _shared_lock = Lock()
+
+    def __init__(self, path: str = "./results/array_script.db"):
+        """
+        開啟（或建立）SQLite 資料庫
+
+        Args:
+            path: 資料庫檔案路徑
+        """
+        self.path = path
+        self._lock = Lock()
+        self._shared_key = None
+        self._refs = 0
+        # 已寫入 metric_schemas 的 schema id
+        self._saved_schemas = set()
+
+        try:
+            db_dir = os.path.dirname(path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(_SCHEMA)
+            print(f"成功開啟 SQLite 資料庫: {path}")
+        except Exception as e:
+            print(f"警告: 無法開啟 SQLite 資料庫 ({path}): {e}")
+            self.conn = None
+
+    @classmethod
+    def shared(cls, path: str = "./results/array_script.db") -> "SQLiteHandler":
+        """
+        取得行程內共用的 SQLiteHandler（以檔案路徑為 key）
+
+        每次呼叫需對應一次 close()，最後一個 close() 才真正關閉資料庫。
+        """
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            handler = cls._shared.get(key)
+            if handler is None:
+                handler = cls(path)
+                handler._shared_key = key
+                cls._shared[key] = handler
+            handler._refs += 1
+            return handler
+
+    def pool_stats(self) -> Dict:
+        """SQLite 沒有連線池，返回空 dict（與 RedisHandler 介面一致）"""
+        return {}
+
+    def is_connected(self) -> bool:
+        """檢查資料庫是否已開啟"""
+        return self.conn is not None
+
+    def reconnect(self) -> bool:
+        """與 RedisHandler 介面一致；本地檔案沒有連線可恢復，返回 is_connected()"""
+        return self.is_connected()
+
+    def save_monitor_data(
+        self, pair_index: int, timestamp: Union[str, float], cpu_usage: float,
+        ram_used: int, ram_total: int, ram_usage: float
+    ) -> bool:
+        """
+        儲存一筆監控數據
+
+        Args:
+            與 RedisHandler.save_monitor_data 相同
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        return self.save_monitor_batch(pair_index, [{
+            "timestamp": timestamp,
+            "cpu_usage": cpu_usage,
+            "ram_used": ram_used,
+            "ram_total": ram_total,
+            "ram_usage": ram_usage,
+        }]) == 1
+
+    def save_monitor_batch(self, pair_index: int, samples: Iterable[Dict]) -> int:
+        """
+        以單一交易批次儲存多筆監控數據，同一時間戳重複寫入時保留第一筆
+
+        Returns:
+            成功處理的筆數，失敗返回 0
+        """
+        if not self.is_connected():
+            return 0
+
+        try:
+            rows = [
+                (
+                    pair_index,
+                    _normalize_timestamp(s["timestamp"])[1],
+                    s["cpu_usage"],
+                    int(s["ram_used"]),
+                    int(s["ram_total"]),
+                    s["ram_usage"],
+                )
+                for s in samples
+            ]
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO monitor_samples "
+                    "(pair_index, ts, cpu_usage, ram_used, ram_total, ram_usage) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            return len(rows)
+        except Exception as e:
+            print(f"批次儲存監控數據失敗: {e}")
+            return 0
+
+    def save_test_output(
+        self, pair_index: int, role: str, output: Dict, timestamp: Union[str, float, None] = None,
+        steady: Optional[Dict] = None, fingerprint: Optional[str] = None, run_id: Optional[str] = None
+    ) -> bool:
+        """
+        儲存測試輸出數據（同一 pair/role/run_id/timestamp 會覆蓋）
+
+        Args:
+            與 RedisHandler.save_test_output 相同
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        if timestamp is None:
+            timestamp = datetime.now().timestamp()
+
+        try:
+            timestamp, ts = _normalize_timestamp(timestamp)
+            # 與 Redis 一致，以 metric_codec 的二進位編碼保存，保留數值型別
+            metrics, metrics_schema = metric_codec.encode(output)
+            schemas = [metrics_schema]
+            steady_blob = b''
+            if steady:
+                steady_blob, steady_schema = metric_codec.encode(steady)
+                schemas.append(steady_schema)
+            new_schemas = [schema for schema in schemas if schema.schema_id not in self._saved_schemas]
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO metric_schemas (schema_id, definition) VALUES (?, ?)",
+                    [(schema.schema_id, schema.to_json()) for schema in new_schemas],
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO test_outputs "
+                    "(pair_index, role, ts, timestamp, run_id, fingerprint, metrics, steady) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (pair_index, role, ts, timestamp, run_id or '', fingerprint, metrics, steady_blob),
+                )
+            self._saved_schemas.update(schema.schema_id for schema in new_schemas)
+            return True
+        except Exception as e:
+            print(f"儲存測試輸出失敗: {e}")
+            return False
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """執行查詢並返回所有列"""
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get_monitor_arrays(
+        self, pair_index: int, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, limit: Optional[int] = None,
+        after: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取監控數據
+
+        Args:
+            與 RedisHandler.get_monitor_arrays 相同
+
+        Returns:
+            {'timestamp', 'cpu_usage', 'ram_used', 'ram_total', 'ram_usage'} -> np.ndarray
+        """
+        columns = ("timestamp", "cpu_usage", "ram_used", "ram_total", "ram_usage")
+        dtypes = (np.float64, np.float32, np.uint32, np.int64, np.float32)
+        if not self.is_connected():
+            return {name: np.empty(0, dtype=dtype) for name, dtype in zip(columns, dtypes)}
+
+        try:
+            sql = "SELECT ts, cpu_usage, ram_used, ram_total, ram_usage FROM monitor_samples WHERE pair_index = ?"
+            params: List = [pair_index]
+            if start_time is not None:
+                sql += " AND ts >= ?"
+                params.append(_normalize_timestamp(start_time)[1])
+            if end_time is not None:
+                sql += " AND ts <= ?"
+                params.append(_normalize_timestamp(end_time)[1])
+            if after is not None:
+                sql += " AND ts > ?"
+                params.append(after)
+            sql += " ORDER BY ts"
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+
+            rows = self._query(sql, tuple(params))
+            if not rows:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in zip(columns, dtypes)}
+            values = list(zip(*rows))
+            return {name: np.asarray(col, dtype=dtype) for name, col, dtype in zip(columns, values, dtypes)}
+        except Exception as e:
+            print(f"獲取監控數據失敗: {e}")
+            return {name: np.empty(0, dtype=dtype) for name, dtype in zip(columns, dtypes)}
+
+    # 與 RedisHandler 相同的陣列 -> dict 轉換與分頁邏輯
+    get_monitor_data = RedisHandler.get_monitor_data
+    get_monitor_page = RedisHandler.get_monitor_page
+
+    def save_process_batch(self, pair_index: int, role: str, samples: Iterable[Dict]) -> int:
+        """
+        以單一交易批次儲存一個 pair / 角色的 dperf 行程取樣，同一時間戳重複寫入時保留第一筆
+
+        Args:
+            與 RedisHandler.save_process_batch 相同
+
+        Returns:
+            成功處理的筆數，失敗返回 0
+        """
+        if not self.is_connected():
+            return 0
+
+        try:
+            rows = [
+                (pair_index, role, _normalize_timestamp(s["timestamp"])[1], *(s[name] for name in PROCESS_FIELDS))
+                for s in samples
+            ]
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    f"INSERT OR IGNORE INTO process_samples (pair_index, role, ts, {', '.join(PROCESS_FIELDS)}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            return len(rows)
+        except Exception as e:
+            print(f"批次儲存行程監控數據失敗: {e}")
+            return 0
+
+    def get_process_arrays(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取一個 pair / 角色的 dperf 行程取樣
+
+        Args:
+            與 RedisHandler.get_process_arrays 相同
+
+        Returns:
+            與 RedisHandler.get_process_arrays 相同
+        """
+        records = np.empty(0, dtype=PROCESS_DTYPE)
+        if self.is_connected():
+            try:
+                sql = (f"SELECT ts, {', '.join(PROCESS_FIELDS)} FROM process_samples "
+                       "WHERE pair_index = ? AND role = ?")
+                params: List = [pair_index, role]
+                if start_time is not None:
+                    sql += " AND ts >= ?"
+                    params.append(_normalize_timestamp(start_time)[1])
+                if end_time is not None:
+                    sql += " AND ts <= ?"
+                    params.append(_normalize_timestamp(end_time)[1])
+                rows = self._query(sql + " ORDER BY ts", tuple(params))
+                if rows:
+                    records = np.array(rows, dtype=PROCESS_DTYPE)
+            except Exception as e:
+                print(f"獲取行程監控數據失敗: {e}")
+        return {name: records[name] for name in PROCESS_DTYPE.names}
+
+    get_process_data = RedisHandler.get_process_data
+
+    def expire_process_data(self, pair_index: int, days: float, now: Optional[float] = None) -> int:
+        """
+        刪除超過保留天數的 dperf 行程取樣
+
+        Args:
+            與 RedisHandler.expire_process_data 相同
+
+        Returns:
+            刪除的列數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        try:
+            with self._lock, self.conn:
+                return self.conn.execute(
+                    "DELETE FROM process_samples WHERE pair_index = ? AND ts <= ?", (pair_index, cutoff)
+                ).rowcount
+        except Exception as e:
+            print(f"刪除過期行程監控數據失敗: {e}")
+            return 0
+
+    def compact_monitor_data(
+        self, pair_index: int, raw_days: float, minute_days: Optional[float] = 30,
+        hour_days: Optional[float] = None, now: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        依保留政策降採樣並清除舊的監控數據，每個階段一個交易
+
+        Args:
+            與 RedisHandler.compact_monitor_data 相同（batch_size 保留以與介面一致）
+
+        Returns:
+            {'raw_samples', 'minute_rollups', 'hour_rollups_expired'} 各階段處理的筆數
+        """
+        result = {'raw_samples': 0, 'minute_rollups': 0, 'hour_rollups_expired': 0}
+        if not self.is_connected():
+            return result
+
+        now = time.time() if now is None else now
+        minute, hour = ROLLUP_RESOLUTIONS['1m'], ROLLUP_RESOLUTIONS['1h']
+        try:
+            cutoff = now - raw_days * 86400
+            with self._lock, self.conn:
+                self.conn.execute(_rollup_insert_sql(minute if minute_days else hour, False), (pair_index, cutoff))
+                result['raw_samples'] = self.conn.execute(
+                    "DELETE FROM monitor_samples WHERE pair_index = ? AND ts < ?", (pair_index, cutoff)
+                ).rowcount
+
+            if minute_days:
+                params = (pair_index, minute, now - minute_days * 86400 - minute)
+                with self._lock, self.conn:
+                    self.conn.execute(_rollup_insert_sql(hour, True), params)
+                    result['minute_rollups'] = self.conn.execute(
+                        "DELETE FROM monitor_rollups WHERE pair_index = ? AND resolution = ? AND ts <= ?", params
+                    ).rowcount
+
+            if hour_days is not None:
+                with self._lock, self.conn:
+                    result['hour_rollups_expired'] = self.conn.execute(
+                        "DELETE FROM monitor_rollups WHERE pair_index = ? AND resolution = ? AND ts <= ?",
+                        (pair_index, hour, now - hour_days * 86400 - hour),
+                    ).rowcount
+        except Exception as e:
+            print(f"壓縮監控數據失敗: {e}")
+        return result
+
+    def get_monitor_rollups(
+        self, pair_index: int, resolution: str = '1m', start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取降採樣後的監控彙總
+
+        Args:
+            與 RedisHandler.get_monitor_rollups 相同
+
+        Returns:
+            {'timestamp', 'count', 'cpu_usage_min', 'cpu_usage_avg', 'cpu_usage_max', ...} -> np.ndarray
+        """
+        records = np.empty(0, dtype=ROLLUP_DTYPE)
+        if self.is_connected():
+            try:
+                sql = (f"SELECT ts, {', '.join(_ROLLUP_COLUMNS)} FROM monitor_rollups "
+                       "WHERE pair_index = ? AND resolution = ?")
+                params: List = [pair_index, ROLLUP_RESOLUTIONS[resolution]]
+                if start_time is not None:
+                    sql += " AND ts >= ?"
+                    params.append(_normalize_timestamp(start_time)[1])
+                if end_time is not None:
+                    sql += " AND ts <= ?"
+                    params.append(_normalize_timestamp(end_time)[1])
+                rows = self._query(sql + " ORDER BY ts", tuple(params))
+                if rows:
+                    records = np.array(rows, dtype=ROLLUP_DTYPE)
+            except Exception as e:
+                print(f"獲取監控彙總失敗: {e}")
+        return {name: records[name] for name in ROLLUP_DTYPE.names}
+
+    def _load_schema(self, schema_id: int) -> metric_codec.MetricSchema:
+        """取得 schema，未登錄時從 metric_schemas 讀取"""
+        schema = metric_codec.get_schema(schema_id)
+        if schema is None:
+            rows = self._query("SELECT definition FROM metric_schemas WHERE schema_id = ?", (schema_id,))
+            if not rows:
+                raise ValueError(f"找不到 metric schema {schema_id}")
+            schema = metric_codec.register_schema(metric_codec.MetricSchema.from_json(rows[0][0]))
+        return schema
+
+    def _decode_metrics(self, value: Union[bytes, str]) -> Dict:
+        """解碼 metrics / steady 欄位；舊資料庫的 JSON 字串直接解析"""
+        if isinstance(value, str):
+            return json.loads(value)
+        if not value:
+            return {}
+        return metric_codec.decode(value, self._load_schema(metric_codec.schema_id_of(value)))
+
+    def _rows_to_outputs(self, rows: List[Tuple], include_metrics: bool = True) -> List[Dict]:
+        """將 test_outputs 的列轉為 {'info', 'metrics', 'steady'} 格式"""
+        result = []
+        for pair_index, role, timestamp, run_id, fingerprint, metrics, steady in rows:
+            info = {"pair_index": str(pair_index), "role": role, "timestamp": timestamp}
+            if fingerprint:
+                info["fingerprint"] = fingerprint
+            if run_id:
+                info["run_id"] = run_id
+            data = {"info": info}
+            if include_metrics:
+                data["metrics"] = self._decode_metrics(metrics)
+                data["steady"] = self._decode_metrics(steady)
+            result.append(data)
+        return result
+
+    _OUTPUT_COLUMNS = "pair_index, role, timestamp, run_id, fingerprint, metrics, steady"
+
+    def get_test_output(
+        self, pair_index: int, role: str, timestamp: Optional[str] = None,
+        include_metrics: bool = True, run_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        獲取測試輸出數據（未指定 timestamp 與 run_id 時返回最新的）
+
+        Returns:
+            測試輸出數據字典，如果不存在則返回 None
+        """
+        if not self.is_connected():
+            return None
+
+        try:
+            sql = f"SELECT {self._OUTPUT_COLUMNS} FROM test_outputs WHERE pair_index = ? AND role = ?"
+            params: List = [pair_index, role]
+            if run_id is not None:
+                sql += " AND run_id = ?"
+                params.append(run_id)
+            if timestamp is not None:
+                sql += " AND timestamp = ?"
+                params.append(timestamp)
+            rows = self._query(sql + " ORDER BY ts DESC LIMIT 1", tuple(params))
+            outputs = self._rows_to_outputs(rows, include_metrics)
+            return outputs[0] if outputs else None
+        except Exception as e:
+            print(f"獲取測試輸出失敗: {e}")
+            return None
+
+    def get_all_test_outputs(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, include_metrics: bool = True,
+        limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict]:
+        """
+        獲取指定時間範圍內的所有測試輸出數據（由舊到新）
+
+        Returns:
+            測試輸出數據列表
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            sql = f"SELECT {self._OUTPUT_COLUMNS} FROM test_outputs WHERE pair_index = ? AND role = ?"
+            params: List = [pair_index, role]
+            if start_time is not None:
+                sql += " AND ts >= ?"
+                params.append(_normalize_timestamp(start_time)[1])
+            if end_time is not None:
+                sql += " AND ts <= ?"
+                params.append(_normalize_timestamp(end_time)[1])
+            sql += " ORDER BY ts LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+            return self._rows_to_outputs(self._query(sql, tuple(params)), include_metrics)
+        except Exception as e:
+            print(f"獲取測試輸出數據失敗: {e}")
+            return []
+
+    def get_metric_arrays(
+        self, pair_index: int, role: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None, section: str = "metrics"
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取多次測試的數值指標
+
+        Args:
+            與 RedisHandler.get_metric_arrays 相同
+
+        Returns:
+            {'timestamp': np.ndarray, 指標名稱: np.ndarray, ...}，依時間排序
+        """
+        result = {"timestamp": np.empty(0, dtype=np.float64)}
+        if not self.is_connected():
+            return result
+
+        try:
+            column = {"metrics": "metrics", "steady": "steady"}[section]
+            sql = f"SELECT ts, {column} FROM test_outputs WHERE pair_index = ? AND role = ?"
+            params: List = [pair_index, role]
+            if start_time is not None:
+                sql += " AND ts >= ?"
+                params.append(_normalize_timestamp(start_time)[1])
+            if end_time is not None:
+                sql += " AND ts <= ?"
+                params.append(_normalize_timestamp(end_time)[1])
+            # 舊資料庫的 JSON 字串不包含在內
+            rows = [(ts, blob) for ts, blob in self._query(sql + " ORDER BY ts", tuple(params))
+                    if isinstance(blob, bytes) and blob]
+
+            result["timestamp"] = np.array([ts for ts, _ in rows], dtype=np.float64)
+            result.update(metric_codec.decode_arrays([blob for _, blob in rows], self._load_schema))
+            return result
+        except Exception as e:
+            print(f"獲取指標陣列失敗: {e}")
+            return result
+
+    def get_fingerprint_outputs(
+        self, fingerprint: str, role: str, limit: int = 10
+    ) -> List[Dict]:
+        """
+        獲取相同配置指紋的最近測試輸出（由新到舊）
+
+        Returns:
+            測試輸出數據列表
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            rows = self._query(
+                f"SELECT {self._OUTPUT_COLUMNS} FROM test_outputs "
+                "WHERE fingerprint = ? AND role = ? ORDER BY ts DESC LIMIT ?",
+                (fingerprint, role, limit),
+            )
+            return self._rows_to_outputs(rows)
+        except Exception as e:
+            print(f"獲取 baseline 數據失敗: {e}")
+            return []
+
+    def get_specific_metrics(
+        self, pair_index: int, role: str, metric_names: List[str],
+        timestamp: Optional[str] = None, run_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        獲取特定的 metrics 數據
+
+        Returns:
+            {metric: 值或 None}，如果測試輸出不存在則返回 None
+        """
+        output = self.get_test_output(pair_index, role, timestamp, run_id=run_id)
+        if output is None:
+            return None
+        return {name: output["metrics"].get(name) for name in metric_names}
+
+    _RUN_COLUMNS = ("run_id", "fingerprint", "pairs", "start", "start_time", "date", "end", "end_time", "status")
+
+    def start_run(
+        self, run_id: str, fingerprint: str, pair_indexes: Iterable[int],
+        start_time: Union[str, float, None] = None
+    ) -> bool:
+        """
+        建立測試執行索引
+
+        Args:
+            與 RedisHandler.start_run 相同
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        try:
+            start_time, start = _normalize_timestamp(
+                datetime.now().timestamp() if start_time is None else start_time
+            )
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, fingerprint, pairs, start, start_time, date, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'running')",
+                    (run_id, fingerprint, ",".join(str(i) for i in pair_indexes), start, start_time, start_time[:10]),
+                )
+            return True
+        except Exception as e:
+            print(f"建立測試執行索引失敗: {e}")
+            return False
+
+    def finish_run(
+        self, run_id: str, status: str = "completed", end_time: Union[str, float, None] = None
+    ) -> bool:
+        """
+        記錄測試執行結束
+
+        Args:
+            與 RedisHandler.finish_run 相同
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        try:
+            end_time, end = _normalize_timestamp(
+                datetime.now().timestamp() if end_time is None else end_time
+            )
+            with self._lock, self.conn:
+                self.conn.execute(
+                    'UPDATE runs SET "end" = ?, end_time = ?, status = ? WHERE run_id = ?',
+                    (end, end_time, status, run_id),
+                )
+            return True
+        except Exception as e:
+            print(f"更新測試執行索引失敗: {e}")
+            return False
+
+    def _rows_to_runs(self, rows: List[Tuple]) -> List[Dict]:
+        """將 runs 的列轉為與 Redis run:{run_id} hash 相同的字串字典"""
+        return [
+            {name: str(value) for name, value in zip(self._RUN_COLUMNS, row) if value is not None}
+            for row in rows
+        ]
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """
+        獲取測試執行索引
+
+        Returns:
+            執行索引字典，如果不存在則返回 None
+        """
+        if not self.is_connected():
+            return None
+
+        try:
+            columns = ", ".join(f'"{name}"' for name in self._RUN_COLUMNS)
+            runs = self._rows_to_runs(self._query(f"SELECT {columns} FROM runs WHERE run_id = ?", (run_id,)))
+            return runs[0] if runs else None
+        except Exception as e:
+            print(f"獲取測試執行索引失敗: {e}")
+            return None
+
+    def get_runs(
+        self, fingerprint: Optional[str] = None, date: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        依配置指紋或日期查詢測試執行（由新到舊）
+
+        Args:
+            與 RedisHandler.get_runs 相同
+
+        Returns:
+            執行索引字典的列表
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            columns = ", ".join(f'"{name}"' for name in self._RUN_COLUMNS)
+            sql = f"SELECT {columns} FROM runs WHERE 1 = 1"
+            params: List = []
+            if fingerprint:
+                sql += " AND fingerprint = ?"
+                params.append(fingerprint)
+            if date:
+                sql += " AND date = ?"
+                params.append(date)
+            sql += " ORDER BY start DESC LIMIT ?"
+            params.append(-1 if limit is None else limit)
+            return self._rows_to_runs(self._query(sql, tuple(params)))
+        except Exception as e:
+            print(f"查詢測試執行失敗: {e}")
+            return []
+
+    def get_runs_page(
+        self, cursor: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        依開始時間由舊到新分頁讀取測試執行
+
+        Args:
+            與 RedisHandler.get_runs_page 相同
+
+        Returns:
+            (執行索引字典的列表, 下一頁游標)，已無更多執行時游標為 None
+        """
+        if not self.is_connected():
+            return [], None
+
+        try:
+            offset = cursor or 0
+            columns = ", ".join(f'"{name}"' for name in self._RUN_COLUMNS)
+            runs = self._rows_to_runs(self._query(
+                f"SELECT {columns} FROM runs ORDER BY start, run_id LIMIT ? OFFSET ?", (limit, offset)
+            ))
+            return runs, offset + len(runs) if len(runs) == limit else None
+        except Exception as e:
+            print(f"查詢測試執行失敗: {e}")
+            return [], None
+
+    def get_run_outputs(self, run_id: str, include_metrics: bool = True) -> Dict[int, Dict[str, Dict]]:
+        """
+        獲取一次測試執行中所有 pair 的測試輸出
+
+        Returns:
+            {pair_index: {'server': 輸出, 'client': 輸出}}，缺少的輸出不列出
+        """
+        if not self.is_connected():
+            return {}
+
+        try:
+            rows = self._query(
+                f"SELECT {self._OUTPUT_COLUMNS} FROM test_outputs WHERE run_id = ? ORDER BY ts", (run_id,)
+            )
+            result: Dict[int, Dict[str, Dict]] = {}
+            for output in self._rows_to_outputs(rows, include_metrics):
+                info = output["info"]
+                result.setdefault(int(info["pair_index"]), {})[info["role"]] = output
+            return result
+        except Exception as e:
+            print(f"獲取測試執行輸出失敗: {e}")
+            return {}
+
+    def save_apv_samples(self, run_id: str, samples: Iterable[Dict]) -> int:
+        """
+        以單一交易批次儲存 APV 監控樣本（同一時間戳會覆蓋）
+
+        Args:
+            與 RedisHandler.save_apv_samples 相同
+
+        Returns:
+            成功處理的筆數，失敗返回 0
+        """
+        if not self.is_connected():
+            return 0
+
+        try:
+            rows, schemas = [], {}
+            for sample in samples:
+                blob, schema = metric_codec.encode(sample["metrics"])
+                rows.append((run_id, _normalize_timestamp(sample["timestamp"])[1], blob))
+                if schema.schema_id not in self._saved_schemas:
+                    schemas[schema.schema_id] = schema
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO metric_schemas (schema_id, definition) VALUES (?, ?)",
+                    [(schema.schema_id, schema.to_json()) for schema in schemas.values()],
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO apv_samples (run_id, ts, metrics) VALUES (?, ?, ?)", rows
+                )
+            self._saved_schemas.update(schemas)
+            return len(rows)
+        except Exception as e:
+            print(f"儲存 APV 監控數據失敗: {e}")
+            return 0
+
+    def expire_apv_samples(self, days: float, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        刪除所有執行中超過保留天數的 APV 監控樣本
+
+        Args:
+            與 RedisHandler.expire_apv_samples 相同（batch_size 保留以與介面一致）
+
+        Returns:
+            刪除的列數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        try:
+            with self._lock, self.conn:
+                return self.conn.execute("DELETE FROM apv_samples WHERE ts <= ?", (cutoff,)).rowcount
+        except Exception as e:
+            print(f"刪除過期 APV 監控數據失敗: {e}")
+            return 0
+
+    def expire_runs(self, days: float, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        刪除開始時間超過保留天數的執行索引
+
+        Args:
+            與 RedisHandler.expire_runs 相同（batch_size 保留以與介面一致）
+
+        Returns:
+            刪除的執行數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        try:
+            with self._lock, self.conn:
+                return self.conn.execute("DELETE FROM runs WHERE start <= ?", (cutoff,)).rowcount
+        except Exception as e:
+            print(f"刪除過期執行索引失敗: {e}")
+            return 0
+
+    def stored_pairs(self, batch_size: int = 500) -> List[int]:
+        """
+        找出資料庫中有監控數據或測試輸出的 pair 索引
+
+        Args:
+            與 RedisHandler.stored_pairs 相同（batch_size 保留以與介面一致）
+
+        Returns:
+            排序後的 pair 索引列表
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            rows = self._query(
+                "SELECT pair_index FROM monitor_samples UNION SELECT pair_index FROM process_samples "
+                "UNION SELECT pair_index FROM monitor_rollups UNION SELECT pair_index FROM test_outputs"
+            )
+        except Exception as e:
+            print(f"掃描 pair 索引失敗: {e}")
+            return []
+        return sorted(row[0] for row in rows)
+
+    def _read_apv_rows(
+        self, run_id: str, start_time: Union[str, float, None], end_time: Union[str, float, None]
+    ) -> List[Tuple[float, bytes]]:
+        """讀取時間範圍內的 APV 樣本，依時間排序"""
+        sql = "SELECT ts, metrics FROM apv_samples WHERE run_id = ?"
+        params: List = [run_id]
+        if start_time is not None:
+            sql += " AND ts >= ?"
+            params.append(_normalize_timestamp(start_time)[1])
+        if end_time is not None:
+            sql += " AND ts <= ?"
+            params.append(_normalize_timestamp(end_time)[1])
+        return self._query(sql + " ORDER BY ts", tuple(params))
+
+    def get_apv_samples(
+        self, run_id: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> List[Dict]:
+        """
+        獲取一次測試執行的 APV 監控樣本
+
+        Returns:
+            與 RedisHandler.get_apv_samples 相同
+        """
+        if not self.is_connected():
+            return []
+
+        try:
+            return [
+                {"timestamp": ts, "metrics": self._decode_metrics(blob)}
+                for ts, blob in self._read_apv_rows(run_id, start_time, end_time)
+            ]
+        except Exception as e:
+            print(f"獲取 APV 監控數據失敗: {e}")
+            return []
+
+    def get_apv_arrays(
+        self, run_id: str, start_time: Union[str, float, None] = None,
+        end_time: Union[str, float, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以陣列形式獲取一次測試執行的 APV 監控樣本
+
+        Returns:
+            與 RedisHandler.get_apv_arrays 相同
+        """
+        result = {"timestamp": np.empty(0, dtype=np.float64)}
+        if not self.is_connected():
+            return result
+
+        try:
+            rows = self._read_apv_rows(run_id, start_time, end_time)
+            result["timestamp"] = np.array([ts for ts, _ in rows], dtype=np.float64)
+            result.update(metric_codec.decode_arrays([blob for _, blob in rows], self._load_schema))
+            return result
+        except Exception as e:
+            print(f"獲取 APV 監控陣列失敗: {e}")
+            return result
+
+    def expire_test_outputs(
+        self, pair_index: int, days: float, now: Optional[float] = None, batch_size: int = 500
+    ) -> int:
+        """
+        刪除超過保留天數的測試輸出
+
+        Args:
+            與 RedisHandler.expire_test_outputs 相同（batch_size 保留以與介面一致）
+
+        Returns:
+            刪除的列數
+        """
+        if not self.is_connected():
+            return 0
+
+        cutoff = (time.time() if now is None else now) - days * 86400
+        try:
+            with self._lock, self.conn:
+                return self.conn.execute(
+                    "DELETE FROM test_outputs WHERE pair_index = ? AND ts <= ?", (pair_index, cutoff)
+                ).rowcount
+        except Exception as e:
+            print(f"刪除過期測試輸出失敗: {e}")
+            return 0
+
+    def clear_pair_data(
+        self, pair_index: int, batch_size: int = 500, sweep: bool = True,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> bool:
+        """
+        分批刪除指定 pair 的所有數據，每批一個交易，避免長時間鎖住資料庫
+
+        Args:
+            pair_index: pair 索引
+            batch_size: 每批刪除的列數
+            sweep: 保留以與 RedisHandler 介面一致（SQLite 沒有殘留 keys）
+            progress: 進度回呼，參數為目前累計刪除的列數（可選）
+
+        Returns:
+            成功返回 True，否則返回 False
+        """
+        if not self.is_connected():
+            return False
+
+        statements = (
+            ("DELETE FROM monitor_samples WHERE pair_index = ? AND ts IN "
+             "(SELECT ts FROM monitor_samples WHERE pair_index = ? LIMIT ?)",
+             (pair_index, pair_index, batch_size)),
+            ("DELETE FROM process_samples WHERE pair_index = ? AND (role, ts) IN "
+             "(SELECT role, ts FROM process_samples WHERE pair_index = ? LIMIT ?)",
+             (pair_index, pair_index, batch_size)),
+            ("DELETE FROM monitor_rollups WHERE pair_index = ? AND (resolution, ts) IN "
+             "(SELECT resolution, ts FROM monitor_rollups WHERE pair_index = ? LIMIT ?)",
+             (pair_index, pair_index, batch_size)),
+            ("DELETE FROM test_outputs WHERE id IN "
+             "(SELECT id FROM test_outputs WHERE pair_index = ? LIMIT ?)",
+             (pair_index, batch_size)),
+        )
+        deleted = 0
+        try:
+            for sql, params in statements:
+                while True:
+                    with self._lock, self.conn:
+                        count = self.conn.execute(sql, params).rowcount
+                    if count <= 0:
+                        break
+                    deleted += count
+                    if progress:
+                        progress(deleted)
+
+            print(f"已清除 pair {pair_index} 的所有數據 ({deleted} rows)")
+            return True
+        except Exception as e:
+            print(f"清除數據失敗: {e}")
+            return False
+
+    def clear_pair_data_async(
+        self, pair_index: int, batch_size: int = 500, sweep: bool = True,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Thread:
+        """在背景執行緒中清除指定 pair 的所有數據"""
+        thread = Thread(
+            target=self.clear_pair_data,
+            args=(pair_index, batch_size, sweep, progress),
+            name=f"sqlite-clear-pair{pair_index}",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def get_pair_summary(self, pair_index: int) -> Dict:
+        """
+        獲取指定 pair 的數據摘要
+
+        Returns:
+            包含監控數據和測試輸出數量的摘要字典
+        """
+        if not self.is_connected():
+            return {}
+
+        try:
+            monitor_count = self._query(
+                "SELECT COUNT(*) FROM monitor_samples WHERE pair_index = ?", (pair_index,)
+            )[0][0]
+            counts = dict(self._query(
+                "SELECT role, COUNT(*) FROM test_outputs WHERE pair_index = ? GROUP BY role", (pair_index,)
+            ))
+            return {
+                'pair_index': pair_index,
+                'monitor_count': monitor_count,
+                'server_output_count': counts.get('server', 0),
+                'client_output_count': counts.get('client', 0),
+            }
+        except Exception as e:
+            print(f"獲取 pair 摘要失敗: {e}")
+            return {}
+
+    def close(self) -> None:
+        """關閉資料庫（共用 handler 在最後一個使用者 close 時才關閉）"""
+        if self._shared_key is not None:
+            with self._shared_lock:
+                self._refs -= 1
+                if self._refs > 0:
+                    return
+                if self._shared.get(self._shared_key) is self:
+                    del self._shared[self._shared_key]
+
+        if self.conn:
+            with self._lock:
+                self.conn.close()
+            self.conn = None
+            print("SQLite 資料庫已關閉")
+
+
+def open_storage_handler(
+    backend: str = "redis", redis_host: str = "localhost", redis_port: int = 6379,
+    redis_db: int = 0, sqlite_path: str = "./results/array_script.db"
+):
+    """
+    依設定取得共用的儲存後端
+
+    Args:
+        backend: 'redis' 或 'sqlite'
+        redis_host: Redis 主機地址
+        redis_port: Redis 端口
+        redis_db: Redis 數據庫編號
+        sqlite_path: SQLite 資料庫檔案路徑
+
+    Returns:
+        RedisHandler 或 SQLiteHandler（呼叫端需對應呼叫 close()）
+    """
+    if backend == "sqlite":
+        return SQLiteHandler.shared(sqlite_path)
+    if backend != "redis":
+        raise ValueError(f"不支援的儲存後端: {backend}")
+    return RedisHandler.shared(host=redis_host, port=redis_port, db=redis_db)
@@ -4,8 +4,9 @@
 import argparse
 import paramiko
 # import signal  # 暫時關閉 signal，因為與多線程衝突
+import socket
 import sys
-from typing import Tuple, Optional
+from typing import Callable, Iterator, Tuple, Optional
 from config import Config
 from output_handler import OutputHandler
 
@@ -186,6 +187,51 @@ class RealTimeStreamReader:
             self.output_handler.write(remaining, end="", flush=True)
 
 
+class LineStreamReader:
+    """在獨立 channel 上執行長時間執行的指令，逐行讀取輸出
+
+    不經過持久 session 的提示符判斷與輪詢，輸出到達即可處理；
+    使用 pty，關閉 channel 時遠端指令會收到 SIGHUP 而結束。
+    """
+
+    def __init__(self, ssh_client: paramiko.SSHClient, command: str, timeout: float = 1.0):
+        """
+        開啟 channel 並執行指令
+
+        Args:
+            ssh_client: SSH 客戶端
+            command: 要執行的指令
+            timeout: 每次等待輸出的時間（秒），用於定期檢查是否已關閉
+        """
+        self.channel = ssh_client.get_transport().open_session()
+        self.channel.get_pty()
+        self.channel.settimeout(timeout)
+        self.channel.exec_command(command)
+        self._buffer = ""
+        self._closed = False
+
+    def lines(self) -> Iterator[str]:
+        """逐行產生輸出（不含換行），遠端指令結束或呼叫 close() 後停止"""
+        while not self._closed:
+            try:
+                chunk = self.channel.recv(4096)
+            except socket.timeout:
+                continue
+            except Exception:
+                break
+            if not chunk:
+                break
+            self._buffer += chunk.decode("utf-8", errors="replace")
+            *complete, self._buffer = self._buffer.split("\n")
+            for line in complete:
+                yield line.rstrip("\r")
+
+    def close(self) -> None:
+        """關閉 channel"""
+        self._closed = True
+        self.channel.close()
+
+
 class CommandExecutor:
     """命令執行器"""
 
@@ -202,19 +248,29 @@ class CommandExecutor:
         self._shell = None
         self._session_active = False
 
-    def execute_simple(self, command: str) -> Tuple[str, str, int]:
+    def execute_simple(
+        self, command: str, on_line: Optional[Callable[[str], None]] = None
+    ) -> Tuple[str, str, int]:
         """
         執行簡單命令（等待完成）
 
         Args:
             command: 要執行的命令
+            on_line: 每收到一行標準輸出即呼叫（不含換行），用於執行期間即時處理輸出（可選）
 
         Returns:
             (output, error, exit_status) 元組
         """
         stdin, stdout, stderr = self.ssh_client.exec_command(command)
 
-        output = stdout.read().decode("utf-8")
+        if on_line is None:
+            output = stdout.read().decode("utf-8")
+        else:
+            lines = []
+            for line in stdout:
+                lines.append(line)
+                on_line(line.rstrip("\r\n"))
+            output = "".join(lines)
         error = stderr.read().decode("utf-8")
         exit_status = stdout.channel.recv_exit_status()
 
@@ -364,7 +420,8 @@ class SSHExecutor:
         self.connect(persistent_session=True)
         
     def execute_script(
-        self, script_path: str, real_time: bool = False
+        self, script_path: str, real_time: bool = False,
+        on_line: Optional[Callable[[str], None]] = None
     ) -> Optional[Tuple[str, str, int]]:
         """
         執行指定的 shell 腳本
@@ -372,6 +429,7 @@ class SSHExecutor:
         Args:
             script_path: shell 腳本的路徑
             real_time: 是否即時輸出 (預設: False)
+            on_line: real_time=False 時，每收到一行標準輸出即呼叫（可選）
 
         Returns:
             如果 real_time=False,返回 (output, error, exit_status)，否則返回 None
@@ -386,7 +444,7 @@ class SSHExecutor:
             self._executor.execute_realtime(commands)
             return None
         else:
-            output, error, exit_status = self._executor.execute_simple(commands)
+            output, error, exit_status = self._executor.execute_simple(commands, on_line=on_line)
 
             self.output_handler.print_output(output)
             self.output_handler.print_error(error)
@@ -420,6 +478,20 @@ class SSHExecutor:
                 self.output_handler.print_output(output)
                 return output, error, exit_status
 
+    def open_stream(self, command: str) -> LineStreamReader:
+        """
+        在獨立 channel 上執行長時間執行的指令（不影響持久 session）
+
+        Args:
+            command: 要執行的指令
+
+        Returns:
+            LineStreamReader，以 lines() 逐行讀取輸出，結束時呼叫 close()
+        """
+        if not self._executor:
+            raise Exception("尚未建立 SSH 連接")
+        return LineStreamReader(self.connection_manager.get_client(), command)
+
     def close(self) -> None:
         """關閉 SSH 連接"""
         if self._executor and self._executor.is_session_active():
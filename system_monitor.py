@@ -1,11 +1,371 @@
 from ssh_executor import SSHExecutor
+from metrics_exporter import MetricsRegistry
+from monitor_buffer import MonitorBuffer
+from monitor_sink import SINK_EXTENSIONS, SINK_FORMATS, open_monitor_sink
 from output_handler import OutputHandler
-from RedisDB import RedisHandler
-import csv
+from sqlite_storage import open_storage_handler
+from write_behind import WriteBehindQueue
 import os
+import re
 import time
+from collections import deque
 from datetime import datetime
-from threading import Thread
+from threading import Event, Thread
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 行程區塊的開頭標記，後面接 pid 與 dperf 的指令列
+PROCESS_MARKER = "@@pid"
+
+# 以 pgrep 找出各 pair 的 dperf 行程（指令列含 config/{server,client}_pairN.conf），輸出其
+# /proc/<pid>/stat 與 status 的 VmRSS / HugetlbPages；'^[^ ]*dperf' 排除 sudo 父行程，
+# 標記寫成 "@@"pid，持久 session 的指令回顯不會被誤認為標記
+PROCESS_SAMPLE_CMD = (
+    "for p in $(pgrep -f '^[^ ]*dperf -c config/(server|client)_pair[0-9]+[.]conf'); do "
+    "echo \"@@\"pid $p $(tr '\\0' ' ' < /proc/$p/cmdline); "
+    "cat /proc/$p/stat; grep -hE '^(VmRSS|HugetlbPages):' /proc/$p/status; done 2>/dev/null"
+)
+
+# 各 NUMA 節點、各 hugepage 大小的總頁數與可用頁數（/sys/kernel/mm/hugepages 只有全系統的數量）
+HUGEPAGE_SAMPLE_CMD = (
+    "grep -H . /sys/devices/system/node/node*/hugepages/hugepages-*/nr_hugepages "
+    "/sys/devices/system/node/node*/hugepages/hugepages-*/free_hugepages 2>/dev/null"
+)
+
+# 每次取樣只在遠端執行一個 grep，一次讀取 /proc/stat 的 cpu 行與需要的 /proc/meminfo 欄位，
+# 接著讀取各節點的 hugepages 與 dperf 行程的 /proc/<pid>；CPU 使用率由控制端依兩次取樣的差值計算
+PROC_SAMPLE_CMD = (
+    "grep -hE '^(cpu[0-9]* |(MemTotal|MemFree|MemAvailable|Buffers|Cached):)' /proc/stat /proc/meminfo; "
+    + HUGEPAGE_SAMPLE_CMD + "; " + PROCESS_SAMPLE_CMD
+)
+
+_HUGEPAGE_LINE = re.compile(
+    r'/sys/devices/system/node/node(\d+)/hugepages/hugepages-(\d+)kB/(nr|free)_hugepages:(\d+)\s*$'
+)
+
+# /proc/<pid>/stat 的 utime / stime 單位（USER_HZ，x86 / arm64 的 Linux 固定為 100）
+USER_HZ = 100
+
+_DPERF_CONFIG = re.compile(r'config/(server|client)_pair(\d+)\.conf')
+
+
+# 串流取樣的訊框結尾標記，每次讀取 /proc 後輸出一行，後接遠端 /proc/uptime 與 epoch 秒數
+STREAM_MARKER = "@@sample"
+
+# 最短取樣間隔（秒）
+MIN_INTERVAL = 0.1
+
+# 監控輸出與 get_data() 的時間戳格式（毫秒精度）
+SAMPLE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def stream_sample_cmd(interval: float = 1.0) -> str:
+    """產生常駐遠端的取樣迴圈指令：依遠端時鐘每 interval 秒輸出一次 /proc 內容與結尾標記
+
+    以 /proc/uptime（0.01 秒）為時鐘，每輪取樣後把截止時間加上 interval，只 sleep 到截止時間的剩餘時間，
+    取樣、fork 與迴圈本身的耗時不會累積成漂移；落後超過一個間隔時跳到下一個格點，由控制端計為略過的 tick。
+    結尾標記帶有取樣開始時的 /proc/uptime（以 shell 內建的 read 讀取）與 epoch 秒數
+    （bash 的 EPOCHREALTIME，其他 shell 改用 date），控制端以此對齊時間格點。
+
+    Args:
+        interval: 取樣間隔（秒），以 0.01 秒為單位
+
+    Returns:
+        遠端執行的 shell 指令
+    """
+    step = max(1, round(interval * 100))
+    return (
+        f"step={step}; read -r up _ < /proc/uptime; next=${{up%.*}}${{up#*.}}; "
+        f"while :; do read -r up _ < /proc/uptime; "
+        f"t=${{EPOCHREALTIME:-$(date +%s.%N)}}; {PROC_SAMPLE_CMD}; "
+        f"echo {STREAM_MARKER} $up $t; "
+        f"read -r now _ < /proc/uptime; now=${{now%.*}}${{now#*.}}; next=$((next+step)); "
+        f"[ $next -gt $now ] || next=$((now+step-(now-next)%step)); "
+        f"d=$((next-now)); sleep $((d/100)).$((d%100/10))$((d%10)); done"
+    )
+
+
+def parse_stream_marker(line: str) -> Optional[Tuple[float, float]]:
+    """解析串流訊框的結尾標記
+
+    Args:
+        line: 一行輸出
+
+    Returns:
+        (遠端 /proc/uptime 秒數, 遠端 epoch 秒數)；不是結尾標記時返回 None
+
+    Raises:
+        ValueError: 結尾標記缺少時間或無法解析
+    """
+    parts = line.split()
+    if not parts or parts[0] != STREAM_MARKER:
+        return None
+    if len(parts) < 3:
+        raise ValueError(f"串流結尾標記缺少遠端時間: {line.strip()}")
+    # EPOCHREALTIME 依 locale 可能以逗號作為小數點
+    return float(parts[1]), float(parts[2].replace(',', '.'))
+
+
+def format_sample_time(wall: float) -> str:
+    """將 epoch 秒數轉為毫秒精度的時間字串"""
+    return datetime.fromtimestamp(wall).strftime(SAMPLE_TIMESTAMP_FORMAT)[:-3]
+
+
+class TickScheduler:
+    """以 monotonic 時鐘為基準的固定間隔排程
+
+    tick 時間固定為 起點 + n * interval，不因取樣耗時而累積漂移；
+    取樣耗時超過間隔時立即執行下一次，並略過已完全錯過的 tick（計入 missed），
+    之後仍回到原本的時間格點。
+    """
+
+    def __init__(self, interval: float, stop_event: Optional[Event] = None):
+        """
+        Args:
+            interval: 間隔（秒），最短 MIN_INTERVAL
+            stop_event: 設定後 wait() 立即返回 False
+
+        Raises:
+            ValueError: 間隔小於 MIN_INTERVAL
+        """
+        if interval < MIN_INTERVAL:
+            raise ValueError(f"取樣間隔不可小於 {MIN_INTERVAL} 秒: {interval}")
+        self.interval = interval
+        self.missed = 0
+        self._stop_event = stop_event or Event()
+        self._next = time.monotonic()
+        # align() 使用：外部時鐘的起點與最後一個 tick 編號
+        self._origin: Optional[float] = None
+        self._tick = 0
+
+    def wait(self) -> bool:
+        """等待到下一個 tick
+
+        Returns:
+            bool: 已到下一個 tick 時返回 True，stop_event 被設定時返回 False
+        """
+        self._next += self.interval
+        now = time.monotonic()
+        if now >= self._next:
+            missed = int((now - self._next) // self.interval)
+            self._next += missed * self.interval
+            self.missed += missed
+            return not self._stop_event.is_set()
+        return not self._stop_event.wait(self._next - now)
+
+    def align(self, monotonic: float) -> bool:
+        """將由其他時鐘排程的取樣（例如遠端的 /proc/uptime）對齊到時間格點
+
+        第一次呼叫的時間作為起點，之後以 round((monotonic - 起點) / interval) 決定所屬的 tick；
+        跳過的 tick 計入 missed，落在已記錄 tick 上的取樣返回 False。
+
+        Args:
+            monotonic: 取樣時間（單調遞增的秒數）
+
+        Returns:
+            bool: 取樣屬於新的 tick 時返回 True
+        """
+        if self._origin is None:
+            self._origin = monotonic
+            return True
+        tick = round((monotonic - self._origin) / self.interval)
+        if tick <= self._tick:
+            return False
+        self.missed += tick - self._tick - 1
+        self._tick = tick
+        return True
+
+
+def parse_proc_sample(output: str) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, int]]:
+    """解析 /proc/stat 與 /proc/meminfo 的內容（PROC_SAMPLE_CMD 的輸出）
+
+    Args:
+        output: 指令輸出（可包含提示符、指令回顯與 ANSI 控制字元）
+
+    Returns:
+        ({'cpu': (busy, total), 'cpu0': ...} 累計 jiffies, {'MemTotal': 數值, ...} meminfo 欄位，單位 kB)
+    """
+    cpu_times: Dict[str, Tuple[int, int]] = {}
+    meminfo: Dict[str, int] = {}
+    for line in OutputHandler.clean_ansi(output).splitlines():
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        if parts[0].startswith('cpu') and len(parts) >= 5 and all(p.isdigit() for p in parts[1:]):
+            # user nice system idle iowait irq softirq steal（guest 已計入 user，不重複加總）
+            values = [int(p) for p in parts[1:9]]
+            total = sum(values)
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            cpu_times[parts[0]] = (total - idle, total)
+        elif parts[0].endswith(':') and parts[1].isdigit():
+            meminfo[parts[0][:-1]] = int(parts[1])
+    return cpu_times, meminfo
+
+
+def parse_process_sample(output: str) -> Dict[Tuple[int, str], Dict]:
+    """解析 PROCESS_SAMPLE_CMD 的輸出，同一 pair / 角色的多個行程加總
+
+    Args:
+        output: 指令輸出（PROCESS_MARKER 之前的內容略過）
+
+    Returns:
+        {(pair 索引, 角色): {'pids': (pid, ...), 'jiffies': utime + stime, 'rss_kb': 數值, 'hugetlb_kb': 數值}}
+    """
+    processes: Dict[Tuple[int, str], Dict] = {}
+    current = None
+    pid = None
+    for line in OutputHandler.clean_ansi(output).splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == PROCESS_MARKER:
+            match = _DPERF_CONFIG.search(line)
+            current = None
+            if match and len(parts) > 1 and parts[1].isdigit():
+                pid = parts[1]
+                current = processes.setdefault(
+                    (int(match.group(2)), match.group(1)), {'pids': (), 'jiffies': 0, 'rss_kb': 0, 'hugetlb_kb': 0}
+                )
+                current['pids'] += (int(pid),)
+        elif current is None:
+            continue
+        elif parts[0] == pid and ')' in line:
+            # 行程名稱可能含空白，以最後一個 ')' 之後的欄位計算（utime、stime 為第 14、15 欄）
+            fields = line.rsplit(')', 1)[1].split()
+            if len(fields) > 12:
+                current['jiffies'] += int(fields[11]) + int(fields[12])
+        elif parts[0] in ('VmRSS:', 'HugetlbPages:') and len(parts) > 1 and parts[1].isdigit():
+            current['rss_kb' if parts[0] == 'VmRSS:' else 'hugetlb_kb'] += int(parts[1])
+    return processes
+
+
+def parse_hugepage_sample(output: str) -> Dict[Tuple[int, int], Dict[str, int]]:
+    """解析 HUGEPAGE_SAMPLE_CMD 的輸出
+
+    Returns:
+        {(NUMA 節點, 頁大小 kB): {'total': 總頁數, 'free': 可用頁數}}，只包含兩個數值都有的項目
+    """
+    hugepages: Dict[Tuple[int, int], Dict[str, int]] = {}
+    for line in OutputHandler.clean_ansi(output).splitlines():
+        match = _HUGEPAGE_LINE.search(line)
+        if match:
+            node, page_kb, field, value = match.groups()
+            entry = hugepages.setdefault((int(node), int(page_kb)), {})
+            entry['total' if field == 'nr' else 'free'] = int(value)
+    return {key: entry for key, entry in hugepages.items() if len(entry) == 2}
+
+
+def process_usage(
+    previous: Dict[Tuple[int, str], Dict], current: Dict[Tuple[int, str], Dict],
+    previous_times: Dict[str, Tuple[int, int]], cpu_times: Dict[str, Tuple[int, int]]
+) -> Dict[Tuple[int, str], Dict]:
+    """依兩次取樣計算各 pair / 角色 dperf 行程的資源使用
+
+    CPU 使用率以單一核心為 100%（與 top 相同），期間長度由 /proc/stat 總 jiffies / 核心數換算；
+    行程在兩次取樣之間重新啟動（pid 改變）時本次略過，下一次取樣再以新的行程計算。
+
+    Returns:
+        {(pair 索引, 角色): {'pids': 行程數, 'cpu_usage': %, 'cpu_time': 累計秒數, 'rss_mb': MB, 'hugetlb_mb': MB}}
+    """
+    if 'cpu' not in previous_times or 'cpu' not in cpu_times:
+        return {}
+    cores = sum(1 for name in cpu_times if name != 'cpu') or 1
+    elapsed = (cpu_times['cpu'][1] - previous_times['cpu'][1]) / cores
+    if elapsed <= 0:
+        return {}
+
+    usage = {}
+    for key, stats in current.items():
+        last = previous.get(key)
+        if not last or last['pids'] != stats['pids'] or stats['jiffies'] < last['jiffies']:
+            continue
+        usage[key] = {
+            'pids': len(stats['pids']),
+            'cpu_usage': (stats['jiffies'] - last['jiffies']) * 100.0 / elapsed,
+            'cpu_time': stats['jiffies'] / USER_HZ,
+            'rss_mb': stats['rss_kb'] / 1024,
+            'hugetlb_mb': stats['hugetlb_kb'] / 1024,
+        }
+    return usage
+
+
+def per_core_usage(previous: Dict[str, Tuple[int, int]], current: Dict[str, Tuple[int, int]]) -> Dict[int, float]:
+    """依兩次 /proc/stat 的 cpuN 行計算每個核心的使用率
+
+    Returns:
+        {核心編號: 使用率 %}，只包含兩次取樣都有且可計算差值的核心
+    """
+    usage = {}
+    for name, times in current.items():
+        if name == 'cpu' or name not in previous:
+            continue
+        value = cpu_usage_percent(previous[name], times)
+        if value is not None:
+            usage[int(name[3:])] = value
+    return usage
+
+
+def parse_dperf_cpus(config_text: str) -> List[int]:
+    """解析 dperf 配置檔的 cpu 欄位（如 'cpu 0-3 8 9'），返回核心編號列表"""
+    for line in config_text.splitlines():
+        parts = line.split()
+        if not parts or parts[0] != 'cpu':
+            continue
+        cores = []
+        for token in parts[1:]:
+            start, _, end = token.partition('-')
+            cores.extend(range(int(start), int(end or start) + 1))
+        return cores
+    return []
+
+
+def load_worker_cores(pair_indexes: Iterable[int], config_dir: str = "config") -> Dict[int, Tuple[int, str]]:
+    """讀取產生的 dperf 配置檔（config/server_pairN.conf、config/client_pairN.conf），
+    建立 核心 -> (pair 索引, 角色) 的對應
+
+    Args:
+        pair_indexes: 要讀取的 pair 索引
+        config_dir: dperf 配置檔所在目錄
+
+    Returns:
+        {核心編號: (pair 索引, 'server' 或 'client')}；配置檔不存在的 pair 略過
+    """
+    worker_cores: Dict[int, Tuple[int, str]] = {}
+    for pair_index in pair_indexes:
+        for role in ("server", "client"):
+            path = f"{config_dir}/{role}_pair{pair_index}.conf"
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                cores = parse_dperf_cpus(f.read())
+            for core in cores:
+                if core in worker_cores:
+                    owner = worker_cores[core]
+                    print(f"[SystemMonitor] 警告: 核心 {core} 同時分配給 Pair {owner[0]} {owner[1]} "
+                          f"與 Pair {pair_index} {role}")
+                    continue
+                worker_cores[core] = (pair_index, role)
+    return worker_cores
+
+
+def cpu_usage_percent(previous: Tuple[int, int], current: Tuple[int, int]) -> Optional[float]:
+    """依兩次 /proc/stat 的累計 jiffies 計算期間內的 CPU 使用率，計數器重置時返回 None"""
+    busy = current[0] - previous[0]
+    total = current[1] - previous[1]
+    if total <= 0 or busy < 0:
+        return None
+    return min(100.0, busy * 100.0 / total)
+
+
+def memory_usage(meminfo: Dict[str, int]) -> Tuple[int, int, float]:
+    """依 /proc/meminfo 計算 (已使用 MB, 總量 MB, 使用率 %)，已使用為 MemTotal - MemAvailable"""
+    total = meminfo.get('MemTotal', 0)
+    available = meminfo.get('MemAvailable')
+    if available is None:
+        # 3.14 以前的核心沒有 MemAvailable
+        available = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+    used = max(0, total - available)
+    return used // 1024, total // 1024, (used * 100.0 / total) if total else 0.0
 
 
 class SystemMonitor:
@@ -16,7 +376,11 @@ class SystemMonitor:
 
     def __init__(self, management_ip: str, management_port: int, username: str, password: str,
                  log_path: str = "./logs", redis_host: str = "localhost", redis_port: int = 6379,
-                 redis_db: int = 0, enable_redis: bool = True):
+                 redis_db: int = 0, enable_redis: bool = True, storage_backend: str = "redis",
+                 sqlite_path: str = "./results/array_script.db", sampling_mode: str = "stream",
+                 interval: float = 1.0, saturation_threshold: float = 90.0, buffer_capacity: int = 65536,
+                 sink_format: str = "csv", flush_interval: float = 5.0, flush_bytes: int = 65536,
+                 metrics: Optional[MetricsRegistry] = None):
         """初始化系統監控器
 
         Args:
@@ -29,10 +393,57 @@ class SystemMonitor:
             redis_port: Redis 埠號
             redis_db: Redis 資料庫編號
             enable_redis: 是否啟用 Redis 儲存
+            storage_backend: 儲存後端 ('redis' 或 'sqlite')
+            sqlite_path: storage_backend 為 'sqlite' 時的資料庫檔案路徑
+            sampling_mode: 'stream' 在獨立 channel 上常駐遠端取樣迴圈並逐行解析，
+                'poll' 每次取樣在持久 session 中執行一次指令
+            interval: 取樣間隔（秒），最短 0.1
+            saturation_threshold: dperf worker 核心使用率達到此值（%）時標記為飽和
+            buffer_capacity: 記憶體中保存的監控數據列數上限，滿時較舊的數據降採樣
+            sink_format: 監控數據輸出格式 ('csv'、'jsonl' 或 'binary')
+            flush_interval: 輸出檔案每隔多少秒寫出一次
+            flush_bytes: 輸出檔案的緩衝區大小，累積超過時寫出
+            metrics: OpenMetrics 端點的 MetricsRegistry，每筆取樣時更新（可選）
+
+        Raises:
+            ValueError: 不支援的取樣模式、輸出格式或取樣間隔小於 0.1 秒
         """
+        if sink_format not in SINK_FORMATS:
+            raise ValueError(f"不支援的監控輸出格式: {sink_format}")
+        if sampling_mode not in ("stream", "poll"):
+            raise ValueError(f"不支援的取樣模式: {sampling_mode}")
+        if interval < MIN_INTERVAL:
+            raise ValueError(f"取樣間隔不可小於 {MIN_INTERVAL} 秒: {interval}")
+        self.sampling_mode = sampling_mode
+        self.sink_format = sink_format
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.metrics = metrics
+        self._sink = None
+        self.interval = interval
+        self.missed_ticks = 0
+        # 受監控主機時鐘減去控制端 time.time() 的差（秒），串流取樣以遠端時間記錄，輪詢取樣為 0；
+        # 每次串流開始時更新，之前的值在下一次取到遠端時間前沿用
+        self.clock_offset = 0.0
+        self._stop_event = Event()
+        self.saturation_threshold = saturation_threshold
+        # dperf worker 核心 -> (pair 索引, 角色)，由 set_worker_cores() 設定
+        self.worker_cores: Dict[int, Tuple[int, str]] = {}
+        # 各 worker 核心的累計統計，由 get_core_report() 彙整
+        self._core_stats: Dict[int, Dict[str, float]] = {}
+        self._stream = None
         self.monitoring = False
-        self.monitor_data = []
+        # 固定容量的監控數據（struct-of-arrays），長時間測試時較舊的數據自動降採樣
+        self.buffer = MonitorBuffer(buffer_capacity)
         self.monitor_thread = None
+        # 上一次取樣的 /proc/stat 累計 jiffies 與 dperf 行程（parse_process_sample() 的結果）
+        self._last_cpu_times: Dict[str, Tuple[int, int]] = {}
+        self._last_processes: Dict[Tuple[int, str], Dict] = {}
+        # 各 pair / 角色的 dperf 行程取樣（每個 series 最多 buffer_capacity 筆）
+        self.process_data: Dict[Tuple[int, str], deque] = {}
+        # hugepage 耗盡事件與各 (節點, 頁大小) 尚未結束的事件
+        self.depletion_events: List[Dict] = []
+        self._open_depletions: Dict[Tuple[int, int], Dict] = {}
 
         if log_path is None or log_path == "":
             log_path = "./logs"
@@ -54,16 +465,30 @@ class SystemMonitor:
         self.redis_handler = None
         if self.enable_redis:
             try:
-                self.redis_handler = RedisHandler(host=redis_host, port=redis_port, db=redis_db)
+                self.redis_handler = open_storage_handler(
+                    storage_backend, redis_host=redis_host, redis_port=redis_port, redis_db=redis_db,
+                    sqlite_path=sqlite_path
+                )
                 if self.redis_handler.is_connected():
-                    print("[SystemMonitor] Redis 已啟用並成功連接")
+                    print(f"[SystemMonitor] 儲存後端 ({storage_backend}) 已啟用並成功連接")
                 else:
-                    print("[SystemMonitor] Redis 連接失敗，將僅使用本地儲存")
-                    self.redis_handler = None
+                    # 保留 handler 交給寫入佇列，後端恢復後由佇列重新連接並補寫
+                    print("[SystemMonitor] Redis 連接失敗，數據先暫存到本地，恢復後自動補寫")
             except Exception as e:
                 print(f"[SystemMonitor] Redis 初始化失敗: {e}，將僅使用本地儲存")
                 self.redis_handler = None
 
+        # Redis 寫入由背景佇列處理，監控迴圈不會因 Redis 緩慢或斷線而延遲；
+        # Redis 無法使用時數據暫存到本地，下次可用時補寫
+        self.writer = None
+        if self.enable_redis:
+            self.writer = WriteBehindQueue(
+                self.redis_handler,
+                spill_path=f"{log_path}/redis_spill_monitor.jsonl",
+                name="SystemMonitor-Writer",
+                metrics=metrics,
+            ).start()
+
     def connect(self):
         """連接到遠端主機"""
         self.executor.connect(persistent_session=True)
@@ -71,8 +496,12 @@ class SystemMonitor:
     def disconnect(self):
         """斷開與遠端主機的連接"""
         self.executor.close()
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
         if self.redis_handler:
             self.redis_handler.close()
+            self.redis_handler = None
 
     def start(self, output_file: str|None = None):
         """開始監控（在新執行緒中執行）
@@ -90,132 +519,378 @@ class SystemMonitor:
     def stop(self):
         """停止監控"""
         self.monitoring = False
+        self._stop_event.set()
         print("[SystemMonitor] 正在停止監控...")
+        stream = self._stream
+        if stream:
+            stream.close()
 
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=5)
             if self.monitor_thread.is_alive():
                 print("[SystemMonitor] 警告: 監控線程未能正常結束")
 
+    def _sample_from(self, output: str) -> Optional[Tuple[float, int, int, float, Dict[int, float], Dict, Dict]]:
+        """由一次 /proc 讀取的內容計算 CPU、RAM、各節點 hugepages 與各 pair 的 dperf 行程資源
+
+        Returns:
+            (cpu_usage %, ram_used MB, ram_total MB, ram_usage %, {核心編號: 使用率 %},
+            {(pair 索引, 角色): 行程資源，見 process_usage()}, parse_hugepage_sample() 的結果)；
+            沒有上一次取樣可計算 CPU 差值時返回 None
+        """
+        system, marker, processes = output.partition(PROCESS_MARKER)
+        cpu_times, meminfo = parse_proc_sample(system)
+        if 'cpu' not in cpu_times or 'MemTotal' not in meminfo:
+            raise ValueError("無法解析 /proc/stat 或 /proc/meminfo 的輸出")
+
+        previous_times = self._last_cpu_times
+        previous = previous_times.get('cpu')
+        previous_processes = self._last_processes
+        self._last_cpu_times = cpu_times
+        self._last_processes = parse_process_sample(marker + processes)
+        cpu_usage = cpu_usage_percent(previous, cpu_times['cpu']) if previous else None
+        if cpu_usage is None:
+            return None
+        return (
+            cpu_usage, *memory_usage(meminfo), per_core_usage(previous_times, cpu_times),
+            process_usage(previous_processes, self._last_processes, previous_times, cpu_times),
+            parse_hugepage_sample(system),
+        )
+
+    def set_worker_cores(self, worker_cores: Dict[int, Tuple[int, str]]) -> None:
+        """設定 dperf worker 核心的歸屬並重置飽和統計
+
+        Args:
+            worker_cores: {核心編號: (pair 索引, 角色)}，通常由 load_worker_cores() 產生
+        """
+        self.worker_cores = dict(worker_cores)
+        self._core_stats = {}
+
+    def _track_cores(self, timestamp: str, core_usage: Dict[int, float]) -> None:
+        """累計 worker 核心的使用率，核心進入飽和時輸出警告"""
+        for core, (pair_index, role) in self.worker_cores.items():
+            usage = core_usage.get(core)
+            if usage is None:
+                continue
+            stats = self._core_stats.setdefault(
+                core, {'samples': 0, 'total': 0.0, 'max': 0.0, 'saturated': 0, 'in_saturation': False}
+            )
+            stats['samples'] += 1
+            stats['total'] += usage
+            stats['max'] = max(stats['max'], usage)
+            saturated = usage >= self.saturation_threshold
+            if saturated:
+                stats['saturated'] += 1
+                if not stats['in_saturation']:
+                    print(f"[SystemMonitor] 警告: Pair {pair_index} {role} 核心 {core} 使用率 "
+                          f"{usage:.1f}% 達到飽和門檻 {self.saturation_threshold:g}% ({timestamp})")
+            stats['in_saturation'] = saturated
+
+    def _track_hugepages(self, timestamp: str, hugepages: Dict[Tuple[int, int], Dict[str, int]]) -> None:
+        """記錄 hugepage 耗盡事件：有配置 hugepages 的節點可用頁數降為 0 時開始，恢復時結束"""
+        for (node, page_kb), pages in sorted(hugepages.items()):
+            depleted = pages['total'] > 0 and pages['free'] == 0
+            event = self._open_depletions.get((node, page_kb))
+            if depleted and event is None:
+                print(f"[SystemMonitor] 警告: NUMA 節點 {node} 的 {page_kb} kB hugepages 已耗盡 "
+                      f"({pages['total']} 頁全部使用中，{timestamp})")
+                event = {
+                    'type': 'hugepage_depleted', 'node': node, 'page_size_kb': page_kb,
+                    'total_pages': pages['total'], 'start': timestamp, 'end': None, 'samples': 0,
+                }
+                self._open_depletions[(node, page_kb)] = event
+                self.depletion_events.append(event)
+            elif not depleted and event is not None:
+                event['end'] = timestamp
+                del self._open_depletions[(node, page_kb)]
+            if depleted:
+                event['samples'] += 1
+
+    def get_depletion_events(self) -> List[Dict]:
+        """獲取監控期間的 hugepage 耗盡事件
+
+        Returns:
+            List[Dict]: 依發生順序，每筆包含 type（'hugepage_depleted'）、node、page_size_kb、total_pages、
+                start、end（監控結束時仍耗盡為 None）與 samples（耗盡期間的取樣數）
+        """
+        return [dict(event) for event in self.depletion_events]
+
+    def get_core_report(self) -> List[Dict]:
+        """彙整各 dperf worker 核心在監控期間的使用率
+
+        Returns:
+            List[Dict]: 依核心編號排序，每筆包含 core、pair_index、role、samples、avg_usage、
+                max_usage、saturated_samples 與 saturated（曾達到飽和門檻）
+        """
+        report = []
+        for core in sorted(self.worker_cores):
+            pair_index, role = self.worker_cores[core]
+            stats = self._core_stats.get(core, {'samples': 0, 'total': 0.0, 'max': 0.0, 'saturated': 0})
+            report.append({
+                'core': core,
+                'pair_index': pair_index,
+                'role': role,
+                'samples': stats['samples'],
+                'avg_usage': round(stats['total'] / stats['samples'], 2) if stats['samples'] else None,
+                'max_usage': round(stats['max'], 2),
+                'saturated_samples': stats['saturated'],
+                'saturated': stats['saturated'] > 0,
+            })
+        return report
+
+    def _sample(self) -> Optional[Tuple[float, int, int, float, Dict[int, float], Dict, Dict]]:
+        """在持久 session 中以單一指令讀取 /proc/stat 與 /proc/meminfo
+
+        Returns:
+            同 _sample_from()
+        """
+        start = time.perf_counter()
+        result = self.executor.execute_command(PROC_SAMPLE_CMD)
+        self._observe_latency(time.perf_counter() - start)
+        return self._sample_from(result[0] if result else "")
+
+    def _observe_latency(self, seconds: float) -> None:
+        """記錄一次取樣指令的 SSH 往返時間"""
+        if self.metrics:
+            self.metrics.observe('array_script_ssh_command_latency_seconds', seconds, source='system_monitor')
+
+    def _record(self, now: float, monotonic: float,
+                sample: Tuple[float, int, int, float, Dict[int, float], Dict, Dict]) -> None:
+        """記錄一筆取樣：加入記憶體、寫入監控輸出並排入 Redis 寫入佇列
+
+        Args:
+            now: 取樣時間（epoch 秒數）
+            monotonic: 取樣時的 time.monotonic()
+            sample: _sample_from() 的結果
+        """
+        cpu_usage, ram_used, ram_total, ram_usage, core_usage, processes, hugepages = sample
+        timestamp = format_sample_time(now)
+        self._track_cores(timestamp, core_usage)
+        self._track_hugepages(timestamp, hugepages)
+
+        # 記錄數據
+        self.buffer.append(now, monotonic, cpu_usage, ram_used, ram_total, ram_usage, core_usage)
+        self._record_processes(timestamp, now, processes)
+        if self.metrics:
+            self._publish(cpu_usage, ram_used, ram_usage, core_usage, processes, hugepages)
+
+        # 寫入監控輸出（保持開啟的緩衝檔案，依 flush 政策寫出）
+        if self._sink:
+            self._sink.write({
+                'timestamp': timestamp,
+                'epoch': now,
+                'monotonic': monotonic,
+                'cpu_usage': cpu_usage,
+                'ram_used': ram_used,
+                'ram_total': ram_total,
+                'ram_usage': ram_usage,
+                'core_usage': core_usage,
+                'process_usage': processes,
+                'hugepages': hugepages,
+            })
+
+        # 排入 Redis 寫入佇列（如果啟用），不等待寫入完成
+        if self.writer:
+            self.writer.put_monitor(0, {  # 系統級監控使用 0 作為標識
+                'timestamp': now,
+                'cpu_usage': round(cpu_usage, 2),
+                'ram_used': ram_used,
+                'ram_total': ram_total,
+                'ram_usage': round(ram_usage, 2)
+            })
+
+    def _publish(self, cpu_usage: float, ram_used: int, ram_usage: float, core_usage: Dict[int, float],
+                 processes: Dict[Tuple[int, str], Dict], hugepages: Dict[Tuple[int, int], Dict[str, int]]) -> None:
+        """以最新一筆取樣更新 OpenMetrics 指標"""
+        metrics = self.metrics
+        metrics.set('array_script_host_cpu_usage_percent', round(cpu_usage, 2))
+        metrics.set('array_script_host_ram_used_megabytes', ram_used)
+        metrics.set('array_script_host_ram_usage_percent', round(ram_usage, 2))
+        metrics.set_many('array_script_core_cpu_usage_percent',
+                         {core: round(usage, 2) for core, usage in core_usage.items()}, key='core')
+        for (pair_index, role), usage in processes.items():
+            for field, name in (('cpu_usage', 'cpu_usage_percent'), ('cpu_time', 'cpu_time_seconds'),
+                                ('rss_mb', 'rss_megabytes'), ('hugetlb_mb', 'hugetlb_megabytes')):
+                metrics.set(f'array_script_dperf_process_{name}', round(usage[field], 2), pair=pair_index, role=role)
+        for (node, page_kb), pages in hugepages.items():
+            metrics.set('array_script_hugepages_total', pages['total'], node=node, page_size_kb=page_kb)
+            metrics.set('array_script_hugepages_free', pages['free'], node=node, page_size_kb=page_kb)
+
+    def _record_processes(self, timestamp: str, now: float, processes: Dict[Tuple[int, str], Dict]) -> None:
+        """記錄各 pair / 角色的 dperf 行程資源，並以各自的 pair 與角色排入 Redis 寫入佇列"""
+        for (pair_index, role), usage in processes.items():
+            sample = {
+                'pids': usage['pids'],
+                'cpu_usage': round(usage['cpu_usage'], 2),
+                'cpu_time': round(usage['cpu_time'], 2),
+                'rss_mb': round(usage['rss_mb'], 2),
+                'hugetlb_mb': round(usage['hugetlb_mb'], 2),
+            }
+            series = self.process_data.get((pair_index, role))
+            if series is None:
+                series = self.process_data[(pair_index, role)] = deque(maxlen=self.buffer.capacity)
+            series.append({'pair_index': pair_index, 'role': role, 'timestamp': timestamp, 'epoch': now, **sample})
+            if self.writer:
+                self.writer.put_process(pair_index, role, {'timestamp': now, **sample})
+
     def _monitor_loop(self, output_file: str|None = None):
-        """監控迴圈，每秒記錄一次 CPU 和 RAM 使用率
+        """監控迴圈，每 interval 秒記錄一次 CPU 和 RAM 使用率
 
         Args:
             output_file: 輸出檔案路徑
         """
         self.monitoring = True
-        self.monitor_data = []
+        self._stop_event.clear()
+        self.buffer.clear()
+        self.missed_ticks = 0
+        self._last_cpu_times = {}
+        self._last_processes = {}
+        self.process_data = {}
+        self.depletion_events = []
+        self._open_depletions = {}
+        self._core_stats = {}
 
         print("[SystemMonitor] 開始監控 CPU 和 RAM...")
 
-        # 建立監控數據的 CSV 文件路徑
+        # 建立監控數據的輸出檔案路徑
         if output_file is None:
-            output_file = f"{self.log_path}/system_monitor.csv"
+            output_file = f"{self.log_path}/system_monitor{SINK_EXTENSIONS[self.sink_format]}"
 
-        # 寫入 CSV 標題
-        with open(output_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Timestamp', 'CPU_Usage_Percent', 'RAM_Used_MB', 'RAM_Total_MB', 'RAM_Usage_Percent'])
+        # 整個監控期間保持同一個有緩衝的檔案，停止時 fsync
+        self._sink = open_monitor_sink(
+            self.sink_format, output_file, flush_bytes=self.flush_bytes,
+            flush_interval=self.flush_interval, worker_cores=self.worker_cores
+        )
+        try:
+            if self.sampling_mode == "stream":
+                try:
+                    self._stream_loop()
+                except Exception as e:
+                    print(f"[SystemMonitor] 串流取樣失敗: {e}")
+                if self.monitoring:
+                    print("[SystemMonitor] 串流取樣中斷，改用輪詢取樣")
+                    self._last_cpu_times = {}
+                    self._last_processes = {}
+
+            self._poll_loop()
+        finally:
+            self._sink.close()
+            self._sink = None
+
+        if self.missed_ticks:
+            print(f"[SystemMonitor] 取樣耗時超過間隔，共略過 {self.missed_ticks} 次取樣")
+        for entry in self.get_core_report():
+            if entry['saturated']:
+                print(f"[SystemMonitor] Pair {entry['pair_index']} {entry['role']} 核心 {entry['core']} "
+                      f"飽和 {entry['saturated_samples']}/{entry['samples']} 次取樣 "
+                      f"(平均 {entry['avg_usage']}%，最高 {entry['max_usage']}%)，瓶頸可能在流量產生器")
+        for event in self.depletion_events:
+            print(f"[SystemMonitor] NUMA 節點 {event['node']} 的 {event['page_size_kb']} kB hugepages "
+                  f"耗盡 {event['samples']} 次取樣 ({event['start']} ~ {event['end'] or '監控結束'})")
+        print(f"[SystemMonitor] 監控已停止，數據已保存到 {output_file}")
+
+    def _stream_loop(self) -> None:
+        """串流取樣：遠端迴圈常駐在獨立 channel，依遠端時鐘輸出 /proc 內容，控制端逐行解析，
+        每讀到一個結尾標記即記錄一筆，沒有每筆取樣的請求/回應往返
 
+        取樣時間使用結尾標記中的遠端時間：epoch 作為 timestamp，/proc/uptime 以 TickScheduler.align()
+        對齊時間格點並計算略過的 tick，換算為控制端 time.monotonic() 的刻度後作為 monotonic。
+        """
+        self._stream = self.executor.open_stream(stream_sample_cmd(self.interval))
+        scheduler = TickScheduler(self.interval, self._stop_event)
+        # (第一筆取樣的遠端 uptime, 控制端 monotonic)
+        origin = None
+        try:
+            frame = []
+            for line in self._stream.lines():
+                if not self.monitoring:
+                    break
+                try:
+                    stamp = parse_stream_marker(line)
+                except ValueError as e:
+                    print(f"[SystemMonitor] 監控錯誤: {e}")
+                    frame = []
+                    continue
+                if stamp is None:
+                    frame.append(line)
+                    continue
+                output, frame = "\n".join(frame), []
+                uptime, now = stamp
+                if not scheduler.align(uptime):
+                    continue
+                if origin is None:
+                    origin = (uptime, time.monotonic())
+                    self.clock_offset = now - time.time()
+                try:
+                    sample = self._sample_from(output)
+                    if sample is not None:
+                        self._record(now, origin[1] + uptime - origin[0], sample)
+                except Exception as e:
+                    print(f"[SystemMonitor] 監控錯誤: {e}")
+        finally:
+            self.missed_ticks += scheduler.missed
+            self._stream.close()
+            self._stream = None
+
+    def _poll_loop(self) -> None:
+        """輪詢取樣：每個 tick 在持久 session 中執行一次取樣指令"""
+        # 輪詢取樣以控制端時間記錄
+        self.clock_offset = 0.0
+        scheduler = TickScheduler(self.interval, self._stop_event)
         while self.monitoring:
             try:
-                # 獲取當前時間戳
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                # 獲取 CPU 使用率（使用 top 命令）
-                cpu_cmd = "top -bn1 | grep 'Cpu(s)' | awk '{print $8}'"
-                cpu_result = self.executor.execute_command(cpu_cmd)
-
-                # 清理輸出：移除 ANSI 轉義序列和額外的換行符
-                cpu_output = OutputHandler.clean_ansi(cpu_result[0]) if cpu_result else ""
-
-                # 提取數字部分
-                cpu_lines = [line.strip() for line in cpu_output.split('\n') if line.strip()]
-                cpu_idle = 0
-                for line in reversed(cpu_lines):
-                    try:
-                        if line and not line.startswith('[') and '#' not in line:
-                            cpu_idle = float(line)
-                            break
-                    except ValueError:
-                        continue
-
-                cpu_usage = 100 - cpu_idle
-
-                # 獲取 RAM 使用情況（使用 free 命令）
-                ram_cmd = "free -m | grep Mem | awk '{print $3, $2}'"
-                ram_result = self.executor.execute_command(ram_cmd)
-
-                # 清理輸出
-                ram_output = OutputHandler.clean_ansi(ram_result[0]) if ram_result else ""
-                ram_lines = [line.strip() for line in ram_output.split('\n') if line.strip()]
-
-                ram_used = 0
-                ram_total = 0
-                ram_usage = 0
-
-                for line in reversed(ram_lines):
-                    try:
-                        if line and not line.startswith('[') and '#' not in line:
-                            ram_parts = line.split()
-                            if len(ram_parts) >= 2:
-                                ram_used = int(ram_parts[0])
-                                ram_total = int(ram_parts[1])
-                                ram_usage = (ram_used / ram_total) * 100
-                                break
-                    except (ValueError, IndexError):
-                        continue
-
-                # 記錄數據
-                data_point = {
-                    'timestamp': timestamp,
-                    'cpu_usage': round(cpu_usage, 2),
-                    'ram_used': ram_used,
-                    'ram_total': ram_total,
-                    'ram_usage': round(ram_usage, 2)
-                }
-                self.monitor_data.append(data_point)
-
-                # 寫入 CSV 文件
-                with open(output_file, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        timestamp,
-                        round(cpu_usage, 2),
-                        ram_used,
-                        ram_total,
-                        round(ram_usage, 2)
-                    ])
-
-                # 寫入 Redis（如果啟用）
-                if self.redis_handler and self.redis_handler.is_connected():
-                    success = self.redis_handler.save_monitor_data(
-                        pair_index=0,  # 系統級監控使用 0 作為標識
-                        timestamp=timestamp,
-                        cpu_usage=round(cpu_usage, 2),
-                        ram_used=ram_used,
-                        ram_total=ram_total,
-                        ram_usage=round(ram_usage, 2)
-                    )
-                    if not success:
-                        print("[SystemMonitor] 警告: 監控數據寫入 Redis 失敗")
-
-                # 每秒收集一次數據
-                time.sleep(1)
-
+                # 取樣開始時的 wall-clock（供 Redis 與 CSV 使用）與 monotonic 時間
+                now, monotonic = time.time(), time.monotonic()
+                sample = self._sample()
+                if sample is not None:
+                    self._record(now, monotonic, sample)
             except Exception as e:
                 print(f"[SystemMonitor] 監控錯誤: {e}")
-                time.sleep(1)
 
-        print(f"[SystemMonitor] 監控已停止，數據已保存到 {output_file}")
+            # 依 monotonic 時間格點等待下一次取樣（第一次取樣只建立 CPU 計數基準）
+            if not scheduler.wait():
+                break
+        self.missed_ticks += scheduler.missed
+
+    def remote_time(self) -> float:
+        """以取樣使用的時鐘表示目前時間（time.time() 加上 clock_offset），供其他監控對齊時間戳"""
+        return time.time() + self.clock_offset
 
     def get_data(self):
-        """獲取監控數據
+        """獲取監控數據（由緩衝區複製為字典列表）
 
         Returns:
-            list: 監控數據列表
+            list: 監控數據列表，每筆的 timestamp 為毫秒精度字串、epoch 為 epoch 秒數，
+                其餘欄位見 MonitorBuffer.to_records()；已降採樣的列 count 大於 1，數值為區間平均
+        """
+        records = self.buffer.to_records()
+        for record in records:
+            record['epoch'] = record['timestamp']
+            record['timestamp'] = format_sample_time(record['epoch'])
+        return records
+
+    def get_process_data(self, pair_index: int, role: Optional[str] = None) -> List[Dict]:
+        """獲取指定 pair 的 dperf 行程監控數據
+
+        Args:
+            pair_index: pair 索引
+            role: 'server' 或 'client'，None 時包含兩者
+
+        Returns:
+            list: 依時間排序，每筆包含 pair_index、role、timestamp（毫秒精度字串）、epoch、pids（行程數）、
+                cpu_usage（% of 單一核心）、cpu_time（累計秒數）、rss_mb 與 hugetlb_mb
+        """
+        roles = (role,) if role else ("server", "client")
+        records = [record for r in roles for record in self.process_data.get((pair_index, r), ())]
+        return sorted(records, key=lambda record: record['epoch'])
+
+    def get_arrays(self):
+        """以 NumPy 視圖取得監控數據（不複製），見 MonitorBuffer.arrays()
+
+        Returns:
+            Dict[str, np.ndarray]: 欄位名稱 -> 唯讀陣列
         """
-        return self.monitor_data
+        return self.buffer.arrays()
 
     def get_redis_monitor_data(self, start_time=None, end_time=None):
         """從 Redis 獲取監控數據
@@ -228,6 +903,8 @@ class SystemMonitor:
             list: 監控數據列表
         """
         if self.redis_handler and self.redis_handler.is_connected():
+            if self.writer:
+                self.writer.flush()
             return self.redis_handler.get_monitor_data(0, start_time, end_time)
         else:
             return []
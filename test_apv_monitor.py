@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""測試 APV 統計監控"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from apv_monitor import APVMonitor, DEFAULT_APV_COMMANDS, parse_apv_stats, slb_object_names
+from config import Config, TrafficGeneratorPair
+
+
+SYSTEM_OUTPUT = (
+    "AN#show statistics system\r\n"
+    "\x1b[0mCPU Utilization: 35%   Memory Used: 1,024 MB\r\n"
+    "Current Connections      1520\r\n"
+    "AN#"
+)
+
+SLB_OUTPUT = (
+    "AN#show statistics slb virtual\r\n"
+    "Virtual service tcp_slb_vs: 10.10.11.101:6769\r\n"
+    "  Current connections: 12\r\n"
+    "  Bytes in: 2048\r\n"
+    "Virtual service tcp_slb_vs2:\r\n"
+    "  Current connections: 3\r\n"
+    "AN#"
+)
+
+
+def _config(pair_count=1, protocol="tcp"):
+    config = Config()
+    config.test.traffic_generator.pairs = [TrafficGeneratorPair(protocol=protocol) for _ in range(pair_count)]
+    config.test.apv_monitor.interval = 0.1
+    return config
+
+
+class TestParseApvStats(unittest.TestCase):
+    """測試 APV 統計輸出的解析"""
+
+    def test_system_counters(self):
+        """測試略過提示符與回顯，解析「名稱: 數值」與行尾數值"""
+        self.assertEqual(parse_apv_stats(SYSTEM_OUTPUT, "system"), {
+            "system.cpu_utilization": 35,
+            "system.memory_used": 1024,
+            "system.current_connections": 1520,
+        })
+
+    def test_counters_scoped_by_slb_object(self):
+        """測試數值歸屬於最近出現的 SLB 物件，名稱相近的物件不會誤判"""
+        metrics = parse_apv_stats(SLB_OUTPUT, "slb_virtual", ["tcp_slb_vs", "tcp_slb_vs2"])
+        self.assertEqual(metrics["slb_virtual.tcp_slb_vs.current_connections"], 12)
+        self.assertEqual(metrics["slb_virtual.tcp_slb_vs.bytes_in"], 2048)
+        self.assertEqual(metrics["slb_virtual.tcp_slb_vs2.current_connections"], 3)
+
+    def test_slb_object_names_follow_apv_setup(self):
+        """測試物件名稱與 APVSetup 建立的名稱相同"""
+        pairs = [TrafficGeneratorPair(protocol="TCP"), TrafficGeneratorPair(protocol="udp")]
+        self.assertEqual(slb_object_names(pairs), ["tcp_slb_vs", "tcp_rs_0", "udp_slb_vs", "udp_rs_1"])
+
+
+class TestAPVMonitor(unittest.TestCase):
+    """測試監控迴圈（以 Mock 取代 SSH 連線）"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _monitor(self, config):
+        with patch("apv_monitor.SSHExecutor"):
+            monitor = APVMonitor(config, log_path=self.tmpdir.name, enable_redis=False)
+        monitor.executor = MagicMock()
+        return monitor
+
+    def test_samples_recorded_with_run_id(self):
+        """測試每個 tick 執行各區段指令，樣本帶有 run_id 並寫入 JSONL 與寫入佇列"""
+        monitor = self._monitor(_config())
+        outputs = {DEFAULT_APV_COMMANDS["system"]: SYSTEM_OUTPUT}
+        calls = []
+
+        def execute(command):
+            calls.append(command)
+            if len(calls) == 2 * len(DEFAULT_APV_COMMANDS):
+                monitor.monitoring = False
+            return outputs.get(command, ""), "", 0
+
+        monitor.executor.execute_command.side_effect = execute
+        monitor.writer = MagicMock()
+        monitor.run_id = "run-1"
+        monitor.monitoring = True
+
+        monitor._monitor_loop()
+
+        data = monitor.get_data()
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]["run_id"], "run-1")
+        self.assertEqual(data[0]["metrics"]["system.cpu_utilization"], 35)
+        self.assertEqual(len(data[0]["timestamp"]), 23)
+        self.assertEqual(calls[:3], list(DEFAULT_APV_COMMANDS.values()))
+        run_id, sample = monitor.writer.put_apv.call_args[0]
+        self.assertEqual((run_id, sample["timestamp"]), ("run-1", data[1]["epoch"]))
+
+        with open(os.path.join(self.tmpdir.name, "apv_monitor.jsonl")) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["epoch"] for line in lines], [d["epoch"] for d in data])
+
+    def test_samples_use_injected_clock(self):
+        """測試取樣時間使用傳入的時鐘（例如 SystemMonitor.remote_time），而非控制端 time.time()"""
+        with patch("apv_monitor.SSHExecutor"):
+            monitor = APVMonitor(_config(), log_path=self.tmpdir.name, enable_redis=False, clock=lambda: 5000.25)
+        monitor.executor = MagicMock()
+
+        def execute(command):
+            monitor.monitoring = False
+            return SYSTEM_OUTPUT, "", 0
+
+        monitor.executor.execute_command.side_effect = execute
+        monitor.monitoring = True
+
+        monitor._monitor_loop()
+
+        self.assertEqual(monitor.get_data()[0]["epoch"], 5000.25)
+
+    def test_connect_enters_enable_mode(self):
+        """測試連線後以 enable 密碼進入 enable 模式"""
+        config = _config()
+        config.test.apv_enable_password = "secret"
+        monitor = self._monitor(config)
+
+        monitor.connect()
+
+        monitor.executor.connect.assert_called_once_with(persistent_session=True)
+        self.assertEqual([c.args[0] for c in monitor.executor.execute_command.call_args_list], ["enable", "secret"])
+
+    def test_minimum_interval(self):
+        """測試取樣間隔過短"""
+        config = _config()
+        config.test.apv_monitor.interval = 0.01
+        with self.assertRaises(ValueError):
+            self._monitor(config)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
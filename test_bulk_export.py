@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""測試批次匯出"""
+
+import csv
+import glob
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from bulk_export import BulkExporter, pa
+from sqlite_storage import SQLiteHandler
+
+
+def _sample(ts, cpu=10.0):
+    return {"timestamp": ts, "cpu_usage": cpu, "ram_used": 512, "ram_total": 1024, "ram_usage": 50.0}
+
+
+def _process(ts):
+    return {"timestamp": ts, "cpu_usage": 99.0, "cpu_time": 1.0, "rss_mb": 2.0, "hugetlb_mb": 1024.0, "pids": 1}
+
+
+class TestBulkExporter(unittest.TestCase):
+    """測試依日期與配置分區的串流匯出"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.handler = SQLiteHandler(os.path.join(self.tmpdir.name, "test.db"))
+        self.output_dir = os.path.join(self.tmpdir.name, "export")
+
+        # 兩天、兩種配置各一次執行，另有一次尚未結束的執行
+        day1 = datetime(2026, 1, 1, 12, 0, 0).timestamp()
+        day2 = datetime(2026, 1, 2, 12, 0, 0).timestamp()
+        for run_id, fingerprint, start in (("r1", "cfgA", day1), ("r2", "cfgB", day1 + 60), ("r3", "cfgA", day2)):
+            self.handler.start_run(run_id, fingerprint, [0], start_time=start)
+            self.handler.save_test_output(0, "client", {"pktRx": 100, "state": "ok"}, timestamp=start,
+                                          run_id=run_id, fingerprint=fingerprint, steady={"pktRx.mean": 1.5})
+            self.handler.save_monitor_batch(0, [_sample(start + i) for i in range(25)])
+            self.handler.save_process_batch(0, "server", [_process(start + i) for i in range(25)])
+            if run_id != "r3":
+                self.handler.finish_run(run_id, end_time=start + 9)
+
+    def tearDown(self):
+        self.handler.close()
+        self.tmpdir.cleanup()
+
+    def _read(self, pattern):
+        rows = []
+        for path in sorted(glob.glob(os.path.join(self.output_dir, pattern))):
+            with open(path, newline="") as f:
+                rows.extend(csv.DictReader(f))
+        return rows
+
+    def test_csv_partitions(self):
+        """測試 CSV 依日期與配置分區，監控數據只取執行期間"""
+        exporter = BulkExporter(self.handler, self.output_dir, fmt="csv", run_batch_size=2, page_size=4)
+
+        counts = exporter.export()
+
+        self.assertEqual(counts, {"runs": 3, "test_outputs": 9, "monitor": 20, "process": 20})
+        self.assertEqual(
+            sorted(os.path.relpath(p, self.output_dir) for p in glob.glob(os.path.join(self.output_dir, "*", "*"))),
+            ["date=2026-01-01/config=cfgA", "date=2026-01-01/config=cfgB", "date=2026-01-02/config=cfgA"],
+        )
+        monitor = self._read("date=2026-01-01/config=cfgA/monitor-*.csv")
+        self.assertEqual(len(monitor), 10)
+        self.assertEqual({row["run_id"] for row in monitor}, {"r1"})
+        process = self._read("date=2026-01-01/config=cfgA/process-*.csv")
+        self.assertEqual({(row["run_id"], row["role"], row["pids"]) for row in process}, {("r1", "server", "1")})
+        self.assertEqual(len(process), 10)
+        outputs = self._read("date=2026-01-02/config=cfgA/test_outputs-*.csv")
+        self.assertEqual(
+            sorted((row["section"], row["metric"], row["value"], row["text"]) for row in outputs),
+            [("metrics", "pktRx", "100.0", ""), ("metrics", "state", "", "ok"), ("steady", "pktRx.mean", "1.5", "")],
+        )
+        self.assertEqual(self._read("date=2026-01-02/config=cfgA/runs-*.csv")[0]["end"], "")
+
+    def test_host_monitor_exported_once_per_run(self):
+        """測試多 pair 的執行只匯出一次 pair 0 的主機監控數據，行程取樣依各 pair 匯出"""
+        start = datetime(2026, 1, 3, 12, 0, 0).timestamp()
+        self.handler.start_run("r4", "cfgC", [1, 2], start_time=start)
+        self.handler.save_monitor_batch(0, [_sample(start + i) for i in range(10)])
+        for pair_index in (1, 2):
+            self.handler.save_process_batch(pair_index, "client", [_process(start + i) for i in range(10)])
+        self.handler.finish_run("r4", end_time=start + 4)
+
+        counts = BulkExporter(self.handler, self.output_dir).export(fingerprint="cfgC")
+
+        self.assertEqual((counts["monitor"], counts["process"]), (5, 10))
+        monitor = self._read("date=2026-01-03/config=cfgC/monitor-*.csv")
+        self.assertEqual({row["pair_index"] for row in monitor}, {"0"})
+        process = self._read("date=2026-01-03/config=cfgC/process-*.csv")
+        self.assertEqual(sorted({(row["pair_index"], row["role"]) for row in process}), [("1", "client"), ("2", "client")])
+
+    def test_csv_rotates_files(self):
+        """測試單一檔案超過 rows_per_file 筆時換下一個檔案"""
+        BulkExporter(self.handler, self.output_dir, fmt="csv", rows_per_file=4).export(fingerprint="cfgB")
+
+        files = sorted(glob.glob(os.path.join(self.output_dir, "date=2026-01-01", "config=cfgB", "monitor-*.csv")))
+        self.assertEqual(len(files), 3)
+        self.assertEqual(len(self._read("date=2026-01-01/config=cfgB/monitor-*.csv")), 10)
+        self.assertFalse(glob.glob(os.path.join(self.output_dir, "*", "config=cfgA")))
+
+    @unittest.skipIf(pa is None, "未安裝 pyarrow")
+    def test_parquet(self):
+        """測試 Parquet 輸出可讀回"""
+        import pyarrow.parquet as pq
+        BulkExporter(self.handler, self.output_dir, fmt="parquet").export(date="2026-01-01")
+
+        table = pq.read_table(os.path.join(self.output_dir, "date=2026-01-01", "config=cfgA", "monitor-0000.parquet"))
+        self.assertEqual(table.num_rows, 10)
+
+    @unittest.skipIf(pa is not None, "已安裝 pyarrow")
+    def test_columnar_formats_require_pyarrow(self):
+        """測試未安裝 pyarrow 時指定 Parquet / Arrow"""
+        for fmt in ("parquet", "arrow"):
+            with self.assertRaises(ValueError):
+                BulkExporter(self.handler, self.output_dir, fmt=fmt)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
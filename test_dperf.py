@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """測試 dperf 類別的各種功能"""
 
+import tempfile
 import unittest
 from unittest.mock import Mock, MagicMock, patch, call
 from dperfSetup import dperf
@@ -114,6 +115,26 @@ class TestDperfInit(unittest.TestCase):
         )
 
 
+    @patch("dperfSetup.open_storage_handler")
+    @patch("dperfSetup.SSHExecutor")
+    def test_init_keeps_unconnected_storage_handler(self, mock_ssh, mock_open):
+        """測試儲存後端未連線時 handler 仍交給寫入佇列，由佇列重新連接"""
+        handler = Mock()
+        handler.is_connected.return_value = False
+        handler.reconnect.return_value = False
+        mock_open.return_value = handler
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = dperf(self.config, log_path=tmpdir, enable_redis=True)
+            self.assertIs(d.redis_handler, handler)
+            self.assertIs(d.writer.redis_handler, handler)
+            self.assertIsNone(d.get_redis_test_output("server"))
+            d.disconnect()
+
+        handler.get_test_output.assert_not_called()
+        handler.close.assert_called_once()
+
+
 class TestDperfConnection(unittest.TestCase):
     """測試 dperf 連接管理"""
 
@@ -481,6 +502,35 @@ class TestDperfIntegration(unittest.TestCase):
         self.assertEqual(d2.pair.payload_size, 2048)
 
 
+class TestDperfOutputResults(unittest.TestCase):
+    """測試結果輸出"""
+
+    def setUp(self):
+        """設定測試環境"""
+        self.config = TestDperfInit()._create_test_config()
+
+    @patch("dperfSetup.open_storage_handler")
+    @patch("dperfSetup.SSHExecutor")
+    def test_monitor_csv_uses_in_memory_series(self, mock_ssh, mock_open):
+        """測試 Redis 已連線時行程監控數據仍使用傳入的本次監控序列，不以 Redis 的讀取結果取代"""
+        handler = Mock()
+        handler.is_connected.return_value = True
+        handler.get_test_output.return_value = None
+        mock_open.return_value = handler
+        monitor_data = [{'timestamp': '12:00:00.000', 'role': 'server', 'pids': 1, 'cpu_usage': 99.0,
+                         'cpu_time': 1.0, 'rss_mb': 2.0, 'hugetlb_mb': 1024.0}]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = dperf(self.config, log_path=tmpdir, output_path=f"{tmpdir}/results.csv", enable_redis=True)
+            d.outputResults(monitor_data=monitor_data)
+            with open(f"{tmpdir}/dperf_pair0_monitor.csv") as f:
+                rows = f.read().splitlines()
+            d.disconnect()
+
+        self.assertEqual(rows[1], "12:00:00.000,server,1,99.0,1.0,2.0,1024.0")
+        handler.get_process_data.assert_not_called()
+
+
 def run_tests():
     """執行所有測試"""
     # 創建測試套件
@@ -496,6 +546,7 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestDperfConfigGeneration))
     suite.addTests(loader.loadTestsFromTestCase(TestDperfSetupEnv))
     suite.addTests(loader.loadTestsFromTestCase(TestDperfIntegration))
+    suite.addTests(loader.loadTestsFromTestCase(TestDperfOutputResults))
 
     # 執行測試
     runner = unittest.TextTestRunner(verbosity=2)
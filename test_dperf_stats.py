@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""測試 dperf 每秒統計解析與穩態區間計算"""
+
+import unittest
+import math
+from dperf_stats import (
+    IntervalStatsParser,
+    parse_interval_stats,
+    trim_samples,
+    steady_window_stats,
+    flatten_steady_stats,
+    nic_error_events,
+    summarize_nic_events,
+    parse_stat_blocks,
+    parse_total_logs,
+)
+from dperfSetup import dperf
+
+
+def _make_log(pkt_rx_per_second):
+    """產生模擬的 dperf 輸出，每秒一個統計區塊"""
+    blocks = []
+    for i, pkt_rx in enumerate(pkt_rx_per_second, start=1):
+        blocks.append(
+            f"seconds {i}                  cpuUsage 52\n"
+            f"pktRx   {pkt_rx:,}          pktTx    {pkt_rx:,}          dropTx  0\n"
+            f"skOpen  1,000              skClose  1,000              skErr   0\n"
+        )
+    blocks.append(
+        "dperf Test Finished\n"
+        "Total Numbers:\n"
+        "pktRx   99,999,999         pktTx    99,999,999\n"
+    )
+    return "\n".join(blocks)
+
+
+class TestParseIntervalStats(unittest.TestCase):
+    """測試每秒統計區塊解析"""
+
+    def test_parse_blocks(self):
+        """測試每個 seconds 區塊解析為一筆樣本"""
+        samples = parse_interval_stats(_make_log([100, 2000, 3000]))
+
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[0]['seconds'], 1)
+        self.assertEqual(samples[1]['pktRx'], 2000)
+        self.assertEqual(samples[2]['cpuUsage'], 52)
+
+    def test_total_numbers_excluded(self):
+        """測試 Total Numbers 區塊不被視為每秒樣本"""
+        samples = parse_interval_stats(_make_log([100]))
+
+        self.assertEqual(samples[-1]['pktRx'], 100)
+
+    def test_ansi_codes_removed(self):
+        """測試移除 ANSI 顏色代碼"""
+        samples = parse_interval_stats("\x1b[32mseconds 1\x1b[0m cpuUsage 10\npktRx 5\n")
+
+        self.assertEqual(samples, [{'seconds': 1, 'cpuUsage': 10, 'pktRx': 5}])
+
+    def test_line_parser_matches_batch_parser(self):
+        """測試逐行解析在下一個區塊開始時返回前一個區塊，結果與 parse_interval_stats 相同"""
+        log = _make_log([100, 2000, 3000])
+        parser = IntervalStatsParser()
+        samples = [sample for line in log.splitlines() if (sample := parser.feed(line))]
+
+        self.assertEqual(samples, parse_interval_stats(log))
+        self.assertTrue(parser.finished)
+        self.assertIsNone(parser.feed("seconds 9 pktRx 1"))
+
+
+class TestSteadyWindow(unittest.TestCase):
+    """測試穩態區間統計"""
+
+    def test_trim_warmup_and_cooldown(self):
+        """測試捨棄暖機與收尾秒數"""
+        samples = parse_interval_stats(_make_log([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]))
+
+        window = trim_samples(samples, warmup_seconds=2, cooldown_seconds=3)
+
+        self.assertEqual([s['seconds'] for s in window], [3, 4, 5, 6, 7])
+
+    def test_steady_stats(self):
+        """測試穩態統計數值"""
+        samples = parse_interval_stats(_make_log([10, 100, 100, 200, 300, 10]))
+
+        stats = steady_window_stats(samples, warmup_seconds=1, cooldown_seconds=1)
+
+        pkt_rx = stats['pktRx']
+        self.assertEqual(pkt_rx['samples'], 4)
+        self.assertEqual(pkt_rx['mean'], 175)
+        self.assertEqual(pkt_rx['p50'], 150)
+        self.assertEqual(pkt_rx['p99'], 297)
+        self.assertEqual(pkt_rx['min'], 100)
+        self.assertEqual(pkt_rx['max'], 300)
+        self.assertAlmostEqual(pkt_rx['stddev'], 82.916, places=3)
+
+    def test_steady_stats_empty_window(self):
+        """測試修剪後沒有樣本時返回空 dict"""
+        samples = parse_interval_stats(_make_log([1, 2]))
+
+        self.assertEqual(steady_window_stats(samples, warmup_seconds=5), {})
+
+    def test_flatten(self):
+        """測試攤平格式"""
+        flat = flatten_steady_stats({'pktRx': {'mean': 1.0, 'max': 2}})
+
+        self.assertEqual(flat, {'pktRx.mean': 1.0, 'pktRx.max': 2})
+
+
+class TestNicErrorEvents(unittest.TestCase):
+    """測試 DPDK port 錯誤計數事件"""
+
+    def test_contiguous_seconds_grouped(self):
+        """測試錯誤計數大於 0 的連續秒數合併為一個事件，dperf 沒有輸出的計數略過"""
+        samples = [
+            {'seconds': 1, 'imissed': 0, 'ierrors': 0},
+            {'seconds': 2, 'imissed': 30, 'ierrors': 0},
+            {'seconds': 3, 'imissed': 50, 'ierrors': 0},
+            {'seconds': 4, 'imissed': 0, 'ierrors': 2},
+            {'seconds': 5, 'imissed': 5, 'ierrors': 0},
+        ]
+        events = nic_error_events(samples)
+
+        self.assertEqual([(e['counter'], e['first_second'], e['last_second'], e['total'], e['max']) for e in events],
+                         [('ierrors', 4, 4, 2, 2), ('imissed', 2, 3, 80, 50), ('imissed', 5, 5, 5, 5)])
+        self.assertEqual(summarize_nic_events(events), {
+            'ierrors.error_seconds': 1, 'ierrors.total': 2, 'ierrors.first_second': 4,
+            'imissed.error_seconds': 3, 'imissed.total': 85, 'imissed.first_second': 2,
+        })
+        self.assertEqual(nic_error_events([{'seconds': 1, 'pktRx': 10}]), [])
+
+
+class TestBatchParser(unittest.TestCase):
+    """測試 NumPy 批次解析器"""
+
+    def test_parse_stat_blocks_matches_interval_parser(self):
+        """測試批次解析結果與逐區塊解析一致"""
+        log = _make_log([100, 2000, 3000])
+
+        arrays = parse_stat_blocks(log)
+        samples = parse_interval_stats(log)
+
+        self.assertEqual(list(arrays['seconds']), [1, 2, 3])
+        for key in samples[0]:
+            self.assertEqual(list(arrays[key]), [s[key] for s in samples])
+
+    def test_parse_stat_blocks_irregular_layout(self):
+        """測試區塊欄位不一致時缺值為 NaN 且重複 key 保留第一個"""
+        arrays = parse_stat_blocks("EAL: init 1\nseconds 1 a 1 a 2\nb 3,000\nseconds 2 a 4\n")
+
+        self.assertEqual(list(arrays['a']), [1, 4])
+        self.assertEqual(arrays['b'][0], 3000)
+        self.assertTrue(math.isnan(arrays['b'][1]))
+        self.assertNotIn('init', arrays)
+
+    def test_noisy_log_matches_clean_log(self):
+        """測試夾雜啟動訊息、ANSI 控制字元與其他文字時，兩種解析結果與只有統計區塊時一致"""
+        log = _make_log([100, 2000, 3000])
+        noisy = "EAL: Detected 8 lcore(s)\n" + log.replace("seconds 2", "\x1b[31mwarn: link flapping\x1b[0m\nseconds 2")
+
+        clean, parsed = parse_stat_blocks(log), parse_stat_blocks(noisy)
+
+        self.assertEqual(sorted(clean), sorted(parsed))
+        for key in clean:
+            self.assertEqual(list(clean[key]), list(parsed[key]))
+        self.assertEqual(parse_interval_stats(noisy), parse_interval_stats(log))
+
+    def test_parse_total_logs_matches_parse_output(self):
+        """測試多份 log 的 Total Numbers 與 parseOutput 結果一致"""
+        logs = [_make_log([1]), "no finish marker", _make_log([2]) + "\nretrans 7\n"]
+
+        arrays = parse_total_logs(logs)
+        legacy = dperf.parseOutput(None, (logs[2],))
+
+        self.assertEqual(arrays['pktRx'][0], legacy['pktRx'])
+        self.assertTrue(math.isnan(arrays['pktRx'][1]))
+        self.assertTrue(math.isnan(arrays['retrans'][0]))
+        self.assertEqual(arrays['retrans'][2], legacy['retrans'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
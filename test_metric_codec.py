@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""測試指標的二進位編碼"""
+
+import unittest
+import metric_codec
+
+
+class TestMetricCodec(unittest.TestCase):
+    """測試編碼、解碼與批次解碼為陣列"""
+
+    def test_round_trip_keeps_types(self):
+        """測試 int / float / 字串還原為原本的型別"""
+        values = {"pktRx": 100, "synRt": 1.5, "flag": True, "big": 1 << 70, "state": "ok"}
+        blob, schema = metric_codec.encode(values)
+
+        decoded = metric_codec.decode(blob, schema)
+
+        self.assertEqual(decoded, {"pktRx": 100, "synRt": 1.5, "flag": 1, "big": str(1 << 70), "state": "ok"})
+        self.assertIsInstance(decoded["synRt"], float)
+        self.assertEqual(metric_codec.schema_id_of(blob), schema.schema_id)
+
+    def test_schema_shared_by_same_fields(self):
+        """測試相同欄位與型別共用 schema，定義可由 JSON 還原"""
+        _, first = metric_codec.encode({"pktRx": 1, "synRt": 0.5})
+        _, second = metric_codec.encode({"pktRx": 2, "synRt": 0.7})
+        _, other = metric_codec.encode({"pktRx": 2.0, "synRt": 0.7})
+
+        self.assertIs(first, second)
+        self.assertNotEqual(first.schema_id, other.schema_id)
+        self.assertEqual(metric_codec.MetricSchema.from_json(first.to_json()).schema_id, first.schema_id)
+
+    def test_long_string_truncated_on_character_boundary(self):
+        """測試超過長度上限的字串在 UTF-8 字元邊界截斷，解碼不會失敗"""
+        blob, schema = metric_codec.encode({"note": "a" + "中" * 30000})
+
+        note = metric_codec.decode(blob, schema)["note"]
+        self.assertEqual(note, "a" + "中" * 21844)
+        self.assertLessEqual(len(note.encode('utf-8')), 0xFFFF)
+
+    def test_rejects_unknown_format(self):
+        """測試非本模組編碼的內容"""
+        with self.assertRaises(ValueError):
+            metric_codec.schema_id_of(b'{"pktRx": 1}')
+
+    def test_decode_arrays_mixed_schemas(self):
+        """測試多種 schema 解碼為陣列時缺少的欄位為 NaN"""
+        blobs = [metric_codec.encode(v)[0] for v in ({"a": 1, "s": "x"}, {"a": 2, "s": "y"}, {"a": 3, "b": 0.5})]
+
+        same = metric_codec.decode_arrays(blobs[:2], metric_codec.get_schema)
+        mixed = metric_codec.decode_arrays(blobs, metric_codec.get_schema)
+
+        self.assertEqual(same["a"].dtype.kind, "i")
+        self.assertNotIn("s", same)
+        self.assertEqual(mixed["a"].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(mixed["b"][2], 0.5)
+        self.assertNotEqual(mixed["b"][0], mixed["b"][0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""測試 OpenMetrics 匯出"""
+
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+
+from config import Config, TrafficGeneratorPair
+from dperfSetup import dperf
+from metrics_exporter import (
+    MetricsExporter, MetricsRegistry, OPENMETRICS_CONTENT_TYPE, PAIR_PHASES, RUN_PHASES
+)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """測試增量更新與輸出格式"""
+
+    def test_render_openmetrics(self):
+        """測試 gauge、stateset 與 summary 的輸出，沒有數據的指標不輸出，結尾為 # EOF"""
+        registry = MetricsRegistry()
+        registry.set('array_script_host_cpu_usage_percent', 12.5)
+        registry.set_many('array_script_dperf_stat', {'pktRx': 100}, key='metric', pair=0, role='client')
+        registry.set_state('array_script_run_phase', 'running', RUN_PHASES)
+        registry.observe('array_script_ssh_command_latency_seconds', 0.25, source='system_monitor')
+        registry.observe('array_script_ssh_command_latency_seconds', 0.5, source='system_monitor')
+
+        text = registry.render().decode()
+        lines = text.splitlines()
+        self.assertIn('# TYPE array_script_host_cpu_usage_percent gauge', lines)
+        self.assertIn('array_script_host_cpu_usage_percent 12.5', lines)
+        self.assertIn('array_script_dperf_stat{pair="0",role="client",metric="pktRx"} 100', lines)
+        self.assertIn('array_script_run_phase{array_script_run_phase="running"} 1', lines)
+        self.assertIn('array_script_run_phase{array_script_run_phase="idle"} 0', lines)
+        self.assertIn('array_script_ssh_command_latency_seconds_count{source="system_monitor"} 2', lines)
+        self.assertIn('array_script_ssh_command_latency_seconds_sum{source="system_monitor"} 0.75', lines)
+        self.assertNotIn('array_script_apv_stat', text)
+        self.assertEqual(lines[-1], '# EOF')
+
+    def test_update_replaces_series(self):
+        """測試同一組標籤的更新取代原本的值，標籤值會跳脫"""
+        registry = MetricsRegistry()
+        registry.set('array_script_apv_stat', 1, metric='a"b')
+        registry.set('array_script_apv_stat', 2, metric='a"b')
+
+        lines = [line for line in registry.render().decode().splitlines() if not line.startswith('#')]
+        self.assertEqual(lines, ['array_script_apv_stat{metric="a\\"b"} 2'])
+
+    def test_undefined_metric_or_state(self):
+        """測試未定義的指標、類型不符與未定義的狀態"""
+        registry = MetricsRegistry()
+        with self.assertRaises(ValueError):
+            registry.set('array_script_unknown', 1)
+        with self.assertRaises(ValueError):
+            registry.observe('array_script_host_cpu_usage_percent', 1.0)
+        with self.assertRaises(ValueError):
+            registry.set_state('array_script_run_phase', 'paused', RUN_PHASES)
+
+
+class TestMetricsExporter(unittest.TestCase):
+    """測試 HTTP 端點"""
+
+    def test_scrape(self):
+        """測試 /metrics 返回 OpenMetrics 內容，其他路徑返回 404"""
+        registry = MetricsRegistry()
+        registry.set('array_script_host_ram_used_megabytes', 2048)
+        exporter = MetricsExporter(registry, port=0).start()
+        try:
+            url = f"http://127.0.0.1:{exporter.port}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertEqual(response.headers['Content-Type'], OPENMETRICS_CONTENT_TYPE)
+                self.assertIn(b'array_script_host_ram_used_megabytes 2048\n', response.read())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/", timeout=5)
+        finally:
+            exporter.stop()
+
+
+class TestDperfLiveStats(unittest.TestCase):
+    """測試 dperf 執行期間逐行更新每秒統計與階段"""
+
+    def test_live_stats_and_phase(self):
+        """測試每個完整的每秒區塊更新指標，暖機秒數後進入 steady"""
+        config = Config()
+        config.test.traffic_generator.pairs = [TrafficGeneratorPair()]
+        config.test.traffic_generator.warmup_seconds = 1
+        pair = dperf.__new__(dperf)
+        pair.config = config
+        pair.pair_index = 0
+        pair.metrics = MagicMock()
+
+        on_line = pair._live_stats('client')
+        for line in ("seconds 1 cpuUsage 50", "pktRx 10", "seconds 2 cpuUsage 60", "pktRx 20", "Total Numbers:"):
+            on_line(line)
+
+        pair.metrics.set_many.assert_called_with(
+            'array_script_dperf_stat', {'cpuUsage': 60, 'pktRx': 20}, key='metric', pair=0, role='client'
+        )
+        phases = [call.args[1] for call in pair.metrics.set_state.call_args_list]
+        self.assertEqual(phases, ['warmup', 'steady'])
+        pair.metrics.set_state.assert_called_with(
+            'array_script_pair_phase', 'steady', PAIR_PHASES, pair=0, role='client'
+        )
+
+    def test_disabled_without_registry(self):
+        """測試未啟用端點時不建立 callback"""
+        pair = dperf.__new__(dperf)
+        pair.metrics = None
+        self.assertIsNone(pair._live_stats('server'))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""測試固定容量的監控數據緩衝區"""
+
+import unittest
+
+import numpy as np
+
+from monitor_buffer import MonitorBuffer
+
+
+def _fill(buffer, count, start=0):
+    for i in range(start, start + count):
+        buffer.append(1000.0 + i, 50.0 + i, cpu_usage=float(i), ram_used=100 + i, ram_total=1024,
+                      ram_usage=10.0, core_usage={0: float(i), 2: 100.0})
+
+
+class TestMonitorBuffer(unittest.TestCase):
+    """測試寫入、降採樣與 NumPy 視圖"""
+
+    def test_arrays_are_readonly_views(self):
+        """測試 arrays() 不複製數據且為唯讀"""
+        buffer = MonitorBuffer(capacity=8)
+        _fill(buffer, 3)
+
+        arrays = buffer.arrays()
+        self.assertEqual(arrays["cpu_usage_avg"].tolist(), [0.0, 1.0, 2.0])
+        self.assertTrue(np.shares_memory(arrays["timestamp"], buffer.arrays()["timestamp"]))
+        self.assertFalse(arrays["timestamp"].flags.writeable)
+        self.assertEqual(arrays["core_usage"].shape, (3, 3))
+        self.assertTrue(np.isnan(arrays["core_usage"][0, 1]))
+
+    def test_full_buffer_downsamples_oldest_half(self):
+        """測試緩衝區滿時較舊的一半兩兩合併，最近的數據保持原始解析度"""
+        buffer = MonitorBuffer(capacity=8)
+        _fill(buffer, 9)
+
+        arrays = buffer.arrays()
+        self.assertEqual((len(buffer), buffer.samples, buffer.compactions), (7, 9, 1))
+        self.assertEqual(arrays["count"].tolist(), [2, 2, 1, 1, 1, 1, 1])
+        self.assertEqual(arrays["timestamp"].tolist()[:3], [1000.0, 1002.0, 1004.0])
+        self.assertEqual(arrays["cpu_usage_avg"].tolist()[:3], [0.5, 2.5, 4.0])
+        self.assertEqual(arrays["cpu_usage_min"][1], 2.0)
+        self.assertEqual(arrays["cpu_usage_max"][1], 3.0)
+        self.assertEqual(arrays["core_usage"][:2, 0].tolist(), [0.5, 2.5])
+
+    def test_repeated_compaction_weights_by_count(self):
+        """測試多次降採樣後平均值依涵蓋的樣本數加權，總樣本數不變"""
+        buffer = MonitorBuffer(capacity=8)
+        _fill(buffer, 40)
+
+        arrays = buffer.arrays()
+        self.assertEqual(int(arrays["count"].sum()), 40)
+        self.assertLessEqual(len(buffer), 8)
+        weighted = float((arrays["cpu_usage_avg"] * arrays["count"]).sum() / arrays["count"].sum())
+        self.assertAlmostEqual(weighted, 19.5, places=4)
+        self.assertEqual(arrays["timestamp"][-1], 1039.0)
+
+    def test_records_and_clear(self):
+        """測試 to_records() 的欄位與 clear()"""
+        buffer = MonitorBuffer(capacity=4)
+        _fill(buffer, 2)
+
+        record = buffer.to_records()[1]
+        self.assertEqual(record["cpu_usage"], 1.0)
+        self.assertEqual(record["ram_used"], 101)
+        self.assertEqual(record["core_usage"], {0: 1.0, 2: 100.0})
+
+        buffer.clear()
+        self.assertEqual((len(buffer), buffer.to_records()), (0, []))
+
+    def test_minimum_capacity(self):
+        """測試容量過小"""
+        with self.assertRaises(ValueError):
+            MonitorBuffer(capacity=2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
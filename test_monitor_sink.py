@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""測試監控數據輸出 (sink)"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from monitor_sink import open_monitor_sink, read_binary_samples
+
+
+def _record(i):
+    return {
+        "timestamp": f"2026-01-01 00:00:0{i}.500", "epoch": 1000.5 + i, "monotonic": 50.25 + i,
+        "cpu_usage": 12.345, "ram_used": 512, "ram_total": 1024, "ram_usage": 50.0,
+        "core_usage": {2: 99.0, 0: 10.0},
+        "process_usage": {(0, "client"): {"pids": 1, "cpu_usage": 99.5, "cpu_time": 12.0, "rss_mb": 64.0,
+                                          "hugetlb_mb": 2048.0}},
+        "hugepages": {(1, 2048): {"total": 512, "free": 128}, (0, 2048): {"total": 512, "free": 0}},
+    }
+
+
+class TestMonitorSink(unittest.TestCase):
+    """測試各格式的輸出與 flush 政策"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_csv_keeps_one_handle_and_tags_worker_cores(self):
+        """測試 CSV 只開檔一次，每核心檔案標記 worker 核心"""
+        path = self._path("monitor.csv")
+        with patch("builtins.open", wraps=open) as opened:
+            sink = open_monitor_sink("csv", path, flush_interval=3600, worker_cores={2: (0, "client")})
+            for i in range(3):
+                sink.write(_record(i))
+            sink.close()
+        self.assertEqual(opened.call_count, 4)
+
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1], ["2026-01-01 00:00:00.500", "12.35", "512", "1024", "50.0", "1000.500000", "50.250000"])
+        with open(self._path("monitor_cores.csv")) as f:
+            cores = list(csv.reader(f))
+        self.assertEqual(cores[1:3], [["2026-01-01 00:00:00.500", "0", "", "", "10.0"],
+                                      ["2026-01-01 00:00:00.500", "2", "0", "client", "99.0"]])
+        with open(self._path("monitor_processes.csv")) as f:
+            processes = list(csv.reader(f))
+        self.assertEqual(processes[1], ["2026-01-01 00:00:00.500", "0", "client", "1", "99.5", "12.0", "64.0", "2048.0"])
+        with open(self._path("monitor_hugepages.csv")) as f:
+            hugepages = list(csv.reader(f))
+        self.assertEqual(hugepages[1:3], [["2026-01-01 00:00:00.500", "0", "2048", "512", "0", "512"],
+                                          ["2026-01-01 00:00:00.500", "1", "2048", "512", "128", "384"]])
+
+    def test_flush_policy(self):
+        """測試未達 flush 間隔時數據留在緩衝區，超過間隔後寫出"""
+        path = self._path("monitor.jsonl")
+        sink = open_monitor_sink("jsonl", path, flush_interval=3600)
+        sink.write(_record(0))
+        self.assertEqual(os.path.getsize(path), 0)
+
+        sink.flush_interval = 0
+        sink.write(_record(1))
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["epoch"] for line in lines], [1000.5, 1001.5])
+        self.assertEqual(lines[0]["core_usage"], {"2": 99.0, "0": 10.0})
+        self.assertEqual(lines[0]["process_usage"]["0:client"]["hugetlb_mb"], 2048.0)
+        sink.close()
+
+    def test_binary_round_trip(self):
+        """測試二進位格式可讀回"""
+        path = self._path("monitor.bin")
+        sink = open_monitor_sink("binary", path)
+        sink.write(_record(0))
+        sink.write(dict(_record(1), core_usage={}))
+        sink.close()
+
+        rows, cores = read_binary_samples(path)
+        self.assertEqual(rows["timestamp"].tolist(), [1000.5, 1001.5])
+        self.assertEqual(rows["ram_total"].tolist(), [1024, 1024])
+        self.assertEqual(cores, [{0: 10.0, 2: 99.0}, {}])
+
+    def test_unknown_format(self):
+        """測試不支援的格式"""
+        with self.assertRaises(ValueError):
+            open_monitor_sink("xml", self._path("monitor.xml"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
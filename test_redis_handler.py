@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""測試 RedisHandler 的 pipeline 讀寫（以 Mock 取代 Redis 連線）"""
+
+import unittest
+from datetime import datetime
+from threading import Lock
+from unittest.mock import MagicMock, patch
+import metric_codec
+from RedisDB import RedisHandler, InstrumentedConnectionPool, MONITOR_RECORD
+
+
+def _make_handler():
+    """建立不實際連線的 RedisHandler"""
+    handler = RedisHandler.__new__(RedisHandler)
+    handler.client = MagicMock()
+    handler._ram_totals = {}
+    handler._ram_totals_lock = Lock()
+    handler._saved_schemas = set()
+    return handler
+
+
+def _sample(ts):
+    return {"timestamp": ts, "cpu_usage": 10.0, "ram_used": 100, "ram_total": 1000, "ram_usage": 10.0}
+
+
+class TestPipelinedWrites(unittest.TestCase):
+    """測試寫入以單次 pipeline 送出"""
+
+    def test_save_monitor_data_single_pipeline(self):
+        """測試樣本以 APPEND 追加到分鐘 chunk，且只 execute 一次"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+        ts = datetime(2026, 1, 1, 12, 0, 30).timestamp()
+        chunk_start = int(ts // 60) * 60
+
+        self.assertTrue(handler.save_monitor_data(1, ts + 0.25, 10.0, 100, 1000, 10.0))
+
+        chunk_key = f"monitor:pair1:chunk:{chunk_start}"
+        pipe.append.assert_called_once_with(chunk_key, MONITOR_RECORD.pack(30250, 10.0, 100, 10.0))
+        pipe.zadd.assert_called_once_with("monitor:pair1:chunks", {chunk_key: chunk_start})
+        pipe.hset.assert_called_once_with("monitor:pair1:meta", "ram_total", 1000)
+        pipe.execute.assert_called_once()
+
+    def test_ram_total_written_only_when_changed(self):
+        """測試 ram_total 只在改變時寫入 meta"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+
+        handler.save_monitor_data(0, "2026-01-01 12:00:00", 1.0, 1, 2048, 50.0)
+        handler.save_monitor_data(0, "2026-01-01 12:00:01", 1.0, 1, 2048, 50.0)
+        handler.save_monitor_data(0, "2026-01-01 12:00:02", 1.0, 1, 4096, 50.0)
+
+        self.assertEqual(pipe.hset.call_count, 2)
+
+    def test_save_monitor_batch(self):
+        """測試多筆監控數據一次 execute"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+        base = datetime(2026, 1, 1).timestamp()
+
+        count = handler.save_monitor_batch(2, [_sample(base + i) for i in range(5)])
+
+        self.assertEqual(count, 5)
+        self.assertEqual(pipe.append.call_count, 5)
+        pipe.execute.assert_called_once()
+
+    def test_save_monitor_batch_failure_returns_zero(self):
+        """測試 pipeline 失敗時返回 0"""
+        handler = _make_handler()
+        handler.client.pipeline.return_value.execute.side_effect = Exception("boom")
+
+        self.assertEqual(handler.save_monitor_batch(0, [_sample(0.0)]), 0)
+
+    def test_save_test_output_single_pipeline(self):
+        """測試 info、編碼後的 metrics/steady、schema 與索引一次送出"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+        ts = datetime(2026, 1, 1, 12, 0, 0).timestamp()
+
+        ok = handler.save_test_output(0, "client", {"pktRx": 1}, ts, steady={"pktRx.mean": 1.0}, fingerprint="abc")
+
+        self.assertTrue(ok)
+        self.assertEqual(pipe.hset.call_count, 2)
+        self.assertEqual(pipe.set.call_count, 2)
+        self.assertEqual(pipe.zadd.call_count, 2)
+        pipe.execute.assert_called_once()
+        info = pipe.hset.call_args_list[0][1]["mapping"]
+        self.assertEqual(info["timestamp"], "2026-01-01 12:00:00")
+        packed = pipe.hset.call_args_list[1][1]["mapping"]
+        self.assertEqual(handler._decode_metrics(packed["metrics"]), {"pktRx": 1})
+        self.assertEqual(handler._decode_metrics(packed["steady"]), {"pktRx.mean": 1.0})
+
+        # schema 定義只寫入一次
+        handler.save_test_output(0, "client", {"pktRx": 2}, ts + 1, steady={"pktRx.mean": 2.0})
+        self.assertEqual(pipe.set.call_count, 2)
+
+
+class TestPipelinedReads(unittest.TestCase):
+    """測試範圍查詢以分批 pipeline 讀取，而非每個 key 一次往返"""
+
+    def _chunk_handler(self, chunks):
+        """建立讀取指定 chunk 內容的 handler，chunks 為 [(chunk 起點, [(偏移秒數, cpu), ...])]"""
+        handler = _make_handler()
+        handler.client.zrangebyscore.return_value = [
+            (f"monitor:pair0:chunk:{start}", float(start)) for start, _ in chunks
+        ]
+        handler.client.pipeline.return_value.execute.return_value = [
+            b"".join(MONITOR_RECORD.pack(int(offset * 1000), cpu, 100, 10.0) for offset, cpu in records)
+            for _, records in chunks
+        ]
+        handler.client.hget.return_value = "2048"
+        return handler
+
+    def test_get_monitor_arrays_decodes_chunks(self):
+        """測試 chunk 一次 pipeline 讀回並依時間排序、去除重複時間戳"""
+        handler = self._chunk_handler([(60, [(1.5, 1.0), (0, 2.0), (1.5, 9.0)]), (120, [(0, 3.0)])])
+
+        arrays = handler.get_monitor_arrays(0)
+
+        self.assertEqual(list(arrays["timestamp"]), [60.0, 61.5, 120.0])
+        self.assertEqual(list(arrays["cpu_usage"]), [2.0, 1.0, 3.0])
+        self.assertEqual(list(arrays["ram_total"]), [2048] * 3)
+        handler.client.pipeline.return_value.execute.assert_called_once()
+        handler.client.get.assert_not_called()
+
+    def test_get_monitor_data_filters_range(self):
+        """測試時間範圍過濾與 dict 格式"""
+        handler = self._chunk_handler([(60, [(0, 1.0), (10, 2.0), (20, 3.0)])])
+
+        data = handler.get_monitor_data(0, start_time=65.0, end_time=75.0)
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["cpu_usage"], 2.0)
+        self.assertEqual(data[0]["ram_total"], 2048)
+        self.assertEqual(handler.client.zrangebyscore.call_args[0][1], 60)
+
+    def test_get_monitor_page_cursor(self):
+        """測試分頁游標：滿頁時返回最後時間戳，最後一頁返回 None"""
+        handler = self._chunk_handler([(60, [(0, 1.0), (1, 2.0), (2, 3.0)])])
+
+        arrays, cursor = handler.get_monitor_page(0, limit=2)
+        self.assertEqual(list(arrays["cpu_usage"]), [1.0, 2.0])
+        self.assertEqual(cursor, 61.0)
+
+        arrays, cursor = handler.get_monitor_page(0, cursor=cursor, limit=2)
+        self.assertEqual(list(arrays["cpu_usage"]), [3.0])
+        self.assertIsNone(cursor)
+
+    def test_get_all_test_outputs_single_round_trip(self):
+        """測試多次測試的 info 與編碼後的 metrics/steady 以同一批 pipeline 讀取並略過不存在的項目"""
+        handler = _make_handler()
+        handler.client.zrangebyscore.return_value = ["p1", "p2"]
+        pipe = handler.client.pipeline.return_value
+        blob, _ = metric_codec.encode({"pktRx": 1, "state": "ok"})
+        pipe.execute.return_value = [{"role": "client"}, [blob, None], {}, [None, None]]
+
+        outputs = handler.get_all_test_outputs(0, "client")
+
+        self.assertEqual(outputs, [{"info": {"role": "client"}, "metrics": {"pktRx": 1, "state": "ok"}, "steady": {}}])
+        pipe.execute.assert_called_once()
+
+    def test_get_all_test_outputs_legacy_hashes(self):
+        """測試沒有 :packed 的舊格式結果改讀字串 hash"""
+        handler = _make_handler()
+        handler.client.zrangebyscore.return_value = ["p1"]
+        pipe = handler.client.pipeline.return_value
+        pipe.execute.side_effect = [[{"role": "client"}, [None, None]], [{"pktRx": "1"}, {}]]
+
+        outputs = handler.get_all_test_outputs(0, "client")
+
+        self.assertEqual(outputs[0]["metrics"], {"pktRx": "1"})
+        pipe.hgetall.assert_any_call("p1:metrics")
+
+    def test_get_metric_arrays_groups_by_schema(self):
+        """測試相同 schema 一次解碼，欄位不同時缺少的值為 NaN"""
+        handler = _make_handler()
+        handler.client.zrangebyscore.return_value = [("p1", 1.0), ("p2", 2.0), ("p3", 3.0)]
+        blobs = [metric_codec.encode(m)[0] for m in ({"pktRx": 1}, {"pktRx": 2}, {"pktRx": 3, "dropTx": 0.5})]
+        handler.client.pipeline.return_value.execute.return_value = blobs
+
+        arrays = handler.get_metric_arrays(0, "client")
+
+        self.assertEqual(arrays["timestamp"].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(arrays["pktRx"].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(arrays["dropTx"][2], 0.5)
+        self.assertTrue(all(v != v for v in arrays["dropTx"][:2]))
+
+    def test_get_specific_metrics_decodes_packed(self):
+        """測試指定 metrics 從編碼內容取出並保留型別"""
+        handler = _make_handler()
+        handler.client.execute_command.return_value = metric_codec.encode({"duration": 10, "synRt": 1.5})[0]
+
+        result = handler.get_specific_metrics(0, "client", ["duration", "ackDup"], timestamp="t")
+
+        self.assertEqual(result, {"duration": 10, "ackDup": None})
+        handler.client.hmget.assert_not_called()
+
+    def test_get_specific_metrics_uses_hmget(self):
+        """測試舊格式的指定 metrics 以單次 HMGET 讀取"""
+        handler = _make_handler()
+        handler.client.execute_command.return_value = None
+        handler.client.hmget.return_value = ["10", None]
+
+        result = handler.get_specific_metrics(0, "client", ["duration", "ackDup"], timestamp="t")
+
+        handler.client.hmget.assert_called_once_with("test:pair0:client:t:metrics", ["duration", "ackDup"])
+        self.assertEqual(result, {"duration": "10", "ackDup": None})
+
+
+class TestRunIndex(unittest.TestCase):
+    """測試以 run_id 區分的測試輸出與執行索引"""
+
+    def test_run_scoped_output_keys(self):
+        """測試指定 run_id 時 key 以 run_id 區分，讀取時不取最新一筆"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+
+        handler.save_test_output(0, "client", {"pktRx": 1}, 1000.0, run_id="r1")
+
+        self.assertEqual(pipe.hset.call_args_list[0][0][0], "test:pair0:client:r1:info")
+        self.assertEqual(pipe.hset.call_args_list[0][1]["mapping"]["run_id"], "r1")
+        pipe.zadd.assert_called_once_with("test:pair0:client:timeline", {"test:pair0:client:r1": 1000.0})
+
+        pipe.execute.return_value = [{"pair_index": "0"}, [None, None]]
+        handler.get_test_output(0, "client", run_id="r1")
+        handler.client.zrevrange.assert_not_called()
+        pipe.hgetall.assert_any_call("test:pair0:client:r1:info")
+
+    def test_start_run_writes_indexes(self):
+        """測試執行索引與配置、日期索引一次送出"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+        ts = datetime(2026, 1, 2, 3, 4, 5).timestamp()
+
+        self.assertTrue(handler.start_run("r1", "cfg", [0, 1], start_time=ts))
+
+        run = pipe.hset.call_args[1]["mapping"]
+        self.assertEqual((run["pairs"], run["date"], run["status"]), ("0,1", "2026-01-02", "running"))
+        pipe.zadd.assert_any_call("runs:config:cfg", {"r1": ts})
+        pipe.zadd.assert_any_call("runs:date:2026-01-02", {"r1": ts})
+        pipe.execute.assert_called_once()
+
+    def test_get_runs_by_config_uses_index(self):
+        """測試依配置查詢直接讀取 runs:config 索引"""
+        handler = _make_handler()
+        handler.client.zrevrange.return_value = ["r2", "r1"]
+        handler.client.pipeline.return_value.execute.return_value = [{"run_id": "r2"}, {"run_id": "r1"}]
+
+        runs = handler.get_runs(fingerprint="cfg", limit=2)
+
+        handler.client.zrevrange.assert_called_once_with("runs:config:cfg", 0, 1)
+        self.assertEqual([r["run_id"] for r in runs], ["r2", "r1"])
+
+
+    def test_get_runs_page_cursor(self):
+        """測試依 runs:timeline 位置分頁，最後一頁游標為 None"""
+        handler = _make_handler()
+        handler.client.zrange.side_effect = [["r1", "r2"], ["r3"]]
+        handler.client.pipeline.return_value.execute.side_effect = [
+            [{"run_id": "r1"}, {"run_id": "r2"}], [{"run_id": "r3"}]
+        ]
+
+        runs, cursor = handler.get_runs_page(limit=2)
+        self.assertEqual((len(runs), cursor), (2, 2))
+        runs, cursor = handler.get_runs_page(cursor, limit=2)
+
+        handler.client.zrange.assert_called_with("runs:timeline", 2, 3)
+        self.assertEqual(([r["run_id"] for r in runs], cursor), (["r3"], None))
+
+    def test_apv_samples_round_trip(self):
+        """測試 APV 樣本以取樣時間為 score 寫入 apv:{run_id}:samples，讀取時還原時間與指標"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+
+        self.assertEqual(handler.save_apv_samples("r1", [{"timestamp": 1000.5, "metrics": {"system.cpu": 35}}]), 1)
+
+        key, members = pipe.zadd.call_args[0]
+        self.assertEqual((key, list(members.values())), ("apv:r1:samples", [1000.5]))
+        pipe.execute.assert_called_once()
+
+        handler.client.execute_command.return_value = list(members)
+        self.assertEqual(handler.get_apv_samples("r1"), [{"timestamp": 1000.5, "metrics": {"system.cpu": 35}}])
+        arrays = handler.get_apv_arrays("r1", start_time=1000.0)
+        self.assertEqual((arrays["timestamp"].tolist(), arrays["system.cpu"].tolist()), ([1000.5], [35]))
+        self.assertEqual(handler.client.execute_command.call_args[0][:4],
+                         ("ZRANGEBYSCORE", "apv:r1:samples", 1000.0, "+inf"))
+
+    def test_expire_apv_samples_scans_all_runs(self):
+        """測試以 SCAN 找出各執行的 apv:*:samples 並刪除過期樣本"""
+        handler = _make_handler()
+        handler.client.scan_iter.return_value = iter(["apv:r1:samples", "apv:r2:samples", "apv:r3:samples"])
+        pipe = handler.client.pipeline.return_value
+        pipe.execute.side_effect = [[4, 0], [2]]
+
+        self.assertEqual(handler.expire_apv_samples(days=1, now=90000.0, batch_size=2), 6)
+        handler.client.scan_iter.assert_called_once_with(match="apv:*:samples", count=2)
+        pipe.zremrangebyscore.assert_any_call("apv:r3:samples", "-inf", 3600.0)
+        self.assertEqual(pipe.zremrangebyscore.call_count, 3)
+
+    def test_expire_runs_removes_index_members(self):
+        """測試刪除過期執行的 run:{id} 及其在時間線、配置與日期索引中的成員"""
+        handler = _make_handler()
+        handler.client.zrangebyscore.side_effect = [["r1", "r2"], []]
+        pipe = handler.client.pipeline.return_value
+        pipe.execute.side_effect = [[["cfg", "2026-01-01"], [None, None]], []]
+
+        self.assertEqual(handler.expire_runs(days=1, now=90000.0), 2)
+        handler.client.zrangebyscore.assert_called_with("runs:timeline", "-inf", 3600.0, start=0, num=500)
+        pipe.zrem.assert_any_call("runs:config:cfg", "r1")
+        pipe.zrem.assert_any_call("runs:date:2026-01-01", "r1")
+        pipe.zrem.assert_any_call("runs:timeline", "r1", "r2")
+        pipe.unlink.assert_called_once_with("run:r1", "run:r2")
+
+    def test_stored_pairs_scans_keys(self):
+        """測試以 SCAN 找出寫入過監控數據或測試輸出的 pair"""
+        handler = _make_handler()
+        handler.client.scan_iter.side_effect = [
+            iter(["monitor:pair0:chunks", "monitor:pair2:meta", "monitor:pair10:server:process"]),
+            iter(["test:pair2:client:timeline", "test:pair5:server:timeline"]),
+        ]
+
+        self.assertEqual(handler.stored_pairs(), [0, 2, 5, 10])
+
+    def test_process_samples_round_trip(self):
+        """測試行程取樣寫入 monitor:pair{N}:{role}:process，讀取時還原各欄位"""
+        handler = _make_handler()
+        sample = {"timestamp": 1000.5, "cpu_usage": 50.0, "cpu_time": 3.0, "rss_mb": 2.0, "hugetlb_mb": 1024.0, "pids": 1}
+
+        self.assertEqual(handler.save_process_batch(2, "client", [sample]), 1)
+
+        key, members = handler.client.zadd.call_args[0]
+        self.assertEqual((key, list(members.values())), ("monitor:pair2:client:process", [1000.5]))
+        handler.client.execute_command.return_value = list(members)
+        data = handler.get_process_data(2, "client")
+        self.assertEqual(
+            {k: data[0][k] for k in ("pair_index", "role", "epoch", "cpu_usage", "hugetlb_mb", "pids")},
+            {"pair_index": 2, "role": "client", "epoch": 1000.5, "cpu_usage": 50.0, "hugetlb_mb": 1024.0, "pids": 1},
+        )
+
+    def test_expire_process_data(self):
+        """測試依保留天數從 server 與 client 的行程取樣 sorted set 刪除"""
+        handler = _make_handler()
+        pipe = handler.client.pipeline.return_value
+        pipe.execute.return_value = [2, 1]
+
+        self.assertEqual(handler.expire_process_data(1, days=1, now=90000.0), 3)
+        pipe.zremrangebyscore.assert_any_call("monitor:pair1:server:process", "-inf", 3600.0)
+        pipe.zremrangebyscore.assert_any_call("monitor:pair1:client:process", "-inf", 3600.0)
+
+class TestClearPairData(unittest.TestCase):
+    """測試依 timeline 分批 UNLINK 的清除流程"""
+
+    def test_clear_uses_timeline_and_unlink(self):
+        """測試不呼叫 KEYS，依 timeline 成員刪除並回報進度"""
+        handler = _make_handler()
+        client = handler.client
+        timelines = {
+            "monitor:pair0:chunks": [["monitor:pair0:chunk:60", "monitor:pair0:chunk:120"], []],
+            "monitor:pair0:timeline": [[]],
+            "test:pair0:server:timeline": [[]],
+            "test:pair0:client:timeline": [["test:pair0:client:t1"], []],
+        }
+        client.zrange.side_effect = lambda key, *_: timelines[key].pop(0)
+        pipe = client.pipeline.return_value
+        pipe.execute.side_effect = [[2, 2], ["fp"], [3, 1, 1]]
+        client.unlink.return_value = 0
+        progress = []
+
+        self.assertTrue(handler.clear_pair_data(0, sweep=False, progress=progress.append))
+
+        client.keys.assert_not_called()
+        pipe.unlink.assert_any_call(
+            "test:pair0:client:t1:info", "test:pair0:client:t1:packed",
+            "test:pair0:client:t1:metrics", "test:pair0:client:t1:steady"
+        )
+        pipe.zrem.assert_any_call("baseline:fp:client:timeline", "test:pair0:client:t1")
+        self.assertEqual(progress, [2, 5])
+
+    def test_clear_async_returns_thread(self):
+        """測試背景清除返回可 join 的執行緒"""
+        handler = _make_handler()
+        handler.client.zrange.return_value = []
+        handler.client.unlink.return_value = 0
+        handler.client.scan_iter.return_value = iter([])
+
+        thread = handler.clear_pair_data_async(0)
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        handler.client.keys.assert_not_called()
+
+
+class TestSharedPool(unittest.TestCase):
+    """測試共用連線池"""
+
+    def tearDown(self):
+        RedisHandler._shared.clear()
+
+    @patch("RedisDB.redis_client.Redis")
+    def test_shared_handler_per_host_port_db(self, mock_redis):
+        """測試相同 host/port/db 共用同一個 handler 且只 ping 一次"""
+        a = RedisHandler.shared("h", 6379, 0)
+        b = RedisHandler.shared("h", 6379, 0)
+        c = RedisHandler.shared("h", 6379, 1)
+
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(mock_redis.return_value.ping.call_count, 2)
+        self.assertIsInstance(a.connection_pool, InstrumentedConnectionPool)
+
+    @patch("RedisDB.redis_client.Redis")
+    def test_close_releases_on_last_reference(self, mock_redis):
+        """測試最後一個使用者 close 時才真正關閉"""
+        a = RedisHandler.shared("h", 6379, 0)
+        RedisHandler.shared("h", 6379, 0)
+
+        a.close()
+        mock_redis.return_value.close.assert_not_called()
+        a.close()
+        mock_redis.return_value.close.assert_called_once()
+        self.assertIsNot(RedisHandler.shared("h", 6379, 0), a)
+
+    def test_pool_stats_tracks_usage(self):
+        """測試連線池統計記錄取得次數與使用中連線數"""
+        def connection(**_):
+            return MagicMock(**{"can_read.return_value": False})
+
+        pool = InstrumentedConnectionPool(max_connections=2, connection_class=connection)
+
+        first = pool.get_connection()
+        second = pool.get_connection()
+        stats = pool.stats()
+        self.assertEqual(stats["in_use"], 2)
+        self.assertEqual(stats["acquire_count"], 2)
+
+        pool.release(first)
+        pool.release(second)
+        stats = pool.stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["peak_in_use"], 2)
+        self.assertEqual(stats["max_connections"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
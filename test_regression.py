@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""測試效能回歸偵測"""
+
+import unittest
+from unittest.mock import Mock, patch
+from regression import RegressionDetector, check_config, check_regression
+import test_dperf
+
+
+def _run(pkt_rx, drop_tx=0, steady_mean=None):
+    """建立 get_fingerprint_outputs 格式的測試輸出"""
+    run = {"info": {}, "metrics": {"pktRx": str(pkt_rx), "dropTx": str(drop_tx), "mode": "client"}, "steady": {}}
+    if steady_mean is not None:
+        run["steady"] = {"pktRx.mean": str(steady_mean), "pktRx.stddev": "1.0"}
+    return run
+
+
+class TestRegressionDetector(unittest.TestCase):
+    """測試回歸判定"""
+
+    def test_throughput_drop_is_regression(self):
+        """測試吞吐量下降超過門檻時判定為回歸"""
+        detector = RegressionDetector(Mock(), sigma=3.0, min_relative=0.05)
+        baseline = [_run(1000), _run(1010), _run(990)]
+
+        deltas = {d.metric: d for d in detector.compare({"pktRx": 900.0}, baseline)}
+
+        self.assertTrue(deltas["pktRx"].regression)
+        self.assertAlmostEqual(deltas["pktRx"].delta_percent, -10.0)
+
+    def test_change_within_noise_is_not_regression(self):
+        """測試在雜訊門檻內的變化不判定為回歸"""
+        detector = RegressionDetector(Mock(), sigma=3.0, min_relative=0.01)
+        baseline = [_run(1000), _run(1100), _run(900)]
+
+        deltas = {d.metric: d for d in detector.compare({"pktRx": 850.0}, baseline)}
+
+        # stddev ≈ 81.6，門檻 ≈ 245，下降 150 仍在雜訊範圍內
+        self.assertFalse(deltas["pktRx"].regression)
+
+    def test_improvement_is_not_regression(self):
+        """測試往好的方向變化不判定為回歸"""
+        detector = RegressionDetector(Mock())
+        baseline = [_run(1000, drop_tx=100)] * 3
+
+        deltas = {d.metric: d for d in detector.compare({"pktRx": 2000.0, "dropTx": 0.0}, baseline)}
+
+        self.assertFalse(deltas["pktRx"].regression)
+        self.assertFalse(deltas["dropTx"].regression)
+
+    def test_error_increase_is_regression(self):
+        """測試錯誤類指標上升時判定為回歸"""
+        detector = RegressionDetector(Mock())
+        baseline = [_run(1000, drop_tx=100)] * 3
+
+        deltas = {d.metric: d for d in detector.compare({"dropTx": 200.0}, baseline)}
+
+        self.assertTrue(deltas["dropTx"].regression)
+
+    def test_steady_mean_compared_and_stddev_ignored(self):
+        """測試穩態統計只比較 mean，不比較 stddev"""
+        detector = RegressionDetector(Mock())
+        baseline = [_run(1000, steady_mean=500)] * 3
+
+        deltas = {d.metric: d for d in detector.compare({"pktRx.mean": 400.0, "pktRx.stddev": 50.0}, baseline)}
+
+        self.assertTrue(deltas["pktRx.mean"].regression)
+        self.assertNotIn("pktRx.stddev", deltas)
+
+    def test_check_latest_uses_previous_runs_as_baseline(self):
+        """測試最新一筆與之前的結果比較"""
+        handler = Mock()
+        handler.get_fingerprint_outputs.return_value = [_run(500), _run(1000), _run(1000)]
+        detector = RegressionDetector(handler, baseline_runs=2)
+
+        deltas = detector.check_latest("abc", "client")
+
+        handler.get_fingerprint_outputs.assert_called_once_with("abc", "client", limit=3)
+        self.assertTrue(any(d.regression for d in deltas))
+
+    def test_check_latest_without_history(self):
+        """測試沒有歷史資料時不判定回歸"""
+        handler = Mock()
+        handler.get_fingerprint_outputs.return_value = [_run(500)]
+
+        self.assertEqual(RegressionDetector(handler).check_latest("abc", "client"), [])
+
+
+class TestCheckConfig(unittest.TestCase):
+    """測試整份配置的回歸檢查"""
+
+    def test_check_config_reports_regression(self):
+        """測試任何 pair 回歸時返回 True"""
+        config = test_dperf.TestDperfInit()._create_test_config()
+        handler = Mock()
+        handler.get_fingerprint_outputs.return_value = [_run(500), _run(1000)]
+
+        self.assertTrue(check_config(config, handler))
+        handler.get_fingerprint_outputs.assert_any_call(config.pair_fingerprint(0), "server", limit=6)
+
+    def test_check_regression_exit_codes(self):
+        """測試無法連接儲存後端時返回 2，沒有 baseline 時返回 0 並列出缺少 baseline 的項目"""
+        config = test_dperf.TestDperfInit()._create_test_config()
+        handler = Mock()
+        handler.is_connected.return_value = False
+
+        self.assertEqual(check_regression(config, handler), 2)
+        handler.get_fingerprint_outputs.assert_not_called()
+
+        handler.is_connected.return_value = True
+        handler.get_fingerprint_outputs.return_value = [_run(500)]
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(check_regression(config, handler), 0)
+        output = "\n".join(str(call.args[0]) for call in mock_print.call_args_list if call.args)
+        self.assertIn("未進行回歸比對: Pair 0 server, Pair 0 client", output)
+
+        handler.get_fingerprint_outputs.return_value = [_run(500), _run(1000)]
+        self.assertEqual(check_regression(config, handler), 1)
+
+    def test_fingerprint_ignores_credentials(self):
+        """測試配置指紋不受帳號密碼影響，但受 pair 參數影響"""
+        config = test_dperf.TestDperfInit()._create_test_config()
+        fingerprint = config.pair_fingerprint(0)
+
+        config.test.traffic_generator.password = "changed"
+        self.assertEqual(config.pair_fingerprint(0), fingerprint)
+
+        config.test.traffic_generator.pairs[0].payload_size = 64
+        self.assertNotEqual(config.pair_fingerprint(0), fingerprint)
+
+    def test_config_fingerprint_follows_pairs(self):
+        """測試整份配置指紋隨任一 pair 的配置改變"""
+        config = test_dperf.TestDperfInit()._create_test_config()
+        fingerprint = config.fingerprint()
+
+        config.test.traffic_generator.pairs[0].payload_size = 64
+        self.assertNotEqual(config.fingerprint(), fingerprint)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""測試 ResourcePlanner 的拓樸解析與資源分配"""
+
+import unittest
+from unittest.mock import Mock, patch
+from resource_planner import ResourcePlanner, PairAllocation, hugepage_kb, socket_mem_mb
+from dperfSetup import dperf
+import test_dperf
+from config import TrafficGeneratorPair, ClientConfig, ServerConfig
+
+
+TOPOLOGY_OUTPUT = """[root@host ~]# lscpu -p=CPU,NODE,SOCKET; grep -H . /sys/bus/pci/devices/*/numa_node
+# The following is the parsable format, which can be fed to other
+# CPU,Node,Socket
+0,0,0
+1,0,0
+2,0,0
+3,0,0
+4,1,1
+5,1,1
+6,1,1
+7,1,1
+/sys/bus/pci/devices/0000:01:00.0/numa_node:0
+/sys/bus/pci/devices/0000:02:00.0/numa_node:1
+/sys/bus/pci/devices/0000:03:00.0/numa_node:1
+/sys/bus/pci/devices/0000:04:00.0/numa_node:-1
+/sys/devices/system/node/node0/hugepages/hugepages-1048576kB/free_hugepages:2
+/sys/devices/system/node/node1/hugepages/hugepages-1048576kB/free_hugepages:1
+/sys/devices/system/node/node1/hugepages/hugepages-2048kB/free_hugepages:512
+[root@host ~]# """
+
+
+def _make_pair(client_pci, server_pci, socket_mem=1024):
+    """建立測試用 pair"""
+    pair = TrafficGeneratorPair()
+    pair.client = ClientConfig(client_nic_pci=client_pci, socket_mem=socket_mem)
+    pair.server = ServerConfig(server_nic_pci=server_pci, socket_mem=socket_mem)
+    return pair
+
+
+class TestTopologyParsing(unittest.TestCase):
+    """測試拓樸解析"""
+
+    def test_parse_topology(self):
+        """測試解析 lscpu 與 sysfs 輸出"""
+        topology = ResourcePlanner.parse_topology(TOPOLOGY_OUTPUT)
+
+        self.assertEqual(topology.cpus_by_node, {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]})
+        self.assertEqual(topology.nic_nodes["0000:02:00.0"], 1)
+        self.assertEqual(topology.free_hugepage_mb, {0: 2048, 1: 2048})
+        self.assertEqual(topology.nodes, [0, 1])
+
+    def test_parse_topology_counts_configured_page_size(self):
+        """測試指定 hugepage_size 時只計算該大小的可用頁"""
+        executor = Mock()
+        executor.execute_command.return_value = (TOPOLOGY_OUTPUT, "", 0)
+
+        self.assertEqual(ResourcePlanner(executor=executor, hugepage_size="1G").read_topology().free_hugepage_mb,
+                         {0: 2048, 1: 1024})
+        self.assertEqual(ResourcePlanner.parse_topology(TOPOLOGY_OUTPUT, hugepage_kb("2M")).free_hugepage_mb,
+                         {1: 1024})
+        with self.assertRaises(ValueError):
+            hugepage_kb("1GB")
+
+    def test_unknown_numa_node_defaults_to_zero(self):
+        """測試 numa_node 為 -1 時視為節點 0"""
+        topology = ResourcePlanner.parse_topology(TOPOLOGY_OUTPUT)
+
+        self.assertEqual(topology.nic_node("0000:04:00.0"), 0)
+        self.assertEqual(topology.nic_node("0000:ff:00.0"), 0)
+
+    def test_topology_read_once(self):
+        """測試拓樸只從遠端讀取一次"""
+        executor = Mock()
+        executor.execute_command.return_value = (TOPOLOGY_OUTPUT, "", 0)
+        planner = ResourcePlanner(executor=executor)
+
+        planner.read_topology()
+        planner.read_topology()
+
+        executor.execute_command.assert_called_once()
+
+
+class TestResourcePlan(unittest.TestCase):
+    """測試資源分配"""
+
+    def setUp(self):
+        """設定測試環境"""
+        self.executor = Mock()
+        self.executor.execute_command.return_value = (TOPOLOGY_OUTPUT, "", 0)
+
+    def test_plan_numa_local_and_non_overlapping(self):
+        """測試分配的核心位於 NIC 所在節點且互不重疊"""
+        planner = ResourcePlanner(executor=self.executor, cores_per_role=1, reserved_cores=[0])
+        pairs = [
+            _make_pair("0000:01:00.0", "0000:02:00.0", socket_mem=512),
+            _make_pair("0000:01:00.0", "0000:03:00.0", socket_mem=512),
+        ]
+
+        allocations = planner.plan(pairs)
+
+        self.assertEqual(allocations[0].client_cpus, [1])
+        self.assertEqual(allocations[0].server_cpus, [4])
+        self.assertEqual(allocations[1].client_cpus, [2])
+        self.assertEqual(allocations[1].server_cpus, [5])
+        self.assertEqual(allocations[0].client_socket_mem, "512,0")
+        self.assertEqual(allocations[0].server_socket_mem, "0,512")
+
+    def test_plan_accepts_per_node_socket_mem(self):
+        """測試 socket_mem 為 per-node 格式時以總量配置到 NIC 所在節點"""
+        planner = ResourcePlanner(executor=self.executor, cores_per_role=1)
+        allocations = planner.plan([_make_pair("0000:01:00.0", "0000:02:00.0", socket_mem="0,1024")])
+
+        self.assertEqual(allocations[0].client_socket_mem, "1024,0")
+        self.assertEqual(allocations[0].server_socket_mem, "0,1024")
+        self.assertEqual(socket_mem_mb("512, 512"), 1024)
+        with self.assertRaises(ValueError):
+            socket_mem_mb("1G")
+
+    def test_plan_raises_when_hugepages_short(self):
+        """測試 NUMA 節點可用 hugepages 不足時拋出例外，訊息列出節點、需要與可用的 MB"""
+        planner = ResourcePlanner(executor=self.executor, cores_per_role=1, hugepage_size="1G")
+        pairs = [_make_pair("0000:01:00.0", "0000:02:00.0"), _make_pair("0000:01:00.0", "0000:03:00.0")]
+
+        with self.assertRaises(ValueError) as context:
+            planner.plan(pairs)
+        self.assertIn("NUMA node 1 需要 2048 MB，只有 1024 MB 可用", str(context.exception))
+        self.assertNotIn("node 0", str(context.exception))
+
+    def test_plan_spills_to_other_node(self):
+        """測試本地核心不足時跨節點分配"""
+        planner = ResourcePlanner(executor=self.executor, cores_per_role=3, reserved_cores=[0])
+        pairs = [_make_pair("0000:01:00.0", "0000:01:00.0")]
+
+        allocations = planner.plan(pairs)
+
+        self.assertEqual(allocations[0].client_cpus, [1, 2, 3])
+        self.assertEqual(allocations[0].server_cpus, [4, 5, 6])
+
+    def test_plan_raises_when_cores_exhausted(self):
+        """測試核心耗盡時拋出例外"""
+        planner = ResourcePlanner(executor=self.executor, cores_per_role=4, reserved_cores=[0])
+        pairs = [_make_pair("0000:01:00.0", "0000:02:00.0")] * 2
+
+        with self.assertRaises(ValueError):
+            planner.plan(pairs)
+
+
+class TestDperfAllocation(unittest.TestCase):
+    """測試 dperf 配置使用規劃結果"""
+
+    def setUp(self):
+        """設定測試環境"""
+        self.config = test_dperf.TestDperfInit()._create_test_config()
+
+    @patch("dperfSetup.SSHExecutor")
+    def test_generate_config_with_allocation(self, mock_ssh):
+        """測試有分配結果時覆蓋 cpu 與 socket_mem"""
+        d = dperf(self.config, enable_redis=False)
+        d.allocation = PairAllocation(
+            pair_index=0, client_node=0, server_node=1,
+            client_cpus=[1, 2], server_cpus=[4],
+            client_socket_mem="1024,0", server_socket_mem="0,1024",
+        )
+
+        self.assertIn("cpu             1 2", d.generateClientConfig())
+        self.assertIn("socket_mem      1024,0", d.generateClientConfig())
+        self.assertIn("cpu             4", d.generateServerConfig())
+        self.assertIn("socket_mem      0,1024", d.generateServerConfig())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
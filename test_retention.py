@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""測試監控數據保留與降採樣"""
+
+import unittest
+from unittest.mock import Mock
+import numpy as np
+from config import RetentionConfig
+from RedisDB import ROLLUP_DTYPE, rollup_records
+from retention import RetentionCompactor
+
+
+def _records(timestamps, values, counts=None):
+    """建立 cpu/ram 數值相同的 ROLLUP_DTYPE 紀錄"""
+    records = np.zeros(len(timestamps), dtype=ROLLUP_DTYPE)
+    records['timestamp'] = timestamps
+    records['count'] = counts or [1] * len(timestamps)
+    for name in ROLLUP_DTYPE.names[2:]:
+        records[name] = values
+    return records
+
+
+class TestRollupRecords(unittest.TestCase):
+    """測試分桶彙總"""
+
+    def test_min_avg_max_per_bucket(self):
+        """測試每個分桶計算 min/avg/max 與筆數"""
+        result = rollup_records(_records([0, 10, 59, 60, 61], [1, 2, 6, 10, 20]), 60)
+
+        self.assertEqual(result['timestamp'].tolist(), [0, 60])
+        self.assertEqual(result['count'].tolist(), [3, 2])
+        self.assertEqual(result['cpu_usage_min'].tolist(), [1, 10])
+        self.assertEqual(result['cpu_usage_avg'].tolist(), [3, 15])
+        self.assertEqual(result['cpu_usage_max'].tolist(), [6, 20])
+
+    def test_merge_weights_average_by_count(self):
+        """測試合併既有彙總時 avg 依筆數加權"""
+        result = rollup_records(_records([0, 60], [10, 40], counts=[3, 1]), 3600)
+
+        self.assertEqual(result['count'].tolist(), [4])
+        self.assertAlmostEqual(float(result['ram_used_avg'][0]), 17.5)
+
+
+class TestRetentionCompactor(unittest.TestCase):
+    """測試保留政策的套用"""
+
+    def test_run_once_applies_policy_to_each_pair(self):
+        """測試每個 pair 依政策壓縮，未設定 test_output_days 時不刪除測試輸出"""
+        handler = Mock()
+        handler.compact_monitor_data.return_value = {'raw_samples': 1}
+        policy = RetentionConfig(raw_days=1, minute_days=0, hour_days=None)
+
+        results = RetentionCompactor(handler, policy, range(2)).run_once(now=1000.0)
+
+        handler.compact_monitor_data.assert_any_call(1, raw_days=1, minute_days=0, hour_days=None, now=1000.0)
+        handler.expire_test_outputs.assert_not_called()
+        handler.expire_process_data.assert_not_called()
+        handler.expire_apv_samples.assert_not_called()
+        self.assertEqual(results[0]['test_outputs_expired'], 0)
+
+    def test_run_once_expires_test_outputs(self):
+        """測試設定 test_output_days 時刪除過期的測試輸出與 dperf 行程取樣"""
+        handler = Mock()
+        handler.compact_monitor_data.side_effect = lambda *args, **kwargs: {}
+        handler.expire_test_outputs.return_value = 6
+        handler.expire_process_data.return_value = 40
+
+        results = RetentionCompactor(handler, RetentionConfig(test_output_days=90), [0]).run_once(now=1000.0)
+
+        handler.expire_test_outputs.assert_called_once_with(0, 90, now=1000.0)
+        handler.expire_process_data.assert_called_once_with(0, 90, now=1000.0)
+        self.assertEqual(results[0]['test_outputs_expired'], 6)
+        self.assertEqual(results[0]['process_samples_expired'], 40)
+        handler.expire_apv_samples.assert_called_once_with(90, now=1000.0)
+        handler.expire_runs.assert_called_once_with(90, now=1000.0)
+
+    def test_run_once_discovers_stored_pairs(self):
+        """測試未指定 pair 時處理儲存後端中所有寫入過數據的 pair（包含已不在配置中的 pair）"""
+        handler = Mock()
+        handler.stored_pairs.return_value = [0, 3]
+        handler.compact_monitor_data.side_effect = lambda *args, **kwargs: {}
+
+        results = RetentionCompactor(handler, RetentionConfig()).run_once(now=1000.0)
+
+        self.assertEqual(sorted(results), [0, 3])
+        handler.compact_monitor_data.assert_any_call(3, raw_days=7, minute_days=30, hour_days=365, now=1000.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
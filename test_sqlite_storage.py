@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""測試 SQLite 儲存後端"""
+
+import os
+import tempfile
+import unittest
+from sqlite_storage import SQLiteHandler, open_storage_handler
+
+
+def _sample(ts, cpu=10.0):
+    return {"timestamp": ts, "cpu_usage": cpu, "ram_used": 512, "ram_total": 1024, "ram_usage": 50.0}
+
+
+class TestSQLiteHandler(unittest.TestCase):
+    """測試與 RedisHandler 相同介面的讀寫"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.handler = SQLiteHandler(os.path.join(self.tmpdir.name, "test.db"))
+
+    def tearDown(self):
+        self.handler.close()
+        self.tmpdir.cleanup()
+
+    def test_monitor_batch_and_range(self):
+        """測試批次寫入監控數據並依時間範圍讀取"""
+        self.assertEqual(self.handler.save_monitor_batch(0, [_sample(1000.0 + i) for i in range(10)]), 10)
+
+        arrays = self.handler.get_monitor_arrays(0, start_time=1002.0, end_time=1004.0)
+        self.assertEqual(arrays["timestamp"].tolist(), [1002.0, 1003.0, 1004.0])
+
+        data = self.handler.get_monitor_data(0, limit=2)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]["ram_total"], 1024)
+
+    def test_monitor_page_cursor(self):
+        """測試以 cursor 分頁讀取監控數據"""
+        self.handler.save_monitor_batch(0, [_sample(1000.0 + i) for i in range(5)])
+
+        page, cursor = self.handler.get_monitor_page(0, cursor=None, limit=3)
+        self.assertEqual(len(page["timestamp"]), 3)
+        page, cursor = self.handler.get_monitor_page(0, cursor=cursor, limit=3)
+        self.assertEqual(page["timestamp"].tolist(), [1003.0, 1004.0])
+        self.assertIsNone(cursor)
+
+    def test_test_outputs_and_fingerprint(self):
+        """測試測試輸出的讀取與配置指紋查詢"""
+        self.handler.save_test_output(0, "client", {"pktRx": 100}, timestamp=1000.0, fingerprint="abc")
+        self.handler.save_test_output(0, "client", {"pktRx": 200}, timestamp=2000.0, fingerprint="abc",
+                                      steady={"pktRx.mean": 150.0})
+
+        latest = self.handler.get_test_output(0, "client")
+        self.assertEqual(latest["metrics"], {"pktRx": 200})
+        self.assertEqual(latest["steady"], {"pktRx.mean": 150.0})
+
+        runs = self.handler.get_fingerprint_outputs("abc", "client", limit=5)
+        self.assertEqual([r["metrics"]["pktRx"] for r in runs], [200, 100])
+        self.assertEqual(self.handler.get_specific_metrics(0, "client", ["pktRx", "dropTx"]),
+                         {"pktRx": 200, "dropTx": None})
+        self.assertEqual(len(self.handler.get_all_test_outputs(0, "client", limit=1, offset=1)), 1)
+
+    def test_metric_arrays(self):
+        """測試多次測試的指標以陣列讀取，schema 定義保存在資料庫"""
+        self.handler.save_test_output(0, "client", {"pktRx": 100, "state": "ok"}, timestamp=1000.0)
+        self.handler.save_test_output(0, "client", {"pktRx": 200, "state": "ok"}, timestamp=2000.0)
+
+        arrays = self.handler.get_metric_arrays(0, "client", start_time=1500.0)
+        self.assertEqual(arrays["timestamp"].tolist(), [2000.0])
+        self.assertEqual(arrays["pktRx"].tolist(), [200])
+        self.assertNotIn("state", arrays)
+        self.assertEqual(self.handler._query("SELECT COUNT(*) FROM metric_schemas")[0][0], 1)
+
+    def test_clear_pair_data(self):
+        """測試分批清除只影響指定 pair"""
+        self.handler.save_monitor_batch(0, [_sample(1000.0 + i) for i in range(7)])
+        self.handler.save_monitor_batch(1, [_sample(1000.0)])
+        self.handler.save_test_output(0, "server", {"pktTx": 1}, timestamp=1000.0)
+        progress = []
+
+        self.assertTrue(self.handler.clear_pair_data(0, batch_size=3, progress=progress.append))
+
+        self.assertEqual(progress, [3, 6, 7, 8])
+        self.assertEqual(self.handler.get_pair_summary(0)["monitor_count"], 0)
+        self.assertEqual(self.handler.get_pair_summary(1)["monitor_count"], 1)
+
+    def test_compact_monitor_data(self):
+        """測試舊的原始樣本降採樣為 1 分鐘彙總，再合併為 1 小時"""
+        now = 100 * 86400.0
+        self.handler.save_monitor_batch(0, [_sample(now - 10 * 86400 + i, cpu=i % 60) for i in range(120)])
+        self.handler.save_monitor_batch(0, [_sample(now - 1)])
+
+        result = self.handler.compact_monitor_data(0, raw_days=7, minute_days=30, now=now)
+
+        self.assertEqual(result["raw_samples"], 120)
+        minutes = self.handler.get_monitor_rollups(0, "1m")
+        self.assertEqual(minutes["count"].tolist(), [60, 60])
+        self.assertEqual(minutes["cpu_usage_max"].tolist(), [59, 59])
+        self.assertEqual(len(self.handler.get_monitor_arrays(0)["timestamp"]), 1)
+
+        self.handler.compact_monitor_data(0, raw_days=7, minute_days=30, now=now + 30 * 86400)
+        hours = self.handler.get_monitor_rollups(0, "1h")
+        self.assertEqual(hours["count"].tolist(), [120, 1])
+        self.assertAlmostEqual(float(hours["cpu_usage_avg"][0]), 29.5)
+        self.assertEqual(len(self.handler.get_monitor_rollups(0, "1m")["timestamp"]), 0)
+
+    def test_expire_test_outputs(self):
+        """測試只刪除超過保留天數的測試輸出"""
+        self.handler.save_test_output(0, "client", {"pktRx": 1}, timestamp=1000.0)
+        self.handler.save_test_output(0, "client", {"pktRx": 2}, timestamp=2000.0)
+
+        self.assertEqual(self.handler.expire_test_outputs(0, days=0, now=1500.0), 1)
+        self.assertEqual(self.handler.get_test_output(0, "client")["metrics"], {"pktRx": 2})
+
+    def test_run_index(self):
+        """測試同一秒開始的兩次執行不互相覆蓋，並可依配置與日期查詢"""
+        for run_id, value in (("r1", 1), ("r2", 2)):
+            self.handler.start_run(run_id, "cfg", [0], start_time=1000.0 + value)
+            self.handler.save_test_output(0, "client", {"pktRx": value}, timestamp=1000.0, run_id=run_id)
+        self.handler.finish_run("r1", end_time=2000.0)
+
+        self.assertEqual(self.handler.get_test_output(0, "client", run_id="r1")["metrics"], {"pktRx": 1})
+        self.assertEqual(self.handler.get_run("r1")["status"], "completed")
+        self.assertEqual([r["run_id"] for r in self.handler.get_runs(fingerprint="cfg")], ["r2", "r1"])
+        date = self.handler.get_run("r1")["date"]
+        self.assertEqual(len(self.handler.get_runs(fingerprint="cfg", date=date, limit=1)), 1)
+        self.assertEqual(self.handler.get_run_outputs("r2")[0]["client"]["metrics"], {"pktRx": 2})
+
+        runs, cursor = self.handler.get_runs_page(limit=1)
+        self.assertEqual(([r["run_id"] for r in runs], cursor), (["r1"], 1))
+        self.assertEqual(self.handler.get_runs_page(cursor, limit=2)[1], None)
+
+    def test_expire_runs_and_stored_pairs(self):
+        """測試刪除過期的執行索引，並找出所有寫入過數據的 pair"""
+        self.handler.start_run("old", "cfg", [0], start_time=1000.0)
+        self.handler.start_run("new", "cfg", [0], start_time=2000.0)
+        self.handler.save_test_output(3, "client", {"pktRx": 1}, timestamp=1000.0)
+        self.handler.save_monitor_data(1, 1000.0, 10.0, 100, 1000, 10.0)
+
+        self.assertEqual(self.handler.expire_runs(days=0, now=1500.0), 1)
+        self.assertIsNone(self.handler.get_run("old"))
+        self.assertEqual([r["run_id"] for r in self.handler.get_runs(fingerprint="cfg")], ["new"])
+        self.assertEqual(self.handler.stored_pairs(), [1, 3])
+
+    def test_apv_samples(self):
+        """測試 APV 樣本依 run_id 保存，並依時間範圍以字典或陣列讀取"""
+        self.handler.save_apv_samples("r1", [
+            {"timestamp": 1000.5, "metrics": {"system.cpu": 10, "slb.vs.conn": 3}},
+            {"timestamp": 1001.5, "metrics": {"system.cpu": 20, "slb.vs.conn": 4}},
+        ])
+        self.handler.save_apv_samples("r2", [{"timestamp": 1000.5, "metrics": {"system.cpu": 99}}])
+
+        samples = self.handler.get_apv_samples("r1")
+        self.assertEqual(samples[0], {"timestamp": 1000.5, "metrics": {"system.cpu": 10, "slb.vs.conn": 3}})
+        arrays = self.handler.get_apv_arrays("r1", start_time=1001.0)
+        self.assertEqual(arrays["timestamp"].tolist(), [1001.5])
+        self.assertEqual(arrays["system.cpu"].tolist(), [20])
+
+        self.assertEqual(self.handler.expire_apv_samples(days=0, now=1001.0), 2)
+        self.assertEqual([sample["timestamp"] for sample in self.handler.get_apv_samples("r1")], [1001.5])
+        self.assertEqual(self.handler.get_apv_samples("r2"), [])
+
+
+    def test_process_samples(self):
+        """測試 dperf 行程取樣依 pair 與角色分開保存，清除 pair 時一併刪除"""
+        sample = {"cpu_usage": 50.0, "cpu_time": 3.0, "rss_mb": 2.0, "hugetlb_mb": 1024.0, "pids": 1}
+        self.assertEqual(self.handler.save_process_batch(0, "server", [
+            dict(sample, timestamp=1000.5), dict(sample, timestamp=1001.5, cpu_usage=75.0),
+        ]), 2)
+        self.handler.save_process_batch(0, "client", [dict(sample, timestamp=1000.5, cpu_usage=10.0)])
+        self.handler.save_process_batch(1, "server", [dict(sample, timestamp=1000.5, cpu_usage=99.0)])
+
+        data = self.handler.get_process_data(0, "server", start_time=1001.0)
+        self.assertEqual([(d["role"], d["cpu_usage"], d["hugetlb_mb"]) for d in data], [("server", 75.0, 1024.0)])
+        self.assertEqual(self.handler.get_process_arrays(0, "client")["cpu_usage"].tolist(), [10.0])
+
+        self.handler.clear_pair_data(0)
+        self.assertEqual(len(self.handler.get_process_arrays(0, "server")["timestamp"]), 0)
+        self.assertEqual(len(self.handler.get_process_arrays(1, "server")["timestamp"]), 1)
+
+    def test_expire_process_data(self):
+        """測試只刪除此 pair 超過保留天數的行程取樣"""
+        sample = {"cpu_usage": 50.0, "cpu_time": 3.0, "rss_mb": 2.0, "hugetlb_mb": 1024.0, "pids": 1}
+        for role in ("server", "client"):
+            self.handler.save_process_batch(0, role, [dict(sample, timestamp=1000.0), dict(sample, timestamp=2000.0)])
+        self.handler.save_process_batch(1, "server", [dict(sample, timestamp=1000.0)])
+
+        self.assertEqual(self.handler.expire_process_data(0, days=0, now=1500.0), 2)
+        self.assertEqual(self.handler.get_process_arrays(0, "server")["timestamp"].tolist(), [2000.0])
+        self.assertEqual(len(self.handler.get_process_arrays(1, "server")["timestamp"]), 1)
+
+
+class TestOpenStorageHandler(unittest.TestCase):
+    """測試依設定選擇儲存後端"""
+
+    def test_sqlite_backend_is_shared(self):
+        """測試相同路徑共用同一個 SQLiteHandler"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "shared.db")
+            first = open_storage_handler("sqlite", sqlite_path=path)
+            second = open_storage_handler("sqlite", sqlite_path=path)
+            self.assertIs(first, second)
+            first.close()
+            self.assertTrue(second.is_connected())
+            second.close()
+
+    def test_unknown_backend(self):
+        """測試不支援的後端"""
+        with self.assertRaises(ValueError):
+            open_storage_handler("mongodb")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
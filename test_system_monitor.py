@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""測試 SystemMonitor 的 /proc 取樣"""
+
+import os
+import subprocess
+import tempfile
+import unittest
+from threading import Event
+from unittest.mock import MagicMock, patch
+from system_monitor import (
+    SystemMonitor, TickScheduler, parse_proc_sample, cpu_usage_percent, memory_usage, stream_sample_cmd,
+    format_sample_time, per_core_usage, parse_dperf_cpus, load_worker_cores, parse_process_sample, process_usage,
+    parse_hugepage_sample, parse_stream_marker, PROC_SAMPLE_CMD, STREAM_MARKER
+)
+
+
+def _hugepages(node, page_kb, total, free):
+    """模擬 HUGEPAGE_SAMPLE_CMD（grep -H）的輸出"""
+    base = f"/sys/devices/system/node/node{node}/hugepages/hugepages-{page_kb}kB"
+    return f"{base}/nr_hugepages:{total}\r\n{base}/free_hugepages:{free}\r\n"
+
+
+def _proc_output(user, idle, mem_available=1024 * 1024, processes=""):
+    """模擬持久 session 的輸出（含指令回顯與提示符）"""
+    return (
+        f"[root@gen ~]# {PROC_SAMPLE_CMD}\r\n"
+        f"cpu  {user} 0 0 {idle} 0 0 0 0 0 0\r\n"
+        f"cpu0 {user} 0 0 {idle} 0 0 0 0 0 0\r\n"
+        "MemTotal:        4194304 kB\r\n"
+        f"MemAvailable:    {mem_available} kB\r\n"
+        f"{processes}"
+        "[root@gen ~]# "
+    )
+
+
+def _dperf_process(pid, pair_index, role, utime, stime, rss_kb=2048, hugetlb_kb=1048576):
+    """模擬一個 dperf 行程的 PROCESS_SAMPLE_CMD 輸出"""
+    return (
+        f"@@pid {pid} ./build/dperf -c config/{role}_pair{pair_index}.conf\r\n"
+        f"{pid} (dperf worker) R 1 {pid} {pid} 0 -1 4194560 0 0 0 0 {utime} {stime} 0 0 20 0 1 0\r\n"
+        f"VmRSS:\t    {rss_kb} kB\r\n"
+        f"HugetlbPages:\t {hugetlb_kb} kB\r\n"
+    )
+
+
+class TestProcParsing(unittest.TestCase):
+    """測試 /proc/stat、/proc/meminfo 解析與差值計算"""
+
+    def test_parse_ignores_prompt_and_echo(self):
+        """測試略過提示符與指令回顯，iowait 計為閒置"""
+        cpu_times, meminfo = parse_proc_sample(
+            "\x1b[0mcpu  10 2 3 40 5 1 1 0 7 0\r\nHugePages_Total:  8\r\nMemTotal: 2048 kB\r\n# "
+        )
+        self.assertEqual(cpu_times, {"cpu": (17, 62)})
+        self.assertEqual(meminfo, {"HugePages_Total": 8, "MemTotal": 2048})
+
+    def test_cpu_usage_from_deltas(self):
+        """測試 CPU 使用率為兩次取樣之間的差值，計數器重置時返回 None"""
+        self.assertEqual(cpu_usage_percent((100, 400), (175, 500)), 75.0)
+        self.assertIsNone(cpu_usage_percent((100, 400), (100, 400)))
+        self.assertIsNone(cpu_usage_percent((100, 400), (10, 500)))
+
+    def test_memory_usage(self):
+        """測試已使用記憶體為 MemTotal - MemAvailable，舊核心改用 MemFree + Buffers + Cached"""
+        self.assertEqual(memory_usage({"MemTotal": 4096 * 1024, "MemAvailable": 1024 * 1024}), (3072, 4096, 75.0))
+        self.assertEqual(
+            memory_usage({"MemTotal": 4096 * 1024, "MemFree": 1024 * 1024, "Buffers": 0, "Cached": 1024 * 1024}),
+            (2048, 4096, 50.0),
+        )
+
+
+class TestSample(unittest.TestCase):
+    """測試每次取樣只執行一個遠端指令"""
+
+    def test_first_sample_sets_baseline(self):
+        """測試第一次取樣只建立基準，之後以差值計算"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.executor = MagicMock()
+        monitor._last_cpu_times = {}
+        monitor._last_processes = {}
+        monitor.metrics = None
+        monitor.executor.execute_command.side_effect = [
+            (_proc_output(100, 900), "", 0), (_proc_output(150, 950), "", 0)
+        ]
+
+        self.assertIsNone(monitor._sample())
+        self.assertEqual(monitor._sample(), (50.0, 3072, 4096, 75.0, {0: 50.0}, {}, {}))
+        monitor.executor.execute_command.assert_called_with(PROC_SAMPLE_CMD)
+
+    def test_unparsable_output_raises(self):
+        """測試無法解析的輸出"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.executor = MagicMock()
+        monitor._last_cpu_times = {}
+        monitor._last_processes = {}
+        monitor.metrics = None
+        monitor.executor.execute_command.return_value = ("bash: grep: command not found", "", 0)
+
+        with self.assertRaises(ValueError):
+            monitor._sample()
+
+
+class TestWorkerCores(unittest.TestCase):
+    """測試每核心使用率與 dperf worker 核心標記"""
+
+    def test_per_core_usage(self):
+        """測試只計算兩次取樣都有的 cpuN 行"""
+        previous = {"cpu": (0, 0), "cpu0": (100, 400), "cpu1": (0, 100)}
+        current = {"cpu": (0, 0), "cpu0": (190, 500), "cpu1": (10, 200), "cpu2": (5, 10)}
+        self.assertEqual(per_core_usage(previous, current), {0: 90.0, 1: 10.0})
+
+    def test_load_worker_cores_from_configs(self):
+        """測試由產生的 dperf 配置檔讀取 cpu 欄位（單一核心、範圍與多個值）"""
+        self.assertEqual(parse_dperf_cpus("mode server\ncpu             2-4 8\nrss"), [2, 3, 4, 8])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, cpu in (("server_pair0", "14"), ("client_pair0", "6"), ("client_pair1", "7-8")):
+                with open(os.path.join(tmpdir, f"{name}.conf"), "w") as f:
+                    f.write(f"mode            client\ncpu             {cpu}\n")
+            self.assertEqual(
+                load_worker_cores([0, 1], config_dir=tmpdir),
+                {14: (0, "server"), 6: (0, "client"), 7: (1, "client"), 8: (1, "client")},
+            )
+
+    def test_saturated_worker_flagged(self):
+        """測試 worker 核心達到飽和門檻時在報告中標記"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.saturation_threshold = 90.0
+        monitor.set_worker_cores({6: (0, "client"), 14: (0, "server")})
+        for usage in (50.0, 97.0, 99.0):
+            monitor._track_cores("t", {6: usage, 14: 40.0, 3: 100.0})
+
+        report = {entry["core"]: entry for entry in monitor.get_core_report()}
+        self.assertEqual(sorted(report), [6, 14])
+        self.assertTrue(report[6]["saturated"])
+        self.assertEqual((report[6]["saturated_samples"], report[6]["max_usage"]), (2, 99.0))
+        self.assertFalse(report[14]["saturated"])
+        self.assertEqual(report[14]["avg_usage"], 40.0)
+
+
+class TestProcessAttribution(unittest.TestCase):
+    """測試各 pair dperf 行程的資源歸屬"""
+
+    def test_parse_process_sample(self):
+        """測試依指令列的配置檔歸屬 pair 與角色，名稱含空白時仍取得 utime + stime"""
+        output = (
+            _dperf_process(4100, 0, "server", 300, 20)
+            + _dperf_process(4200, 1, "client", 50, 5, hugetlb_kb=0)
+            + "@@pid 4300 /usr/bin/other -c other.conf\r\n4300 (other) S 1 0 0 0 -1 0 0 0 0 0 9 9\r\n"
+        )
+        processes = parse_process_sample(output)
+        self.assertEqual(processes, {
+            (0, "server"): {"pids": (4100,), "jiffies": 320, "rss_kb": 2048, "hugetlb_kb": 1048576},
+            (1, "client"): {"pids": (4200,), "jiffies": 55, "rss_kb": 2048, "hugetlb_kb": 0},
+        })
+
+    def test_usage_per_pair_and_restart_skipped(self):
+        """測試 CPU 使用率以單一核心為 100%，行程重新啟動時略過該次取樣"""
+        previous_times = {"cpu": (0, 0), "cpu0": (0, 0), "cpu1": (0, 0)}
+        cpu_times = {"cpu": (0, 400), "cpu0": (0, 200), "cpu1": (0, 200)}
+        previous = parse_process_sample(_dperf_process(4100, 0, "server", 100, 0) + _dperf_process(4200, 0, "client", 0, 0))
+        current = parse_process_sample(_dperf_process(4100, 0, "server", 250, 50) + _dperf_process(4201, 0, "client", 9, 0))
+
+        usage = process_usage(previous, current, previous_times, cpu_times)
+        self.assertEqual(list(usage), [(0, "server")])
+        self.assertEqual(usage[(0, "server")], {
+            "pids": 1, "cpu_usage": 100.0, "cpu_time": 3.0, "rss_mb": 2.0, "hugetlb_mb": 1024.0,
+        })
+
+    def test_samples_stored_under_pair_and_role(self):
+        """測試取樣依 pair 與角色分開保存並排入寫入佇列"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.executor = MagicMock()
+        monitor._last_cpu_times = {}
+        monitor._last_processes = {}
+        monitor.metrics = None
+        monitor.process_data = {}
+        monitor.buffer = MagicMock(capacity=4)
+        monitor.writer = MagicMock()
+        monitor.executor.execute_command.side_effect = [
+            (_proc_output(100, 900, processes=_dperf_process(4100, 1, "server", 10, 0)), "", 0),
+            (_proc_output(150, 950, processes=_dperf_process(4100, 1, "server", 60, 0)), "", 0),
+        ]
+
+        monitor._sample()
+        sample = monitor._sample()
+        monitor._record_processes("t", 1000.0, sample[5])
+
+        self.assertEqual(sample[5][(1, "server")]["cpu_usage"], 50.0)
+        data = monitor.get_process_data(1)
+        self.assertEqual([(d["pair_index"], d["role"], d["cpu_usage"]) for d in data], [(1, "server", 50.0)])
+        self.assertEqual(monitor.get_process_data(0), [])
+        pair_index, role, stored = monitor.writer.put_process.call_args[0]
+        self.assertEqual((pair_index, role, stored["timestamp"], stored["cpu_time"]), (1, "server", 1000.0, 0.6))
+
+
+class TestHugepages(unittest.TestCase):
+    """測試各 NUMA 節點 hugepages 取樣與耗盡事件"""
+
+    def test_parse_hugepage_sample(self):
+        """測試依節點與頁大小解析配置與可用頁數"""
+        output = _hugepages(0, 1048576, 8, 2) + _hugepages(1, 2048, 512, 512) + "[root@gen ~]# "
+        self.assertEqual(parse_hugepage_sample(output), {
+            (0, 1048576): {"total": 8, "free": 2},
+            (1, 2048): {"total": 512, "free": 512},
+        })
+
+    def test_depletion_event_opens_and_closes(self):
+        """測試可用頁數降為 0 時開始事件、恢復時結束，未配置 hugepages 的節點不計入"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.depletion_events = []
+        monitor._open_depletions = {}
+
+        for timestamp, free in (("t1", 2), ("t2", 0), ("t3", 0), ("t4", 1), ("t5", 0)):
+            monitor._track_hugepages(timestamp, {(0, 2048): {"total": 4, "free": free},
+                                                 (1, 2048): {"total": 0, "free": 0}})
+
+        events = monitor.get_depletion_events()
+        self.assertEqual([(e["node"], e["start"], e["end"], e["samples"]) for e in events],
+                         [(0, "t2", "t4", 2), (0, "t5", None, 1)])
+        self.assertEqual(events[0]["type"], "hugepage_depleted")
+
+    def test_sample_includes_hugepages(self):
+        """測試同一個取樣指令返回各節點的 hugepages"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.executor = MagicMock()
+        monitor._last_cpu_times = {}
+        monitor._last_processes = {}
+        monitor.metrics = None
+        monitor.executor.execute_command.side_effect = [
+            (_proc_output(100, 900), "", 0),
+            (_proc_output(150, 950, processes=_hugepages(0, 2048, 4, 0)), "", 0),
+        ]
+
+        monitor._sample()
+        self.assertEqual(monitor._sample()[6], {(0, 2048): {"total": 4, "free": 0}})
+
+
+class TestTickScheduler(unittest.TestCase):
+    """測試 monotonic 時鐘排程"""
+
+    def test_ticks_stay_on_grid(self):
+        """測試取樣耗時不累積漂移，錯過的 tick 略過並計數"""
+        clock = [100.0]
+        waits = []
+
+        def wait(timeout):
+            waits.append(round(timeout, 3))
+            clock[0] += timeout
+            return False
+
+        stop_event = MagicMock()
+        stop_event.wait.side_effect = wait
+        stop_event.is_set.return_value = False
+        with patch("system_monitor.time.monotonic", side_effect=lambda: clock[0]):
+            scheduler = TickScheduler(0.5, stop_event)
+            for elapsed in (0.2, 0.1, 1.3, 0.1):
+                clock[0] += elapsed
+                self.assertTrue(scheduler.wait())
+
+        # tick 在 100.5、101.0；取樣耗時 1.3 秒錯過 101.5，於 102.3 立即補上 102.0 的取樣，下一個 tick 仍為 102.5
+        self.assertEqual(waits, [0.3, 0.4, 0.1])
+        self.assertEqual(scheduler.missed, 1)
+
+    def test_align_remote_clock(self):
+        """測試依外部時鐘對齊格點：間隔小幅抖動不計為略過，跳過的 tick 計數，同一 tick 的取樣略過"""
+        scheduler = TickScheduler(1.0)
+        aligned = [scheduler.align(t) for t in (500.0, 501.02, 501.98, 504.01, 504.3, 505.0)]
+
+        self.assertEqual(aligned, [True, True, True, True, False, True])
+        self.assertEqual(scheduler.missed, 1)
+
+    def test_stop_and_minimum_interval(self):
+        """測試 stop_event 設定後立即返回 False，間隔小於 0.1 秒拋出 ValueError"""
+        stop_event = Event()
+        stop_event.set()
+        self.assertFalse(TickScheduler(10.0, stop_event).wait())
+        with self.assertRaises(ValueError):
+            TickScheduler(0.05)
+
+    def test_sample_time_has_milliseconds(self):
+        """測試時間字串為毫秒精度"""
+        self.assertTrue(format_sample_time(1700000000.25).endswith(".250"))
+
+
+class TestStreamLoop(unittest.TestCase):
+    """測試串流取樣逐行解析"""
+
+    def test_stream_frames_recorded(self):
+        """測試每個結尾標記記錄一筆，時間取自遠端標記，第一個訊框只建立基準"""
+        monitor = SystemMonitor.__new__(SystemMonitor)
+        monitor.monitoring = True
+        monitor.interval = 0.1
+        monitor.missed_ticks = 0
+        monitor._stop_event = Event()
+        monitor._last_cpu_times = {}
+        monitor._last_processes = {}
+        monitor.metrics = None
+        monitor._stream = None
+        stream = MagicMock()
+        stream.lines.return_value = iter(
+            [""] + _proc_output(100, 900).splitlines() + [f"{STREAM_MARKER} 500.00 1700000000.250000"]
+            + _proc_output(150, 950).splitlines() + [f"{STREAM_MARKER} 500.10 1700000000,350000\r"]
+            + _proc_output(240, 960).splitlines() + [f"{STREAM_MARKER} 500.30 1700000000.550000"]
+        )
+        monitor.executor = MagicMock()
+        monitor.executor.open_stream.return_value = stream
+        recorded = []
+        monitor._record = lambda now, monotonic, sample: recorded.append((now, monotonic, sample))
+
+        with patch("system_monitor.time.monotonic", return_value=10.0):
+            monitor._stream_loop()
+
+        self.assertEqual([sample for _, _, sample in recorded],
+                         [(50.0, 3072, 4096, 75.0, {0: 50.0}, {}, {}), (90.0, 3072, 4096, 75.0, {0: 90.0}, {}, {})])
+        self.assertEqual([now for now, _, _ in recorded], [1700000000.35, 1700000000.55])
+        self.assertEqual([round(monotonic, 3) for _, monotonic, _ in recorded], [10.1, 10.3])
+        # 遠端 500.20 的 tick 未輸出，計為略過；控制端不送出任何觸發
+        self.assertEqual(monitor.missed_ticks, 1)
+        stream.send.assert_not_called()
+        monitor.executor.open_stream.assert_called_once_with(stream_sample_cmd(0.1))
+        stream.close.assert_called_once()
+        self.assertIsNone(monitor._stream)
+
+    def test_stream_marker(self):
+        """測試結尾標記的遠端時間，一般輸出返回 None，缺少時間拋出 ValueError"""
+        self.assertEqual(parse_stream_marker(f"{STREAM_MARKER} 12.34 1700000000,5\r"), (12.34, 1700000000.5))
+        self.assertIsNone(parse_stream_marker("MemTotal: 1 kB"))
+        with self.assertRaises(ValueError):
+            parse_stream_marker(STREAM_MARKER)
+        self.assertIn("step=50;", stream_sample_cmd(0.5))
+
+    @unittest.skipUnless(os.path.exists("/proc/uptime"), "需要 /proc/uptime")
+    def test_stream_cmd_paces_on_absolute_deadline(self):
+        """測試本機執行串流迴圈時取樣落在時間格點上，align() 不會誤判略過的 tick"""
+        process = subprocess.Popen(["sh", "-c", stream_sample_cmd(0.1)], stdout=subprocess.PIPE, text=True)
+        uptimes = []
+        try:
+            for line in process.stdout:
+                stamp = parse_stream_marker(line)
+                if stamp:
+                    uptimes.append(stamp[0])
+                if len(uptimes) == 20:
+                    break
+        finally:
+            process.kill()
+            process.wait()
+
+        scheduler = TickScheduler(0.1)
+        self.assertTrue(all(scheduler.align(uptime) for uptime in uptimes))
+        self.assertEqual(scheduler.missed, 0)
+        # 個別取樣可能因負載晚醒，但截止時間不累積誤差：最後幾筆中至少一筆仍在格點上（uptime 精度 0.01 秒）
+        offsets = [abs(u - uptimes[0] - round((u - uptimes[0]) / 0.1) * 0.1) for u in uptimes[-5:]]
+        self.assertLessEqual(min(offsets), 0.011)
+
+
+class _DownThenUpHandler:
+    """建立時未連線、第二次 reconnect() 才成功的儲存後端"""
+
+    def __init__(self):
+        self.connected = False
+        self.reconnects = 0
+        self.saved = []
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.connected = self.reconnects >= 2
+        return self.connected
+
+    def save_monitor_batch(self, pair_index, samples):
+        self.saved.extend(samples)
+        return len(samples)
+
+    def close(self):
+        self.closed = True
+
+
+class TestStorageReconnect(unittest.TestCase):
+    """測試儲存後端建立時未連線，恢復後由寫入佇列補寫"""
+
+    def test_writer_reconnects_handler_that_was_down_at_start(self):
+        handler = _DownThenUpHandler()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch("system_monitor.SSHExecutor"), \
+                patch("system_monitor.open_storage_handler", return_value=handler):
+            monitor = SystemMonitor("10.0.0.1", 22, "user", "pass", log_path=tmpdir)
+            self.assertIs(monitor.redis_handler, handler)
+            self.assertIs(monitor.writer.redis_handler, handler)
+
+            monitor.writer.put_monitor(0, {"timestamp": 1.0, "cpu_usage": 5.0})
+            for _ in range(100):
+                if handler.saved:
+                    break
+                Event().wait(0.05)
+            monitor.disconnect()
+
+        self.assertEqual(handler.reconnects, 2)
+        self.assertEqual([s["timestamp"] for s in handler.saved], [1.0])
+        self.assertTrue(handler.closed)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""測試 Redis 非同步寫入佇列"""
+
+import json
+import os
+import tempfile
+import unittest
+from threading import Thread
+from unittest.mock import Mock
+from write_behind import WriteBehindQueue
+
+
+def _sample(ts):
+    return {"timestamp": ts, "cpu_usage": 1.0, "ram_used": 1, "ram_total": 2, "ram_usage": 50.0}
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """測試批次寫入、重試與本地暫存"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.tmpdir.name, "spill.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _queue(self, handler, **kwargs):
+        kwargs.setdefault("flush_interval", 0.01)
+        kwargs.setdefault("backoff_base", 0.001)
+        return WriteBehindQueue(handler, self.spill_path, **kwargs)
+
+    def _spilled(self):
+        with open(self.spill_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_monitor_samples_batched_per_pair(self):
+        """測試監控數據依 pair 合併為一次 save_monitor_batch"""
+        handler = Mock()
+        handler.save_monitor_batch.side_effect = lambda pair, samples: len(samples)
+        writer = self._queue(handler)
+
+        for i in range(5):
+            writer.put_monitor(0, _sample(i))
+        writer.start()
+        self.assertTrue(writer.flush(timeout=5))
+        writer.stop()
+
+        handler.save_monitor_batch.assert_called_once()
+        self.assertEqual(len(handler.save_monitor_batch.call_args[0][1]), 5)
+        self.assertEqual(writer.stats["written"], 5)
+
+    def test_apv_samples_batched_per_run(self):
+        """測試 APV 監控數據依 run_id 合併為一次 save_apv_samples"""
+        handler = Mock()
+        handler.save_apv_samples.side_effect = lambda run_id, samples: len(samples)
+        writer = self._queue(handler)
+
+        for i in range(3):
+            writer.put_apv("run-1", {"timestamp": i, "metrics": {"system.cpu": i}})
+        writer.start()
+        self.assertTrue(writer.flush(timeout=5))
+        writer.stop()
+
+        handler.save_apv_samples.assert_called_once()
+        self.assertEqual(handler.save_apv_samples.call_args[0][0], "run-1")
+        self.assertEqual(writer.stats["written"], 3)
+
+    def test_process_samples_batched_per_pair_and_role(self):
+        """測試 dperf 行程數據依 pair 與角色分開合併為 save_process_batch"""
+        handler = Mock()
+        handler.save_process_batch.side_effect = lambda pair, role, samples: len(samples)
+        writer = self._queue(handler)
+
+        for role in ("server", "client", "server"):
+            writer.put_process(1, role, {"timestamp": 1000.0, "cpu_usage": 50.0})
+        writer.start()
+        self.assertTrue(writer.flush(timeout=5))
+        writer.stop()
+
+        calls = {call[0][:2]: len(call[0][2]) for call in handler.save_process_batch.call_args_list}
+        self.assertEqual(calls, {(1, "server"): 2, (1, "client"): 1})
+        self.assertEqual(writer.stats["written"], 3)
+
+    def test_retry_then_spill(self):
+        """測試寫入持續失敗時重試後暫存到本地"""
+        handler = Mock()
+        handler.save_test_output.return_value = False
+        writer = self._queue(handler, max_retries=2).start()
+
+        writer.put_test_output(pair_index=0, role="client", output={"pktRx": 1})
+        writer.flush(timeout=5)
+        writer.stop()
+
+        self.assertEqual(handler.save_test_output.call_count, 3)
+        self.assertEqual(writer.stats["retries"], 2)
+        self.assertEqual(self._spilled()[0]["kwargs"]["output"], {"pktRx": 1})
+
+    def test_without_redis_spills_immediately(self):
+        """測試沒有 Redis 時直接暫存，不嘗試寫入"""
+        writer = self._queue(None).start()
+
+        writer.put_monitor(1, _sample(1.5))
+        writer.flush(timeout=5)
+        writer.stop()
+
+        self.assertEqual(self._spilled(), [{"op": "monitor", "pair_index": 1, "sample": _sample(1.5)}])
+
+    def test_full_queue_spills_without_blocking(self):
+        """測試佇列滿時直接暫存，不阻塞呼叫端"""
+        writer = self._queue(Mock(), max_size=1)
+
+        writer.put_monitor(0, _sample(1))
+        writer.put_monitor(0, _sample(2))
+
+        self.assertEqual(writer.stats["spilled"], 1)
+        self.assertEqual(self._spilled()[0]["sample"]["timestamp"], 2)
+        writer.stop()
+
+    def test_replay_spill_when_redis_available(self):
+        """測試 Redis 可用時補寫暫存檔並移除"""
+        with open(self.spill_path, "w") as f:
+            f.write(json.dumps({"op": "monitor", "pair_index": 0, "sample": _sample(1)}) + "\n")
+            f.write(json.dumps({"op": "test_output", "kwargs": {"pair_index": 0, "role": "server", "output": {}}}) + "\n")
+        handler = Mock()
+        handler.save_monitor_batch.side_effect = lambda pair, samples: len(samples)
+        handler.save_test_output.return_value = True
+        writer = self._queue(handler)
+
+        writer._replay_spill()
+
+        self.assertEqual(writer.stats["replayed"], 2)
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertFalse(os.path.exists(self.spill_path + ".replay"))
+        handler.save_test_output.assert_called_once_with(pair_index=0, role="server", output={})
+
+    def test_reconnect_after_backoff_then_replay(self):
+        """測試建立時未連線：退避期間暫存，退避結束後重新連線並補寫暫存數據"""
+        handler = Mock()
+        handler.is_connected.return_value = False
+        handler.reconnect.return_value = False
+        handler.save_monitor_batch.side_effect = lambda pair, samples: len(samples)
+        writer = self._queue(handler, backoff_base=0.05)
+
+        writer._write_with_retry([{"op": "monitor", "pair_index": 0, "sample": _sample(1)}])
+        self.assertEqual(writer.stats["spilled"], 1)
+        writer._replay_spill()
+        self.assertEqual(handler.reconnect.call_count, 1)
+
+        writer._retry_at = 0.0
+        handler.reconnect.return_value = True
+        writer._replay_spill()
+
+        self.assertEqual(writer.stats["replayed"], 1)
+        self.assertFalse(os.path.exists(self.spill_path))
+        handler.save_monitor_batch.assert_called_once_with(0, [_sample(1)])
+
+    def test_stats_counted_across_threads(self):
+        """測試多個呼叫端執行緒同時排入時統計不遺失"""
+        writer = self._queue(Mock(), max_size=100000)
+
+        threads = [Thread(target=lambda: [writer.put_monitor(0, _sample(i)) for i in range(2000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(writer.get_stats()["enqueued"], 16000)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,6 +1,11 @@
 from config import Config
 from dperfSetup import dperf
-from system_monitor import SystemMonitor
+from system_monitor import SystemMonitor, load_worker_cores
+from apv_monitor import APVMonitor
+from metrics_exporter import MetricsExporter, MetricsRegistry, RUN_PHASES
+from resource_planner import ResourcePlanner
+from RedisDB import new_run_id
+from sqlite_storage import open_storage_handler
 from threading import Thread
 from concurrent.futures import ThreadPoolExecutor
 import time
@@ -9,7 +14,7 @@ import time
 class TrafficGenerator:
     """流量產生器管理類別
 
-    封裝多組 dperf pair 和一個共用的 SystemMonitor，
+    封裝多組 dperf pair、一個共用的 SystemMonitor 與（啟用時）APVMonitor、OpenMetrics 端點，
     提供統一的介面來管理流量測試。
     """
 
@@ -39,6 +44,15 @@ class TrafficGenerator:
         self.pair_count = len(config.test.traffic_generator.pairs)
         print(f"[TrafficGenerator] 偵測到 {self.pair_count} 組 pair")
 
+        # OpenMetrics 端點（test.metrics_exporter.enable 時建立），各元件取得新數據時更新 registry
+        self.metrics = None
+        self.exporter = None
+        exporter_config = config.test.metrics_exporter
+        if exporter_config.enable:
+            self.metrics = MetricsRegistry()
+            self.exporter = MetricsExporter(self.metrics, host=exporter_config.host, port=exporter_config.port)
+            self._set_phase('idle')
+
         # 建立共用的 SystemMonitor（整台機器只需一個）
         self.monitor = SystemMonitor(
             management_ip=config.test.traffic_generator.management_ip,
@@ -49,9 +63,34 @@ class TrafficGenerator:
             redis_host=redis_host,
             redis_port=redis_port,
             redis_db=redis_db,
-            enable_redis=enable_redis
+            enable_redis=enable_redis,
+            storage_backend=config.test.storage.backend,
+            sqlite_path=config.test.storage.sqlite_path,
+            sampling_mode=config.test.traffic_generator.monitor.mode,
+            interval=config.test.traffic_generator.monitor.interval,
+            saturation_threshold=config.test.traffic_generator.monitor.saturation_threshold,
+            buffer_capacity=config.test.traffic_generator.monitor.buffer_capacity,
+            sink_format=config.test.traffic_generator.monitor.sink,
+            flush_interval=config.test.traffic_generator.monitor.flush_interval,
+            flush_bytes=config.test.traffic_generator.monitor.flush_bytes,
+            metrics=self.metrics
         )
 
+        # APV 統計監控（test.apv_monitor.enable 時建立），數據與產生器使用相同的 run_id
+        self.apv_monitor = None
+        if config.test.apv_monitor.enable:
+            self.apv_monitor = APVMonitor(
+                config=config,
+                log_path=log_path,
+                redis_host=redis_host,
+                redis_port=redis_port,
+                redis_db=redis_db,
+                enable_redis=enable_redis,
+                metrics=self.metrics,
+                # APV 樣本與 SystemMonitor 的串流取樣使用同一個（流量產生器主機的）時鐘
+                clock=self.monitor.remote_time
+            )
+
         # 建立多組 dperf pair
         self.pairs = []
         for i in range(self.pair_count):
@@ -63,19 +102,42 @@ class TrafficGenerator:
                 redis_host=redis_host,
                 redis_port=redis_port,
                 redis_db=redis_db,
-                enable_redis=enable_redis
+                enable_redis=enable_redis,
+                metrics=self.metrics
             )
             self.pairs.append(pair)
             print(f"[TrafficGenerator] 已建立 Pair {i}")
 
+        # 測試執行索引（run:{run_id}），與 pair 共用同一個儲存後端連線
+        self.run_id = None
+        self.storage_handler = None
+        if enable_redis:
+            try:
+                self.storage_handler = open_storage_handler(
+                    config.test.storage.backend, redis_host=redis_host, redis_port=redis_port,
+                    redis_db=redis_db, sqlite_path=config.test.storage.sqlite_path
+                )
+                if not self.storage_handler.is_connected():
+                    self.storage_handler = None
+            except Exception as e:
+                print(f"[TrafficGenerator] 儲存後端初始化失敗: {e}，不建立測試執行索引")
+                self.storage_handler = None
+
     def connect(self):
         """連接到遠端主機（包含 monitor 和所有 pair)"""
         print("[TrafficGenerator] 開始連接...")
 
+        if self.exporter:
+            self.exporter.start()
+
         # 連接 monitor
         self.monitor.connect()
         print("[TrafficGenerator] Monitor 已連接")
 
+        if self.apv_monitor:
+            self.apv_monitor.connect()
+            print("[TrafficGenerator] APV Monitor 已連接")
+
         # 連接所有 pair
         for i, pair in enumerate(self.pairs):
             pair.connect()
@@ -96,6 +158,17 @@ class TrafficGenerator:
         self.monitor.disconnect()
         print("[TrafficGenerator] Monitor 已斷開")
 
+        if self.apv_monitor:
+            self.apv_monitor.disconnect()
+            print("[TrafficGenerator] APV Monitor 已斷開")
+
+        if self.storage_handler:
+            self.storage_handler.close()
+            self.storage_handler = None
+
+        if self.exporter:
+            self.exporter.stop()
+
         print("[TrafficGenerator] 所有連接已斷開")
 
     def setup_env(self, pair_indices: list|None = None):
@@ -108,6 +181,13 @@ class TrafficGenerator:
             pair_indices = list(range(self.pair_count))
 
         print(f"[TrafficGenerator] 開始設定環境 (Pairs: {pair_indices})...")
+        self._set_phase('setup')
+
+        if self.config.test.traffic_generator.resource_planner.enable:
+            # 先保留 hugepages 再規劃，規劃時讀到的才是 dperf 實際可用的頁數
+            # （dpdk-hugepages.py --setup 會清除後在每個節點保留相同數量，之後各 pair 重複設定結果不變）
+            self.pairs[0].setHugePages()
+            self.plan_resources()
 
         for i in pair_indices:
             if i < len(self.pairs):
@@ -117,8 +197,32 @@ class TrafficGenerator:
             else:
                 print(f"[TrafficGenerator] 警告: Pair {i} 不存在")
 
+        self._set_phase('idle')
         print("[TrafficGenerator] 環境設定完成")
 
+    def plan_resources(self):
+        """讀取遠端 NUMA 拓樸並為每組 pair 分配不重疊的核心與 socket 記憶體
+
+        Returns:
+            list: 各 pair 的 PairAllocation
+        """
+        planner_cfg = self.config.test.traffic_generator.resource_planner
+        planner = ResourcePlanner(
+            executor=self.monitor.executor,
+            cores_per_role=planner_cfg.cores_per_role,
+            reserved_cores=planner_cfg.reserved_cores,
+            hugepage_size=self.config.test.traffic_generator.hugepage_size,
+        )
+        allocations = planner.plan(self.config.test.traffic_generator.pairs)
+
+        for pair, allocation in zip(self.pairs, allocations):
+            pair.allocation = allocation
+            print(f"[TrafficGenerator] Pair {allocation.pair_index} 資源分配: "
+                  f"client cpu [{allocation.client_cpu}] (node {allocation.client_node}), "
+                  f"server cpu [{allocation.server_cpu}] (node {allocation.server_node})")
+
+        return allocations
+
     def run_test(self, pair_indices: list|None = None, enable_monitor: bool = True,
                  parallel: bool = False, monitor_output_file: str|None = None):
         """執行測試
@@ -130,18 +234,33 @@ class TrafficGenerator:
             monitor_output_file: 監控數據輸出檔案路徑
 
         Returns:
-            dict: 測試結果，包含各 pair 的 server/client 輸出和監控數據
+            dict: 測試結果，包含各 pair 的 server/client 輸出、監控數據（monitor_data）、
+                dperf worker 核心使用率（core_report）、hugepage 耗盡與 DPDK port 錯誤事件
+                （depletion_events）與啟用時的 APV 統計（apv_data）
         """
         if pair_indices is None:
             pair_indices = list(range(self.pair_count))
 
-        print(f"[TrafficGenerator] 開始測試 (Pairs: {pair_indices}, 並行: {parallel}, 監控: {enable_monitor})...")
+        # 每次執行使用新的 run_id，測試輸出以 run_id 區分，同一秒開始的執行不會互相覆蓋
+        self.run_id = new_run_id()
+        for pair in self.pairs:
+            pair.run_id = self.run_id
+        if self.storage_handler:
+            self.storage_handler.start_run(self.run_id, self.config.fingerprint(), pair_indices)
+
+        print(f"[TrafficGenerator] 開始測試 (Run: {self.run_id}, Pairs: {pair_indices}, "
+              f"並行: {parallel}, 監控: {enable_monitor})...")
 
         results = {}
+        status = "failed"
+        self._set_phase('running')
 
-        # 啟動監控
+        # 啟動監控（依產生的 dperf 配置標記各 pair 的 worker 核心）
         if enable_monitor:
+            self.monitor.set_worker_cores(load_worker_cores(pair_indices))
             self.monitor.start(output_file=monitor_output_file)
+            if self.apv_monitor:
+                self.apv_monitor.start(run_id=self.run_id)
             time.sleep(2)  # 確保監控已啟動
 
         try:
@@ -151,17 +270,50 @@ class TrafficGenerator:
             else:
                 # 順序執行各 pair 測試
                 results = self._run_sequential(pair_indices)
+            status = "completed"
         finally:
             # 停止監控
+            self._set_phase('stopping')
             if enable_monitor:
                 self.monitor.stop()
+                if self.apv_monitor:
+                    self.apv_monitor.stop()
+            if self.storage_handler:
+                self.storage_handler.finish_run(self.run_id, status=status)
+            self._set_phase('idle')
 
-        # 加入監控數據到結果
+        # 加入監控數據與 worker 核心使用率到結果
         results['monitor_data'] = self.monitor.get_data()
+        results['core_report'] = self.monitor.get_core_report()
+        results['depletion_events'] = self._depletion_events(results)
+        if self.apv_monitor:
+            results['apv_data'] = self.apv_monitor.get_data()
 
         print("[TrafficGenerator] 測試完成")
         return results
 
+    def _depletion_events(self, results: dict) -> list:
+        """彙整 hugepage 耗盡事件與各 pair 的 DPDK port 錯誤事件
+
+        Returns:
+            list: SystemMonitor.get_depletion_events() 的事件，接著為
+                {'type': 'nic_errors', 'pair_index', 'role', 'counter', 'first_second', 'last_second', ...}
+        """
+        events = self.monitor.get_depletion_events()
+        for name, result in results.items():
+            if not name.startswith('pair_') or not isinstance(result, dict):
+                continue
+            pair_index = int(name[len('pair_'):])
+            for role, nic_events in (result.get('nic_events') or {}).items():
+                for event in nic_events:
+                    events.append(dict(event, type='nic_errors', pair_index=pair_index, role=role))
+        return events
+
+    def _set_phase(self, phase: str):
+        """更新 OpenMetrics 端點上的測試階段（未啟用端點時不做任何事）"""
+        if self.metrics:
+            self.metrics.set_state('array_script_run_phase', phase, RUN_PHASES)
+
     def _run_sequential(self, pair_indices: list):
         """順序執行測試
 
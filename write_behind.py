@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Redis 非同步寫入佇列 (write-behind)
+
+量測執行緒只把要寫入的數據放進有上限的佇列，由背景執行緒批次寫入 Redis；
+寫入失敗時以指數退避重試，Redis 無法使用時將數據暫存到本地 JSONL 檔，
+退避時間結束後重新連線，恢復連線後再自動補寫。
+"""
+
+import json
+import os
+import queue
+import time
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from RedisDB import RedisHandler
+from metrics_exporter import MetricsRegistry
+
+
+# 停止背景執行緒的佇列標記
+_STOP = {'op': 'stop'}
+
+
+class WriteBehindQueue:
+    """Redis 非同步寫入佇列"""
+
+    def __init__(self, redis_handler: Optional[RedisHandler], spill_path: str,
+                 max_size: int = 10000, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 name: str = "WriteBehind", metrics: Optional[MetricsRegistry] = None):
+        """初始化寫入佇列
+
+        Args:
+            redis_handler: RedisHandler，可為 None（此時所有數據直接暫存到本地）
+            spill_path: Redis 無法使用時的本地暫存檔 (JSONL)
+            max_size: 佇列上限，佇列滿時新數據直接暫存到本地，不會阻塞呼叫端
+            batch_size: 每次寫入 Redis 的最大筆數
+            flush_interval: 佇列為空時等待新數據的秒數
+            max_retries: 單批寫入失敗時的重試次數，超過後暫存到本地
+            backoff_base: 第一次重試前等待的秒數，之後每次加倍
+            backoff_max: 重試等待秒數上限
+            name: 執行緒名稱與訊息前綴
+            metrics: 記錄每批寫入耗時的 MetricsRegistry（可選）
+        """
+        self.redis_handler = redis_handler
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.name = name
+        self.metrics = metrics
+
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_size)
+        self._spill_lock = Lock()
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        # 下次嘗試寫入 Redis 的時間（退避期間直接暫存，不阻塞佇列）
+        self._retry_at = 0.0
+        self._backoff = backoff_base
+
+        # 呼叫端執行緒與背景執行緒都會更新統計，以 _count() 在鎖內累加
+        self._stats_lock = Lock()
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'retries': 0,
+            'spilled': 0,
+            'replayed': 0,
+        }
+
+        spill_dir = os.path.dirname(spill_path)
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def start(self) -> "WriteBehindQueue":
+        """啟動背景寫入執行緒"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def put_monitor(self, pair_index: int, sample: Dict) -> None:
+        """排入一筆監控數據（格式與 RedisHandler.save_monitor_batch 的 sample 相同）"""
+        self._put({'op': 'monitor', 'pair_index': pair_index, 'sample': sample})
+
+    def put_process(self, pair_index: int, role: str, sample: Dict) -> None:
+        """排入一筆 dperf 行程監控數據（格式與 RedisHandler.save_process_batch 的 sample 相同）"""
+        self._put({'op': 'process', 'pair_index': pair_index, 'role': role, 'sample': sample})
+
+    def put_apv(self, run_id: str, sample: Dict) -> None:
+        """排入一筆 APV 監控數據（格式與 RedisHandler.save_apv_samples 的 sample 相同）"""
+        self._put({'op': 'apv', 'run_id': run_id, 'sample': sample})
+
+    def put_test_output(self, **kwargs) -> None:
+        """排入一筆測試輸出，參數與 RedisHandler.save_test_output 相同"""
+        self._put({'op': 'test_output', 'kwargs': kwargs})
+
+    def _put(self, item: Dict) -> None:
+        """放入佇列，佇列滿時直接暫存到本地，不阻塞呼叫端"""
+        self._count('enqueued')
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._spill([item])
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待佇列中的數據寫出（寫入 Redis 或暫存到本地）
+
+        Args:
+            timeout: 最長等待秒數
+
+        Returns:
+            bool: 佇列在時限內清空時返回 True
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """寫出剩餘數據並停止背景執行緒"""
+        if self._thread and self._thread.is_alive():
+            self.flush(timeout)
+            self._stop_event.set()
+            # 喚醒等待中的背景執行緒
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=timeout)
+        # 執行緒未啟動或未能結束時，剩餘數據暫存到本地
+        remaining = [item for item in self._drain(self._queue.qsize()) if item is not _STOP]
+        if remaining:
+            self._spill(remaining)
+            for _ in remaining:
+                self._queue.task_done()
+        print(f"[{self.name}] 已停止，統計: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """返回統計的複本（enqueued、written、retries、spilled、replayed）"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        """累加一項統計"""
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _drain(self, limit: int) -> List[Dict]:
+        """從佇列取出最多 limit 筆"""
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        """背景寫入迴圈"""
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+            if first is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [first] + self._drain(self.batch_size - 1)
+            try:
+                self._write_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            # 佇列持續有數據時也要補寫，不只在佇列空閒時
+            self._replay_spill()
+
+    def _available(self) -> bool:
+        """Redis 是否可用：退避期間返回 False，退避結束時未連線則重新連線並 ping"""
+        if self.redis_handler is None or time.monotonic() < self._retry_at:
+            return False
+        if self.redis_handler.is_connected():
+            return True
+        if self.redis_handler.reconnect():
+            print(f"[{self.name}] 已重新連接到儲存後端")
+            self._backoff = self.backoff_base
+            return True
+        # 重新連線失敗：退避後再試，期間數據直接暫存
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+        return False
+
+    def _write_with_retry(self, batch: List[Dict]) -> None:
+        """寫入一批數據，失敗時以指數退避重試，仍失敗則暫存到本地"""
+        for attempt in range(self.max_retries + 1):
+            if not self._available():
+                break
+            start = time.perf_counter()
+            failed = self._write(batch)
+            if self.metrics:
+                self.metrics.observe('array_script_storage_write_latency_seconds',
+                                     time.perf_counter() - start, writer=self.name)
+            if not failed:
+                self._backoff = self.backoff_base
+                self._retry_at = 0.0
+                return
+            batch = failed
+            if attempt < self.max_retries:
+                self._count('retries')
+                time.sleep(self._backoff)
+                self._backoff = min(self._backoff * 2, self.backoff_max)
+
+        # 重試用盡：暫存到本地，並在退避時間內不再嘗試 Redis，避免阻塞佇列
+        self._retry_at = time.monotonic() + self._backoff
+        self._spill(batch)
+
+    def _write(self, batch: List[Dict]) -> List[Dict]:
+        """寫入一批數據到 Redis
+
+        Returns:
+            List[Dict]: 寫入失敗的項目
+        """
+        failed = []
+        samples_by_pair: Dict[int, List[Dict]] = {}
+        processes: Dict[Tuple[int, str], List[Dict]] = {}
+        apv_by_run: Dict[str, List[Dict]] = {}
+        for item in batch:
+            if item['op'] == 'monitor':
+                samples_by_pair.setdefault(item['pair_index'], []).append(item)
+            elif item['op'] == 'process':
+                processes.setdefault((item['pair_index'], item['role']), []).append(item)
+            elif item['op'] == 'apv':
+                apv_by_run.setdefault(item['run_id'], []).append(item)
+            elif item['op'] == 'test_output':
+                if self.redis_handler.save_test_output(**item['kwargs']):
+                    self._count('written')
+                else:
+                    failed.append(item)
+
+        # 監控數據依 pair 合併成一次 pipeline
+        for pair_index, items in samples_by_pair.items():
+            written = self.redis_handler.save_monitor_batch(pair_index, [i['sample'] for i in items])
+            if written == len(items):
+                self._count('written', written)
+            else:
+                failed.extend(items)
+
+        # 行程監控數據依 pair 與角色合併
+        for (pair_index, role), items in processes.items():
+            written = self.redis_handler.save_process_batch(pair_index, role, [i['sample'] for i in items])
+            if written == len(items):
+                self._count('written', written)
+            else:
+                failed.extend(items)
+
+        # APV 監控數據依 run_id 合併成一次 pipeline
+        for run_id, items in apv_by_run.items():
+            written = self.redis_handler.save_apv_samples(run_id, [i['sample'] for i in items])
+            if written == len(items):
+                self._count('written', written)
+            else:
+                failed.extend(items)
+
+        return failed
+
+    def _spill(self, items: List[Dict]) -> None:
+        """將數據追加到本地暫存檔"""
+        with self._spill_lock:
+            try:
+                with open(self.spill_path, 'a') as f:
+                    for item in items:
+                        f.write(json.dumps(item, default=str) + "\n")
+                self._count('spilled', len(items))
+            except OSError as e:
+                print(f"[{self.name}] 暫存到本地失敗，遺失 {len(items)} 筆數據: {e}")
+
+    def _replay_spill(self) -> None:
+        """Redis 可用時補寫本地暫存檔"""
+        replay_path = f"{self.spill_path}.replay"
+        if not self._available():
+            return
+        if not os.path.exists(self.spill_path) and not os.path.exists(replay_path):
+            return
+
+        # 先改名再讀取，補寫期間新的暫存數據寫入新檔案；
+        # 上次補寫中斷留下的 .replay 檔優先處理（重複寫入同一筆數據不影響結果）
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+
+        items = []
+        with open(replay_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    continue
+
+        print(f"[{self.name}] Redis 已可用，補寫 {len(items)} 筆暫存數據")
+        # written 只由背景執行緒（即此處）更新，前後差值即為補寫筆數
+        written_before = self.get_stats()['written']
+        for i in range(0, len(items), self.batch_size):
+            self._write_with_retry(items[i:i + self.batch_size])
+        self._count('replayed', self.get_stats()['written'] - written_before)
+        os.remove(replay_path)